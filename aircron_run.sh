@@ -11,6 +11,8 @@
 
 # ▸ Self-logging to ~/Library/Logs/AirCron/cron.log
 
+# ▸ Structured step/run records in ~/Library/Logs/AirCron/runs.jsonl
+
 ##############################################################################
 
 set -o pipefail
@@ -21,17 +23,102 @@ exec >>"$LOG_FILE" 2>&1
 
 echo "$(date): DEBUG: Args: $*"
 
-# Best-effort single-run lock to avoid overlapping cron jobs
+# ── Run log ───────────────────────────────────────────────────────────────
+# One JSON line per step and one per run (see app/runlog.py). Times are epoch
+# milliseconds; cron lines set AIRCRON_JOB_ID to the job being fired (a comma-
+# separated list when one line fires several jobs with the same command).
+RUN_LOG="${AIRCRON_RUN_LOG:-$HOME/Library/Logs/AirCron/runs.jsonl}"
+mkdir -p "$(dirname "$RUN_LOG")" 2>/dev/null
+
+now_ms() {
+    if [ -n "$EPOCHREALTIME" ]; then
+        local t="${EPOCHREALTIME/[.,]/}"
+        printf '%s' "${t:0:${#t}-3}"
+    else
+        # macOS /bin/bash 3.2 has no EPOCHREALTIME and date has no %N
+        perl -MTime::HiRes=time -e 'printf "%d", time() * 1000' 2>/dev/null \
+            || printf '%s000' "$(date +%s)"
+    fi
+}
+
+RUN_START=$(now_ms)
+ACTION_START=$RUN_START
+RUN_ID="${RUN_START}-$$"
+RUN_PATH=script
+STEP_FAILURES=0
+RUN_ZONE="$1"
+RUN_ACTION="$2"
+RUN_SERVICE="${5:-spotify}"
+
+# ── Fast path: hand the action to the resident executor ───────────────────
+# The executor (python -m app.executor, or started with the app) keeps tool
+# paths and app readiness warm and spools the action on its run queue, where
+# same-minute fires are serialized per speaker rather than dropped. If it
+# isn't listening, run the action below.
+EXECUTOR_SOCKET="${AIRCRON_EXECUTOR_SOCKET:-$HOME/Library/Application Support/AirCron/executor.sock}"
+
+json_str() {
+    printf '"%s"' "$(printf '%s' "$1" | sed 's/\\/\\\\/g; s/"/\\"/g' | tr '\t\r\n' '   ')"
+}
+
+log_record() {
+    printf '%s\n' "$1" >>"$RUN_LOG" 2>/dev/null
+}
+
+# log_step NAME START_MS EXIT_CODE
+log_step() {
+    local end
+    end=$(now_ms)
+    [ "$3" -ne 0 ] && STEP_FAILURES=$((STEP_FAILURES + 1))
+    log_record "{\"type\": \"step\", \"run_id\": \"$RUN_ID\", \"job_id\": $(json_str "$AIRCRON_JOB_ID"), \"step\": $(json_str "$1"), \"start_ms\": $2, \"end_ms\": $end, \"duration_ms\": $((end - $2)), \"exit_code\": $3}"
+}
+
+# Written on exit with the script's exit code
+finish_run() {
+    local rc=$? end drift=null
+    end=$(now_ms)
+    # Cron starts a job on its minute; drift is how late the action itself started
+    [ -n "$AIRCRON_JOB_ID" ] && drift=$((ACTION_START - RUN_START + RUN_START % 60000))
+    log_record "{\"type\": \"run\", \"run_id\": \"$RUN_ID\", \"job_id\": $(json_str "$AIRCRON_JOB_ID"), \"zone\": $(json_str "$RUN_ZONE"), \"action\": $(json_str "$RUN_ACTION"), \"service\": $(json_str "$RUN_SERVICE"), \"path\": \"$RUN_PATH\", \"start_ms\": $ACTION_START, \"end_ms\": $end, \"duration_ms\": $((end - ACTION_START)), \"lock_wait_ms\": $((ACTION_START - RUN_START)), \"exit_code\": $rc, \"failed_steps\": $STEP_FAILURES, \"drift_ms\": $drift}"
+}
+trap finish_run EXIT
+
+if [ -z "$AIRCRON_NO_EXECUTOR" ] && [ -S "$EXECUTOR_SOCKET" ] && command -v nc >/dev/null 2>&1; then
+    SCHEDULED_AT=null
+    [ -n "$AIRCRON_JOB_ID" ] && SCHEDULED_AT=$((RUN_START / 60000 * 60))
+    REQUEST="{\"zone\": $(json_str "$1"), \"action\": $(json_str "$2"), \"arg1\": $(json_str "$3"), \"arg2\": $(json_str "$4"), \"service\": $(json_str "$5"), \"job_id\": $(json_str "$AIRCRON_JOB_ID"), \"scheduled_at\": $SCHEDULED_AT, \"wait\": false}"
+    REPLY=$(printf '%s\n' "$REQUEST" | nc -U -w "${AIRCRON_EXECUTOR_TIMEOUT:-120}" "$EXECUTOR_SOCKET" 2>/dev/null)
+    case "$REPLY" in
+        '{"ok": true'*)
+            echo "$(date): Executor handled '$2': $REPLY"
+            # The executor writes this action's run record when it runs it
+            trap - EXIT
+            exit 0
+            ;;
+        '{"ok": false'*)
+            echo "$(date): ERROR: Executor failed '$2': $REPLY"
+            RUN_PATH=executor
+            exit 1
+            ;;
+        *)
+            echo "$(date): INFO: Executor not responding; running '$2' directly"
+            ;;
+    esac
+fi
+
+# Best-effort single-run lock so overlapping cron jobs take turns; wait for
+# the other run instead of dropping this one
 LOCK_FILE=/tmp/aircron_run.lock
 if command -v flock >/dev/null 2>&1; then
     exec 200>"$LOCK_FILE"
-    if ! flock -n 200; then
-        echo "$(date): Another AirCron invocation is running; skipping."
-        exit 0
+    if ! flock -w "${AIRCRON_LOCK_WAIT:-300}" 200; then
+        echo "$(date): ERROR: Another AirCron invocation held the lock too long; giving up on '$2'."
+        exit 1
     fi
 else
     echo "$(date): INFO: flock not available; continuing without lock"
 fi
+ACTION_START=$(now_ms)
 
 ###########################################################################
 
@@ -72,6 +159,16 @@ csv_to_as_list() {
     fi
 }
 
+# AppleScript list of a zone's speakers: "Custom:A,B,C" is split on commas, any
+# other zone is a single speaker whose name may itself contain commas
+zone_to_as_list() {
+    if [[ "$1" == Custom:* ]]; then
+        csv_to_as_list "${1#Custom:}"
+    else
+        printf '{"%s"}' "$(essc "$(normalize_speaker_name "$1")")"
+    fi
+}
+
 # Clamp a percentage to 0-100 and strip trailing '%'
 clamp_pct() {
     local raw=${1%%%}
@@ -100,22 +197,30 @@ wait_for_process() {
 
 # Ensure an app is running; launch if missing and wait briefly
 ensure_app() {
-    local proc="$1" app_name="$2"
+    local proc="$1" app_name="$2" start rc=0
+    start=$(now_ms)
     if ! pgrep -x "$proc" >/dev/null; then
         echo "$(date): $app_name not running, launching..."
         open -g -a "$app_name" >/dev/null 2>&1 || open -a "$app_name" >/dev/null 2>&1
     fi
-    wait_for_process "$proc" 12 0.5 || echo "$(date): WARN: $app_name not ready after wait"
+    if ! wait_for_process "$proc" 12 0.5; then
+        echo "$(date): WARN: $app_name not ready after wait"
+        rc=1
+    fi
+    log_step "ensure_app:$app_name" "$start" "$rc"
 }
 
-# run osascript with logging
+# run osascript with logging (AIRCRON_OSASCRIPT overrides the binary, e.g. a stand-in)
+OSASCRIPT="${AIRCRON_OSASCRIPT:-/usr/bin/osascript}"
 
 run_osascript() {
-    local script="$1"
+    local script="$1" start
     echo "$(date): Running osascript >>>"
     echo "$script"
-    echo "$script" | /usr/bin/osascript 2>&1
+    start=$(now_ms)
+    echo "$script" | "$OSASCRIPT" 2>&1
     local rc=${PIPESTATUS[1]}
+    log_step osascript "$start" "$rc"
     [ $rc -ne 0 ] && echo "$(date): osascript exit $rc"
     return $rc
 }
@@ -159,6 +264,16 @@ elif command -v spotify >/dev/null;      then SPOTIFY_CMD="$(command -v spotify)
 else SPOTIFY_CMD=""
 fi
 
+# Run spotify-cli as a logged step
+run_spotify() {
+    local start rc
+    start=$(now_ms)
+    "$SPOTIFY_CMD" "$@"
+    rc=$?
+    log_step "spotify:$1" "$start" "$rc"
+    return $rc
+}
+
 ensure_spotify_cli() {
     if [ -z "$SPOTIFY_CMD" ]; then
         echo "$(date): spotify-cli missing"
@@ -173,7 +288,7 @@ ensure_spotify_cli() {
 
 ###########################################################################
 SPEAKER="$1"     # "All Speakers", single name, or Custom:A,B,C
-ACTION="$2"      # play|pause|resume|volume|connect|disconnect
+ACTION="$2"      # play|pause|resume|volume|connect|disconnect|reconnect
 ARG1="$3"        # playlist / URI / volume %
 ARG2="$4"        # spare
 SERVICE="$5"     # applemusic | spotify | (blank ⇒ spotify)
@@ -203,6 +318,37 @@ set_airfoil_source_spotify() {
     end tell'
 }
 
+# One AppleScript applying a step to every named Airfoil speaker, instead of
+# one osascript per speaker. Each speaker is tried separately and the failures
+# are reported together, so one missing speaker doesn't hide the rest.
+airfoil_each_speaker() {
+    local list
+    list=$(zone_to_as_list "$1")
+    printf '%s' "set failures to {}
+tell application \"Airfoil\"
+    repeat with speakerName in ${list}
+        try
+            set matches to (every speaker whose name is (speakerName as text))
+            if (count of matches) is 0 then error \"Airfoil speaker not found: \" & speakerName
+            repeat with s in matches
+                $2
+            end repeat
+        on error errMsg
+            set end of failures to errMsg
+        end try
+    end repeat
+end tell
+if (count of failures) > 0 then
+    set AppleScript's text item delimiters to \"; \"
+    error (failures as text)
+end if"
+}
+
+reconnect_speakers() {
+    disconnect_speakers "$1" "$2"
+    connect_speakers "$1" "$2"
+}
+
 connect_speakers() {
 local zone esc_zone
 zone="$1"
@@ -238,12 +384,7 @@ else
 if [[ "$1" == "All Speakers" ]]; then
 run_osascript 'tell application "Airfoil" to connect to (every speaker)'
 elif [[ "$1" == Custom:* ]]; then
-IFS=',' read -ra arr <<< "${1#Custom:}"
-for spk in "${arr[@]}"; do
-clean_spk="$(normalize_speaker_name "$spk")"
-esc_spk=$(essc "$clean_spk")
-run_osascript "tell application \"Airfoil\" to connect to (every speaker whose name is \"${esc_spk}\")"
-done
+run_osascript "$(airfoil_each_speaker "$1" "connect to s")"
 else
 run_osascript "tell application \"Airfoil\" to connect to (every speaker whose name is \"${esc_zone}\")"
 fi
@@ -282,12 +423,7 @@ ensure_airfoil
 if [[ "$1" == "All Speakers" ]]; then
 run_osascript 'tell application "Airfoil" to disconnect from (every speaker whose connected is true)'
 elif [[ "$1" == Custom:* ]]; then
-IFS=',' read -ra arr <<< "${1#Custom:}"
-for spk in "${arr[@]}"; do
-clean_spk="$(normalize_speaker_name "$spk")"
-esc_spk=$(essc "$clean_spk")
-run_osascript "tell application \"Airfoil\" to disconnect from (every speaker whose name is \"${esc_spk}\")"
-done
+run_osascript "$(airfoil_each_speaker "$1" "disconnect from s")"
 else
 run_osascript "tell application \"Airfoil\" to disconnect from (every speaker whose name is \"${esc_zone}\")"
 fi
@@ -306,7 +442,7 @@ set_global_volume() {
     case "$service" in
         spotify)
             if ensure_spotify_cli; then
-                run_or_fail "$SPOTIFY_CMD" vol "$pct"
+                run_or_fail run_spotify vol "$pct"
             else
                 return 1
             fi
@@ -323,53 +459,42 @@ set_global_volume() {
 }
 
 set_speaker_volume() {
-local zone arr esc_spk f pct
+local zone f pct
 zone="$2"; pct=$(clamp_pct "$3"); f=$(awk "BEGIN {printf \"%.2f\", ${pct}/100}")
-if [[ "$zone" == Custom:* ]]; then
-IFS=',' read -ra arr <<< "${zone#Custom:}"
-else
-arr=("$zone")
-fi
 
 case "$1" in
     spotify)
         ensure_airfoil
         ensure_app "Spotify" "Spotify"
-        for spk in "${arr[@]}"; do
-            clean_spk="$(normalize_speaker_name "$spk")"
-            esc_spk=$(essc "$clean_spk")
-            run_osascript "tell application \"Airfoil\"
-                set matches to (every speaker whose name is \"${esc_spk}\")
-                if (count of matches) is 0 then error \"Airfoil speaker not found: ${esc_spk}\"
-                repeat with s in matches
-                    set (volume of s) to ${f}
-                end repeat
-            end tell" || return $?
-        done
+        run_osascript "$(airfoil_each_speaker "$zone" "set (volume of s) to ${f}")" || return $?
         ;;
     applemusic)
         ensure_music
-        for spk in "${arr[@]}"; do
-            clean_spk="$(normalize_speaker_name "$spk")"
-            esc_spk=$(essc "$clean_spk")
-            run_osascript "tell application \"Music\"
-                set matchedCount to 0
-                if \"${esc_spk}\" is \"All Speakers\" then
-                    repeat with d in (every AirPlay device)
+        # One pass over the AirPlay devices for every speaker in the zone
+        run_osascript "set targetNames to $(zone_to_as_list "$zone")
+            set matchedNames to {}
+            tell application \"Music\"
+                repeat with d in (every AirPlay device)
+                    if \"All Speakers\" is in targetNames or name of d is in targetNames then
                         set sound volume of d to ${pct}
-                        set matchedCount to matchedCount + 1
-                    end repeat
-                else
-                    repeat with d in (every AirPlay device)
-                        if name of d is \"${esc_spk}\" then
-                            set sound volume of d to ${pct}
-                            set matchedCount to matchedCount + 1
-                        end if
-                    end repeat
+                        set end of matchedNames to name of d
+                    end if
+                end repeat
+            end tell
+            set missing to {}
+            repeat with speakerName in targetNames
+                set speakerName to speakerName as text
+                if speakerName is not \"All Speakers\" and speakerName is not in matchedNames then
+                    set end of missing to speakerName
                 end if
-                if matchedCount is 0 then error \"Apple Music AirPlay device not found: ${esc_spk}\"
-            end tell" || return $?
-        done
+            end repeat
+            if \"All Speakers\" is in targetNames and (count of matchedNames) is 0 then
+                set end of missing to \"All Speakers\"
+            end if
+            if (count of missing) > 0 then
+                set AppleScript's text item delimiters to \", \"
+                error \"Apple Music AirPlay device not found: \" & (missing as text)
+            end if" || return $?
         ;;
     *)
         echo "$(date): WARN: Unknown service '$1' for speaker volume"
@@ -392,7 +517,7 @@ run_osascript "tell application \"Music\" to play playlist \"$(essc "$ARG1")\""
 else
 if ! ensure_spotify_cli; then exit 1; fi
 ensure_app "Spotify" "Spotify"
-$SPOTIFY_CMD play uri "$ARG1"
+run_spotify play uri "$ARG1"
 fi
 ;;
 pause)
@@ -401,7 +526,7 @@ ensure_music; run_osascript 'tell application "Music" to pause'
 else
 if ensure_spotify_cli; then
     ensure_app "Spotify" "Spotify"
-    $SPOTIFY_CMD pause
+    run_spotify pause
 fi
 fi
 ;;
@@ -411,7 +536,7 @@ ensure_music; run_osascript 'tell application "Music" to play'
 else
 if ensure_spotify_cli; then
     ensure_app "Spotify" "Spotify"
-    $SPOTIFY_CMD play
+    run_spotify play
 fi
 fi
 ;;
@@ -426,6 +551,8 @@ connect)
 connect_speakers    "$SPEAKER" "$SERVICE" ;;
 disconnect)
 disconnect_speakers "$SPEAKER" "$SERVICE" ;;
+reconnect)
+reconnect_speakers  "$SPEAKER" "$SERVICE" ;;
 *)
 echo "$(date): ERROR – unknown action '$ACTION'"; exit 1 ;;
 esac
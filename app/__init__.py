@@ -7,7 +7,24 @@ from typing import Any, Dict, Optional
 
 from flask import Flask
 
+from . import metrics, profiling, registry
 from .api import api_bp
+from .control_runs import control_runs
+from .executor import default_socket_path
+from .jobs_backends import get_backend
+from .runlog import default_run_log_path, run_stats
+from .scheduler import SCHEDULER_BACKENDS
+from .server import SERVER_MODES
+from .services import (
+    changes_service,
+    control_service,
+    cron_service,
+    jobs_service,
+    playlists_service,
+    runs_service,
+    speakers_service,
+)
+from .speakers import speaker_discovery
 from .views import views_bp
 
 
@@ -69,6 +86,47 @@ def create_app(config: Optional[Dict[str, Any]] = None) -> Flask:
     app.config.update(
         SECRET_KEY="dev-only-not-for-production",
         JSON_SORT_KEYS=False,
+        # Job storage backend: "json" (jobs.json) or "sqlite" (jobs.db, WAL mode)
+        JOBS_BACKEND="json",
+        # json backend: fold jobs.journal into jobs.json after this many records
+        JOBS_JOURNAL_COMPACT_THRESHOLD=500,
+        # Seconds a parsed `crontab -l` is shared before external edits are re-read
+        CRONTAB_SNAPSHOT_TTL=5.0,
+        # Speaker list: background refresh period and the age after which reads
+        # trigger a refresh (0 disables the background worker)
+        SPEAKER_REFRESH_INTERVAL=30.0,
+        SPEAKER_CACHE_TTL=60.0,
+        # Resident action executor socket (defaults to APP_SUPPORT_DIR/executor.sock);
+        # main.py starts the executor with the app when EXECUTOR_AUTOSTART is set
+        EXECUTOR_SOCKET=None,
+        EXECUTOR_AUTOSTART=True,
+        # "cron" installs jobs in crontab; "internal" fires them from the server
+        # process (app/scheduler.py), catching up fires up to SCHEDULER_CATCH_UP late
+        SCHEDULER_BACKEND="cron",
+        SCHEDULER_CATCH_UP=300.0,
+        SCHEDULER_POLL_INTERVAL=1.0,
+        # Background pool for POST /api/control runs
+        CONTROL_WORKERS=4,
+        # HTTP server used by main.py: "production" (app/server.py) or "dev"
+        # (Flask's development server)
+        SERVER_MODE="production",
+        # Each open browser holds a thread on the /api/changes stream, so streams
+        # end after STREAM_MAX_AGE seconds and the browser reconnects
+        SERVER_THREADS=16,
+        SERVER_MAX_CONNECTIONS=64,
+        SERVER_REQUEST_TIMEOUT=30.0,
+        SERVER_DRAIN_TIMEOUT=10.0,
+        STREAM_MAX_AGE=300.0,
+        # Structured run log written by aircron_run.sh and the executor (defaults
+        # to ~/Library/Logs/AirCron/runs.jsonl, or AIRCRON_RUN_LOG)
+        RUN_LOG=None,
+        # Prometheus text metrics at /metrics (app/metrics.py)
+        METRICS_ENABLED=True,
+        # Per-request span trees (app/profiling.py): requests slower than
+        # PROFILING_SLOW_MS are kept (the last PROFILING_KEEP) at /debug/requests
+        PROFILING_ENABLED=False,
+        PROFILING_SLOW_MS=1000.0,
+        PROFILING_KEEP=50,
     )
     if config:
         app.config.update(config)
@@ -86,21 +144,53 @@ def create_app(config: Optional[Dict[str, Any]] = None) -> Flask:
     # Create directory if it doesn't exist
     app_support_dir.mkdir(parents=True, exist_ok=True)
     app.config["APP_SUPPORT_DIR"] = app_support_dir
+    if not app.config["EXECUTOR_SOCKET"]:
+        app.config["EXECUTOR_SOCKET"] = default_socket_path(app_support_dir)
+    if not app.config["RUN_LOG"]:
+        app.config["RUN_LOG"] = default_run_log_path()
 
-    # Initialize global managers with app context
-    with app.app_context():
-        from .cronblock import cron_manager
+    if app.config["SCHEDULER_BACKEND"] not in SCHEDULER_BACKENDS:
+        raise ValueError(
+            f"Unknown SCHEDULER_BACKEND '{app.config['SCHEDULER_BACKEND']}' "
+            f"(expected one of {', '.join(SCHEDULER_BACKENDS)})"
+        )
 
-        if cron_manager is None:
-            import app.cronblock as cronblock_module
+    if app.config["SERVER_MODE"] not in SERVER_MODES:
+        raise ValueError(
+            f"Unknown SERVER_MODE '{app.config['SERVER_MODE']}' "
+            f"(expected one of {', '.join(SERVER_MODES)})"
+        )
 
-            from .cronblock import CronManager
+    # Open the jobs backend up front so a bad JOBS_BACKEND fails fast and a new
+    # SQLite database imports any existing jobs.json at startup
+    get_backend(app.config["JOBS_BACKEND"], app_support_dir).configure(app.config)
 
-            cronblock_module.cron_manager = CronManager(app_support_dir)
+    # One jobs store and cron manager per app, shared by every request
+    registry.init_app(app)
+
+    # Discover speakers in the background so requests never wait on AppleScript
+    speaker_discovery.configure(app.config)
+    speaker_discovery.start()
+
+    control_runs.configure(app.config)
+    run_stats.configure(app.config)
 
     # Register blueprints
     app.register_blueprint(views_bp)
     app.register_blueprint(api_bp, url_prefix="/api")
+    metrics.init_app(app)
+    profiling.init_app(
+        app,
+        [
+            changes_service,
+            control_service,
+            cron_service,
+            jobs_service,
+            playlists_service,
+            runs_service,
+            speakers_service,
+        ],
+    )
 
     # Setup logging
     logging.getLogger("werkzeug").setLevel(logging.WARNING)
@@ -1,12 +1,24 @@
 """AirCron API endpoints."""
 
+import json
 import logging
-from typing import Any
-
-from flask import Blueprint, jsonify, request
-
-from .jobs_store import JobsStore
-from .services import control_service, cron_service, jobs_service, playlists_service, speakers_service
+from typing import Any, Dict, Iterator
+
+from flask import Blueprint, Response, current_app, jsonify, request
+
+from .changefeed import change_feed
+from .registry import get_jobs_store
+from .response_cache import cached_json
+from .server import STOPPING_ENVIRON_KEY
+from .services import (
+    changes_service,
+    control_service,
+    cron_service,
+    jobs_service,
+    playlists_service,
+    runs_service,
+    speakers_service,
+)
 from .speakers import speaker_discovery
 
 logger = logging.getLogger(__name__)
@@ -14,12 +26,20 @@ logger = logging.getLogger(__name__)
 api_bp = Blueprint("api", __name__)
 
 
+def _stream_limits() -> Dict[str, Any]:
+    """How long an event stream may stay open: until the server stops, or STREAM_MAX_AGE."""
+    return {
+        "stop": request.environ.get(STOPPING_ENVIRON_KEY),
+        "max_age": current_app.config["STREAM_MAX_AGE"],
+    }
+
+
 @api_bp.route("/speakers", methods=["GET"])
 def get_speakers() -> Any:
-    """Get current connected speakers from Airfoil."""
+    """Get available speakers from the background-refreshed cache."""
     try:
         speakers = speakers_service.list_speakers()
-        return jsonify({"speakers": speakers})
+        return jsonify({"speakers": speakers, **speakers_service.get_speaker_cache_status()})
     except Exception as e:
         logger.error(f"Error listing speakers: {e}")
         return jsonify({"error": "Failed to list speakers"}), 500
@@ -27,7 +47,7 @@ def get_speakers() -> Any:
 
 @api_bp.route("/speakers/refresh", methods=["POST"])
 def refresh_speakers() -> Any:
-    """Force refresh of speaker list."""
+    """Refresh the speaker list immediately and return it."""
     try:
         result = speakers_service.refresh_speakers()
         return jsonify(result)
@@ -40,13 +60,63 @@ def refresh_speakers() -> Any:
 def get_jobs_for_zone(zone: str) -> Any:
     """Get all jobs for a specific zone."""
     try:
-        jobs = jobs_service.get_jobs_for_zone(zone)
-        return jsonify(jobs)
+        return cached_json(
+            jobs_service.get_jobs_version(), lambda: jobs_service.get_jobs_for_zone(zone)
+        )
     except Exception as e:
         logger.error(f"Error getting jobs for zone {zone}: {e}")
         return jsonify({"error": f"Failed to get jobs for zone {zone}"}), 500
 
 
+def _is_bad_job_request(msg: str) -> bool:
+    """Whether a job validation error is the client's fault (400) rather than a conflict."""
+    return (
+        "Invalid time format" in msg
+        or "Invalid time range" in msg
+        or "Missing required field" in msg
+        or "Days must be integers" in msg
+        or "Days must be a non-empty list" in msg
+        or "Invalid action" in msg
+        or "Invalid service" in msg
+        or "Service is required" in msg
+        or "Service must be" in msg
+        or "Volume must" in msg
+        or "requires" in msg
+        or "Invalid op" in msg
+        or "Operation must be" in msg
+        or "Operations must be" in msg
+    )
+
+
+@api_bp.route("/jobs/batch", methods=["POST"])
+def apply_jobs_batch() -> Any:
+    """Apply creates, updates and deletes across zones in one commit."""
+    logger.info("[API] POST /jobs/batch - incoming request")
+    try:
+        data = request.get_json()
+        if not data:
+            logger.warning("[API] POST /jobs/batch - No JSON data provided")
+            return jsonify({"error": "No JSON data provided"}), 400
+
+        result = jobs_service.apply_batch(data)
+        logger.info(
+            f"[API] POST /jobs/batch - {result['applied']} of "
+            f"{len(result['results'])} operations applied"
+        )
+        if result["committed"]:
+            return jsonify(result)
+        # Atomic batch rejected: 400 if any item was malformed, otherwise it conflicted
+        errors = [item["error"] for item in result["results"] if item["status"] == "failed"]
+        status = 400 if any(_is_bad_job_request(msg) for msg in errors) else 409
+        return jsonify(result), status
+    except ValueError as e:
+        logger.warning(f"[API] POST /jobs/batch - BadRequest: {e}")
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"[API] POST /jobs/batch - Exception: {e}", exc_info=True)
+        return jsonify({"error": "Failed to apply batch"}), 500
+
+
 @api_bp.route("/jobs/<zone>", methods=["POST"])
 def create_job(zone: str) -> Any:
     """Create a new job in the specified zone."""
@@ -67,19 +137,7 @@ def create_job(zone: str) -> Any:
         return jsonify(job), 201
     except ValueError as e:
         msg = str(e)
-        if (
-            "Invalid time format" in msg
-            or "Invalid time range" in msg
-            or "Missing required field" in msg
-            or "Days must be integers" in msg
-            or "Days must be a non-empty list" in msg
-            or "Invalid action" in msg
-            or "Invalid service" in msg
-            or "Service is required" in msg
-            or "Service must be" in msg
-            or "Volume must" in msg
-            or "requires" in msg
-        ):
+        if _is_bad_job_request(msg):
             logger.warning(f"[API] POST /jobs/{zone} - BadRequest: {e}")
             return jsonify({"error": msg}), 400
         logger.warning(f"[API] POST /jobs/{zone} - Conflict: {e}")
@@ -163,20 +221,20 @@ def apply_jobs_to_cron() -> Any:
 def get_status() -> Any:
     """Get system status."""
     try:
-        airfoil_running = speaker_discovery.is_airfoil_running()
-        from flask import current_app
-
-        app_support_dir = current_app.config.get("APP_SUPPORT_DIR")
-        jobs_store = JobsStore(app_support_dir)
-        all_jobs = jobs_store.get_all_jobs()
-        total_jobs = sum(len(jobs) for jobs in all_jobs.values())
+        airfoil_running = speaker_discovery.get_airfoil_running()
 
-        return jsonify(
-            {
+        def build() -> Dict[str, Any]:
+            all_jobs = get_jobs_store().get_all_jobs()
+            total_jobs = sum(len(jobs) for jobs in all_jobs.values())
+            return {
                 "airfoil_running": airfoil_running,
                 "total_jobs": total_jobs,
                 "zones": list(all_jobs.keys()),
             }
+
+        jobs_version = jobs_service.get_jobs_version()
+        return cached_json(
+            None if jobs_version is None else (jobs_version, airfoil_running), build
         )
 
     except Exception as e:
@@ -225,18 +283,30 @@ def get_current_cron_jobs() -> Any:
 @api_bp.route("/cron/all", methods=["GET"])
 def get_all_cron_jobs() -> Any:
     try:
-        result = cron_service.get_all_cron_jobs()
-        return jsonify(result)
+        return cached_json(
+            cron_service.get_all_cron_jobs_version(), cron_service.get_all_cron_jobs
+        )
     except Exception as e:
         logger.error(f"Error getting all cron jobs: {e}")
         return jsonify({"error": "Failed to get all cron jobs"}), 500
 
 
+@api_bp.route("/scheduler", methods=["GET"])
+def get_scheduler_status() -> Any:
+    try:
+        return jsonify(cron_service.get_scheduler_status())
+    except Exception as e:
+        logger.error(f"Error getting scheduler status: {e}")
+        return jsonify({"error": "Failed to get scheduler status"}), 500
+
+
 @api_bp.route("/playlists", methods=["GET"])
 def get_playlists() -> Any:
     try:
-        playlists = playlists_service.list_playlists()
-        return jsonify({"playlists": playlists})
+        return cached_json(
+            playlists_service.get_playlists_version(),
+            lambda: {"playlists": playlists_service.list_playlists()},
+        )
     except Exception as e:
         logger.error(f"Error getting playlists: {e}")
         return jsonify({"error": "Failed to get playlists"}), 500
@@ -295,22 +365,73 @@ def delete_playlist(playlist_id: str) -> Any:
 def get_all_jobs_flat() -> Any:
     """Return all jobs as a flat list for the view schedule tab."""
     try:
-        jobs_flat = jobs_service.get_all_jobs_flat()
-        return jsonify({"jobs": jobs_flat})
+        return cached_json(
+            jobs_service.get_jobs_version(), lambda: {"jobs": jobs_service.get_all_jobs_flat()}
+        )
     except Exception as e:
         logger.error(f"Error getting all jobs flat: {e}")
         return jsonify({"error": "Failed to get jobs"}), 500
 
 
+@api_bp.route("/changes", methods=["GET"])
+def get_changes() -> Any:
+    """Job, playlist and cron-apply events after ``?since=<rev>``.
+
+    ``?wait=N`` long-polls up to N seconds (max 30). With ``Accept:
+    text/event-stream`` the events are streamed instead; EventSource reconnects
+    resume from ``Last-Event-ID``. Streams end after ``STREAM_MAX_AGE`` seconds
+    (and when the server drains) so they don't hold a server thread for good.
+    """
+    try:
+        cursor = request.headers.get("Last-Event-ID") or request.args.get("since")
+        feed, since = changes_service.parse_cursor(cursor)
+        feed = request.args.get("feed") or feed
+        wait = float(request.args.get("wait", 0))
+    except ValueError:
+        return jsonify({"error": "since must be a revision and wait a number of seconds"}), 400
+
+    if "text/event-stream" not in request.headers.get("Accept", ""):
+        try:
+            return jsonify(changes_service.get_changes(since, feed, wait))
+        except Exception as e:
+            logger.error(f"Error reading change feed: {e}")
+            return jsonify({"error": "Failed to read changes"}), 500
+
+    stream = changes_service.stream_changes(since, feed, **_stream_limits())
+
+    def events() -> Iterator[str]:
+        for event, payload in stream:
+            if event == "heartbeat":
+                yield ": keep-alive\n\n"
+                continue
+            event_id = f"{change_feed.feed_id}:{payload['rev']}"
+            yield f"id: {event_id}\nevent: {event}\ndata: {json.dumps(payload)}\n\n"
+
+    return Response(
+        events(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @api_bp.route("/control", methods=["POST"])
 def control_action() -> Any:
-    """Trigger a live control action (connect/disconnect/play/pause/resume/volume)."""
+    """Start a live control action (connect/disconnect/play/pause/resume/volume).
+
+    Returns 202 with a run id; the action runs in the background. Pass
+    ``"wait": true`` to block until it finishes and get the old synchronous reply.
+    """
     try:
         data = request.get_json()
         if not data:
             return jsonify({"error": "No JSON data provided"}), 400
-        result = control_service.run_control_action(data)
-        return jsonify(result)
+        if data.get("wait"):
+            result = control_service.run_control_action(data)
+            return jsonify(result)
+        run = control_service.start_control_action(data)
+        run["status_url"] = f"/api/control/{run['run_id']}"
+        run["events_url"] = f"/api/control/{run['run_id']}/events"
+        return jsonify(run), 202
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
     except RuntimeError as e:
@@ -318,3 +439,58 @@ def control_action() -> Any:
     except Exception as e:
         logger.error(f"Error running control action: {e}", exc_info=True)
         return jsonify({"error": "Failed to run control action"}), 500
+
+
+@api_bp.route("/control/<run_id>", methods=["GET"])
+def get_control_run(run_id: str) -> Any:
+    """Status, output and result of a control run (``?wait=N`` long-polls up to 30s)."""
+    try:
+        wait = min(float(request.args.get("wait", 0)), 30.0)
+    except ValueError:
+        return jsonify({"error": "wait must be a number of seconds"}), 400
+    run = control_service.get_control_run(run_id, wait)
+    if run is None:
+        return jsonify({"error": "Unknown control run"}), 404
+    return jsonify(run)
+
+
+@api_bp.route("/control/<run_id>/events", methods=["GET"])
+def stream_control_run(run_id: str) -> Any:
+    """Stream a control run as server-sent events until it finishes (or STREAM_MAX_AGE)."""
+    if control_service.get_control_run(run_id) is None:
+        return jsonify({"error": "Unknown control run"}), 404
+    stream = control_service.follow_control_run(run_id, **_stream_limits())
+
+    def events() -> Iterator[str]:
+        for event, payload in stream:
+            if event == "heartbeat":
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+    return Response(
+        events(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@api_bp.route("/runs/stats", methods=["GET"])
+def get_run_stats() -> Any:
+    """Latency histograms and failure rates per action, speaker and step from the run log."""
+    try:
+        return cached_json(runs_service.get_runs_version(), runs_service.get_run_stats)
+    except Exception as e:
+        logger.error(f"Error getting run stats: {e}")
+        return jsonify({"error": "Failed to get run stats"}), 500
+
+
+@api_bp.route("/runs/recent", methods=["GET"])
+def get_recent_runs() -> Any:
+    """Most recent run records, newest first (``?limit=N``, ``?job_id=...``)."""
+    try:
+        limit = int(request.args.get("limit", 50))
+        runs = runs_service.get_recent_runs(limit, request.args.get("job_id"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"runs": runs})
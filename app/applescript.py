@@ -0,0 +1,194 @@
+"""Batched AppleScript for zone actions.
+
+A ``Custom:A,B,C`` zone used to cost one ``osascript`` launch per speaker (and
+twice that for a reconnect). ``compile_zone_action`` turns a whole zone action
+into a single AppleScript program, run once, that tries each speaker separately
+and returns one result line per speaker::
+
+    Kitchen<TAB>ok
+    Patio<TAB>error<TAB>Airfoil speaker not found
+
+so a partial failure is reported for the speakers it affected instead of
+aborting the rest. ``parse_results`` turns that output back into dicts.
+"""
+
+from typing import Any, Dict, List, Optional
+
+ALL_SPEAKERS = "All Speakers"
+ZONE_ACTIONS = ("connect", "disconnect", "reconnect", "volume")
+
+
+def as_string(value: str) -> str:
+    """Quote a value as an AppleScript string literal."""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def as_list(names: List[str]) -> str:
+    """Format names as an AppleScript list literal."""
+    return "{" + ", ".join(as_string(name) for name in names) + "}"
+
+
+def zone_speakers(zone: str) -> List[str]:
+    """Speaker names targeted by a zone ("Custom:A,B" or a single speaker)."""
+    if zone.startswith("Custom:"):
+        return [name.strip() for name in zone[len("Custom:") :].split(",") if name.strip()]
+    return [zone]
+
+
+# Joins the per-speaker result lines into the program's return value
+_RETURN_RESULTS = """set AppleScript's text item delimiters to linefeed
+set output to results as text
+set AppleScript's text item delimiters to ""
+return output"""
+
+_AIRFOIL_SPOTIFY_SOURCE = """    try
+        set existingSources to (every application source ¬
+            whose application file is "/Applications/Spotify.app")
+        if (count of existingSources) > 0 then
+            set current audio source to first item of existingSources
+        else
+            set aSource to make new application source
+            set application file of aSource to "/Applications/Spotify.app"
+            set current audio source to aSource
+        end if
+    end try
+"""
+
+
+def _airfoil_program(action: str, zone: str, volume: Optional[float]) -> str:
+    if action == "volume":
+        steps = [f"set (volume of s) to {volume:.2f}"]
+    else:
+        steps = {
+            "connect": ["connect to s"],
+            "disconnect": ["disconnect from s"],
+            "reconnect": ["disconnect from s", "connect to s"],
+        }[action]
+    source = _AIRFOIL_SPOTIFY_SOURCE if action in ("connect", "reconnect") else ""
+    if zone == ALL_SPEAKERS:
+        # Disconnecting everything only touches connected speakers, like the script
+        targets = (
+            "(every speaker whose connected is true)"
+            if action == "disconnect"
+            else "(every speaker)"
+        )
+        return f"""set results to {{}}
+tell application "Airfoil"
+{source}    repeat with s in {targets}
+        set speakerName to name of s
+        try
+{_indent(steps, 12)}
+            set end of results to speakerName & tab & "ok"
+        on error errMsg
+            set end of results to speakerName & tab & "error" & tab & errMsg
+        end try
+    end repeat
+end tell
+{_RETURN_RESULTS}"""
+    return f"""set results to {{}}
+tell application "Airfoil"
+{source}    repeat with speakerName in {as_list(zone_speakers(zone))}
+        set speakerName to speakerName as text
+        try
+            set matches to (every speaker whose name is speakerName)
+            if (count of matches) is 0 then error "Airfoil speaker not found"
+            repeat with s in matches
+{_indent(steps, 16)}
+            end repeat
+            set end of results to speakerName & tab & "ok"
+        on error errMsg
+            set end of results to speakerName & tab & "error" & tab & errMsg
+        end try
+    end repeat
+end tell
+{_RETURN_RESULTS}"""
+
+
+def _music_program(action: str, zone: str, volume: Optional[int]) -> str:
+    if action == "volume":
+        steps = [f"set sound volume of d to {volume}"]
+    else:
+        steps = {
+            "connect": ["set selected of d to true"],
+            "disconnect": ["set selected of d to false"],
+            "reconnect": ["set selected of d to false", "set selected of d to true"],
+        }[action]
+    if zone == ALL_SPEAKERS:
+        return f"""set results to {{}}
+tell application "Music"
+    repeat with d in (every AirPlay device)
+        set speakerName to name of d
+        try
+{_indent(steps, 12)}
+            set end of results to speakerName & tab & "ok"
+        on error errMsg
+            set end of results to speakerName & tab & "error" & tab & errMsg
+        end try
+    end repeat
+end tell
+{_RETURN_RESULTS}"""
+    # One pass over the devices; targets never matched are reported as missing
+    return f"""set results to {{}}
+set targetNames to {as_list(zone_speakers(zone))}
+set matchedNames to {{}}
+tell application "Music"
+    repeat with d in (every AirPlay device)
+        set speakerName to name of d
+        if speakerName is in targetNames then
+            set end of matchedNames to speakerName
+            try
+{_indent(steps, 16)}
+                set end of results to speakerName & tab & "ok"
+            on error errMsg
+                set end of results to speakerName & tab & "error" & tab & errMsg
+            end try
+        end if
+    end repeat
+end tell
+repeat with speakerName in targetNames
+    if (speakerName as text) is not in matchedNames then
+        set end of results to (speakerName as text) & tab & "error" & tab & ¬
+            "Apple Music AirPlay device not found"
+    end if
+end repeat
+{_RETURN_RESULTS}"""
+
+
+def _indent(steps: List[str], width: int) -> str:
+    return "\n".join(" " * width + step for step in steps)
+
+
+def compile_zone_action(
+    action: str, zone: str, service: str = "spotify", volume: Optional[int] = None
+) -> str:
+    """One AppleScript program performing ``action`` on every speaker in ``zone``.
+
+    Spotify zones go through Airfoil (connect also selects Spotify as Airfoil's
+    source); Apple Music zones use Music's AirPlay devices. ``volume`` is 0-100.
+
+    Raises:
+        ValueError: If the action is not a zone action or volume is missing
+    """
+    if action not in ZONE_ACTIONS:
+        raise ValueError(f"Not a zone action: {action}")
+    if action == "volume" and volume is None:
+        raise ValueError("Volume action requires a volume")
+    if service == "applemusic":
+        return _music_program(action, zone, volume)
+    return _airfoil_program(action, zone, None if volume is None else volume / 100)
+
+
+def parse_results(output: str) -> List[Dict[str, Any]]:
+    """Per-speaker results from a compiled program's output."""
+    results: List[Dict[str, Any]] = []
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        parts = line.split("\t", 2)
+        speaker = parts[0]
+        if len(parts) > 1 and parts[1] == "ok":
+            results.append({"speaker": speaker, "ok": True})
+        else:
+            error = parts[2] if len(parts) > 2 else "no result"
+            results.append({"speaker": speaker, "ok": False, "error": error})
+    return results
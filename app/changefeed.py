@@ -0,0 +1,107 @@
+"""In-process change feed for the UI.
+
+Every job edit, playlist edit and cron apply made through this server is
+published here with a monotonic revision number. ``GET /api/changes?since=<rev>``
+returns the events after ``rev`` (long-polling or as server-sent events), so a
+browser that already has the schedule can patch it instead of re-fetching
+``/api/jobs/all`` after every change.
+
+The feed keeps the last ``max_events`` events. A client whose revision is older
+than that, or that comes from a previous server process (revisions restart when
+the server does; ``feed`` identifies the process), gets ``reset`` and should
+re-fetch everything once. Job edits made outside this process (another process,
+or editing jobs.json by hand) are noticed from the jobs store version and
+published as a ``jobs``/``reset`` event.
+"""
+
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Deque, Dict, Hashable, Iterable, List, Optional
+
+from .jobs_backends import JobChange
+
+DEFAULT_MAX_EVENTS = 1000
+
+
+class ChangeFeed:
+    """Bounded, revisioned log of change events with blocking reads."""
+
+    def __init__(self, max_events: int = DEFAULT_MAX_EVENTS) -> None:
+        self.feed_id = uuid.uuid4().hex[:8]
+        self.revision = 0
+        self._events: Deque[Dict[str, Any]] = deque(maxlen=max_events)
+        self._cond = threading.Condition()
+        self._jobs_versions: Dict[Hashable, Optional[Hashable]] = {}
+
+    def publish(self, kind: str, op: str, **fields: Any) -> int:
+        """Append an event and wake waiting readers; returns its revision."""
+        with self._cond:
+            return self._append(kind, op, fields)
+
+    def _append(self, kind: str, op: str, fields: Dict[str, Any]) -> int:
+        self.revision += 1
+        self._events.append(
+            {"rev": self.revision, "type": kind, "op": op, "at": time.time(), **fields}
+        )
+        self._cond.notify_all()
+        return self.revision
+
+    def publish_job_changes(
+        self, location: Hashable, changes: Iterable[JobChange], version: Optional[Hashable]
+    ) -> None:
+        """Publish a committed jobs-store write and remember the version it produced."""
+        with self._cond:
+            for change in changes:
+                if change.op == JobChange.PUT:
+                    job = dict(change.data or {}, zone=change.zone)
+                    self._append(
+                        "job", "put", {"zone": change.zone, "id": change.job_id, "job": job}
+                    )
+                else:
+                    self._append("job", "delete", {"zone": change.zone, "id": change.job_id})
+            self._jobs_versions[location] = version
+
+    def note_jobs_version(self, location: Hashable, version: Optional[Hashable]) -> None:
+        """Publish a jobs reset if the store changed without going through this process."""
+        with self._cond:
+            if location not in self._jobs_versions:
+                self._jobs_versions[location] = version
+            elif self._jobs_versions[location] != version:
+                self._jobs_versions[location] = version
+                self._append("jobs", "reset", {})
+
+    def since(self, revision: int, feed: Optional[str] = None) -> Dict[str, Any]:
+        """Events after ``revision`` (``reset`` if they are no longer all available).
+
+        ``feed`` is the feed id the client's revision came from, if it has one.
+        """
+        with self._cond:
+            return self._since(revision, feed)
+
+    def _since(self, revision: int, feed: Optional[str]) -> Dict[str, Any]:
+        oldest = self._events[0]["rev"] if self._events else self.revision + 1
+        reset = (
+            (feed is not None and feed != self.feed_id)
+            or revision > self.revision
+            or revision < oldest - 1
+        )
+        events: List[Dict[str, Any]] = (
+            [] if reset else [event for event in self._events if event["rev"] > revision]
+        )
+        return {"feed": self.feed_id, "rev": self.revision, "reset": reset, "events": events}
+
+    def wait(self, revision: int, timeout: float, feed: Optional[str] = None) -> Dict[str, Any]:
+        """Like ``since``, but block up to ``timeout`` seconds for a new event."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.revision == revision and feed in (None, self.feed_id):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return self._since(revision, feed)
+
+
+change_feed = ChangeFeed()
@@ -0,0 +1,247 @@
+"""Background runs for live control actions.
+
+``POST /api/control`` used to run the action inside the request, holding a
+server thread (and the browser) for the whole AppleScript round trip. The
+endpoint now hands the action to ``ControlRuns`` and returns a run id at once:
+
+- Runs execute on a bounded thread pool (``CONTROL_WORKERS``).
+- A run for the same zone, action, service and argument as one still queued or
+  running is not started again; the caller gets the in-flight run's id.
+- Each run keeps its status, output lines and result, so ``GET
+  /api/control/<run_id>`` can poll it and ``/api/control/<run_id>/events``
+  can stream it. Finished runs are kept until ``max_finished`` newer ones exist.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_FINISHED = 200
+
+RunKey = Tuple[str, str, str, str]
+
+
+class ControlRun:
+    """One control action and everything it has reported so far."""
+
+    def __init__(self, key: RunKey) -> None:
+        self.id = uuid.uuid4().hex[:12]
+        self.zone, self.action, self.service, self.arg1 = key
+        self.key = key
+        self.status = QUEUED
+        self.output: List[str] = []
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def to_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {
+            "run_id": self.id,
+            "zone": self.zone,
+            "action": self.action,
+            "service": self.service,
+            "status": self.status,
+            "output": list(self.output),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.result is not None:
+            data["result"] = self.result
+        if self.error is not None:
+            data["error"] = self.error
+        return data
+
+
+class ControlRuns:
+    """Bounded pool of control runs with in-flight de-duplication."""
+
+    def __init__(
+        self, workers: int = DEFAULT_WORKERS, max_finished: int = DEFAULT_MAX_FINISHED
+    ) -> None:
+        self.workers = max(1, workers)
+        self.max_finished = max_finished
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._runs: "OrderedDict[str, ControlRun]" = OrderedDict()
+        self._in_flight: Dict[RunKey, str] = {}
+        self._cond = threading.Condition()
+
+    def configure(self, config: Mapping[str, Any]) -> None:
+        """Apply CONTROL_WORKERS from app config (takes effect before the first run)."""
+        workers = max(1, int(config.get("CONTROL_WORKERS", self.workers)))
+        with self._cond:
+            if workers != self.workers and self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+            self.workers = workers
+
+    def submit(
+        self,
+        key: RunKey,
+        target: Callable[[Callable[[str], None]], Dict[str, Any]],
+    ) -> Tuple[ControlRun, bool]:
+        """Start ``target`` in the background unless a run for ``key`` is in flight.
+
+        ``target`` receives a callback for output lines and returns the result.
+
+        Returns:
+            The run and whether it was an existing in-flight run
+        """
+        with self._cond:
+            run_id = self._in_flight.get(key)
+            if run_id is not None:
+                return self._runs[run_id], True
+            run = ControlRun(key)
+            self._runs[run.id] = run
+            self._in_flight[key] = run.id
+            self._prune()
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="aircron-control")
+            pool = self._pool
+        pool.submit(self._execute, run, target)
+        return run, False
+
+    def get(self, run_id: str) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            run = self._runs.get(run_id)
+            return run.to_dict() if run else None
+
+    def wait(self, run_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Block until a run finishes (or ``timeout`` passes) and return its state."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            run = self._runs.get(run_id)
+            while run is not None and not run.finished:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return run.to_dict() if run else None
+
+    def follow(
+        self,
+        run_id: str,
+        heartbeat: float = 15.0,
+        stop: Optional[threading.Event] = None,
+        max_age: Optional[float] = None,
+        poll: float = 1.0,
+    ) -> Iterator[Tuple[str, Any]]:
+        """Yield ``("status", s)``, ``("output", line)`` and a final ``("done", run)``.
+
+        Yields ``("heartbeat", None)`` every ``heartbeat`` seconds without news so
+        a streaming response can notice a closed connection. Ends early, without
+        ``done``, after ``max_age`` seconds or once ``stop`` is set (checked every
+        ``poll`` seconds while idle).
+        """
+        sent_lines = 0
+        sent_status = None
+        deadline = None if max_age is None else time.monotonic() + max_age
+        idle_since = time.monotonic()
+        while stop is None or not stop.is_set():
+            now = time.monotonic()
+            timeout = min(poll, max(0.0, idle_since + heartbeat - now))
+            if deadline is not None:
+                if now >= deadline:
+                    return
+                timeout = min(timeout, deadline - now)
+            with self._cond:
+                run = self._runs.get(run_id)
+                if run is None:
+                    return
+                if sent_status == run.status and sent_lines == len(run.output):
+                    self._cond.wait(timeout)
+                status = run.status
+                lines = run.output[sent_lines:]
+                snapshot = run.to_dict() if run.finished else None
+            if status != sent_status and snapshot is None:
+                sent_status = status
+                idle_since = time.monotonic()
+                yield "status", status
+            for line in lines:
+                yield "output", line
+            sent_lines += len(lines)
+            if snapshot is not None:
+                yield "done", snapshot
+                return
+            if lines:
+                idle_since = time.monotonic()
+            elif time.monotonic() - idle_since >= heartbeat:
+                idle_since = time.monotonic()
+                yield "heartbeat", None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counts of runs by status."""
+        with self._cond:
+            counts = {status: 0 for status in (QUEUED, RUNNING, SUCCEEDED, FAILED)}
+            for run in self._runs.values():
+                counts[run.status] += 1
+            return {"workers": self.workers, **counts}
+
+    def shutdown(self) -> None:
+        with self._cond:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def _execute(
+        self, run: ControlRun, target: Callable[[Callable[[str], None]], Dict[str, Any]]
+    ) -> None:
+        with self._cond:
+            run.status = RUNNING
+            run.started_at = time.time()
+            self._cond.notify_all()
+        try:
+            result = target(lambda line: self._append(run, line))
+        except Exception as e:  # reported on the run; the pool thread carries on
+            logger.info(f"[control_runs] {run.action} for {run.zone} failed: {e}")
+            self._finish(run, FAILED, error=str(e))
+        else:
+            self._finish(run, SUCCEEDED, result=result)
+
+    def _append(self, run: ControlRun, line: str) -> None:
+        with self._cond:
+            run.output.append(line)
+            self._cond.notify_all()
+
+    def _finish(
+        self,
+        run: ControlRun,
+        status: str,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        with self._cond:
+            run.status = status
+            run.result = result
+            run.error = error
+            run.finished_at = time.time()
+            if self._in_flight.get(run.key) == run.id:
+                del self._in_flight[run.key]
+            self._cond.notify_all()
+
+    def _prune(self) -> None:
+        finished = [run_id for run_id, run in self._runs.items() if run.finished]
+        for run_id in finished[: max(0, len(finished) - self.max_finished)]:
+            del self._runs[run_id]
+
+
+control_runs = ControlRuns()
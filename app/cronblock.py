@@ -1,16 +1,22 @@
 """Cron block management for AirCron."""
 
+import hashlib
+import json
 import logging
 import re
 import shlex
 import subprocess
 import tempfile
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Dict, FrozenSet, Hashable, Iterable, List, Optional, Set, Tuple
 
 from croniter import croniter
+from flask import current_app, has_app_context
 
+from . import metrics, profiling
 from .jobs_store import Job, JobsStore
 
 logger = logging.getLogger(__name__)
@@ -18,21 +24,157 @@ logger = logging.getLogger(__name__)
 # Constants
 AIRCRON_BEGIN = "# BEGIN AirCron (auto-generated; do not edit between markers)"
 AIRCRON_END = "# END AirCron"
+# Comment above each generated cron line listing the ids of the jobs it fires
+MANIFEST_PREFIX = "# aircron-jobs: "
+# Seconds a parsed crontab is reused before `crontab -l` runs again, so external
+# edits are picked up; our own writes invalidate it immediately
+DEFAULT_CRONTAB_SNAPSHOT_TTL = 5.0
+
+
+class CrontabSnapshot:
+    """One parse of the user's crontab.
+
+    ``block`` holds the raw AirCron section including its markers (running to the
+    end of the crontab if the end marker is missing), and ``cron_lines`` the
+    normalized, non-comment entries inside it in order.
+    """
+
+    def __init__(self, lines: List[str], taken_at: Optional[float] = None) -> None:
+        self.lines = lines
+        self.taken_at = time.monotonic() if taken_at is None else taken_at
+        self.block: List[str] = []
+        self.cron_lines: List[str] = []
+        # Normalized cron line -> job ids from the manifest comment above it
+        self.manifest: Dict[str, List[str]] = {}
+        in_aircron_section = False
+        job_ids: List[str] = []
+        for line in lines:
+            stripped = line.strip()
+            if stripped == AIRCRON_BEGIN:
+                in_aircron_section = True
+                self.block.append(line)
+            elif stripped == AIRCRON_END:
+                if in_aircron_section:
+                    self.block.append(line)
+                break
+            elif in_aircron_section:
+                self.block.append(line)
+                if stripped.startswith(MANIFEST_PREFIX.strip()):
+                    job_ids = _parse_manifest(stripped)
+                elif stripped and not stripped.startswith("#"):
+                    normalized = _normalize_cron_line(stripped)
+                    self.cron_lines.append(normalized)
+                    if job_ids:
+                        self.manifest[normalized] = job_ids
+                    job_ids = []
+        self.has_section = bool(self.block)
+        self.cron_line_set = frozenset(self.cron_lines)
+        # Identifies the AirCron section's contents (for ETags)
+        self.digest = hashlib.sha1("\n".join(self.block).encode()).hexdigest()
+
+    def age(self) -> float:
+        """Seconds since the crontab was read."""
+        return time.monotonic() - self.taken_at
+
+
+class CompiledCronLine:
+    """A cron line, the ids of the jobs it fires and its normalized form for comparisons."""
+
+    def __init__(self, line: str, job_ids: List[str]) -> None:
+        self.line = line
+        self.job_ids = job_ids
+        self.normalized = _normalize_cron_line(line)
+
+
+class _JobCommand:
+    """One job compiled: its aircron_run.sh command (without the job id) and fire times."""
+
+    __slots__ = ("command", "minute", "hour", "days")
+
+    def __init__(self, command: str, minute: int, hour: int, days: FrozenSet[int]) -> None:
+        self.command = command
+        self.minute = minute
+        self.hour = hour
+        # Cron weekdays, 0=Sunday
+        self.days = days
+
+
+class CompiledJobs:
+    """Cron lines for every stored job at one jobs version.
+
+    Jobs with identical commands share a line (see ``_consolidate_cron_lines``).
+    ``lines`` maps job id -> the CompiledCronLine that fires it (jobs that failed to
+    compile are absent), ``zone_lines`` holds each zone's lines in store order,
+    ``by_normalized`` maps normalized line -> job ids, and ``expected_lines`` /
+    ``expected`` are the normalized lines the AirCron block should contain, in store
+    order and as a set.
+    """
+
+    def __init__(self, key: Optional[Hashable], all_jobs: Dict[str, List[Job]]) -> None:
+        self.key = key
+        self.all_jobs = all_jobs
+        self.jobs: Dict[str, Job] = {}
+        self.lines: Dict[str, CompiledCronLine] = {}
+        self.zone_lines: Dict[str, List[CompiledCronLine]] = {}
+        self.by_normalized: Dict[str, List[str]] = {}
+        self.expected_lines: List[str] = []
+        self.expected: frozenset = frozenset()
+
+    @property
+    def total_jobs(self) -> int:
+        return len(self.jobs)
+
+    def add_lines(self, lines: Iterable[CompiledCronLine]) -> None:
+        """Index consolidated lines by job, zone and normalized text."""
+        for compiled_line in lines:
+            zone = self.jobs[compiled_line.job_ids[0]].zone
+            self.zone_lines.setdefault(zone, []).append(compiled_line)
+            self.by_normalized[compiled_line.normalized] = compiled_line.job_ids
+            for job_id in compiled_line.job_ids:
+                self.lines[job_id] = compiled_line
+        self.expected_lines = [
+            compiled_line.normalized
+            for zone_lines in self.zone_lines.values()
+            for compiled_line in zone_lines
+        ]
+        self.expected = frozenset(self.expected_lines)
+
+    def jobs_for_line(self, normalized_line: str) -> List[Job]:
+        """Return the jobs fired by a normalized cron line, in store order."""
+        return [self.jobs[job_id] for job_id in self.by_normalized.get(normalized_line, [])]
+
+    def job_for_line(self, normalized_line: str) -> Optional[Job]:
+        """Return the first job fired by a normalized cron line, if any."""
+        jobs = self.jobs_for_line(normalized_line)
+        return jobs[0] if jobs else None
 
 
 class CronManager:
     """Manages cron entries within AirCron markers."""
 
-    def __init__(self, app_support_dir: Optional[Path] = None) -> None:
+    def __init__(
+        self, app_support_dir: Optional[Path] = None, jobs_store: Optional[JobsStore] = None
+    ) -> None:
         self.app_support_dir = app_support_dir
-        self._jobs_store: Optional[JobsStore] = None
+        self._jobs_store = jobs_store
         self._aircron_script_path: Optional[str] = None
+        self._crontab_snapshot: Optional[CrontabSnapshot] = None
+        self._crontab_lock = threading.Lock()
+        # Held while compiling so concurrent requests share one result
+        self._compile_lock = threading.Lock()
+        # Compiled jobs keyed on job content + script path (see _job_line_key)
+        self._line_cache: Dict[Tuple, Optional[_JobCommand]] = {}
+        # Merged lines per command, keyed on the command and its jobs' fire times
+        self._merged_cache: Dict[Tuple, List[CompiledCronLine]] = {}
+        self._compiled: Optional[CompiledJobs] = None
 
     @property
     def jobs_store(self) -> JobsStore:
         """Get JobsStore instance, creating it if needed."""
         if self._jobs_store is None:
-            self._jobs_store = JobsStore(self.app_support_dir)
+            with self._compile_lock:
+                if self._jobs_store is None:
+                    self._jobs_store = JobsStore(self.app_support_dir)
         return self._jobs_store
 
     def _get_aircron_script_path(self) -> str:
@@ -79,10 +221,13 @@ class CronManager:
         self._aircron_script_path = fallback_path
         return self._aircron_script_path
 
+    @profiling.traced("cron:read_crontab")
     def _get_current_crontab(self) -> List[str]:
         """Get current crontab as list of lines."""
         try:
-            result = subprocess.run(["crontab", "-l"], capture_output=True, text=True, timeout=10)
+            result = metrics.run_subprocess(
+                ["crontab", "-l"], "crontab -l", capture_output=True, text=True, timeout=10
+            )
             if result.returncode == 0:
                 return result.stdout.strip().split("\n") if result.stdout.strip() else []
             else:
@@ -95,6 +240,30 @@ class CronManager:
             logger.error(f"Error reading crontab: {e}")
             raise
 
+    @profiling.traced("cron:snapshot")
+    def get_crontab_snapshot(self, refresh: bool = False) -> CrontabSnapshot:
+        """Return the parsed crontab, re-reading it once it is older than the TTL.
+
+        The TTL comes from the ``CRONTAB_SNAPSHOT_TTL`` app config key when called
+        inside an app context.
+        """
+        ttl = DEFAULT_CRONTAB_SNAPSHOT_TTL
+        if has_app_context():
+            ttl = current_app.config.get("CRONTAB_SNAPSHOT_TTL", ttl)
+        with metrics.lock_wait(self._crontab_lock, "crontab"):
+            snapshot = self._crontab_snapshot
+            stale = refresh or snapshot is None or snapshot.age() > ttl
+            metrics.cache_lookup("crontab_snapshot", not stale)
+            if stale:
+                snapshot = CrontabSnapshot(self._get_current_crontab())
+                self._crontab_snapshot = snapshot
+            return snapshot
+
+    def invalidate_crontab_snapshot(self) -> None:
+        """Drop the cached crontab so the next read runs `crontab -l`."""
+        with self._crontab_lock:
+            self._crontab_snapshot = None
+
     def _backup_crontab(self, lines: List[str]) -> None:
         """Create backup of current crontab."""
         try:
@@ -117,8 +286,12 @@ class CronManager:
                 f.write(content)
 
             # Install new crontab
-            result = subprocess.run(
-                ["crontab", str(temp_file)], capture_output=True, text=True, timeout=10
+            result = metrics.run_subprocess(
+                ["crontab", str(temp_file)],
+                "crontab install",
+                capture_output=True,
+                text=True,
+                timeout=10,
             )
 
             # Clean up temp file
@@ -135,11 +308,27 @@ class CronManager:
 
     def _generate_cron_lines(self) -> List[str]:
         """Generate cron lines from jobs in store."""
+        return self._generate_cron_block()[0]
+
+    def _generate_cron_block(
+        self, include_jobs: bool = True
+    ) -> Tuple[List[str], Dict[str, List[Job]]]:
+        """Generate the AirCron block, plus a map of normalized cron line -> jobs.
+
+        Each zone gets a header comment, then one entry per consolidated line: a
+        ``# aircron-jobs:`` manifest comment with the job ids and the cron line.
+        With ``include_jobs=False`` the block is empty, for when another scheduler
+        fires the jobs.
+        """
         lines = [AIRCRON_BEGIN, ""]
+        line_to_jobs: Dict[str, List[Job]] = {}
+        if not include_jobs:
+            lines.append(AIRCRON_END)
+            return lines, line_to_jobs
 
-        # Always create a fresh JobsStore instance to ensure we get latest jobs
-        fresh_jobs_store = JobsStore(self.app_support_dir)
-        all_jobs = fresh_jobs_store.get_all_jobs()
+        # Always check the store's current version so we get the latest jobs
+        compiled = self.compile_jobs()
+        all_jobs = compiled.all_jobs
 
         # Add logging to debug job count
         total_jobs = sum(len(jobs) for jobs in all_jobs.values())
@@ -149,85 +338,138 @@ class CronManager:
             if not jobs:
                 continue
 
-            logger.info(f"Processing {len(jobs)} jobs for zone: {zone}")
-            lines.append(f"# {zone}")
-            lines.append("")
-
             for job in jobs:
-                cron_line = self._job_to_cron_line(job)
-                if cron_line:
-                    lines.extend([f"# {zone} – {job.action.title()} {job.time}", cron_line, ""])
-                    logger.info(f"Generated cron line for job {job.id}: {cron_line}")
-                else:
+                if job.id not in compiled.lines:
                     logger.warning(f"Failed to generate cron line for job {job.id}")
+            zone_lines = compiled.zone_lines.get(zone, [])
+            if not zone_lines:
+                continue
+
+            logger.info(f"Processing {len(jobs)} jobs for zone: {zone} ({len(zone_lines)} lines)")
+            lines.append(f"# {zone}")
+            for compiled_line in zone_lines:
+                lines.append(MANIFEST_PREFIX + ",".join(compiled_line.job_ids))
+                lines.append(compiled_line.line)
+                line_to_jobs[compiled_line.normalized] = compiled.jobs_for_line(
+                    compiled_line.normalized
+                )
+            lines.append("")
 
         lines.append(AIRCRON_END)
         logger.info(f"Generated {len(lines)} total cron lines")
-        return lines
+        return lines, line_to_jobs
 
-    def _job_to_cron_line(self, job: Job) -> Optional[str]:
-        """Convert job to cron line format."""
-        try:
-            hour_str, minute_str = job.time.split(":")
-            int(hour_str)
-            int(minute_str)
+    @profiling.traced("cron:compile")
+    def compile_jobs(self) -> CompiledJobs:
+        """Return cron lines for all stored jobs, recompiling only what changed.
 
-            # Convert days (1=Monday, 7=Sunday) to cron format (0=Sunday)
-            cron_days = [str(d % 7) for d in job.days]
-            days_str = ",".join(sorted(cron_days, key=int))
-
-            aircron_script = self._get_aircron_script_path()
-            service = getattr(job, "service", "spotify")
-            zone = job.zone
-            action = job.action
-
-            # Argument mapping based on action
-            arg1 = ""
-            arg2 = ""  # Not currently used, but here for future-proofing
-            if action == "play":
-                if service == "applemusic":
-                    arg1 = job.args.get("playlist", "")
-                else:  # spotify
-                    arg1 = job.args.get("uri", "")
-            elif action == "volume":
-                arg1 = job.args.get("volume", "50")
-
-            # All other actions (pause, resume, connect, disconnect) have no script arguments.
+        The result is reused while the jobs store version and script path are
+        unchanged. After a change, lines are rebuilt from the per-job cache so only
+        jobs whose content differs are actually compiled.
+        """
+        jobs_store = self.jobs_store
+        script_path = self._get_aircron_script_path()
+        with metrics.lock_wait(self._compile_lock, "cron_compile"):
+            return self._compile_locked(jobs_store, script_path)
+
+    def _compile_locked(self, jobs_store: JobsStore, script_path: str) -> CompiledJobs:
+        compiled = self._compiled
+        version = jobs_store.get_version()
+        if compiled is not None and version is not None and compiled.key == (version, script_path):
+            return compiled
+
+        version, all_jobs = jobs_store.get_all_jobs_versioned()
+        compiled = CompiledJobs((version, script_path), all_jobs)
+        line_cache: Dict[Tuple, Optional[_JobCommand]] = {}
+        commands: List[Tuple[Job, _JobCommand]] = []
+        misses = 0
+        for jobs in all_jobs.values():
+            for job in jobs:
+                key = _job_line_key(job, script_path)
+                hit = key in self._line_cache
+                metrics.cache_lookup("cron_line", hit)
+                if hit:
+                    job_command = self._line_cache[key]
+                else:
+                    job_command = self._compile_job(job, script_path)
+                    misses += 1
+                line_cache[key] = job_command
+                compiled.jobs[job.id] = job
+                if job_command is not None:
+                    commands.append((job, job_command))
+        compiled.add_lines(_consolidate_cron_lines(commands, self._merged_cache))
+
+        # Keep only the entries still in use so the cache tracks the store's size
+        self._line_cache = line_cache
+        if version is not None:
+            self._compiled = compiled
+        logger.info(
+            f"Compiled {len(compiled.expected_lines)} cron lines for {compiled.total_jobs} jobs "
+            f"({misses} recompiled)"
+        )
+        return compiled
 
-            cmd_parts = [aircron_script, zone, action, arg1, arg2, service]
+    def _job_to_cron_line(self, job: Job) -> Optional[str]:
+        """Convert a single job to a cron line, reusing the compiled-job cache."""
+        script_path = self._get_aircron_script_path()
+        key = _job_line_key(job, script_path)
+        # Same lock as compile_jobs, which replaces the cache wholesale
+        with metrics.lock_wait(self._compile_lock, "cron_compile"):
+            if key in self._line_cache:
+                job_command = self._line_cache[key]
+            else:
+                job_command = self._compile_job(job, script_path)
+                self._line_cache[key] = job_command
+        if job_command is None:
+            return None
+        return _consolidate_cron_lines([(job, job_command)])[0].line
 
+    def _compile_job(self, job: Job, aircron_script: str) -> Optional[_JobCommand]:
+        """Build a job's aircron_run.sh command and parse its fire times."""
+        try:
+            cmd_parts = [aircron_script] + job_command_args(job)
             command = " ".join(shlex.quote(str(part)) for part in cmd_parts)
-            return f"{minute_str} {hour_str} * * {days_str} {command}"
+            hour_str, minute_str = job.time.split(":")
+            days = frozenset(day % 7 for day in job.days)
+            if not days:
+                raise ValueError("job has no days")
+            return _JobCommand(command, int(minute_str), int(hour_str), days)
 
         except Exception as e:
             logger.error(f"Error converting job {job.id} to cron line: {e}", exc_info=True)
             return None
 
-    def apply_jobs_to_cron(self) -> None:
-        """Apply all jobs from store to crontab."""
+    @profiling.traced("cron:apply")
+    def apply_jobs_to_cron(self, include_jobs: bool = True) -> Dict[str, Any]:
+        """Apply all jobs from store to crontab (or an empty block if not ``include_jobs``).
+
+        The generated AirCron block is hashed and compared with the installed one;
+        when they match the crontab is neither backed up nor reinstalled. Returns
+        ``{"changed", "block_hash", "diff"}`` where ``diff`` lists the added, removed
+        and unchanged cron lines (with the owning job for generated lines).
+        """
         try:
-            # Get current crontab
+            # Always read the crontab fresh here, so external edits are never overwritten
             current_lines = self._get_current_crontab()
-
-            # Backup current crontab
-            self._backup_crontab(current_lines)
+            with self._crontab_lock:
+                self._crontab_snapshot = CrontabSnapshot(current_lines)
 
             # Find AirCron section
-            begin_idx = None
-            end_idx = None
-
-            for i, line in enumerate(current_lines):
-                if line.strip() == AIRCRON_BEGIN:
-                    begin_idx = i
-                elif line.strip() == AIRCRON_END:
-                    end_idx = i
-                    break
+            begin_idx, end_idx = _find_aircron_section(current_lines)
+            has_section = begin_idx is not None and end_idx is not None
+            installed_block = current_lines[begin_idx : end_idx + 1] if has_section else []
 
             # Generate new cron lines
-            new_cron_lines = self._generate_cron_lines()
+            new_cron_lines, line_to_jobs = self._generate_cron_block(include_jobs)
+            block_hash = _hash_cron_block(new_cron_lines)
+            diff = _diff_cron_blocks(installed_block, line_to_jobs)
+
+            if has_section and _hash_cron_block(installed_block) == block_hash:
+                logger.info(f"AirCron block unchanged ({block_hash[:12]}), skipping install")
+                return {"changed": False, "block_hash": block_hash, "diff": diff}
 
             # Build new crontab
-            if begin_idx is not None and end_idx is not None:
+            if has_section:
                 # Replace existing AirCron section
                 new_lines = (
                     current_lines[:begin_idx] + new_cron_lines + current_lines[end_idx + 1 :]
@@ -242,10 +484,20 @@ class CronManager:
             while new_lines and not new_lines[-1].strip():
                 new_lines.pop()
 
-            # Write new crontab
-            self._write_crontab(new_lines)
+            # Backup current crontab, only now that it is about to change
+            self._backup_crontab(current_lines)
 
-            logger.info("Successfully applied jobs to crontab")
+            # Write new crontab
+            try:
+                self._write_crontab(new_lines)
+            finally:
+                self.invalidate_crontab_snapshot()
+
+            logger.info(
+                f"Successfully applied jobs to crontab: {len(diff['added'])} added, "
+                f"{len(diff['removed'])} removed, {len(diff['unchanged'])} unchanged"
+            )
+            return {"changed": True, "block_hash": block_hash, "diff": diff}
 
         except Exception as e:
             logger.error(f"Error applying jobs to cron: {e}")
@@ -291,45 +543,237 @@ class CronManager:
 
     def get_cron_section_from_crontab(self) -> List[str]:
         """Get the AirCron section from the current crontab."""
-        current_lines = self._get_current_crontab()
-        aircron_lines = []
-        in_aircron_section = False
+        return list(self.get_crontab_snapshot().block)
 
-        for line in current_lines:
-            if line.strip() == AIRCRON_BEGIN:
-                in_aircron_section = True
-                aircron_lines.append(line)
-            elif line.strip() == AIRCRON_END:
-                aircron_lines.append(line)
-                break
-            elif in_aircron_section:
-                aircron_lines.append(line)
 
-        return aircron_lines
+def get_cron_manager() -> CronManager:
+    """Return the current app's shared CronManager (see ``app/registry.py``).
 
+    Raises:
+        RuntimeError: If called outside of a Flask app context.
+    """
+    from .registry import get_registry
 
-# Global instance - will be initialized when Flask app is created
-cron_manager: Optional[CronManager] = None
+    return get_registry().cron_manager
 
 
-def get_cron_manager() -> CronManager:
-    """Get or create the global CronManager instance.
+def job_cron_schedule(job: Job) -> str:
+    """The five cron schedule fields for a job ("M H * * days").
 
-    This is a centralized helper function that eliminates code duplication
-    from multiple null-check patterns across services.
+    Raises:
+        ValueError: If the job's time is not HH:MM
+    """
+    hour_str, minute_str = job.time.split(":")
+    int(hour_str)
+    int(minute_str)
+
+    # Convert days (1=Monday, 7=Sunday) to cron format (0=Sunday)
+    cron_days = [str(d % 7) for d in job.days]
+    days_str = ",".join(sorted(cron_days, key=int))
+    return f"{minute_str} {hour_str} * * {days_str}"
+
+
+def job_command_args(job: Job) -> List[str]:
+    """Arguments aircron_run.sh takes for a job: zone, action, arg1, arg2, service."""
+    service = getattr(job, "service", "spotify")
+    action = job.action
+
+    # Argument mapping based on action
+    arg1 = ""
+    arg2 = ""  # Not currently used, but here for future-proofing
+    if action == "play":
+        if service == "applemusic":
+            arg1 = job.args.get("playlist", "")
+        else:  # spotify
+            arg1 = job.args.get("uri", "")
+    elif action == "volume":
+        arg1 = job.args.get("volume", "50")
+
+    # All other actions (pause, resume, connect, disconnect) have no script arguments.
+    return [job.zone, action, str(arg1), arg2, service]
+
+
+def _job_line_key(job: Job, script_path: str) -> Tuple:
+    """Cache key covering everything a job's cron line is built from."""
+    return (
+        script_path,
+        job.id,
+        job.zone,
+        job.time,
+        tuple(job.days),
+        job.action,
+        job.service,
+        json.dumps(job.args, sort_keys=True, default=str),
+    )
+
+
+def _cron_field(values: Iterable[int], low: int, high: int) -> str:
+    """Shortest cron field matching exactly ``values``: ``*``, a step, ranges or a list."""
+    ordered = sorted(set(values))
+    if len(ordered) == 1:
+        return str(ordered[0])
+    if ordered == list(range(low, high + 1)):
+        return "*"
+    parts: List[str] = []
+    start = 0
+    while start < len(ordered):
+        end = start
+        while end + 1 < len(ordered) and ordered[end + 1] == ordered[end] + 1:
+            end += 1
+        if end - start >= 2:
+            parts.append(f"{ordered[start]}-{ordered[end]}")
+        else:
+            parts.extend(str(value) for value in ordered[start : end + 1])
+        start = end + 1
+    candidates = [",".join(parts)]
+    if len(ordered) >= 3:
+        step = ordered[1] - ordered[0]
+        if step > 1 and all(b - a == step for a, b in zip(ordered, ordered[1:])):
+            if ordered[0] == low and ordered[-1] + step > high:
+                candidates.append(f"*/{step}")
+            else:
+                candidates.append(f"{ordered[0]}-{ordered[-1]}/{step}")
+    return min(candidates, key=len)
 
-    Returns:
-        The global CronManager instance, creating it if necessary.
 
-    Raises:
-        RuntimeError: If called outside of a Flask app context.
+def _consolidate_cron_lines(
+    commands: List[Tuple[Job, _JobCommand]],
+    cache: Optional[Dict[Tuple, List[CompiledCronLine]]] = None,
+) -> List[CompiledCronLine]:
+    """Merge jobs whose commands are identical into as few cron lines as possible.
+
+    Lines keep store order (by their first job). ``cache`` maps each command and its
+    jobs' fire times to the merged lines, so only commands whose jobs changed are
+    merged again; it is left holding just the entries used.
     """
-    global cron_manager
-    if cron_manager is None:
-        from flask import current_app
-        app_support_dir = current_app.config.get("APP_SUPPORT_DIR")
-        cron_manager = CronManager(app_support_dir)
-    return cron_manager
+    order = {job.id: position for position, (job, _) in enumerate(commands)}
+    by_command: Dict[str, List[Tuple[Job, _JobCommand]]] = {}
+    for job, job_command in commands:
+        by_command.setdefault(job_command.command, []).append((job, job_command))
+
+    previous = dict(cache) if cache is not None else {}
+    if cache is not None:
+        cache.clear()
+    lines: List[CompiledCronLine] = []
+    for command, entries in by_command.items():
+        key = (command, tuple((job.id, jc.minute, jc.hour, jc.days) for job, jc in entries))
+        merged = previous.get(key)
+        if merged is None:
+            merged = _merge_command(command, entries)
+        if cache is not None:
+            cache[key] = merged
+        lines.extend(merged)
+    lines.sort(key=lambda compiled_line: order[compiled_line.job_ids[0]])
+    return lines
+
+
+def _merge_command(command: str, entries: List[Tuple[Job, _JobCommand]]) -> List[CompiledCronLine]:
+    """Cron lines firing one command at every time of ``entries`` (jobs in store order).
+
+    A cron line fires at every (minute, hour, weekday) in the product of its fields.
+    The weekdays are first unioned per (minute, hour); times with the same weekdays
+    are then grouped into an hour set per minute, and minutes with the same hours and
+    weekdays share a line. Every fire time stays on exactly one line, and each line
+    lists its jobs in store order.
+    """
+    if len(entries) == 1:
+        job, job_command = entries[0]
+        return [
+            _cron_line(
+                command, [job_command.minute], [job_command.hour], job_command.days, [job.id]
+            )
+        ]
+
+    order = {job.id: position for position, (job, _) in enumerate(entries)}
+    times: Dict[Tuple[int, int], Tuple[Set[int], List[str]]] = {}
+    for job, job_command in entries:
+        days, job_ids = times.setdefault((job_command.minute, job_command.hour), (set(), []))
+        days.update(job_command.days)
+        job_ids.append(job.id)
+
+    by_minute: Dict[Tuple[FrozenSet[int], int], Tuple[Set[int], List[str]]] = {}
+    for (minute, hour), (days, job_ids) in times.items():
+        hours, ids = by_minute.setdefault((frozenset(days), minute), (set(), []))
+        hours.add(hour)
+        ids.extend(job_ids)
+    by_hours: Dict[Tuple[FrozenSet[int], FrozenSet[int]], Tuple[Set[int], List[str]]] = {}
+    for (days, minute), (hours, job_ids) in by_minute.items():
+        minutes, ids = by_hours.setdefault((days, frozenset(hours)), (set(), []))
+        minutes.add(minute)
+        ids.extend(job_ids)
+
+    lines: List[CompiledCronLine] = []
+    for (days, hours), (minutes, job_ids) in by_hours.items():
+        job_ids.sort(key=order.__getitem__)
+        lines.append(_cron_line(command, minutes, hours, days, job_ids))
+    lines.sort(key=lambda compiled_line: order[compiled_line.job_ids[0]])
+    return lines
+
+
+def _cron_line(
+    command: str,
+    minutes: Iterable[int],
+    hours: Iterable[int],
+    days: Iterable[int],
+    job_ids: List[str],
+) -> CompiledCronLine:
+    schedule = (
+        f"{_cron_field(minutes, 0, 59)} {_cron_field(hours, 0, 23)} * * "
+        f"{_cron_field(days, 0, 6)}"
+    )
+    # The job ids go into the script's run log records
+    env = f"AIRCRON_JOB_ID={shlex.quote(','.join(job_ids))}"
+    return CompiledCronLine(f"{schedule} {env} {command}", job_ids)
+
+
+def _parse_manifest(comment: str) -> List[str]:
+    """Job ids listed in a ``# aircron-jobs:`` manifest comment."""
+    ids = comment.strip()[len(MANIFEST_PREFIX.strip()) :]
+    return [job_id.strip() for job_id in ids.split(",") if job_id.strip()]
+
+
+def _find_aircron_section(lines: List[str]) -> Tuple[Optional[int], Optional[int]]:
+    """Return the indexes of the AirCron begin and end markers, if present."""
+    begin_idx = None
+    end_idx = None
+    for i, line in enumerate(lines):
+        if line.strip() == AIRCRON_BEGIN:
+            begin_idx = i
+        elif line.strip() == AIRCRON_END:
+            end_idx = i
+            break
+    return begin_idx, end_idx
+
+
+def _hash_cron_block(lines: List[str]) -> str:
+    """Content hash of an AirCron block, ignoring trailing whitespace on each line."""
+    return hashlib.sha256("\n".join(line.rstrip() for line in lines).encode("utf-8")).hexdigest()
+
+
+def _diff_cron_blocks(
+    installed_block: List[str], line_to_jobs: Dict[str, List[Job]]
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Per-job diff between an installed AirCron block and the generated cron lines.
+
+    Removed lines carry the ``job_ids`` from their manifest comment, if they had one.
+    """
+    snapshot = CrontabSnapshot(installed_block)
+    installed = snapshot.cron_line_set
+    diff: Dict[str, List[Dict[str, Any]]] = {"added": [], "removed": [], "unchanged": []}
+    for line, jobs in line_to_jobs.items():
+        for job in jobs:
+            entry = {"job_id": job.id, "zone": job.zone, "cron_line": line}
+            diff["unchanged" if line in installed else "added"].append(entry)
+    for line in sorted(installed - line_to_jobs.keys()):
+        diff["removed"].append(
+            {
+                "job_id": None,
+                "zone": None,
+                "cron_line": line,
+                "job_ids": snapshot.manifest.get(line, []),
+            }
+        )
+    return diff
 
 
 def _normalize_cron_line(line: str) -> str:
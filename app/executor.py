@@ -0,0 +1,526 @@
+"""Resident action executor for AirCron.
+
+A long-lived process that runs the same verbs as ``aircron_run.sh`` (play, pause,
+resume, volume, connect, disconnect) on behalf of cron. It listens on a local Unix
+socket and keeps the resolved tool paths and app readiness warm, so a cron fire
+costs one small request instead of a bash start-up, tool lookups and app polling.
+
+``aircron_run.sh`` tries the socket first and falls back to running the action
+itself when the executor isn't listening. Start it on its own with::
+
+    python -m app.executor [--socket PATH]
+
+or let ``main.py`` start it alongside the Flask app (``EXECUTOR_AUTOSTART``).
+
+Protocol: one JSON object per connection, terminated by a newline, answered with
+one JSON line. ``{"op": "ping"}`` reports liveness; otherwise the request carries
+``zone``, ``action``, ``arg1``, ``arg2`` and ``service`` like the script's
+arguments and the reply is ``{"ok": true, ...}`` or ``{"ok": false, "error": ...}``.
+Actions go through the durable run queue in ``app/runqueue.py``; with
+``"wait": false`` the reply comes as soon as the action is spooled. Cron fires
+also send ``job_id`` and ``scheduled_at`` (epoch seconds of the scheduled
+minute), which end up in the run log (``app/runlog.py``).
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import socket
+import socketserver
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from . import metrics
+from .applescript import as_string, compile_zone_action, parse_results, zone_speakers
+from .runlog import RunLog, default_run_log_path, now_ms
+from .runqueue import DEFAULT_WORKERS, QueuedAction, RunQueue
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_NAME = "executor.sock"
+VALID_ACTIONS = {"play", "pause", "resume", "volume", "connect", "disconnect", "reconnect"}
+VALID_SERVICES = {"spotify", "applemusic"}
+SPOTIFY_LOCATIONS = ["/usr/local/bin/spotify", "/opt/homebrew/bin/spotify", "/usr/bin/spotify"]
+# An app seen running within this many seconds is assumed to still be running
+APP_READY_TTL = 300.0
+MAX_REQUEST_BYTES = 64 * 1024
+
+
+class ExecutorError(RuntimeError):
+    """An action failed in a way aircron_run.sh would report with a non-zero exit."""
+
+    def __init__(self, message: str, speakers: Optional[List[Dict[str, Any]]] = None) -> None:
+        super().__init__(message)
+        self.speakers = speakers
+
+
+def default_socket_path(app_support_dir: Optional[Path] = None) -> Path:
+    """Socket location used by aircron_run.sh unless AIRCRON_EXECUTOR_SOCKET is set."""
+    if app_support_dir is None:
+        app_support_dir = Path.home() / "Library" / "Application Support" / "AirCron"
+    return Path(app_support_dir) / DEFAULT_SOCKET_NAME
+
+
+def _clamp_pct(raw: Any) -> int:
+    """Clamp a percentage to 0-100, dropping a trailing '%' and any decimals."""
+    text = str(raw).strip().rstrip("%").split(".")[0]
+    try:
+        pct = int(text)
+    except ValueError:
+        pct = 50
+    return max(0, min(100, pct))
+
+
+class ActionExecutor:
+    """Runs AirCron actions, keeping tool paths and app readiness warm.
+
+    With a ``run_log`` each action run appends its step and run records to it.
+    """
+
+    def __init__(self, run_log: Optional[RunLog] = None) -> None:
+        self.lock = threading.Lock()
+        self.run_log = run_log
+        # Step records of the action running on the current thread
+        self._steps = threading.local()
+        self.osascript = shutil.which("osascript") or "/usr/bin/osascript"
+        self._spotify_cmd: Optional[str] = None
+        # process name -> time it was last seen running
+        self._ready: Dict[str, float] = {}
+        self.started_at = time.time()
+        self.actions_run = 0
+
+    def _run(
+        self, cmd: List[str], input: Optional[str] = None, timeout: float = 30
+    ) -> subprocess.CompletedProcess:
+        """Run a tool; the single place the executor touches the system."""
+        start = now_ms()
+        result = metrics.run_subprocess(
+            cmd, input=input, capture_output=True, text=True, timeout=timeout
+        )
+        tool = os.path.basename(cmd[0])
+        if tool == "osascript":
+            self._record_step("osascript", start, result.returncode)
+        elif tool == "spotify":
+            self._record_step(f"spotify:{cmd[1]}", start, result.returncode)
+        return result
+
+    def _record_step(self, step: str, start_ms: int, exit_code: int) -> None:
+        """Note a step's timing for the run log while an action is running."""
+        steps = getattr(self._steps, "records", None)
+        if steps is not None:
+            end = now_ms()
+            steps.append(
+                {
+                    "type": "step",
+                    "step": step,
+                    "start_ms": start_ms,
+                    "end_ms": end,
+                    "duration_ms": end - start_ms,
+                    "exit_code": exit_code,
+                }
+            )
+
+    @property
+    def spotify_cmd(self) -> Optional[str]:
+        """Path to spotify-cli, resolved once and re-checked only if it disappears."""
+        if self._spotify_cmd and os.access(self._spotify_cmd, os.X_OK):
+            return self._spotify_cmd
+        self._spotify_cmd = next(
+            (path for path in SPOTIFY_LOCATIONS if os.access(path, os.X_OK)),
+            shutil.which("spotify"),
+        )
+        return self._spotify_cmd
+
+    def _require_spotify(self) -> str:
+        cmd = self.spotify_cmd
+        if not cmd:
+            raise ExecutorError("spotify-cli missing")
+        return cmd
+
+    def app_running(self, proc: str) -> bool:
+        return self._run(["pgrep", "-x", proc], timeout=5).returncode == 0
+
+    def ensure_app(self, proc: str, app_name: str) -> None:
+        """Launch an app if needed and wait briefly for it, skipping the check if warm."""
+        seen = self._ready.get(proc)
+        if seen is not None and time.monotonic() - seen < APP_READY_TTL:
+            return
+        start = now_ms()
+        ready = self._ensure_app(proc, app_name)
+        self._record_step(f"ensure_app:{app_name}", start, 0 if ready else 1)
+
+    def _ensure_app(self, proc: str, app_name: str) -> bool:
+        if not self.app_running(proc):
+            logger.info(f"[executor] {app_name} not running, launching...")
+            if self._run(["open", "-g", "-a", app_name]).returncode != 0:
+                self._run(["open", "-a", app_name])
+            for _ in range(12):
+                if self.app_running(proc):
+                    break
+                time.sleep(0.5)
+            else:
+                logger.warning(f"[executor] {app_name} not ready after wait")
+                return False
+        self._ready[proc] = time.monotonic()
+        return True
+
+    def run_osascript(self, script: str, check: bool = False) -> bool:
+        """Run an AppleScript; raise if ``check`` and it fails, else log and return False."""
+        result = self._run([self.osascript, "-"], input=script)
+        if result.returncode == 0:
+            return True
+        message = (result.stderr or result.stdout).strip()
+        logger.warning(f"[executor] osascript exit {result.returncode}: {message}")
+        if check:
+            raise ExecutorError(message or f"osascript exit {result.returncode}")
+        return False
+
+    def run_zone_action(
+        self, action: str, zone: str, service: str, volume: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Run a connect/disconnect/reconnect/volume for a whole zone in one osascript.
+
+        Returns one ``{"speaker", "ok", "error"?}`` result per speaker.
+        """
+        if service == "applemusic":
+            self.ensure_app("Music", "Music")
+        else:
+            # Spotify → Airfoil
+            self.ensure_app("Airfoil", "Airfoil")
+            if action in ("connect", "reconnect"):
+                self.ensure_app("Spotify", "Spotify")
+        script = compile_zone_action(action, zone, service, volume)
+        result = self._run([self.osascript, "-"], input=script)
+        if result.returncode != 0:
+            message = (result.stderr or result.stdout).strip() or f"exit {result.returncode}"
+            logger.warning(f"[executor] osascript exit {result.returncode}: {message}")
+            return [
+                {"speaker": speaker, "ok": False, "error": message}
+                for speaker in zone_speakers(zone)
+            ]
+        results = parse_results(result.stdout)
+        for failed in (r for r in results if not r["ok"]):
+            logger.warning(f"[executor] {action} {failed['speaker']}: {failed['error']}")
+        return results
+
+    def connect(self, zone: str, service: str) -> List[Dict[str, Any]]:
+        return self.run_zone_action("connect", zone, service)
+
+    def disconnect(self, zone: str, service: str) -> List[Dict[str, Any]]:
+        return self.run_zone_action("disconnect", zone, service)
+
+    def set_global_volume(self, service: str, pct: int) -> None:
+        if service == "spotify":
+            result = self._run([self._require_spotify(), "vol", str(pct)])
+            if result.returncode != 0:
+                raise ExecutorError(f"spotify vol failed with exit {result.returncode}")
+        else:
+            self.ensure_app("Music", "Music")
+            self.run_osascript(f'tell application "Music" to set sound volume to {pct}', check=True)
+
+    def set_speaker_volume(self, service: str, zone: str, pct: int) -> List[Dict[str, Any]]:
+        if service == "spotify":
+            self.ensure_app("Spotify", "Spotify")
+        results = self.run_zone_action("volume", zone, service, pct)
+        failed = [r for r in results if not r["ok"]]
+        if failed:
+            raise ExecutorError("; ".join(f"{r['speaker']}: {r['error']}" for r in failed), results)
+        return results
+
+    def execute(
+        self, zone: str, action: str, arg1: str = "", service: str = "spotify"
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Run one action with the same semantics as ``aircron_run.sh``.
+
+        ``reconnect`` disconnects and connects each speaker in the same osascript.
+
+        Returns:
+            Per-speaker results for actions that address speakers, else None
+
+        Raises:
+            ExecutorError: Where the script would exit non-zero
+        """
+        service = service or "spotify"
+        speakers = None
+        if action == "play":
+            speakers = self.connect(zone, service)
+            if service == "applemusic":
+                self.ensure_app("Music", "Music")
+                self.run_osascript(f'tell application "Music" to play playlist {as_string(arg1)}')
+            else:
+                spotify = self._require_spotify()
+                self.ensure_app("Spotify", "Spotify")
+                self._run([spotify, "play", "uri", arg1])
+        elif action in ("pause", "resume"):
+            if service == "applemusic":
+                self.ensure_app("Music", "Music")
+                verb = "pause" if action == "pause" else "play"
+                self.run_osascript(f'tell application "Music" to {verb}')
+            elif self.spotify_cmd:
+                self.ensure_app("Spotify", "Spotify")
+                self._run([self.spotify_cmd, "pause" if action == "pause" else "play"])
+            else:
+                logger.warning("[executor] spotify-cli missing")
+        elif action == "volume":
+            if zone == "All Speakers":
+                self.set_global_volume(service, _clamp_pct(arg1))
+            else:
+                speakers = self.set_speaker_volume(service, zone, _clamp_pct(arg1))
+        elif action in ("connect", "disconnect", "reconnect"):
+            speakers = self.run_zone_action(action, zone, service)
+        else:
+            raise ExecutorError(f"unknown action '{action}'")
+        return speakers
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "pid": os.getpid(),
+            "uptime": round(time.time() - self.started_at, 1),
+            "actions_run": self.actions_run,
+        }
+
+    def run(self, item: QueuedAction) -> Dict[str, Any]:
+        """Run a queued action and return its reply; called from run queue workers."""
+        start = time.monotonic()
+        start_ms = now_ms()
+        self._steps.records = []
+        logger.info(f"[executor] Running {item.action} for {item.zone} ({item.service})")
+        try:
+            reply = self._execute_item(item)
+        finally:
+            with self.lock:
+                self.actions_run += 1
+            steps, self._steps.records = self._steps.records, None
+        if reply["ok"]:
+            duration_ms = round((time.monotonic() - start) * 1000, 1)
+            logger.info(f"[executor] {item.action} for {item.zone} finished in {duration_ms}ms")
+            reply = {"ok": True, "duration_ms": duration_ms, **reply}
+        self._log_run(item, start_ms, steps, reply)
+        return reply
+
+    def _execute_item(self, item: QueuedAction) -> Dict[str, Any]:
+        try:
+            speakers = self.execute(item.zone, item.action, item.arg1, item.service)
+        except ExecutorError as e:
+            logger.error(f"[executor] {item.action} for {item.zone} failed: {e}")
+            reply: Dict[str, Any] = {"ok": False, "error": str(e)}
+            if e.speakers is not None:
+                reply["speakers"] = e.speakers
+            return reply
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.error(f"[executor] {item.action} for {item.zone} failed: {e}")
+            return {"ok": False, "error": str(e)}
+        reply = {"ok": True}
+        if speakers is not None:
+            reply["speakers"] = speakers
+        return reply
+
+    def _log_run(
+        self,
+        item: QueuedAction,
+        start_ms: int,
+        steps: List[Dict[str, Any]],
+        reply: Dict[str, Any],
+    ) -> None:
+        """Append the action's step records and its run record to the run log."""
+        if self.run_log is None:
+            return
+        end_ms = now_ms()
+        for step in steps:
+            self.run_log.append({**step, "run_id": item.id, "job_id": item.job_id})
+        record: Dict[str, Any] = {
+            "type": "run",
+            "run_id": item.id,
+            "job_id": item.job_id,
+            "zone": item.zone,
+            "action": item.action,
+            "service": item.service,
+            "path": "executor",
+            "start_ms": start_ms,
+            "end_ms": end_ms,
+            "duration_ms": end_ms - start_ms,
+            "queued_ms": max(0, start_ms - round(item.enqueued_at * 1000)),
+            "exit_code": 0 if reply["ok"] else 1,
+            "failed_steps": sum(1 for step in steps if step["exit_code"] != 0),
+            "drift_ms": (
+                start_ms - round(item.scheduled_at * 1000)
+                if item.scheduled_at is not None
+                else None
+            ),
+        }
+        if "error" in reply:
+            record["error"] = reply["error"]
+        if "speakers" in reply:
+            record["speakers"] = reply["speakers"]
+        self.run_log.append(record)
+
+
+def _validate_request(request: Dict[str, Any]) -> Optional[str]:
+    """Return an error message for an invalid action request, else None."""
+    if not request.get("zone"):
+        return "Zone is required"
+    if request.get("action") not in VALID_ACTIONS:
+        return f"unknown action '{request.get('action')}'"
+    if (request.get("service") or "spotify") not in VALID_SERVICES:
+        return f"unknown service '{request.get('service')}'"
+    return None
+
+
+def _scheduled_at(raw: Any) -> Optional[float]:
+    """A request's ``scheduled_at`` as epoch seconds, or None if missing or invalid."""
+    try:
+        return float(raw) if raw not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    server: "ExecutorServer"
+
+    def handle(self) -> None:
+        line = self.rfile.readline(MAX_REQUEST_BYTES)
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+            reply = self.server.handle_request(request)
+        except ValueError as e:
+            reply = {"ok": False, "error": f"bad request: {e}"}
+        self.wfile.write((json.dumps(reply) + "\n").encode("utf-8"))
+
+
+class ExecutorServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server handing requests to an ActionExecutor."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        socket_path: Path,
+        executor: Optional[ActionExecutor] = None,
+        spool_dir: Optional[Path] = None,
+        workers: int = DEFAULT_WORKERS,
+    ) -> None:
+        self.socket_path = Path(socket_path)
+        self.executor = executor or ActionExecutor()
+        _remove_stale_socket(self.socket_path)
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        # Queued actions survive a restart next to the socket
+        self.queue = RunQueue(
+            self.executor.run, spool_dir or self.socket_path.parent / "queue", workers
+        )
+        self.queue.start()
+        super().__init__(str(self.socket_path), _RequestHandler)
+        os.chmod(self.socket_path, 0o600)
+
+    def handle_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Queue one action request and, unless ``wait`` is false, wait for its reply.
+
+        Cron fires send ``"wait": false``: the action is spooled before the reply,
+        so the script can exit straight away without risking a dropped fire.
+        """
+        if request.get("op") == "ping":
+            return {"ok": True, **self.executor.status(), "queue": self.queue.snapshot()}
+
+        error = _validate_request(request)
+        if error:
+            return {"ok": False, "error": error}
+        item = self.queue.submit(
+            str(request["zone"]),
+            str(request["action"]),
+            str(request.get("arg1") or ""),
+            str(request.get("service") or "spotify"),
+            str(request.get("arg2") or ""),
+            job_id=str(request.get("job_id") or ""),
+            scheduled_at=_scheduled_at(request.get("scheduled_at")),
+        )
+        if request.get("wait") is False:
+            return {"ok": True, "queued": item.id}
+        return self.queue.wait(item, timeout=request.get("timeout"))
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.queue.stop()
+        try:
+            self.socket_path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _remove_stale_socket(socket_path: Path) -> None:
+    """Remove a socket left behind by a dead executor; refuse if one is still live."""
+    if not socket_path.exists():
+        return
+    try:
+        send_request(socket_path, {"op": "ping"}, timeout=2)
+    except OSError:
+        socket_path.unlink()
+        return
+    raise OSError(f"An executor is already listening on {socket_path}")
+
+
+def send_request(
+    socket_path: Path, request: Dict[str, Any], timeout: float = 120
+) -> Dict[str, Any]:
+    """Send one request to a running executor and return its reply.
+
+    Raises:
+        OSError: If no executor is listening (callers fall back to the script)
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(str(socket_path))
+        sock.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        with sock.makefile("rb") as reply_file:
+            line = reply_file.readline(MAX_REQUEST_BYTES)
+    if not line:
+        raise ConnectionError("executor closed the connection without replying")
+    return json.loads(line)
+
+
+def start_executor(
+    socket_path: Path, executor: Optional[ActionExecutor] = None, workers: int = DEFAULT_WORKERS
+) -> ExecutorServer:
+    """Bind the socket and serve requests on a daemon thread."""
+    server = ExecutorServer(socket_path, executor, workers=workers)
+    thread = threading.Thread(target=server.serve_forever, name="aircron-executor", daemon=True)
+    thread.start()
+    logger.info(f"[executor] Listening on {socket_path}")
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="AirCron resident action executor")
+    parser.add_argument("--socket", type=Path, default=None, help="Unix socket path")
+    parser.add_argument(
+        "--workers", type=int, default=DEFAULT_WORKERS, help="actions run in parallel"
+    )
+    args = parser.parse_args()
+
+    log_dir = Path.home() / "Library" / "Logs" / "AirCron"
+    log_dir.mkdir(parents=True, exist_ok=True)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        handlers=[logging.FileHandler(log_dir / "executor.log"), logging.StreamHandler()],
+    )
+
+    socket_path = args.socket or Path(
+        os.environ.get("AIRCRON_EXECUTOR_SOCKET") or default_socket_path()
+    )
+    executor = ActionExecutor(RunLog(default_run_log_path()))
+    with ExecutorServer(socket_path, executor, workers=args.workers) as server:
+        logger.info(f"[executor] Listening on {socket_path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
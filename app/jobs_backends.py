@@ -0,0 +1,636 @@
+"""Storage backends for AirCron jobs.
+
+A backend persists the raw job structure ``{zone: [job_dict, ...]}`` used by
+``JobsStore``. Two implementations exist:
+
+- ``json``: ``jobs.json`` plus an append-only ``jobs.journal``, compacted periodically
+- ``sqlite``: a WAL-mode SQLite database with one row per job
+
+The backend is chosen with the ``JOBS_BACKEND`` app config key.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    cast,
+)
+
+from . import metrics, profiling
+
+logger = logging.getLogger(__name__)
+
+RawJobs = Dict[str, List[Dict[str, Any]]]
+
+DEFAULT_BACKEND = "json"
+
+
+class JobChange:
+    """A single row-level change to the jobs store."""
+
+    PUT = "put"
+    DELETE = "delete"
+
+    def __init__(
+        self, op: str, zone: str, job_id: str, data: Optional[Dict[str, Any]] = None
+    ) -> None:
+        self.op = op
+        self.zone = zone
+        self.job_id = job_id
+        self.data = data
+
+    @classmethod
+    def put(cls, zone: str, data: Dict[str, Any]) -> "JobChange":
+        """Insert or replace a job."""
+        return cls(cls.PUT, zone, data["id"], data)
+
+    @classmethod
+    def delete(cls, zone: str, job_id: str) -> "JobChange":
+        """Remove a job."""
+        return cls(cls.DELETE, zone, job_id)
+
+
+def _get_file_key(path: Path) -> Optional[Tuple[int, int, int]]:
+    """Return (st_ino, st_mtime_ns, st_size) for the file at path, or None if missing."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+class FileLock:
+    """Reader/writer lock on a lock file using kernel advisory locks (flock).
+
+    ``shared()`` admits any number of readers, ``exclusive()`` a single writer, and
+    both block in the kernel until granted instead of polling. Locks belong to the
+    open file, so they vanish when a crashed process exits and never need breaking.
+    Holding is re-entrant per thread; asking for ``exclusive()`` while holding
+    ``shared()`` upgrades the lock for the inner block.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._state = threading.local()
+
+    @property
+    def last_wait(self) -> float:
+        """Seconds this thread last spent blocked acquiring the lock."""
+        return cast(float, getattr(self._state, "last_wait", 0.0))
+
+    def shared(self) -> ContextManager[None]:
+        return self._hold(fcntl.LOCK_SH)
+
+    def exclusive(self) -> ContextManager[None]:
+        return self._hold(fcntl.LOCK_EX)
+
+    def _acquire(self, fd: int, mode: int) -> None:
+        start = time.perf_counter()
+        fcntl.flock(fd, mode)
+        self._state.last_wait = time.perf_counter() - start
+        metrics.LOCK_WAIT_SECONDS.observe(self._state.last_wait, lock=self.path.name)
+
+    @contextmanager
+    def _hold(self, mode: int) -> Iterator[None]:
+        state = self._state
+        held_fd: Optional[int] = getattr(state, "fd", None)
+
+        if held_fd is None:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                self._acquire(fd, mode)
+                state.fd, state.mode = fd, mode
+                yield
+            finally:
+                state.fd = None
+                os.close(fd)  # closing the descriptor releases the lock
+        elif mode == fcntl.LOCK_EX and state.mode == fcntl.LOCK_SH:
+            self._acquire(held_fd, fcntl.LOCK_EX)
+            state.mode = fcntl.LOCK_EX
+            try:
+                yield
+            finally:
+                fcntl.flock(held_fd, fcntl.LOCK_SH)
+                state.mode = fcntl.LOCK_SH
+        else:
+            yield
+
+
+class JobsBackend:
+    """Interface implemented by job storage backends."""
+
+    name = ""
+
+    def __init__(self, app_support_dir: Path) -> None:
+        self.app_support_dir = Path(app_support_dir)
+
+    def configure(self, config: Mapping[str, Any]) -> None:
+        """Pick up tuning options from the Flask app config."""
+
+    def ensure_exists(self) -> None:
+        """Create empty storage if it is missing."""
+
+    def write_lock(self) -> ContextManager[None]:
+        """Exclusive lock held across a read-check-write cycle in JobsStore.
+
+        Re-entrant within a thread, so ``apply``/``save_all`` may be called inside it.
+        """
+        return nullcontext()
+
+    @property
+    def location(self) -> Path:
+        """Path identifying this backend's storage, used as the snapshot cache key."""
+        raise NotImplementedError
+
+    def version(self) -> Optional[Hashable]:
+        """Cheap token that changes whenever the stored jobs change, or None if absent."""
+        raise NotImplementedError
+
+    def load(self) -> RawJobs:
+        """Load every job."""
+        raise NotImplementedError
+
+    def save_all(self, jobs: RawJobs) -> Optional[Hashable]:
+        """Replace the stored jobs wholesale and return the new version."""
+        raise NotImplementedError
+
+    def apply(self, changes: List[JobChange], current: Callable[[], RawJobs]) -> Optional[Hashable]:
+        """Persist row-level changes and return the new version.
+
+        ``current`` returns the full job structure with the changes already applied,
+        for backends that can only write whole files.
+        """
+        raise NotImplementedError
+
+
+class JsonJobsBackend(JobsBackend):
+    """Stores jobs in jobs.json plus an append-only jobs.journal of later changes.
+
+    Each mutation is appended to the journal as one JSON line and fsync'd, so a
+    single-job edit costs O(1) I/O. Loading replays the journal over jobs.json.
+    Once the journal holds ``compact_threshold`` records it is folded back into
+    jobs.json (keeping the previous version as jobs.json.bak) and truncated.
+
+    Replaying a record is idempotent (puts are upserts by id, deletes of missing
+    jobs are ignored), so a crash between rewriting jobs.json and truncating the
+    journal is harmless.
+
+    Readers take a shared flock on jobs.json.lock and writers an exclusive one, so a
+    load never sees jobs.json mid-rotation.
+    """
+
+    name = "json"
+
+    DEFAULT_COMPACT_THRESHOLD = 500
+
+    def __init__(self, app_support_dir: Path) -> None:
+        super().__init__(app_support_dir)
+        self.jobs_file = self.app_support_dir / "jobs.json"
+        self.journal_file = self.jobs_file.with_suffix(".journal")
+        self.lock_file = self.jobs_file.with_suffix(".json.lock")
+        self.compact_threshold = self.DEFAULT_COMPACT_THRESHOLD
+        # Journal records seen by this process since the last compaction
+        self._journal_records = 0
+        self.lock = FileLock(self.lock_file)
+        self.ensure_exists()
+
+    def ensure_exists(self) -> None:
+        if not self.jobs_file.exists():
+            self.jobs_file.parent.mkdir(parents=True, exist_ok=True)
+            self.jobs_file.write_text("{}")
+
+    def configure(self, config: Mapping[str, Any]) -> None:
+        self.compact_threshold = int(
+            config.get("JOBS_JOURNAL_COMPACT_THRESHOLD", self.DEFAULT_COMPACT_THRESHOLD)
+        )
+
+    @property
+    def location(self) -> Path:
+        return self.jobs_file
+
+    def version(self) -> Optional[Hashable]:
+        jobs_key = _get_file_key(self.jobs_file)
+        if jobs_key is None:
+            return None
+        return (jobs_key, _get_file_key(self.journal_file))
+
+    def write_lock(self) -> ContextManager[None]:
+        return self.lock.exclusive()
+
+    def load(self) -> RawJobs:
+        # The shared lock keeps writers from swapping files mid-read
+        with metrics.time_store(self.name, "load"), self.lock.shared():
+            jobs = self._load_jobs_from_disk()
+            self._journal_records = self._replay_journal(jobs)
+            read = metrics.record_file_size("jobs.json", self.jobs_file)
+            read += metrics.record_file_size("jobs.journal", self.journal_file)
+        metrics.STORE_BYTES.inc(read, backend=self.name, op="read")
+        return jobs
+
+    def save_all(self, jobs: RawJobs) -> Optional[Hashable]:
+        with self.lock.exclusive():
+            self._write_jobs_file(jobs)
+            self._truncate_journal()
+            return self.version()
+
+    def apply(self, changes: List[JobChange], current: Callable[[], RawJobs]) -> Optional[Hashable]:
+        records = []
+        for change in changes:
+            if change.op == JobChange.PUT:
+                records.append({"op": change.op, "zone": change.zone, "job": change.data})
+            else:
+                records.append({"op": change.op, "zone": change.zone, "id": change.job_id})
+
+        with metrics.time_store(self.name, "apply"), self.lock.exclusive():
+            if len(records) >= self.compact_threshold:
+                # A batch this large would be compacted straight away; ``current`` was
+                # built under the caller's write lock, so write it out directly
+                self._write_jobs_file(current())
+                self._truncate_journal()
+                return self.version()
+            self._append_journal(records)
+            self._journal_records += len(records)
+            if self._journal_records >= self.compact_threshold:
+                self._compact()
+            return self.version()
+
+    def compact(self) -> None:
+        """Fold the journal into jobs.json and truncate it."""
+        with self.lock.exclusive():
+            self._compact()
+
+    def _compact(self) -> None:
+        # Rebuild from disk rather than trusting any in-memory copy, which may be
+        # missing records appended by other processes
+        jobs = self._load_jobs_from_disk()
+        count = self._replay_journal(jobs)
+        self._write_jobs_file(jobs)
+        self._truncate_journal()
+        logger.info(f"[JobsStore] Compacted {count} journal records into {self.jobs_file}")
+
+    def _append_journal(self, records: List[Dict[str, Any]]) -> None:
+        """Append records to the journal as JSON lines and fsync them."""
+        payload = "".join(json.dumps(record) + "\n" for record in records).encode("utf-8")
+        fd = os.open(self.journal_file, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            # Start on a fresh line if a previous append was torn by a crash
+            size = os.fstat(fd).st_size
+            if size and os.pread(fd, 1, size - 1) != b"\n":
+                payload = b"\n" + payload
+            os.write(fd, payload)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        metrics.STORE_BYTES.inc(len(payload), backend=self.name, op="write")
+        metrics.record_file_size("jobs.journal", self.journal_file)
+
+    def _truncate_journal(self) -> None:
+        if self.journal_file.exists():
+            with self.journal_file.open("r+b") as f:
+                f.truncate(0)
+                os.fsync(f.fileno())
+        self._journal_records = 0
+
+    def _replay_journal(self, jobs: RawJobs) -> int:
+        """Apply journal records to jobs in place and return how many were read."""
+        try:
+            lines = self.journal_file.read_text(encoding="utf-8").splitlines()
+        except FileNotFoundError:
+            return 0
+
+        # job id -> zone, so each record is applied without scanning every zone
+        zone_of = {job["id"]: zone for zone, job_list in jobs.items() for job in job_list}
+        count = 0
+        for line_no, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping torn journal record at {self.journal_file}:{line_no}")
+                continue
+            count += 1
+            job_id = record["job"]["id"] if record["op"] == JobChange.PUT else record["id"]
+            old_zone = zone_of.pop(job_id, None)
+            old_list = jobs.get(old_zone, []) if old_zone is not None else []
+            position = next((i for i, job in enumerate(old_list) if job["id"] == job_id), None)
+
+            if record["op"] == JobChange.PUT:
+                zone = record["zone"]
+                zone_of[job_id] = zone
+                if old_zone == zone and position is not None:
+                    old_list[position] = record["job"]
+                    continue
+                jobs.setdefault(zone, []).append(record["job"])
+            if position is not None and old_zone is not None:
+                del old_list[position]
+                if not old_list:
+                    del jobs[old_zone]
+        return count
+
+    def _load_jobs_from_disk(self) -> RawJobs:
+        """
+        Loads a valid dictionary from jobs.json or its backup.
+        If both are corrupt, it cleans up and returns an empty dict.
+        """
+        # 1. Try to load the main jobs file
+        if self.jobs_file.exists():
+            try:
+                with self.jobs_file.open("r", encoding="utf-8") as f:
+                    return cast(RawJobs, json.load(f))
+            except json.JSONDecodeError as e:
+                logger.error(f"Jobs file is corrupt: {e}. Attempting recovery from backup.")
+
+        # 2. Main file failed or doesn't exist. Try to load the backup.
+        backup_file = self.jobs_file.with_suffix(".json.bak")
+        if backup_file.exists():
+            logger.info(f"Attempting to restore from backup: {backup_file}")
+            try:
+                with backup_file.open("r", encoding="utf-8") as bf:
+                    data = cast(RawJobs, json.load(bf))
+                logger.info("Successfully loaded data from backup file. Restoring...")
+                self._save_jobs(data)  # Atomically save the good data back
+                return data
+            except json.JSONDecodeError as be:
+                logger.error(f"Backup file is also corrupt: {be}")
+
+        # 3. Both files are corrupt or don't exist.
+        logger.warning("No valid jobs file found. Resetting jobs store.")
+        if self.jobs_file.exists():
+            self.jobs_file.unlink()
+        if backup_file.exists():
+            backup_file.unlink()
+
+        return {}
+
+    def _save_jobs(self, jobs: RawJobs) -> None:
+        """Atomically rewrite jobs.json under the lock file, leaving the journal alone."""
+        with self.lock.exclusive():
+            self._write_jobs_file(jobs)
+
+    def _write_jobs_file(self, jobs: RawJobs) -> None:
+        """
+        Atomically saves jobs to disk using atomic replace to ensure data integrity,
+        keeping the previous version as jobs.json.bak. The caller holds the lock.
+        """
+        temp_file = self.jobs_file.with_suffix(".json.tmp")
+        backup_file = self.jobs_file.with_suffix(".json.bak")
+        start = time.perf_counter()
+        try:
+            # Write to a temporary file first
+            with temp_file.open("w", encoding="utf-8") as f:
+                json.dump(jobs, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+
+            # Atomically create a backup of the current file (if it exists)
+            if self.jobs_file.exists():
+                os.replace(self.jobs_file, backup_file)
+
+            # Atomically replace the main file with the new data
+            os.replace(temp_file, self.jobs_file)
+
+            logger.info(f"[JobsStore] Jobs saved successfully to {self.jobs_file}")
+            end = time.perf_counter()
+            metrics.STORE_SECONDS.observe(end - start, backend=self.name, op="save")
+            profiling.add_span("store:save", start, end, backend=self.name)
+            written = metrics.record_file_size("jobs.json", self.jobs_file)
+            metrics.STORE_BYTES.inc(written, backend=self.name, op="write")
+
+        except Exception as e:
+            logger.error(f"[JobsStore] Error during atomic save: {e}")
+            # Clean up and attempt to restore from backup
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            if os.path.exists(backup_file) and not os.path.exists(self.jobs_file):
+                os.replace(backup_file, self.jobs_file)
+                logger.info(f"Restored jobs from backup {backup_file} due to save error.")
+            raise
+
+
+class SqliteJobsBackend(JobsBackend):
+    """Stores jobs as rows in a WAL-mode SQLite database (jobs.db).
+
+    Every committed change bumps a revision counter in the ``meta`` table, which is
+    what ``version()`` reports. Jobs are returned in insertion order, grouped by zone,
+    so the structure matches what the JSON backend produces.
+    """
+
+    name = "sqlite"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            zone TEXT NOT NULL,
+            days TEXT NOT NULL,
+            time TEXT NOT NULL,
+            action TEXT NOT NULL,
+            args TEXT NOT NULL,
+            label TEXT NOT NULL DEFAULT '',
+            service TEXT NOT NULL DEFAULT 'spotify'
+        );
+        CREATE INDEX IF NOT EXISTS jobs_zone_time ON jobs (zone, time);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+        INSERT OR IGNORE INTO meta (key, value) VALUES ('revision', '0');
+    """
+
+    def __init__(self, app_support_dir: Path) -> None:
+        super().__init__(app_support_dir)
+        self.db_file = self.app_support_dir / "jobs.db"
+        self._local = threading.local()
+        is_new = not self.db_file.exists()
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        self._connect().executescript(self.SCHEMA)
+        if is_new:
+            import_from_json(self)
+
+    @property
+    def location(self) -> Path:
+        return self.db_file
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn: Optional[sqlite3.Connection] = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; transactions are opened explicitly with BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.db_file, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _revision(self, conn: sqlite3.Connection) -> int:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()
+        return int(row[0]) if row else 0
+
+    def version(self) -> Optional[Hashable]:
+        return self._revision(self._connect())
+
+    def load(self) -> RawJobs:
+        with metrics.time_store(self.name, "load"):
+            return self._load_rows()
+
+    def _load_rows(self) -> RawJobs:
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT id, zone, days, time, action, args, label, service FROM jobs ORDER BY rowid"
+        ).fetchall()
+        jobs: RawJobs = {}
+        for job_id, zone, days, job_time, action, args, label, service in rows:
+            jobs.setdefault(zone, []).append(
+                {
+                    "id": job_id,
+                    "zone": zone,
+                    "days": json.loads(days),
+                    "time": job_time,
+                    "action": action,
+                    "args": json.loads(args),
+                    "label": label,
+                    "service": service,
+                }
+            )
+        return jobs
+
+    def _put(self, conn: sqlite3.Connection, zone: str, data: Dict[str, Any]) -> None:
+        # UPSERT keeps the rowid, and therefore the job's position, on update
+        conn.execute(
+            """
+            INSERT INTO jobs (id, zone, days, time, action, args, label, service)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (id) DO UPDATE SET
+                zone = excluded.zone, days = excluded.days, time = excluded.time,
+                action = excluded.action, args = excluded.args, label = excluded.label,
+                service = excluded.service
+            """,
+            (
+                data["id"],
+                zone,
+                json.dumps(data["days"]),
+                data["time"],
+                data["action"],
+                json.dumps(data.get("args", {})),
+                data.get("label", ""),
+                data.get("service", "spotify"),
+            ),
+        )
+
+    def write_lock(self) -> ContextManager[None]:
+        return self._transaction()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        """Hold a write transaction (BEGIN IMMEDIATE); re-entrant within a thread."""
+        conn = self._connect()
+        depth = getattr(self._local, "txn_depth", 0)
+        if depth:
+            self._local.txn_depth = depth + 1
+            try:
+                yield
+            finally:
+                self._local.txn_depth -= 1
+            return
+
+        # Blocks (up to the connection timeout) while another writer holds the database
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.txn_depth = 1
+        try:
+            yield
+        except BaseException:
+            self._local.txn_depth = 0
+            conn.execute("ROLLBACK")
+            raise
+        self._local.txn_depth = 0
+        conn.execute("COMMIT")
+
+    def _write(self, body: Callable[[sqlite3.Connection], None]) -> int:
+        """Run body in a write transaction and bump the revision."""
+        with metrics.time_store(self.name, "save"), self._transaction():
+            conn = self._connect()
+            body(conn)
+            revision = self._revision(conn) + 1
+            conn.execute("UPDATE meta SET value = ? WHERE key = 'revision'", (str(revision),))
+        return revision
+
+    def save_all(self, jobs: RawJobs) -> Optional[Hashable]:
+        def replace_all(conn: sqlite3.Connection) -> None:
+            conn.execute("DELETE FROM jobs")
+            for zone, job_list in jobs.items():
+                for data in job_list:
+                    self._put(conn, zone, data)
+
+        return self._write(replace_all)
+
+    def apply(self, changes: List[JobChange], current: Callable[[], RawJobs]) -> Optional[Hashable]:
+        def apply_rows(conn: sqlite3.Connection) -> None:
+            for change in changes:
+                if change.op == JobChange.PUT:
+                    assert change.data is not None
+                    self._put(conn, change.zone, change.data)
+                else:
+                    conn.execute(
+                        "DELETE FROM jobs WHERE id = ? AND zone = ?", (change.job_id, change.zone)
+                    )
+
+        return self._write(apply_rows)
+
+
+def import_from_json(backend: JobsBackend) -> int:
+    """One-shot import of an existing jobs.json (or its .bak) into ``backend``.
+
+    Returns the number of jobs imported. Does nothing if there is no jobs.json or
+    jobs.json.bak in the backend's app support directory.
+    """
+    jobs_file = backend.app_support_dir / "jobs.json"
+    if not jobs_file.exists() and not jobs_file.with_suffix(".json.bak").exists():
+        return 0
+    jobs = JsonJobsBackend(backend.app_support_dir).load()
+    backend.save_all(jobs)
+    count = sum(len(job_list) for job_list in jobs.values())
+    logger.info(f"Imported {count} jobs from {jobs_file} into {backend.name} backend")
+    return count
+
+
+BACKENDS = {
+    JsonJobsBackend.name: JsonJobsBackend,
+    SqliteJobsBackend.name: SqliteJobsBackend,
+}
+
+# One backend instance per (name, directory) so connections and state are reused
+_backends: Dict[Tuple[str, Path], JobsBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(name: str, app_support_dir: Path) -> JobsBackend:
+    """Return the shared backend instance for ``name`` in ``app_support_dir``.
+
+    Raises:
+        ValueError: If ``name`` is not a known backend
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown jobs backend '{name}'. Must be one of: {sorted(BACKENDS)}")
+    key = (name, Path(app_support_dir))
+    with _backends_lock:
+        backend = _backends.get(key)
+        if backend is None:
+            backend = BACKENDS[name](Path(app_support_dir))
+            _backends[key] = backend
+        return backend
@@ -2,14 +2,17 @@
 
 import json
 import logging
-import os
-import time
+import threading
 from pathlib import Path
-from typing import Any, Dict, List, Optional, cast
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
 from uuid import uuid4
 
 from flask import current_app, has_app_context
 
+from . import metrics, profiling
+from .changefeed import change_feed
+from .jobs_backends import DEFAULT_BACKEND, JobChange, JobsBackend, RawJobs, get_backend
+
 logger = logging.getLogger(__name__)
 
 
@@ -64,10 +67,207 @@ class Job:
         )
 
 
+class _JobsSnapshot:
+    """Parsed, migrated contents of one version of the stored jobs.
+
+    Alongside the per-zone job lists it keeps two secondary indexes so lookups and
+    conflict checks never scan:
+
+    - ``by_id``: job id -> (zone, position in that zone's list)
+    - ``slots``: (zone, time, weekday) -> id of the job occupying that slot
+    """
+
+    def __init__(self, key: Optional[Hashable], jobs: Dict[str, List[Job]]) -> None:
+        self.key = key
+        self.jobs = jobs
+        self.by_id: Dict[str, Tuple[str, int]] = {}
+        self.slots: Dict[Tuple[str, str, int], str] = {}
+        for zone, job_list in jobs.items():
+            for position, job in enumerate(job_list):
+                self.by_id[job.id] = (zone, position)
+                self._claim_slots(zone, job)
+
+    @classmethod
+    def from_raw(cls, key: Optional[Hashable], raw: RawJobs) -> "_JobsSnapshot":
+        """Build a snapshot from the raw JSON structure."""
+        jobs = {
+            zone: [Job.from_dict(job_data) for job_data in job_list]
+            for zone, job_list in raw.items()
+        }
+        return cls(key, jobs)
+
+    def copy(self) -> "_JobsSnapshot":
+        """Return a copy that can be edited without affecting this snapshot.
+
+        The zone lists and indexes are copied; the Job objects are shared, which is
+        safe because edits replace jobs rather than modifying them.
+        """
+        clone = _JobsSnapshot(self.key, {})
+        clone.jobs = {zone: list(job_list) for zone, job_list in self.jobs.items()}
+        clone.by_id = dict(self.by_id)
+        clone.slots = dict(self.slots)
+        return clone
+
+    def to_raw(self) -> RawJobs:
+        """Convert the snapshot back into the raw JSON structure."""
+        return {zone: [job.to_dict() for job in job_list] for zone, job_list in self.jobs.items()}
+
+    def _claim_slots(self, zone: str, job: Job) -> None:
+        for day in job.days:
+            self.slots[(zone, job.time, day)] = job.id
+
+    def _release_slots(self, zone: str, job: Job) -> None:
+        for day in job.days:
+            if self.slots.get((zone, job.time, day)) == job.id:
+                del self.slots[(zone, job.time, day)]
+
+    def zone_of(self, job_id: str) -> Optional[str]:
+        """Return the zone a job is stored under, if present."""
+        location = self.by_id.get(job_id)
+        return location[0] if location else None
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return the job with the given id, if present."""
+        location = self.by_id.get(job_id)
+        if location is None:
+            return None
+        zone, position = location
+        return self.jobs[zone][position]
+
+    def find_conflict(self, job: Job) -> Optional[str]:
+        """Return the id of another job in the same zone/time on an overlapping day."""
+        for day in job.days:
+            other_id = self.slots.get((job.zone, job.time, day))
+            if other_id is not None and other_id != job.id:
+                return other_id
+        return None
+
+    def add(self, job: Job) -> None:
+        """Append a job to its zone."""
+        zone_jobs = self.jobs.setdefault(job.zone, [])
+        self.by_id[job.id] = (job.zone, len(zone_jobs))
+        zone_jobs.append(job)
+        self._claim_slots(job.zone, job)
+
+    def replace(self, job: Job) -> None:
+        """Replace the job with the same id, keeping its zone and position."""
+        zone, position = self.by_id[job.id]
+        self._release_slots(zone, self.jobs[zone][position])
+        self.jobs[zone][position] = job
+        self._claim_slots(zone, job)
+
+    def remove(self, job_id: str) -> Job:
+        """Remove a job, dropping its zone once empty."""
+        zone, position = self.by_id.pop(job_id)
+        zone_jobs = self.jobs[zone]
+        job = zone_jobs.pop(position)
+        self._release_slots(zone, job)
+        # Only positions after the removed job shift, and only within this zone
+        for later_position in range(position, len(zone_jobs)):
+            self.by_id[zone_jobs[later_position].id] = (zone, later_position)
+        if not zone_jobs:
+            del self.jobs[zone]
+        return job
+
+
+class JobOperation:
+    """One create, update or delete in a batch passed to ``JobsStore.apply_batch``.
+
+    For updates ``zone`` is the zone the job is currently stored under; the job is
+    moved if ``job.zone`` differs.
+    """
+
+    ADD = "add"
+    UPDATE = "update"
+    DELETE = "delete"
+
+    def __init__(self, op: str, zone: str, job_id: str, job: Optional[Job] = None) -> None:
+        self.op = op
+        self.zone = zone
+        self.job_id = job_id
+        self.job = job
+
+    @classmethod
+    def add(cls, job: Job) -> "JobOperation":
+        return cls(cls.ADD, job.zone, job.id, job)
+
+    @classmethod
+    def update(cls, zone: str, job: Job) -> "JobOperation":
+        return cls(cls.UPDATE, zone, job.id, job)
+
+    @classmethod
+    def delete(cls, zone: str, job_id: str) -> "JobOperation":
+        return cls(cls.DELETE, zone, job_id)
+
+
+class _BatchRejected(Exception):
+    """Raised inside an atomic batch to discard it after an operation failed."""
+
+
+def _apply_operation(snapshot: _JobsSnapshot, operation: JobOperation) -> List[JobChange]:
+    """Validate one operation against the snapshot, apply it and return its changes."""
+    if operation.op == JobOperation.ADD:
+        job = operation.job
+        assert job is not None
+        if job.id in snapshot.by_id:
+            raise ValueError(f"Conflict: Job {job.id} already exists")
+        # Validate no conflicts (same time + overlapping days in same zone)
+        if snapshot.find_conflict(job) is not None:
+            raise ValueError(
+                f"Conflict: Job at {job.time} already exists for overlapping days in {job.zone}"
+            )
+        snapshot.add(job)
+        return [JobChange.put(job.zone, job.to_dict())]
+
+    if operation.zone not in snapshot.jobs:
+        raise ValueError(f"Zone {operation.zone} not found")
+    if snapshot.zone_of(operation.job_id) != operation.zone:
+        raise ValueError(f"Job {operation.job_id} not found in zone {operation.zone}")
+
+    if operation.op == JobOperation.DELETE:
+        snapshot.remove(operation.job_id)
+        return [JobChange.delete(operation.zone, operation.job_id)]
+
+    job = operation.job
+    assert job is not None
+    # Validate no conflicts with other jobs
+    if snapshot.find_conflict(job) is not None:
+        raise ValueError(f"Conflict: Job at {job.time} already exists for overlapping days")
+    if job.zone == operation.zone:
+        snapshot.replace(job)
+        return [JobChange.put(job.zone, job.to_dict())]
+    snapshot.remove(job.id)
+    snapshot.add(job)
+    # A move is a delete from the old zone plus a put, so feed consumers keyed on
+    # (zone, id) drop the old copy
+    return [JobChange.delete(operation.zone, job.id), JobChange.put(job.zone, job.to_dict())]
+
+
+# Process-wide snapshot cache shared by every JobsStore, keyed by backend location
+_snapshot_cache: Dict[Path, _JobsSnapshot] = {}
+_snapshot_lock = threading.Lock()
+# Serializes in-process mutations
+_write_lock = threading.RLock()
+
+
 class JobsStore:
-    """Manages job persistence to JSON file."""
+    """Manages job persistence through a pluggable storage backend.
+
+    The backend is picked by the ``JOBS_BACKEND`` app config key ("json" by default,
+    or "sqlite"); see ``app/jobs_backends.py``.
+
+    Reads are served from a process-wide snapshot cache that is revalidated against the
+    backend's version token (the file's (inode, mtime, size) for jobs.json) on every
+    access, so jobs are only re-parsed when storage actually changed. The cached Job
+    objects are shared between callers and must be treated as read-only.
+    """
 
-    def __init__(self, app_support_dir: Optional[Path] = None) -> None:
+    def __init__(
+        self, app_support_dir: Optional[Path] = None, backend: Optional[JobsBackend] = None
+    ) -> None:
+        backend_name = DEFAULT_BACKEND
+        if has_app_context():
+            backend_name = current_app.config.get("JOBS_BACKEND", DEFAULT_BACKEND)
         if app_support_dir is None and has_app_context():
             app_support_dir = current_app.config["APP_SUPPORT_DIR"]
         elif app_support_dir is None:
@@ -76,10 +276,8 @@ class JobsStore:
             app_support_dir.mkdir(parents=True, exist_ok=True)
 
         self.jobs_file = Path(app_support_dir) / "jobs.json"
-        self.lock_file = self.jobs_file.with_suffix(".json.lock")
-        if not self.jobs_file.exists():
-            self.jobs_file.parent.mkdir(parents=True, exist_ok=True)
-            self.jobs_file.write_text("{}")
+        self.backend = backend or get_backend(backend_name, Path(app_support_dir))
+        self.backend.ensure_exists()
 
     def _get_jobs_file_path(self) -> Path:
         """Get path to jobs.json file."""
@@ -91,9 +289,29 @@ class JobsStore:
             self.jobs_file.write_text(json.dumps({}))
             logger.info(f"Created jobs file: {self.jobs_file}")
 
-    def _load_and_migrate_jobs(self) -> Dict[str, List[Dict[str, Any]]]:
-        """Loads jobs from disk and runs any necessary data migrations."""
-        jobs = self._load_jobs_from_disk()
+    @profiling.traced("store:snapshot")
+    def _get_snapshot(self) -> _JobsSnapshot:
+        """Return the cached snapshot, re-loading only if the backend's version changed."""
+        location = self.backend.location
+        key = self.backend.version()
+        with _snapshot_lock:
+            snapshot = _snapshot_cache.get(location)
+        if snapshot is not None and key is not None and snapshot.key == key:
+            metrics.cache_lookup("jobs_snapshot", True)
+            return snapshot
+        metrics.cache_lookup("jobs_snapshot", False)
+
+        # Version before reading: if storage changes mid-read, the stale key forces a reload
+        raw = self._load_and_migrate_jobs()
+        snapshot = _JobsSnapshot.from_raw(key, raw)
+        if key is not None:
+            with _snapshot_lock:
+                _snapshot_cache[location] = snapshot
+        return snapshot
+
+    def _load_and_migrate_jobs(self) -> RawJobs:
+        """Loads jobs from the backend and runs any necessary data migrations."""
+        jobs = self.backend.load()
 
         # --- Migration Section ---
         changed = False
@@ -105,212 +323,141 @@ class JobsStore:
 
         if changed:
             logger.info("Migrated old jobs to include 'service' field. Saving.")
-            self._save_jobs(jobs)
+            self.backend.save_all(jobs)
 
         return jobs
 
-    def _load_jobs_from_disk(self) -> Dict[str, List[Dict[str, Any]]]:
-        """
-        Loads a valid dictionary from jobs.json or its backup.
-        If both are corrupt, it cleans up and returns an empty dict.
-        """
-        # 1. Try to load the main jobs file
-        if self.jobs_file.exists():
-            try:
-                with self.jobs_file.open("r", encoding="utf-8") as f:
-                    return cast(Dict[str, List[Dict[str, Any]]], json.load(f))
-            except json.JSONDecodeError as e:
-                logger.error(f"Jobs file is corrupt: {e}. Attempting recovery from backup.")
-
-        # 2. Main file failed or doesn't exist. Try to load the backup.
-        backup_file = self.jobs_file.with_suffix(".json.bak")
-        if backup_file.exists():
-            logger.info(f"Attempting to restore from backup: {backup_file}")
-            try:
-                with backup_file.open("r", encoding="utf-8") as bf:
-                    data = cast(Dict[str, List[Dict[str, Any]]], json.load(bf))
-                logger.info("Successfully loaded data from backup file. Restoring...")
-                self._save_jobs(data)  # Atomically save the good data back
-                return data
-            except json.JSONDecodeError as be:
-                logger.error(f"Backup file is also corrupt: {be}")
-
-        # 3. Both files are corrupt or don't exist.
-        logger.warning("No valid jobs file found. Resetting jobs store.")
-        if self.jobs_file.exists():
-            self.jobs_file.unlink()
-        if backup_file.exists():
-            backup_file.unlink()
-
-        return {}
-
-    def _save_jobs(self, jobs: Dict[str, List[Dict[str, Any]]]) -> None:
-        """
-        Atomically saves jobs to disk using a file lock and atomic replace to ensure
-        data integrity and prevent race conditions. Includes stale lock detection
-        and recovery to handle orphaned locks from crashes.
+    def _mutate(self, mutate: Callable[[_JobsSnapshot], List[JobChange]]) -> None:
+        """Apply and persist a change under the backend's write lock.
+
+        ``mutate`` receives a private copy of the snapshot that is current as of the
+        lock being taken, validates against it, edits it and returns the row-level
+        changes to persist. The copy replaces the cached snapshot only once the
+        changes are committed, so concurrent readers never see uncommitted jobs and a
+        rejected mutation leaves the cache untouched.
         """
-        timeout = 5.0  # 5-second timeout to acquire the lock
-        stale_lock_threshold = 10.0  # 10 seconds before considering a lock stale
-        start_time = time.time()
-        lock_fd = -1
-
-        # 1. Acquire an exclusive lock
-        while True:
-            try:
-                # Atomically create the lock file. Fails if it already exists.
-                lock_fd = os.open(self.lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
-                break  # Lock acquired
-            except FileExistsError:
-                # Check if the lock file is stale (leftover from a crash)
-                if self.lock_file.exists():
-                    lock_age = time.time() - self.lock_file.stat().st_mtime
-                    if lock_age > stale_lock_threshold:
-                        logger.warning(
-                            f"Breaking stale lock file: {self.lock_file} (age: {lock_age:.1f}s)"
-                        )
-                        try:
-                            self.lock_file.unlink()
-                        except OSError as e:
-                            logger.error(f"Failed to remove stale lock file: {e}")
-                        # Continue to retry acquiring the lock
-                        continue
-
-                if time.time() - start_time > timeout:
-                    raise TimeoutError(
-                        f"Could not acquire lock on {self.lock_file} within {timeout}s"
-                    )
-                time.sleep(0.1)  # Wait and retry
-
-        # 2. Perform the atomic write operation inside a try...finally block
-        try:
-            temp_file = self.jobs_file.with_suffix(".json.tmp")
-            backup_file = self.jobs_file.with_suffix(".json.bak")
-
-            # Write to a temporary file first
-            with temp_file.open("w", encoding="utf-8") as f:
-                json.dump(jobs, f, indent=2)
-
-            # Atomically create a backup of the current file (if it exists)
-            if self.jobs_file.exists():
-                os.replace(self.jobs_file, backup_file)
-
-            # Atomically replace the main file with the new data
-            os.replace(temp_file, self.jobs_file)
-
-            logger.info(f"[JobsStore] Jobs saved successfully to {self.jobs_file}")
-
-        except Exception as e:
-            logger.error(f"[JobsStore] Error during atomic save: {e}")
-            # Clean up and attempt to restore from backup
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
-            if os.path.exists(backup_file) and not os.path.exists(self.jobs_file):
-                os.replace(backup_file, self.jobs_file)
-                logger.info(f"Restored jobs from backup {backup_file} due to save error.")
-            raise
-        finally:
-            # 3. Always release the lock
-            if lock_fd != -1:
-                os.close(lock_fd)
-                os.remove(self.lock_file)
+        location = self.backend.location
+        with metrics.lock_wait(_write_lock, "jobs_store"):
+            with self.backend.write_lock():
+                snapshot = self._get_snapshot().copy()
+                changes = mutate(snapshot)
+                if not changes:
+                    return
+                try:
+                    snapshot.key = self.backend.apply(changes, snapshot.to_raw)
+                except Exception:
+                    # Storage may be partly written; force a reload
+                    with _snapshot_lock:
+                        _snapshot_cache.pop(location, None)
+                    raise
+                with _snapshot_lock:
+                    _snapshot_cache[location] = snapshot
+                change_feed.publish_job_changes(location, changes, snapshot.key)
 
     def get_jobs_for_zone(self, zone: str) -> List[Job]:
         """Get all jobs for a specific zone."""
-        all_jobs = self._load_and_migrate_jobs()
-        zone_jobs = all_jobs.get(zone, [])
-        return [Job.from_dict(job_data) for job_data in zone_jobs]
+        return list(self._get_snapshot().jobs.get(zone, []))
 
     def get_all_jobs(self) -> Dict[str, List[Job]]:
         """Get all jobs organized by zone."""
-        all_jobs = self._load_and_migrate_jobs()
-        result = {}
-        for zone, job_list in all_jobs.items():
-            result[zone] = [Job.from_dict(job_data) for job_data in job_list]
-        return result
+        return {zone: list(job_list) for zone, job_list in self._get_snapshot().jobs.items()}
+
+    def get_version(self) -> Optional[Hashable]:
+        """Return a token that changes whenever the stored jobs change (None if unknown)."""
+        return self._get_snapshot().key
+
+    def get_all_jobs_versioned(self) -> Tuple[Optional[Hashable], Dict[str, List[Job]]]:
+        """Get all jobs organized by zone, with the version token they were read at."""
+        snapshot = self._get_snapshot()
+        return snapshot.key, {zone: list(job_list) for zone, job_list in snapshot.jobs.items()}
+
+    def get_job(self, zone: str, job_id: str) -> Optional[Job]:
+        """Get a single job by id, or None if it isn't in the given zone."""
+        snapshot = self._get_snapshot()
+        if snapshot.zone_of(job_id) != zone:
+            return None
+        return snapshot.get(job_id)
 
     def add_job(self, job: Job) -> None:
         """Add a new job."""
         logger.info(f"[JobsStore] add_job called with job: {job.to_dict()}")
-        all_jobs = self._load_and_migrate_jobs()
-        logger.info(f"[JobsStore] add_job loaded jobs: {all_jobs}")
 
-        # Validate no conflicts (same time + overlapping days in same zone)
-        existing_jobs = self.get_jobs_for_zone(job.zone)
-        for existing in existing_jobs:
-            if existing.time == job.time and set(existing.days) & set(job.days):
-                raise ValueError(
-                    f"Conflict: Job at {job.time} already exists for overlapping days in {job.zone}"
-                )
-
-        # Add job
-        if job.zone not in all_jobs:
-            all_jobs[job.zone] = []
-            logger.info(f"Created new zone: {job.zone}")
-
-        all_jobs[job.zone].append(job.to_dict())
-        logger.info(
-            f"[JobsStore] add_job: Added job {job.id} to zone {job.zone}. "
-            f"Zone now has {len(all_jobs[job.zone])} jobs"
-        )
-
-        self._save_jobs(all_jobs)
+        def add(snapshot: _JobsSnapshot) -> List[JobChange]:
+            new_zone = job.zone not in snapshot.jobs
+            changes = _apply_operation(snapshot, JobOperation.add(job))
+            if new_zone:
+                logger.info(f"Created new zone: {job.zone}")
+            logger.info(
+                f"[JobsStore] add_job: Added job {job.id} to zone {job.zone}. "
+                f"Zone now has {len(snapshot.jobs[job.zone])} jobs"
+            )
+            return changes
+
+        self._mutate(add)
         logger.info(f"[JobsStore] add_job: Saved jobs after adding job {job.id}")
-        logger.info(f"[JobsStore] add_job: Added job {job.id} for zone {job.zone}")
 
-    def update_job(self, job: Job) -> None:
-        """Update an existing job."""
+    def update_job(self, job: Job, zone: Optional[str] = None) -> None:
+        """Update an existing job.
+
+        ``zone`` is the zone the job is currently stored under (``job.zone`` by
+        default); if it differs from ``job.zone`` the job is moved in the same commit.
+        """
         logger.info(f"[JobsStore] update_job called with job: {job.to_dict()}")
-        all_jobs = self._load_and_migrate_jobs()
-        logger.info(f"[JobsStore] update_job loaded jobs: {all_jobs}")
-
-        if job.zone not in all_jobs:
-            raise ValueError(f"Zone {job.zone} not found")
-
-        # Find and update job
-        zone_jobs = all_jobs[job.zone]
-        for i, existing_job in enumerate(zone_jobs):
-            if existing_job["id"] == job.id:
-                # Validate no conflicts with other jobs
-                for j, other_job in enumerate(zone_jobs):
-                    if (
-                        i != j
-                        and other_job["time"] == job.time
-                        and set(other_job["days"]) & set(job.days)
-                    ):
-                        raise ValueError(
-                            f"Conflict: Job at {job.time} already exists for overlapping days"
-                        )
-
-                zone_jobs[i] = job.to_dict()
-                logger.info(f"[JobsStore] update_job: Updated job {job.id}")
-                self._save_jobs(all_jobs)
-                logger.info(f"[JobsStore] update_job: Saved jobs after updating job {job.id}")
-                return
-
-        raise ValueError(f"Job {job.id} not found in zone {job.zone}")
+        current_zone = zone if zone is not None else job.zone
+
+        def update(snapshot: _JobsSnapshot) -> List[JobChange]:
+            changes = _apply_operation(snapshot, JobOperation.update(current_zone, job))
+            logger.info(f"[JobsStore] update_job: Updated job {job.id}")
+            return changes
+
+        self._mutate(update)
+        logger.info(f"[JobsStore] update_job: Saved jobs after updating job {job.id}")
 
     def delete_job(self, zone: str, job_id: str) -> None:
         """Delete a job."""
         logger.info(f"[JobsStore] delete_job called with zone: {zone}, job_id: {job_id}")
-        all_jobs = self._load_and_migrate_jobs()
-        logger.info(f"[JobsStore] delete_job loaded jobs: {all_jobs}")
-
-        if zone not in all_jobs:
-            raise ValueError(f"Zone {zone} not found")
-
-        zone_jobs = all_jobs[zone]
-        for i, job in enumerate(zone_jobs):
-            if job["id"] == job_id:
-                del zone_jobs[i]
-                if not zone_jobs:
-                    del all_jobs[zone]
-                logger.info(f"[JobsStore] delete_job: Deleted job {job_id} from zone {zone}")
-                self._save_jobs(all_jobs)
-                logger.info(f"[JobsStore] delete_job: Saved jobs after deleting job {job_id}")
-                return
-
-        raise ValueError(f"Job {job_id} not found in zone {zone}")
+
+        def delete(snapshot: _JobsSnapshot) -> List[JobChange]:
+            changes = _apply_operation(snapshot, JobOperation.delete(zone, job_id))
+            logger.info(f"[JobsStore] delete_job: Deleted job {job_id} from zone {zone}")
+            return changes
+
+        self._mutate(delete)
+        logger.info(f"[JobsStore] delete_job: Saved jobs after deleting job {job_id}")
+
+    def apply_batch(
+        self, operations: List[JobOperation], atomic: bool = True
+    ) -> List[Optional[str]]:
+        """Apply many operations under one lock and persist them in a single commit.
+
+        Operations are checked in order against the indexed snapshot, so later ones
+        see the effect of earlier ones (e.g. two creates in the same slot conflict).
+        Returns one entry per operation: None if it succeeded, else the error
+        message. With ``atomic`` nothing is persisted unless every operation succeeds;
+        otherwise the failures are skipped and the rest are committed.
+        """
+        errors: List[Optional[str]] = []
+
+        def batch(snapshot: _JobsSnapshot) -> List[JobChange]:
+            changes: List[JobChange] = []
+            for operation in operations:
+                try:
+                    changes.extend(_apply_operation(snapshot, operation))
+                    errors.append(None)
+                except ValueError as e:
+                    errors.append(str(e))
+            if atomic and any(errors):
+                raise _BatchRejected()
+            return changes
+
+        try:
+            self._mutate(batch)
+        except _BatchRejected:
+            logger.info(f"[JobsStore] apply_batch: Rejected batch of {len(operations)} operations")
+            return errors
+        applied = sum(1 for error in errors if error is None)
+        logger.info(f"[JobsStore] apply_batch: Saved {applied} of {len(operations)} operations")
+        return errors
 
     def create_job_id(self) -> str:
         """Generate a unique job ID."""
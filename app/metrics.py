@@ -0,0 +1,372 @@
+"""In-process metrics for AirCron's hot paths, served at ``/metrics``.
+
+A small Prometheus-compatible registry (text exposition format 0.0.4) with no
+extra dependency. The metrics below are updated from ``cronblock``,
+``jobs_store``/``jobs_backends``, ``speakers``, ``response_cache``, the services
+and the executor:
+
+- ``aircron_subprocess_duration_seconds{command}`` and
+  ``aircron_subprocess_failures_total{command}``: every tool AirCron runs
+  (``crontab -l``, ``osascript``, ``aircron_run.sh``, ...) through
+  ``run_subprocess``. The histogram's ``_count`` is the invocation count.
+- ``aircron_lock_wait_seconds{lock}``: time spent waiting for the jobs file lock,
+  the in-process jobs write lock and the crontab snapshot lock.
+- ``aircron_store_operation_duration_seconds{backend,op}``,
+  ``aircron_store_bytes_total{backend,op}`` and ``aircron_store_file_bytes{file}``:
+  jobs storage load/save latency, bytes read and written and file sizes.
+- ``aircron_cache_requests_total{cache,result}``: hits and misses of the jobs
+  snapshot, crontab snapshot, compiled cron line, speaker, Airfoil status and
+  response caches; the hit ratio is ``hit / (hit + miss)``.
+- ``aircron_http_request_duration_seconds{method,route,status}``: per-route
+  request latency, labelled by the route's rule rather than the raw path.
+
+Updating a metric is a dict lookup and a bisect under a per-metric lock, cheap
+enough to leave on; ``METRICS_ENABLED = False`` drops the endpoint and the
+request hooks.
+"""
+
+import bisect
+import os
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+from flask import Flask, Response, g, request
+
+from . import profiling
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LOCK_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+LabelValues = Tuple[str, ...]
+M = TypeVar("M", bound="Metric")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """A named metric family with a fixed set of label names."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """A monotonically increasing count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Gauge(Counter):
+    """A value per label set that can go up and down."""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    """Observations counted into fixed buckets, with their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last is +Inf), sum]
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        """Observe how long the ``with`` block takes, in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: Any) -> int:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return sum(entry[0]) if entry else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(
+                (key, (list(counts), total[0])) for key, (counts, total) in self._values.items()
+            )
+        lines = []
+        bounds = [*self.buckets, float("inf")]
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                labels = _format_labels((*self.labelnames, "le"), (*key, _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Registry:
+    """The set of metrics rendered at ``/metrics``."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: M) -> M:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        """Reset every metric's values (for tests)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.clear()
+
+
+REGISTRY = Registry()
+
+SUBPROCESS_SECONDS = REGISTRY.register(
+    Histogram(
+        "aircron_subprocess_duration_seconds",
+        "Time spent running external tools, by command.",
+        ["command"],
+    )
+)
+SUBPROCESS_FAILURES = REGISTRY.register(
+    Counter(
+        "aircron_subprocess_failures_total",
+        "External tool runs that exited non-zero, timed out or failed to start.",
+        ["command"],
+    )
+)
+LOCK_WAIT_SECONDS = REGISTRY.register(
+    Histogram(
+        "aircron_lock_wait_seconds",
+        "Time spent waiting to acquire a lock.",
+        ["lock"],
+        buckets=LOCK_BUCKETS,
+    )
+)
+STORE_SECONDS = REGISTRY.register(
+    Histogram(
+        "aircron_store_operation_duration_seconds",
+        "Jobs storage load and save latency.",
+        ["backend", "op"],
+    )
+)
+STORE_BYTES = REGISTRY.register(
+    Counter(
+        "aircron_store_bytes_total",
+        "Bytes read from or written to jobs storage.",
+        ["backend", "op"],
+    )
+)
+STORE_FILE_BYTES = REGISTRY.register(
+    Gauge("aircron_store_file_bytes", "Size of jobs storage files.", ["file"])
+)
+CACHE_REQUESTS = REGISTRY.register(
+    Counter(
+        "aircron_cache_requests_total",
+        "Cache lookups by cache and result (hit or miss).",
+        ["cache", "result"],
+    )
+)
+HTTP_REQUEST_SECONDS = REGISTRY.register(
+    Histogram(
+        "aircron_http_request_duration_seconds",
+        "HTTP request latency by route.",
+        ["method", "route", "status"],
+    )
+)
+
+
+def cache_lookup(cache: str, hit: bool) -> None:
+    """Count one lookup in a named cache."""
+    result = "hit" if hit else "miss"
+    CACHE_REQUESTS.inc(cache=cache, result=result)
+    profiling.count(f"cache:{cache}:{result}")
+
+
+@contextmanager
+def lock_wait(lock: Any, name: str) -> Iterator[None]:
+    """Acquire ``lock`` for the ``with`` block, recording how long acquiring took."""
+    start = time.perf_counter()
+    with lock:
+        acquired = time.perf_counter()
+        LOCK_WAIT_SECONDS.observe(acquired - start, lock=name)
+        profiling.add_span(f"lock:{name}", start, acquired)
+        yield
+
+
+@contextmanager
+def time_store(backend: str, op: str) -> Iterator[None]:
+    """Time a jobs storage operation, in the metrics and in the request's profile."""
+    with STORE_SECONDS.time(backend=backend, op=op), profiling.span(f"store:{op}", backend=backend):
+        yield
+
+
+def record_file_size(name: str, path: Any) -> int:
+    """Set and return a storage file's size gauge (0 if the file is missing)."""
+    try:
+        size = os.stat(path).st_size
+    except OSError:
+        size = 0
+    STORE_FILE_BYTES.set(size, file=name)
+    return size
+
+
+def run_subprocess(
+    cmd: Sequence[str], label: Optional[str] = None, **kwargs: Any
+) -> "subprocess.CompletedProcess[Any]":
+    """``subprocess.run`` that records the run's duration and failures.
+
+    ``label`` names the command in the metrics (default: the executable's name).
+    """
+    command = label or os.path.basename(str(cmd[0]))
+    with profiling.span(f"subprocess:{command}", argv=profiling.argv_text(cmd)) as span:
+        start = time.perf_counter()
+        try:
+            result = subprocess.run(cmd, **kwargs)
+        except (OSError, subprocess.SubprocessError) as e:
+            SUBPROCESS_FAILURES.inc(command=command)
+            if span is not None:
+                span.attrs["error"] = str(e)
+            raise
+        finally:
+            SUBPROCESS_SECONDS.observe(time.perf_counter() - start, command=command)
+        if span is not None:
+            span.attrs["returncode"] = result.returncode
+    if result.returncode != 0:
+        SUBPROCESS_FAILURES.inc(command=command)
+    return result
+
+
+def init_app(app: Flask) -> None:
+    """Time every request and serve the registry at ``/metrics``."""
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+
+    @app.before_request
+    def _start_timer() -> None:
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _observe_request(response: Response) -> Response:
+        start = g.pop("metrics_start", None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                method=request.method,
+                route=route,
+                status=response.status_code,
+            )
+        return response
+
+    def metrics_view() -> Response:
+        return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+    app.add_url_rule("/metrics", "metrics", metrics_view, methods=["GET"])
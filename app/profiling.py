@@ -0,0 +1,459 @@
+"""Opt-in per-request profiling: span trees, slow-request log and cProfile capture.
+
+With ``PROFILING_ENABLED`` every request records a tree of spans::
+
+    request:GET /
+      speakers:list
+      store:snapshot
+        store:load            backend=json
+      cron:snapshot
+        lock:crontab
+        cron:read_crontab
+          subprocess:crontab -l   argv=crontab -l  returncode=0
+      template:index.html
+
+Spans come from the service modules (every public function), the jobs store,
+the cron manager, speaker discovery, template rendering, lock waits and every
+tool run through ``metrics.run_subprocess``, which notes the command line and
+exit code. Cache lookups are counted per request. Each trace is summarized as
+self time per span category (``subprocess``, ``store``, ``template``, ...),
+which is also sent as a ``Server-Timing`` header.
+
+Requests slower than ``PROFILING_SLOW_MS`` are kept in a ring buffer of the last
+``PROFILING_KEEP``: ``GET /debug/requests`` lists them and
+``GET /debug/requests/<id>`` returns one span tree.
+
+Adding ``?_profile=pstats`` or ``?_profile=collapsed`` to any URL runs that
+request under cProfile and returns the profile instead of the response: a pstats
+dump (``python -m pstats``, snakeviz) or collapsed stacks (flamegraph.pl,
+speedscope) in microseconds, with each function's time split over its callers.
+Only one capture runs at a time; another ``?_profile=`` request meanwhile gets a
+409. From Python 3.12 cProfile is process-wide, so a capture also includes
+whatever other request threads run while it is open.
+
+When profiling is off (or outside a traced request) spans cost a thread-local
+lookup.
+"""
+
+import cProfile
+import functools
+import inspect
+import itertools
+import logging
+import os
+import pstats
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from types import ModuleType
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple, TypeVar, cast
+
+from flask import (
+    Flask,
+    Response,
+    abort,
+    before_render_template,
+    jsonify,
+    request,
+    template_rendered,
+)
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+PROFILE_FORMATS = ("pstats", "collapsed")
+# Longest argv recorded on a subprocess span (AppleScript programs can be long)
+MAX_ARGV_CHARS = 200
+# Deepest caller chain written to a collapsed-stack profile
+MAX_STACK_DEPTH = 64
+
+# Held for the duration of a ?_profile= capture; cProfile allows one at a time
+_capture_lock = threading.Lock()
+
+_local = threading.local()
+_ids = itertools.count(1)
+
+
+class Span:
+    """One timed operation within a request, with the operations it called."""
+
+    __slots__ = ("name", "attrs", "start", "end", "children")
+
+    def __init__(self, name: str, attrs: Dict[str, Any], start: Optional[float] = None) -> None:
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter() if start is None else start
+        self.end: Optional[float] = None
+        self.children: List["Span"] = []
+
+    @property
+    def category(self) -> str:
+        return self.name.split(":", 1)[0]
+
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def self_time(self) -> float:
+        return max(0.0, self.duration() - sum(child.duration() for child in self.children))
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(self.duration() * 1000, 3),
+            **({"attrs": self.attrs} if self.attrs else {}),
+            "children": [child.to_dict(origin) for child in self.children],
+        }
+
+
+class Trace:
+    """The span tree and cache counters recorded for one request."""
+
+    def __init__(self, method: str, path: str) -> None:
+        self.id = next(_ids)
+        self.method = method
+        self.path = path
+        self.route = ""
+        self.status = 0
+        self.started_at = time.time()
+        self.root = Span(f"request:{method} {path}", {})
+        self.stack: List[Span] = [self.root]
+        self.counters: Dict[str, int] = {}
+
+    def finish(self) -> None:
+        now = time.perf_counter()
+        # Spans left open by an exception end with the request
+        for span in self.stack:
+            if span.end is None:
+                span.end = now
+        self.stack = []
+
+    def duration_ms(self) -> float:
+        return round(self.root.duration() * 1000, 3)
+
+    def self_times(self) -> Dict[str, float]:
+        """Milliseconds spent in each span category itself, excluding nested spans."""
+        totals: Dict[str, float] = {}
+        pending = [self.root]
+        while pending:
+            span = pending.pop()
+            totals[span.category] = totals.get(span.category, 0.0) + span.self_time() * 1000
+            pending.extend(span.children)
+        return {name: round(ms, 3) for name, ms in sorted(totals.items(), key=lambda kv: -kv[1])}
+
+    def summary(self) -> Dict[str, Any]:
+        subprocesses = [s for s in self._walk() if s.category == "subprocess"]
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms(),
+            "self_ms": self.self_times(),
+            "subprocesses": len(subprocesses),
+            "subprocess_ms": round(sum(s.duration() for s in subprocesses) * 1000, 3),
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**self.summary(), "spans": self.root.to_dict(self.root.start)}
+
+    def _walk(self) -> Iterator[Span]:
+        pending = [self.root]
+        while pending:
+            span = pending.pop()
+            yield span
+            pending.extend(span.children)
+
+
+def current_trace() -> Optional[Trace]:
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Optional[Span]]:
+    """Record the ``with`` block as a child of the current span, if a request is traced."""
+    trace = current_trace()
+    if trace is None or not trace.stack:
+        yield None
+        return
+    child = Span(name, attrs)
+    trace.stack[-1].children.append(child)
+    trace.stack.append(child)
+    try:
+        yield child
+    finally:
+        child.end = time.perf_counter()
+        if trace.stack and trace.stack[-1] is child:
+            trace.stack.pop()
+
+
+def add_span(name: str, start: float, end: float, **attrs: Any) -> None:
+    """Record an already finished operation (``perf_counter`` times) under the current span."""
+    trace = current_trace()
+    if trace is None or not trace.stack:
+        return
+    finished = Span(name, attrs, start)
+    finished.end = end
+    trace.stack[-1].children.append(finished)
+
+
+def count(name: str, amount: int = 1) -> None:
+    """Add to a per-request counter (e.g. cache hits)."""
+    trace = current_trace()
+    if trace is not None:
+        trace.counters[name] = trace.counters.get(name, 0) + amount
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """Decorator recording each call as a span named ``name``."""
+
+    def decorate(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if current_trace() is None:
+                return fn(*args, **kwargs)
+            with span(name):
+                return fn(*args, **kwargs)
+
+        return cast(F, wrapper)
+
+    return decorate
+
+
+def instrument_module(module: ModuleType, category: str = "service") -> None:
+    """Trace every public function defined in ``module`` (once)."""
+    short_name = module.__name__.rsplit(".", 1)[-1]
+    for attr, value in list(vars(module).items()):
+        if (
+            attr.startswith("_")
+            or not inspect.isfunction(value)
+            or value.__module__ != module.__name__
+            or hasattr(value, "__wrapped__")
+        ):
+            continue
+        setattr(module, attr, traced(f"{category}:{short_name}.{attr}")(value))
+
+
+def argv_text(cmd: Any) -> str:
+    text = " ".join(str(part) for part in cmd) if isinstance(cmd, (list, tuple)) else str(cmd)
+    return text if len(text) <= MAX_ARGV_CHARS else text[: MAX_ARGV_CHARS - 3] + "..."
+
+
+# ── cProfile output ──────────────────────────────────────────────────────
+
+
+def _label(func: Tuple[str, int, str]) -> str:
+    filename, line, name = func
+    if filename == "~":
+        return name
+    return f"{os.path.basename(filename)}:{line}({name})"
+
+
+def collapsed_stacks(stats: pstats.Stats) -> str:
+    """Collapsed stacks (``a;b;c microseconds``) from a cProfile run.
+
+    cProfile only records caller/callee pairs, so each function's time on a
+    path is its total scaled by the share its caller on that path accounts for.
+    """
+    raw: Dict[Any, Any] = stats.stats  # type: ignore[attr-defined]
+    callees: Dict[Any, List[Any]] = {}
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller in callers:
+            callees.setdefault(caller, []).append(func)
+    roots = [func for func, entry in raw.items() if not entry[4]]
+    lines: Dict[str, float] = {}
+
+    def walk(func: Any, share: float, path: List[str], seen: Tuple[Any, ...]) -> None:
+        _, _, own_time, total_time, _ = raw[func]
+        path = path + [_label(func)]
+        key = ";".join(path)
+        lines[key] = lines.get(key, 0.0) + own_time * share
+        if len(path) >= MAX_STACK_DEPTH:
+            return
+        for callee in callees.get(func, []):
+            if callee in seen:
+                continue
+            edge_time = raw[callee][4][func][3]
+            callee_total = raw[callee][3]
+            if callee_total <= 0 or edge_time <= 0:
+                continue
+            walk(callee, share * edge_time / callee_total, path, seen + (callee,))
+
+    for root in roots:
+        walk(root, 1.0, [], (root,))
+    return "".join(
+        f"{stack} {round(seconds * 1e6)}\n"
+        for stack, seconds in sorted(lines.items())
+        if round(seconds * 1e6) > 0
+    )
+
+
+def profile_response(profile: cProfile.Profile, fmt: str, route: str) -> Response:
+    """The captured profile as a downloadable file in ``fmt``."""
+    stats = pstats.Stats(profile)
+    name = route.strip("/").replace("/", "_").replace("<", "").replace(">", "") or "index"
+    if fmt == "collapsed":
+        response = Response(collapsed_stacks(stats), content_type="text/plain; charset=utf-8")
+        filename = f"aircron-{name}.collapsed"
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "profile.pstats")
+            stats.dump_stats(path)
+            with open(path, "rb") as f:
+                response = Response(f.read(), content_type="application/octet-stream")
+        filename = f"aircron-{name}.pstats"
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+# ── Request hooks ────────────────────────────────────────────────────────
+
+
+class RequestProfiler:
+    """Traces requests and keeps the slowest recent ones."""
+
+    def __init__(self, slow_ms: float = 1000.0, keep: int = 50) -> None:
+        self._lock = threading.Lock()
+        self.slow_ms = slow_ms
+        self._slow: Deque[Trace] = deque(maxlen=keep)
+
+    def configure(self, config: Dict[str, Any]) -> None:
+        with self._lock:
+            self.slow_ms = float(config.get("PROFILING_SLOW_MS", self.slow_ms))
+            keep = int(config.get("PROFILING_KEEP", self._slow.maxlen or 50))
+            if keep != self._slow.maxlen:
+                self._slow = deque(self._slow, maxlen=keep)
+
+    def start(self, method: str, path: str) -> Trace:
+        trace = Trace(method, path)
+        _local.trace = trace
+        return trace
+
+    def finish(self) -> Optional[Trace]:
+        trace = current_trace()
+        _local.trace = None
+        if trace is None:
+            return None
+        trace.finish()
+        if trace.duration_ms() >= self.slow_ms:
+            with self._lock:
+                self._slow.append(trace)
+        return trace
+
+    def slow_requests(self) -> List[Trace]:
+        """Kept slow requests, newest first."""
+        with self._lock:
+            return list(reversed(self._slow))
+
+    def get(self, trace_id: int) -> Optional[Trace]:
+        with self._lock:
+            return next((t for t in self._slow if t.id == trace_id), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._slow.clear()
+
+
+profiler = RequestProfiler()
+
+
+def _server_timing(trace: Trace) -> str:
+    return ", ".join(f"{category};dur={ms:.1f}" for category, ms in trace.self_times().items())
+
+
+def init_app(app: Flask, service_modules: List[ModuleType]) -> None:
+    """Trace requests, the service modules and templates, and serve /debug/requests."""
+    if not app.config.get("PROFILING_ENABLED", False):
+        return
+    profiler.configure(app.config)
+    for module in service_modules:
+        instrument_module(module)
+
+    @app.before_request
+    def _start_trace() -> Optional[Response]:
+        profiler.start(request.method, request.path)
+        fmt = request.args.get("_profile")
+        if fmt is not None:
+            if fmt not in PROFILE_FORMATS:
+                abort(400, f"_profile must be one of {', '.join(PROFILE_FORMATS)}")
+            if not _capture_lock.acquire(blocking=False):
+                abort(409, "A profile capture is already running")
+            cprofile = cProfile.Profile()
+            try:
+                cprofile.enable()
+            except ValueError:
+                # Another profiler (e.g. a debugger) owns the process-wide hook
+                _capture_lock.release()
+                abort(409, "Another profiler is active")
+            _local.cprofile = cprofile
+        return None
+
+    def _stop_capture() -> Optional[cProfile.Profile]:
+        cprofile: Optional[cProfile.Profile] = getattr(_local, "cprofile", None)
+        if cprofile is not None:
+            cprofile.disable()
+            _local.cprofile = None
+            _capture_lock.release()
+        return cprofile
+
+    @app.after_request
+    def _finish_trace(response: Response) -> Response:
+        cprofile = _stop_capture()
+        trace = current_trace()
+        if trace is None:
+            return response
+        trace.route = request.url_rule.rule if request.url_rule else ""
+        trace.status = response.status_code
+        profiler.finish()
+        if cprofile is not None:
+            return profile_response(cprofile, request.args["_profile"], trace.route)
+        response.headers["Server-Timing"] = _server_timing(trace)
+        return response
+
+    @app.teardown_request
+    def _drop_trace(exc: Optional[BaseException]) -> None:
+        _stop_capture()
+        if current_trace() is not None:
+            profiler.finish()
+
+    def _open_template(sender: Flask, template: Any, context: Dict[str, Any], **_: Any) -> None:
+        trace = current_trace()
+        if trace is not None and trace.stack:
+            child = Span(f"template:{template.name}", {})
+            trace.stack[-1].children.append(child)
+            trace.stack.append(child)
+
+    def _close_template(sender: Flask, template: Any, context: Dict[str, Any], **_: Any) -> None:
+        trace = current_trace()
+        name = f"template:{template.name}"
+        if trace is not None and trace.stack and trace.stack[-1].name == name:
+            trace.stack.pop().end = time.perf_counter()
+
+    before_render_template.connect(_open_template, app, weak=False)
+    template_rendered.connect(_close_template, app, weak=False)
+
+    def slow_requests_view() -> Response:
+        return jsonify(
+            {
+                "slow_ms": profiler.slow_ms,
+                "requests": [trace.summary() for trace in profiler.slow_requests()],
+            }
+        )
+
+    def slow_request_view(trace_id: int) -> Response:
+        trace = profiler.get(trace_id)
+        if trace is None:
+            abort(404)
+        return jsonify(trace.to_dict())
+
+    app.add_url_rule("/debug/requests", "debug_requests", slow_requests_view, methods=["GET"])
+    app.add_url_rule(
+        "/debug/requests/<int:trace_id>", "debug_request", slow_request_view, methods=["GET"]
+    )
+    logger.info(f"[profiling] Tracing requests; keeping those over {profiler.slow_ms}ms")
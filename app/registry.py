@@ -0,0 +1,82 @@
+"""App-scoped registry of the long-lived objects shared by every request.
+
+``create_app`` builds one ``AppRegistry`` per app and stores it in
+``app.extensions["aircron"]``. It holds the jobs store, the cron manager and the
+speaker discovery worker, so views and services look them up instead of
+constructing them per call, and a request does no setup I/O (no storage
+``exists()`` checks, no re-probing for ``aircron_run.sh``).
+
+Everything held here is safe to share between request threads: ``JobsStore``
+serializes writes and reads from its snapshot cache, ``CronManager`` guards its
+crontab snapshot and compiled lines with locks, and ``SpeakerDiscovery`` only
+hands out copies of its cached list.
+"""
+
+import logging
+from pathlib import Path
+from typing import Optional
+
+from flask import Flask, current_app
+
+from .cronblock import CronManager
+from .jobs_backends import get_backend
+from .jobs_store import JobsStore
+from .speakers import SpeakerDiscovery, speaker_discovery
+
+logger = logging.getLogger(__name__)
+
+EXTENSION_KEY = "aircron"
+
+
+class AppRegistry:
+    """The store, cron manager and speaker discovery for one app."""
+
+    def __init__(
+        self,
+        app_support_dir: Path,
+        jobs_store: JobsStore,
+        cron_manager: CronManager,
+        speakers: SpeakerDiscovery,
+    ) -> None:
+        self.app_support_dir = app_support_dir
+        self.jobs_store = jobs_store
+        self.cron_manager = cron_manager
+        self.speakers = speakers
+
+
+def init_app(app: Flask) -> AppRegistry:
+    """Create the app's registry; call once the app config is final."""
+    app_support_dir = Path(app.config["APP_SUPPORT_DIR"])
+    backend = get_backend(app.config["JOBS_BACKEND"], app_support_dir)
+    jobs_store = JobsStore(app_support_dir, backend)
+    cron_manager = CronManager(app_support_dir, jobs_store)
+    # Probe for aircron_run.sh now rather than on the first request
+    script_path = cron_manager._get_aircron_script_path()
+    registry = AppRegistry(app_support_dir, jobs_store, cron_manager, speaker_discovery)
+    app.extensions[EXTENSION_KEY] = registry
+    logger.info(f"[registry] Jobs in {backend.location}, script {script_path}")
+    return registry
+
+
+def get_registry(app: Optional[Flask] = None) -> AppRegistry:
+    """Return the registry of ``app`` (the current app by default).
+
+    Raises:
+        RuntimeError: If called outside an app context, or for an app that was not
+            created by ``create_app``
+    """
+    target = app if app is not None else current_app
+    try:
+        return target.extensions[EXTENSION_KEY]  # type: ignore[no-any-return]
+    except KeyError:
+        raise RuntimeError("AirCron registry not initialized; use create_app()") from None
+
+
+def get_jobs_store() -> JobsStore:
+    """The current app's shared JobsStore."""
+    return get_registry().jobs_store
+
+
+def get_cron_manager() -> CronManager:
+    """The current app's shared CronManager."""
+    return get_registry().cron_manager
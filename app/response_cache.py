@@ -0,0 +1,97 @@
+"""Conditional GET and serialized-response cache for read endpoints.
+
+Polling clients hit ``/api/jobs/all``, ``/api/status`` and friends far more often
+than anything changes. ``cached_json`` answers such a request from a version
+token the caller supplies (the jobs store version, the playlists file's stat
+key, the crontab digest, ...):
+
+- The token is hashed into a strong ETag. A request whose ``If-None-Match``
+  matches gets ``304 Not Modified`` without the body being built.
+- Otherwise the serialized body of the last response for the same path and
+  query is reused while the token is unchanged, so the JSON is built once per
+  change instead of once per request.
+
+Only 200 responses are cached. A ``None`` token means the version is unknown and
+the response is built fresh and sent without an ETag.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+from flask import Response, jsonify, request
+
+from . import metrics
+
+DEFAULT_MAX_ENTRIES = 256
+
+
+def make_etag(key: str, version: Hashable) -> str:
+    """Strong ETag (without quotes) for a cache key at a version."""
+    return hashlib.blake2b(repr((key, version)).encode(), digest_size=12).hexdigest()
+
+
+class ResponseCache:
+    """LRU of serialized JSON bodies keyed by path and query string."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"not_modified": 0, "hits": 0, "misses": 0}
+
+    def get(self, key: str, etag: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != etag:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: str, etag: str, body: bytes) -> None:
+        with self._lock:
+            self._entries[key] = (etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+        metrics.cache_lookup("response", stat != "misses")
+
+    def respond(self, version: Optional[Hashable], build: Callable[[], Any]) -> Response:
+        """Answer the current GET from ``version``, calling ``build()`` only on a miss."""
+        if version is None:
+            return jsonify(build())
+        key = request.full_path
+        etag = make_etag(key, version)
+        if request.if_none_match.contains(etag):
+            self._count("not_modified")
+            response = Response(status=304)
+        else:
+            body = self.get(key, etag)
+            if body is None:
+                self._count("misses")
+                body = jsonify(build()).get_data()
+                self.put(key, etag, body)
+            else:
+                self._count("hits")
+            response = Response(body, mimetype="application/json")
+        response.set_etag(etag)
+        # Let browsers keep the body but revalidate it on every poll
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+
+response_cache = ResponseCache()
+
+
+def cached_json(version: Optional[Hashable], build: Callable[[], Any]) -> Response:
+    """Shortcut for ``response_cache.respond`` used by the API views."""
+    return response_cache.respond(version, build)
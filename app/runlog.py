@@ -0,0 +1,283 @@
+"""Structured run log and per-action latency statistics.
+
+Every action run appends JSON lines to ``~/Library/Logs/AirCron/runs.jsonl``
+(``AIRCRON_RUN_LOG`` or the ``RUN_LOG`` config overrides the path), written by
+``aircron_run.sh`` when it runs an action itself and by the resident executor
+otherwise:
+
+- ``{"type": "step", ...}`` for each tool call the script makes (osascript,
+  spotify, launching an app) with its start/end times and exit code.
+- ``{"type": "run", ...}`` once per action with the job id (empty for manual
+  runs), zone, action, service, start/end times, exit code, how many steps
+  failed and, for scheduled fires, ``drift_ms``: how late the action started
+  after its scheduled minute. Executor runs also carry per-speaker results.
+
+Times are epoch milliseconds. ``RunStats`` tails the log incrementally and keeps
+latency histograms and failure rates per action, per speaker and per step, plus
+a histogram of fire drift; ``GET /api/runs/stats`` serves them.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .applescript import zone_speakers
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RUN_LOG_NAME = "runs.jsonl"
+# Histogram bucket upper bounds in milliseconds (a final +Inf bucket is implied)
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+DRIFT_BUCKETS_MS = (100, 500, 1000, 2500, 5000, 15000, 60000)
+# Durations kept per key for percentiles
+SAMPLE_SIZE = 500
+RECENT_RUNS = 200
+# Read at most this much of the log at once when catching up
+MAX_READ_BYTES = 8 * 1024 * 1024
+
+
+def default_run_log_path() -> Path:
+    """Run log location used by aircron_run.sh unless AIRCRON_RUN_LOG is set."""
+    env_path = os.environ.get("AIRCRON_RUN_LOG")
+    if env_path:
+        return Path(env_path)
+    return Path.home() / "Library" / "Logs" / "AirCron" / DEFAULT_RUN_LOG_NAME
+
+
+def now_ms() -> int:
+    return time.time_ns() // 1_000_000
+
+
+def run_failed(record: Dict[str, Any]) -> bool:
+    """Whether a run record counts as a failure (non-zero exit or a failed step)."""
+    return record.get("exit_code", 0) != 0 or bool(record.get("failed_steps"))
+
+
+class RunLog:
+    """Appends records to and reads records from a JSONL run log."""
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.path = Path(path) if path else default_run_log_path()
+        self._lock = threading.Lock()
+
+    def append(self, record: Dict[str, Any]) -> None:
+        """Append one record; failures are logged, never raised, so logging can't fail a run."""
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        try:
+            with self._lock:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+        except OSError as e:
+            logger.warning(f"[runlog] Could not write {self.path}: {e}")
+
+    def read(self, offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """Complete records after byte ``offset`` and the offset to resume from.
+
+        A log shorter than ``offset`` was truncated or rotated and is read from
+        the start. A partly written last line is left for the next read.
+        """
+        try:
+            with open(self.path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size < offset:
+                    offset = 0
+                f.seek(offset)
+                data = f.read(MAX_READ_BYTES)
+        except FileNotFoundError:
+            return [], 0
+        end = data.rfind(b"\n") + 1
+        records: List[Dict[str, Any]] = []
+        for raw in data[:end].splitlines():
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                continue
+            if isinstance(record, dict):
+                records.append(record)
+        return records, offset + end
+
+    def version(self) -> Optional[Tuple[int, int, int]]:
+        """Stat key that changes whenever the log does (None if it doesn't exist)."""
+        try:
+            st = self.path.stat()
+        except OSError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class Histogram:
+    """Per-bucket counts plus a bounded sample of values for percentiles."""
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._samples: Deque[float] = deque(maxlen=SAMPLE_SIZE)
+
+    def observe(self, value: float) -> None:
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), -1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self._samples.append(value)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [str(bound) for bound in self.buckets] + ["+Inf"]
+        return {
+            "buckets": dict(zip(labels, self.counts)),
+            "count": self.count,
+            "sum": round(self.total, 1),
+            "mean": round(self.total / self.count, 1) if self.count else None,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "max": self.max if self.count else None,
+        }
+
+
+class _Series:
+    """Run count, failures and a latency histogram for one action, speaker or step."""
+
+    def __init__(self) -> None:
+        self.runs = 0
+        self.failures = 0
+        self.latency = Histogram(LATENCY_BUCKETS_MS)
+        self.last_error: Optional[str] = None
+
+    def observe(self, duration_ms: float, failed: bool, error: Optional[str] = None) -> None:
+        self.runs += 1
+        self.latency.observe(duration_ms)
+        if failed:
+            self.failures += 1
+            if error:
+                self.last_error = error
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "failures": self.failures,
+            "failure_rate": round(self.failures / self.runs, 4) if self.runs else 0.0,
+            "latency_ms": self.latency.to_dict(),
+            "last_error": self.last_error,
+        }
+
+
+class RunStats:
+    """Incrementally aggregated statistics over a run log."""
+
+    def __init__(self, run_log: Optional[RunLog] = None) -> None:
+        self._lock = threading.Lock()
+        self.run_log = run_log or RunLog()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._offset = 0
+        self._log_id: Optional[int] = None
+        self.runs = 0
+        self.first_at: Optional[int] = None
+        self.by_action: Dict[str, _Series] = {}
+        self.by_speaker: Dict[str, _Series] = {}
+        self.by_step: Dict[str, _Series] = {}
+        self.drift = Histogram(DRIFT_BUCKETS_MS)
+        self._recent: Deque[Dict[str, Any]] = deque(maxlen=RECENT_RUNS)
+
+    def configure(self, config: Dict[str, Any]) -> None:
+        """Point at the app's RUN_LOG, starting over if the path changed."""
+        path = Path(config.get("RUN_LOG") or default_run_log_path())
+        with self._lock:
+            if path != self.run_log.path:
+                self.run_log = RunLog(path)
+                self._reset()
+
+    def refresh(self) -> None:
+        """Read and aggregate records appended since the last refresh."""
+        with self._lock:
+            version = self.run_log.version()
+            log_id = version[0] if version else None
+            if log_id != self._log_id or (version and version[1] < self._offset):
+                # A new, rotated or truncated log: aggregate it from the start
+                self._reset()
+                self._log_id = log_id
+            while True:
+                records, offset = self.run_log.read(self._offset)
+                if offset == self._offset:
+                    break
+                self._offset = offset
+                self.ingest(records)
+
+    def ingest(self, records: Iterable[Dict[str, Any]]) -> None:
+        for record in records:
+            kind = record.get("type")
+            if kind == "run":
+                self._ingest_run(record)
+            elif kind == "step":
+                step = str(record.get("step") or "unknown")
+                self.by_step.setdefault(step, _Series()).observe(
+                    float(record.get("duration_ms") or 0), record.get("exit_code", 0) != 0
+                )
+
+    def _ingest_run(self, record: Dict[str, Any]) -> None:
+        duration = float(record.get("duration_ms") or 0)
+        failed = run_failed(record)
+        error = record.get("error")
+        self.runs += 1
+        if self.first_at is None:
+            self.first_at = record.get("start_ms")
+        action = str(record.get("action") or "unknown")
+        self.by_action.setdefault(action, _Series()).observe(duration, failed, error)
+
+        # Executor runs report each speaker; script runs are charged to every
+        # speaker in the zone
+        speakers = record.get("speakers")
+        if isinstance(speakers, list) and speakers:
+            for result in speakers:
+                self.by_speaker.setdefault(str(result.get("speaker")), _Series()).observe(
+                    duration, not result.get("ok", False), result.get("error")
+                )
+        else:
+            for speaker in zone_speakers(str(record.get("zone") or "")):
+                self.by_speaker.setdefault(speaker, _Series()).observe(duration, failed, error)
+
+        if record.get("drift_ms") is not None:
+            self.drift.observe(float(record["drift_ms"]))
+        self._recent.append(record)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Histograms and failure rates per action, speaker and step."""
+        self.refresh()
+        with self._lock:
+            return {
+                "log": str(self.run_log.path),
+                "runs": self.runs,
+                "since_ms": self.first_at,
+                "by_action": {k: v.to_dict() for k, v in sorted(self.by_action.items())},
+                "by_speaker": {k: v.to_dict() for k, v in sorted(self.by_speaker.items())},
+                "by_step": {k: v.to_dict() for k, v in sorted(self.by_step.items())},
+                "drift_ms": self.drift.to_dict(),
+            }
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """The most recent run records, newest first."""
+        self.refresh()
+        with self._lock:
+            return list(reversed(self._recent))[:limit]
+
+    def version(self) -> Optional[Tuple[int, int, int]]:
+        return self.run_log.version()
+
+
+run_stats = RunStats()
@@ -0,0 +1,310 @@
+"""Durable run queue for AirCron actions.
+
+Cron fires used to race for a single ``flock -n`` and any fire that lost was
+dropped. The executor now puts every action on this queue instead:
+
+- Each action is spooled to ``<spool_dir>/<id>.json`` before it is acknowledged,
+  so a restart replays anything that had not finished (up to ``max_age``).
+- Actions run on a small worker pool. Two actions run at the same time only when
+  they touch different speakers; actions that share a speaker run in FIFO order.
+  ``All Speakers`` touches every speaker, and play/pause/resume also hold their
+  player app (Spotify or Music) since there is only one of each.
+- A new action for a zone replaces any not-yet-started action for the same zone
+  and slot (playback, volume or connection). A pause and a play queued for one
+  zone in the same minute therefore run once, as the play.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, FrozenSet, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ALL_SPEAKERS = "All Speakers"
+# Resource held by actions that touch every speaker
+_EVERY_SPEAKER = "*"
+# Actions in the same slot for the same zone supersede each other while queued
+_SLOTS = {
+    "play": "playback",
+    "pause": "playback",
+    "resume": "playback",
+    "volume": "volume",
+    "connect": "connection",
+    "disconnect": "connection",
+    "reconnect": "connection",
+}
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_AGE = 600.0
+
+
+def zone_resources(zone: str, action: str, service: str) -> FrozenSet[str]:
+    """Resources an action holds while it runs."""
+    if zone == ALL_SPEAKERS:
+        speakers = {_EVERY_SPEAKER}
+    elif zone.startswith("Custom:"):
+        speakers = {name.strip() for name in zone[len("Custom:") :].split(",") if name.strip()}
+    else:
+        speakers = {zone}
+    if _SLOTS.get(action) == "playback":
+        speakers.add(f"app:{service}")
+    return frozenset(speakers)
+
+
+def _conflicts(a: FrozenSet[str], b: FrozenSet[str]) -> bool:
+    if a & b:
+        return True
+    # "*" covers every speaker but not the player apps
+    a_speakers = any(not r.startswith("app:") for r in a)
+    b_speakers = any(not r.startswith("app:") for r in b)
+    return (_EVERY_SPEAKER in a and b_speakers) or (_EVERY_SPEAKER in b and a_speakers)
+
+
+class QueuedAction:
+    """One action on the run queue."""
+
+    def __init__(
+        self,
+        zone: str,
+        action: str,
+        arg1: str = "",
+        service: str = "spotify",
+        arg2: str = "",
+        action_id: Optional[str] = None,
+        enqueued_at: Optional[float] = None,
+        job_id: str = "",
+        scheduled_at: Optional[float] = None,
+    ) -> None:
+        self.id = action_id or f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+        self.zone = zone
+        self.action = action
+        self.arg1 = arg1
+        self.arg2 = arg2
+        self.service = service
+        self.enqueued_at = enqueued_at if enqueued_at is not None else time.time()
+        # The job that fired this action and the time it was due, if scheduled
+        self.job_id = job_id
+        self.scheduled_at = scheduled_at
+        self.resources = zone_resources(zone, action, service)
+        self.slot = _SLOTS.get(action, action)
+        self.started_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.done = threading.Event()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "zone": self.zone,
+            "action": self.action,
+            "arg1": self.arg1,
+            "arg2": self.arg2,
+            "service": self.service,
+            "enqueued_at": self.enqueued_at,
+            "job_id": self.job_id,
+            "scheduled_at": self.scheduled_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "QueuedAction":
+        return cls(
+            zone=data["zone"],
+            action=data["action"],
+            arg1=data.get("arg1", ""),
+            service=data.get("service", "spotify"),
+            arg2=data.get("arg2", ""),
+            action_id=data["id"],
+            enqueued_at=data["enqueued_at"],
+            job_id=data.get("job_id", ""),
+            scheduled_at=data.get("scheduled_at"),
+        )
+
+
+class RunQueue:
+    """FIFO action queue with per-speaker serialization and per-zone coalescing."""
+
+    def __init__(
+        self,
+        run: Callable[[QueuedAction], Dict[str, Any]],
+        spool_dir: Optional[Path] = None,
+        workers: int = DEFAULT_WORKERS,
+        max_age: float = DEFAULT_MAX_AGE,
+    ) -> None:
+        self._run = run
+        self.spool_dir = Path(spool_dir) if spool_dir else None
+        self.workers = max(1, workers)
+        self.max_age = max_age
+        self._cond = threading.Condition()
+        self._pending: List[QueuedAction] = []
+        self._running: List[QueuedAction] = []
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "coalesced": 0, "expired": 0}
+
+    def start(self) -> None:
+        """Replay spooled actions and start the workers."""
+        if self._threads:
+            return
+        self._stopping = False
+        if self.spool_dir:
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+            self._recover()
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._worker, name=f"aircron-runqueue-{index}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the workers; actions still queued stay spooled for the next start."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(
+        self,
+        zone: str,
+        action: str,
+        arg1: str = "",
+        service: str = "spotify",
+        arg2: str = "",
+        job_id: str = "",
+        scheduled_at: Optional[float] = None,
+    ) -> QueuedAction:
+        """Spool and enqueue an action, coalescing queued actions it supersedes."""
+        item = QueuedAction(
+            zone, action, arg1, service, arg2, job_id=job_id, scheduled_at=scheduled_at
+        )
+        self._spool(item)
+        self._enqueue(item)
+        return item
+
+    def wait(self, item: QueuedAction, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Wait for an action to finish and return its result."""
+        if not item.done.wait(timeout):
+            return {"ok": False, "error": "timed out waiting for the run queue", "id": item.id}
+        return item.result or {"ok": False, "error": "no result"}
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Queue depth and counters."""
+        with self._cond:
+            return {
+                "pending": len(self._pending),
+                "running": len(self._running),
+                "workers": self.workers,
+                **self.stats,
+            }
+
+    def _enqueue(self, item: QueuedAction) -> None:
+        with self._cond:
+            superseded = [
+                queued
+                for queued in self._pending
+                if queued.zone == item.zone and queued.slot == item.slot
+            ]
+            for queued in superseded:
+                self._pending.remove(queued)
+                logger.info(
+                    f"[runqueue] {queued.action} for {queued.zone} superseded by {item.action}"
+                )
+                self._finish(queued, {"ok": True, "coalesced": True, "superseded_by": item.id})
+                self.stats["coalesced"] += 1
+            self._pending.append(item)
+            self.stats["submitted"] += 1
+            self._cond.notify_all()
+
+    def _next_runnable(self) -> Optional[QueuedAction]:
+        """First queued action whose speakers are free of running and earlier queued work."""
+        held = [running.resources for running in self._running]
+        for item in self._pending:
+            if not any(_conflicts(item.resources, other) for other in held):
+                return item
+            # Later actions may not overtake this one on the speakers it needs
+            held.append(item.resources)
+        return None
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                item = None
+                while not self._stopping:
+                    item = self._next_runnable()
+                    if item is not None:
+                        break
+                    self._cond.wait()
+                if item is None:
+                    return
+                self._pending.remove(item)
+                self._running.append(item)
+
+            item.started_at = time.time()
+            try:
+                result = self._run(item)
+            except Exception as e:  # a failing action must not kill the worker
+                logger.error(f"[runqueue] {item.action} for {item.zone} crashed: {e}")
+                result = {"ok": False, "error": str(e)}
+            result.setdefault("queued_ms", round((item.started_at - item.enqueued_at) * 1000, 1))
+
+            with self._cond:
+                self._running.remove(item)
+                self.stats["completed" if result.get("ok") else "failed"] += 1
+                self._finish(item, result)
+                self._cond.notify_all()
+
+    def _finish(self, item: QueuedAction, result: Dict[str, Any]) -> None:
+        result.setdefault("id", item.id)
+        item.result = result
+        self._unspool(item)
+        item.done.set()
+
+    def _spool_path(self, item: QueuedAction) -> Optional[Path]:
+        return self.spool_dir / f"{item.id}.json" if self.spool_dir else None
+
+    def _spool(self, item: QueuedAction) -> None:
+        path = self._spool_path(item)
+        if path is None:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_suffix(".tmp")
+        with open(temp_path, "w") as f:
+            json.dump(item.to_dict(), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+
+    def _unspool(self, item: QueuedAction) -> None:
+        path = self._spool_path(item)
+        if path is not None:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _recover(self) -> None:
+        """Re-queue actions spooled by a previous process, dropping expired ones."""
+        assert self.spool_dir is not None
+        now = time.time()
+        for path in sorted(self.spool_dir.glob("*.json")):
+            try:
+                item = QueuedAction.from_dict(json.loads(path.read_text()))
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"[runqueue] Discarding unreadable spool entry {path.name}: {e}")
+                path.unlink(missing_ok=True)
+                continue
+            if now - item.enqueued_at > self.max_age:
+                logger.warning(
+                    f"[runqueue] Dropping {item.action} for {item.zone}: "
+                    f"queued {now - item.enqueued_at:.0f}s ago"
+                )
+                path.unlink(missing_ok=True)
+                self.stats["expired"] += 1
+                continue
+            logger.info(f"[runqueue] Replaying {item.action} for {item.zone}")
+            self._enqueue(item)
@@ -0,0 +1,340 @@
+"""In-process job scheduler, an alternative to installing jobs in crontab.
+
+Selected with ``SCHEDULER_BACKEND = "internal"`` (the default, ``"cron"``, keeps
+``CronManager`` installing the AirCron block). The scheduler keeps a min-heap of
+each job's next fire time, computed with croniter from the same schedule fields
+the cron backend writes, and hands due jobs to the run queue.
+
+- The heap follows the jobs store: a cheap version check each tick, and on a
+  change only jobs whose content changed are rescheduled (stale heap entries are
+  skipped when popped).
+- Fires missed while the machine slept or the server was down are run once if
+  they are less than ``SCHEDULER_CATCH_UP`` seconds late, and skipped otherwise.
+  The last time the scheduler checked is kept in ``scheduler.json``.
+- Each distinct schedule keeps one croniter iterator, so jobs sharing a schedule
+  and consecutive fires of one schedule cost a step rather than a new croniter.
+"""
+
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from croniter import croniter
+
+from .cronblock import job_command_args, job_cron_schedule
+from .jobs_backends import get_backend
+from .jobs_store import Job, JobsStore
+from .runqueue import RunQueue
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_BACKENDS = ("cron", "internal")
+DEFAULT_CATCH_UP = 300.0
+DEFAULT_POLL_INTERVAL = 1.0
+STATE_FILE_NAME = "scheduler.json"
+
+# Global scheduler instance, set when the internal backend is running
+scheduler: Optional["JobScheduler"] = None
+
+
+class _ExprCursor:
+    """Next-fire lookups for one cron expression, reusing its croniter iterator.
+
+    Holds a window ``[prev, next)`` containing no fires, so any time in it maps to
+    ``next`` without calling croniter. Moving forward steps the iterator; going
+    backwards (or far ahead) rebuilds it in local time.
+    """
+
+    __slots__ = ("expr", "itr", "prev", "next")
+
+    # Step the iterator forward at most this many fires before rebuilding it
+    MAX_STEPS = 8
+
+    def __init__(self, expr: str) -> None:
+        self.expr = expr
+        self.itr = None
+        self.prev = self.next = 0.0
+
+    def next_after(self, after: float) -> float:
+        if self.itr is not None and self.prev <= after:
+            for _ in range(self.MAX_STEPS):
+                if after < self.next:
+                    return self.next
+                self.prev = self.next
+                self.next = self.itr.get_next(float)
+        self.itr = croniter(self.expr, datetime.fromtimestamp(after).astimezone())
+        self.prev = after
+        self.next = self.itr.get_next(float)
+        return self.next
+
+
+class _Entry:
+    __slots__ = ("job", "expr", "content", "next_fire", "generation")
+
+    def __init__(self, job: Job, expr: str, content: Tuple, generation: int) -> None:
+        self.job = job
+        self.expr = expr
+        self.content = content
+        self.next_fire = 0.0
+        self.generation = generation
+
+
+def _job_content(job: Job) -> Tuple:
+    return (job_cron_schedule(job), tuple(job_command_args(job)))
+
+
+class JobScheduler:
+    """Min-heap of job fire times, kept in step with the jobs store."""
+
+    def __init__(
+        self,
+        store: JobsStore,
+        dispatch: Callable[[Job, float], None],
+        state_file: Optional[Path] = None,
+        catch_up: float = DEFAULT_CATCH_UP,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.store = store
+        self.dispatch = dispatch
+        self.state_file = state_file
+        self.catch_up = catch_up
+        self.poll_interval = poll_interval
+        self.clock = clock
+        self._heap: List[Tuple[float, int, str, int]] = []
+        self._entries: Dict[str, _Entry] = {}
+        self._cursors: Dict[str, _ExprCursor] = {}
+        self._version: Optional[Hashable] = None
+        self._generation = 0
+        self._seq = 0
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_checked: Optional[float] = None
+        self.stats = {"fired": 0, "missed": 0, "failed": 0, "max_lag_ms": 0.0, "syncs": 0}
+
+    # -- heap maintenance -------------------------------------------------
+
+    def _next_fire(self, expr: str, after: float) -> float:
+        cursor = self._cursors.get(expr)
+        if cursor is None:
+            cursor = self._cursors[expr] = _ExprCursor(expr)
+        return cursor.next_after(after)
+
+    def _push(self, entry: _Entry, fire: float) -> None:
+        entry.next_fire = fire
+        self._seq += 1
+        heapq.heappush(self._heap, (fire, self._seq, entry.job.id, entry.generation))
+
+    def sync(self, after: Optional[float] = None) -> bool:
+        """Reschedule jobs that changed since the last sync; return whether any did.
+
+        New and changed jobs get their next fire after ``after`` (default: now).
+        """
+        version = self.store.get_version()
+        if version is not None and version == self._version:
+            return False
+        version, all_jobs = self.store.get_all_jobs_versioned()
+        after = self.clock() if after is None else after
+        with self._lock:
+            seen = set()
+            changed = 0
+            for jobs in all_jobs.values():
+                for job in jobs:
+                    seen.add(job.id)
+                    entry = self._entries.get(job.id)
+                    # Unchanged jobs keep the same Job object in the store's snapshot
+                    if entry is not None and entry.job is job:
+                        continue
+                    try:
+                        content = _job_content(job)
+                    except (ValueError, AttributeError) as e:
+                        logger.warning(f"[scheduler] Skipping job {job.id}: {e}")
+                        self._entries.pop(job.id, None)
+                        continue
+                    if entry is not None and entry.content == content:
+                        entry.job = job
+                        continue
+                    self._generation += 1
+                    entry = _Entry(job, content[0], content, self._generation)
+                    self._entries[job.id] = entry
+                    self._push(entry, self._next_fire(entry.expr, after))
+                    changed += 1
+            removed = [job_id for job_id in self._entries if job_id not in seen]
+            for job_id in removed:
+                del self._entries[job_id]
+            if len(self._cursors) > 2 * len(self._entries) + 64:
+                live = {entry.expr for entry in self._entries.values()}
+                self._cursors = {e: c for e, c in self._cursors.items() if e in live}
+            # Drop stale heap entries once they outnumber live ones
+            if len(self._heap) > 2 * len(self._entries) + 64:
+                self._heap = [
+                    item
+                    for item in self._heap
+                    if item[2] in self._entries and self._entries[item[2]].generation == item[3]
+                ]
+                heapq.heapify(self._heap)
+            self._version = version
+            self.stats["syncs"] += 1
+        logger.info(
+            f"[scheduler] Synced {len(self._entries)} jobs "
+            f"({changed} rescheduled, {len(removed)} removed)"
+        )
+        self._wake.set()
+        return True
+
+    def next_fire_time(self) -> Optional[float]:
+        """Time of the earliest live heap entry, or None if nothing is scheduled."""
+        with self._lock:
+            while self._heap:
+                fire, _, job_id, generation = self._heap[0]
+                entry = self._entries.get(job_id)
+                if entry is not None and entry.generation == generation:
+                    return fire
+                heapq.heappop(self._heap)
+        return None
+
+    def run_pending(self, now: Optional[float] = None) -> int:
+        """Dispatch every job due at ``now`` and reschedule it; return how many ran."""
+        now = self.clock() if now is None else now
+        due: List[Tuple[_Entry, float]] = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                fire, _, job_id, generation = heapq.heappop(self._heap)
+                entry = self._entries.get(job_id)
+                if entry is None or entry.generation != generation:
+                    continue
+                lag = now - fire
+                if lag > self.catch_up:
+                    logger.warning(
+                        f"[scheduler] Skipping {entry.job.action} for {entry.job.zone}: "
+                        f"{lag:.0f}s late"
+                    )
+                    self.stats["missed"] += 1
+                else:
+                    self.stats["max_lag_ms"] = max(self.stats["max_lag_ms"], lag * 1000)
+                    due.append((entry, fire))
+                # Several missed fires of one job collapse into at most one run
+                self._push(entry, self._next_fire(entry.expr, now))
+            self.last_checked = now
+
+        for entry, fire in due:
+            try:
+                self.dispatch(entry.job, fire)
+                self.stats["fired"] += 1
+            except Exception as e:
+                logger.error(f"[scheduler] Dispatching job {entry.job.id} failed: {e}")
+                self.stats["failed"] += 1
+        return len(due)
+
+    # -- background loop --------------------------------------------------
+
+    def start(self) -> None:
+        """Build the heap (catching up from the saved state) and start the loop."""
+        if self._thread is not None:
+            return
+        now = self.clock()
+        after = now
+        last = self._load_last_checked()
+        if last is not None:
+            after = min(now, max(last, now - self.catch_up))
+        self.sync(after=after)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="aircron-scheduler", daemon=True)
+        self._thread.start()
+        logger.info(f"[scheduler] Started with {len(self._entries)} jobs")
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+        self._save_last_checked()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.sync()
+                self.run_pending()
+                self._save_last_checked()
+            except Exception as e:
+                logger.error(f"[scheduler] Tick failed: {e}")
+            next_fire = self.next_fire_time()
+            timeout = self.poll_interval
+            if next_fire is not None:
+                timeout = max(0.0, min(timeout, next_fire - self.clock()))
+            self._wake.wait(timeout)
+            self._wake.clear()
+
+    def _load_last_checked(self) -> Optional[float]:
+        if self.state_file is None or not self.state_file.exists():
+            return None
+        try:
+            return float(json.loads(self.state_file.read_text())["last_checked"])
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"[scheduler] Ignoring unreadable state file: {e}")
+            return None
+
+    def _save_last_checked(self) -> None:
+        if self.state_file is None or self.last_checked is None:
+            return
+        temp_path = self.state_file.with_suffix(".tmp")
+        temp_path.write_text(json.dumps({"last_checked": self.last_checked}))
+        os.replace(temp_path, self.state_file)
+
+    def status(self) -> Dict[str, Any]:
+        """Job count, the next fire and counters."""
+        next_fire = self.next_fire_time()
+        with self._lock:
+            upcoming = None
+            if next_fire is not None:
+                job_id = self._heap[0][2]
+                job = self._entries[job_id].job
+                upcoming = {
+                    "at": datetime.fromtimestamp(next_fire).isoformat(timespec="seconds"),
+                    "job_id": job.id,
+                    "zone": job.zone,
+                    "action": job.action,
+                }
+            return {
+                "jobs": len(self._entries),
+                "heap_size": len(self._heap),
+                "next_fire": upcoming,
+                "last_checked": self.last_checked,
+                "catch_up_seconds": self.catch_up,
+                **self.stats,
+            }
+
+
+def queue_dispatcher(queue: RunQueue) -> Callable[[Job, float], None]:
+    """Dispatch function handing a job's action, fired at ``fire``, to a run queue."""
+
+    def dispatch(job: Job, fire: float) -> None:
+        zone, action, arg1, arg2, service = job_command_args(job)
+        queue.submit(zone, action, arg1, service, arg2, job_id=job.id, scheduled_at=fire)
+
+    return dispatch
+
+
+def start_scheduler(config: Dict[str, Any], queue: RunQueue) -> JobScheduler:
+    """Start the global internal scheduler for an app's config."""
+    global scheduler
+    app_support_dir = Path(config["APP_SUPPORT_DIR"])
+    store = JobsStore(app_support_dir, get_backend(config["JOBS_BACKEND"], app_support_dir))
+    scheduler = JobScheduler(
+        store,
+        queue_dispatcher(queue),
+        state_file=app_support_dir / STATE_FILE_NAME,
+        catch_up=float(config.get("SCHEDULER_CATCH_UP", DEFAULT_CATCH_UP)),
+        poll_interval=float(config.get("SCHEDULER_POLL_INTERVAL", DEFAULT_POLL_INTERVAL)),
+    )
+    scheduler.start()
+    return scheduler
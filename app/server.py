@@ -0,0 +1,259 @@
+"""HTTP serving for the AirCron UI.
+
+``SERVER_MODE`` picks how ``main.py`` serves the app:
+
+- ``production`` (default): ``PooledWSGIServer``, Werkzeug's WSGI server with a
+  fixed pool of ``SERVER_THREADS`` handler threads, at most
+  ``SERVER_MAX_CONNECTIONS`` connections queued or in progress (more get an
+  immediate 503), ``SERVER_REQUEST_TIMEOUT`` on socket reads/writes and a
+  graceful ``drain`` on shutdown, which ends open event streams and, after
+  ``SERVER_DRAIN_TIMEOUT``, shuts the sockets of requests still in flight so
+  their threads exit. Connections still close after each response:
+  Werkzeug's handler discards unread socket data after a response, which would
+  eat a kept-alive client's next request.
+- ``dev``: Flask's development server, one thread per request, as before.
+
+``benchmark`` drives a running server with concurrent clients and
+reports requests/sec and latency percentiles per endpoint (``main.py --bench``).
+"""
+
+import http.client
+import logging
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Mapping, Optional, Set
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+logger = logging.getLogger(__name__)
+
+SERVER_MODES = ("production", "dev")
+DEFAULT_THREADS = 16
+DEFAULT_MAX_CONNECTIONS = 64
+DEFAULT_REQUEST_TIMEOUT = 30.0
+DEFAULT_DRAIN_TIMEOUT = 10.0
+
+# WSGI environ key of the event set once the server starts draining; long-lived
+# responses (event streams) check it and end
+STOPPING_ENVIRON_KEY = "aircron.server.stopping"
+
+# Read endpoints measured by --bench
+BENCH_ENDPOINTS = [
+    "/api/status",
+    "/api/cron/status",
+    "/api/jobs/all",
+    "/api/speakers",
+    "/api/scheduler",
+]
+
+_SERVICE_UNAVAILABLE = (
+    b"HTTP/1.1 503 Service Unavailable\r\n"
+    b"Content-Type: text/plain\r\n"
+    b"Content-Length: 20\r\n"
+    b"Retry-After: 1\r\n"
+    b"Connection: close\r\n\r\n"
+    b"Server busy, retry.\n"
+)
+
+
+class _PooledRequestHandler(WSGIRequestHandler):
+    """Request handler whose socket reads and writes time out."""
+
+    server: "PooledWSGIServer"
+
+    def setup(self) -> None:
+        self.timeout = self.server.request_timeout
+        super().setup()
+
+    def make_environ(self) -> Dict[str, Any]:
+        environ = super().make_environ()
+        environ[STOPPING_ENVIRON_KEY] = self.server.stopping
+        return environ
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Werkzeug WSGI server handling connections on a bounded thread pool."""
+
+    multithread = True
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        app: Any,
+        threads: int = DEFAULT_THREADS,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        request_timeout: float = DEFAULT_REQUEST_TIMEOUT,
+    ) -> None:
+        self.threads = max(1, threads)
+        self.max_connections = max(self.threads, max_connections)
+        self.request_timeout = request_timeout
+        self.request_queue_size = self.max_connections
+        self.draining = False
+        self.stopping = threading.Event()
+        self.stats = {"accepted": 0, "rejected": 0}
+        self._pool = ThreadPoolExecutor(self.threads, thread_name_prefix="aircron-http")
+        self._cond = threading.Condition()
+        self._active = 0
+        self._in_flight: Set[Any] = set()
+        super().__init__(host, port, app, handler=_PooledRequestHandler)
+
+    def process_request(self, request: Any, client_address: Any) -> None:
+        with self._cond:
+            if self.draining or self._active >= self.max_connections:
+                self.stats["rejected"] += 1
+                busy = True
+            else:
+                self._active += 1
+                self._in_flight.add(request)
+                self.stats["accepted"] += 1
+                busy = False
+        if busy:
+            try:
+                request.sendall(_SERVICE_UNAVAILABLE)
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        self._pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request: Any, client_address: Any) -> None:
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self._cond:
+                self._active -= 1
+                self._in_flight.discard(request)
+                self._cond.notify_all()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "threads": self.threads,
+                "max_connections": self.max_connections,
+                "active": self._active,
+                "draining": self.draining,
+                **self.stats,
+            }
+
+    def drain(self, timeout: float = DEFAULT_DRAIN_TIMEOUT) -> bool:
+        """Stop accepting, end open event streams and let in-flight requests finish.
+
+        Connections still open after ``timeout`` are shut down. Call from a thread
+        other than the one running ``serve_forever``.
+
+        Returns:
+            True if every connection finished within ``timeout``
+        """
+        with self._cond:
+            self.draining = True
+        self.stopping.set()
+        logger.info(f"[server] Draining {self._active} connection(s)")
+        self.shutdown()
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._active:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            drained = self._active == 0
+            in_flight = list(self._in_flight)
+        if not drained:
+            # Unblock handlers stuck on socket reads/writes; the pool threads are
+            # joined at interpreter exit, so a handler that never returns would keep
+            # the process alive
+            logger.warning(
+                f"[server] Closing {len(in_flight)} connection(s) still open after {timeout:g}s"
+            )
+            for request in in_flight:
+                try:
+                    request.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self.server_close()
+        return drained
+
+
+def make_server(app: Any, host: str, port: int, config: Mapping[str, Any]) -> PooledWSGIServer:
+    """A production server for ``app`` configured from SERVER_* settings."""
+    return PooledWSGIServer(
+        host,
+        port,
+        app,
+        threads=int(config.get("SERVER_THREADS", DEFAULT_THREADS)),
+        max_connections=int(config.get("SERVER_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS)),
+        request_timeout=float(config.get("SERVER_REQUEST_TIMEOUT", DEFAULT_REQUEST_TIMEOUT)),
+    )
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def benchmark(
+    host: str,
+    port: int,
+    endpoints: Optional[List[str]] = None,
+    requests: int = 500,
+    concurrency: int = 8,
+) -> List[Dict[str, Any]]:
+    """GET each endpoint ``requests`` times from ``concurrency`` concurrent clients.
+
+    Returns:
+        One dict per endpoint with requests, errors, rps, p50_ms and p99_ms
+    """
+    results = []
+    for path in endpoints or BENCH_ENDPOINTS:
+        latencies: List[float] = []
+        errors = 0
+        lock = threading.Lock()
+        per_client = [requests // concurrency] * concurrency
+        per_client[0] += requests - sum(per_client)
+
+        def client(count: int) -> None:
+            nonlocal errors
+            for _ in range(count):
+                start = time.perf_counter()
+                conn = http.client.HTTPConnection(host, port, timeout=DEFAULT_REQUEST_TIMEOUT)
+                try:
+                    conn.request("GET", path)
+                    resp = conn.getresponse()
+                    resp.read()
+                    ok = resp.status < 500
+                except (OSError, http.client.HTTPException):
+                    ok = False
+                finally:
+                    conn.close()
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    errors += 0 if ok else 1
+
+        start = time.perf_counter()
+        workers = [threading.Thread(target=client, args=(n,)) for n in per_client if n]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        wall = time.perf_counter() - start
+        results.append(
+            {
+                "endpoint": path,
+                "requests": len(latencies),
+                "errors": errors,
+                "rps": len(latencies) / wall if wall else 0.0,
+                "p50_ms": _percentile(latencies, 50) * 1e3,
+                "p99_ms": _percentile(latencies, 99) * 1e3,
+            }
+        )
+    return results
@@ -0,0 +1,96 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from ..changefeed import change_feed
+from ..jobs_store import JobsStore
+from ..registry import get_jobs_store
+
+logger = logging.getLogger(__name__)
+
+MAX_WAIT = 30.0
+# Seconds between keep-alive comments (and external-edit checks) on an idle stream
+STREAM_HEARTBEAT = 15.0
+# Seconds an idle stream waits before checking whether it should end
+STREAM_POLL = 1.0
+
+
+def parse_cursor(value: Optional[str]) -> Tuple[Optional[str], Optional[int]]:
+    """Split a "<feed>:<rev>" or "<rev>" cursor into (feed, rev).
+
+    Raises:
+        ValueError: If the revision is not a non-negative integer
+    """
+    if value is None or value == "":
+        return None, None
+    feed, _, rev = value.rpartition(":")
+    revision = int(rev)
+    if revision < 0:
+        raise ValueError("since must be a non-negative revision")
+    return feed or None, revision
+
+
+def _check_jobs_store(store: JobsStore) -> None:
+    change_feed.note_jobs_version(store.backend.location, store.get_version())
+
+
+def get_changes(since: Optional[int], feed: Optional[str], wait: float = 0.0) -> Dict[str, Any]:
+    """Events after ``since``; with ``wait``, long-poll up to that many seconds for one.
+
+    Without ``since`` only the current revision is returned, to start following from.
+    """
+    _check_jobs_store(get_jobs_store())
+    if since is None:
+        return change_feed.since(change_feed.revision)
+    if wait > 0:
+        return change_feed.wait(since, min(wait, MAX_WAIT), feed)
+    return change_feed.since(since, feed)
+
+
+def stream_changes(
+    since: Optional[int],
+    feed: Optional[str],
+    stop: Optional[threading.Event] = None,
+    max_age: Optional[float] = None,
+) -> Iterator[Tuple[str, Any]]:
+    """Yield ``("reset", info)``, ``("change", event)`` and idle ``("heartbeat", None)``.
+
+    Starts with a ``hello`` carrying the feed id and revision when no cursor was given.
+    Ends after ``max_age`` seconds, or once ``stop`` is set, so a stream never holds
+    a server thread for good; clients reconnect from their last revision.
+    """
+    store = get_jobs_store()
+
+    def generate() -> Iterator[Tuple[str, Any]]:
+        revision, feed_id = since, feed
+        if revision is None:
+            revision = change_feed.revision
+            yield "hello", {"feed": change_feed.feed_id, "rev": revision}
+        deadline = None if max_age is None else time.monotonic() + max_age
+        _check_jobs_store(store)
+        idle_since = time.monotonic()
+        while stop is None or not stop.is_set():
+            now = time.monotonic()
+            timeout = STREAM_POLL
+            if deadline is not None:
+                if now >= deadline:
+                    return
+                timeout = min(timeout, deadline - now)
+            heartbeat_due = now - idle_since >= STREAM_HEARTBEAT
+            if heartbeat_due:
+                _check_jobs_store(store)
+            result = change_feed.wait(revision, timeout, feed_id)
+            feed_id = result["feed"]
+            if result["reset"]:
+                yield "reset", {"feed": feed_id, "rev": result["rev"]}
+            for event in result["events"]:
+                yield "change", event
+            revision = result["rev"]
+            if result["reset"] or result["events"]:
+                idle_since = time.monotonic()
+            elif heartbeat_due:
+                idle_since = time.monotonic()
+                yield "heartbeat", None
+
+    return generate()
@@ -1,11 +1,14 @@
 import logging
 import re
-import subprocess
-from typing import Any, Dict
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
-from flask import current_app
+from flask import current_app, has_app_context
 
-from .. import cronblock
+from .. import metrics
+from ..control_runs import control_runs
+from ..executor import send_request
+from ..registry import get_cron_manager
 
 logger = logging.getLogger(__name__)
 
@@ -38,13 +41,18 @@ def _validate_zone(zone: str) -> str:
     return zone
 
 
+# Receives progress/output lines while an action runs
+Progress = Callable[[str], None]
+
+
 def _get_script_path() -> str:
-    app_support_dir = current_app.config.get("APP_SUPPORT_DIR")
-    manager = cronblock.CronManager(app_support_dir)
-    return manager._get_aircron_script_path()
+    # The shared manager probes for aircron_run.sh once and caches the path
+    return get_cron_manager()._get_aircron_script_path()
 
 
-def _run_script(zone: str, action: str, arg1: str, service: str) -> None:
+def _run_script(
+    zone: str, action: str, arg1: str, service: str, progress: Optional[Progress] = None
+) -> None:
     """Run the aircron_run.sh script with sanitized arguments.
 
     Args:
@@ -52,6 +60,7 @@ def _run_script(zone: str, action: str, arg1: str, service: str) -> None:
         action: The action to perform
         arg1: First argument (e.g., playlist URI or volume)
         service: Music service (spotify or applemusic)
+        progress: Receives the script's output lines
 
     Raises:
         RuntimeError: If the script fails
@@ -63,24 +72,61 @@ def _run_script(zone: str, action: str, arg1: str, service: str) -> None:
     script = _get_script_path()
     cmd = [script, zone, action, arg1 or "", "", service]
     logger.info(f"[control_service] Running: {cmd}")
-    result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+    result = metrics.run_subprocess(
+        cmd, "aircron_run.sh", capture_output=True, text=True, timeout=30
+    )
+    if progress is not None:
+        for line in (result.stdout + result.stderr).splitlines():
+            if line.strip():
+                progress(line)
     if result.returncode != 0:
         output = "\n".join(part for part in [result.stdout.strip(), result.stderr.strip()] if part)
         raise RuntimeError(output or "Control command failed")
 
 
-def run_control_action(data: Dict[str, Any]) -> Dict[str, Any]:
-    """Run a control action with validation.
-
-    Args:
-        data: Dictionary containing action, service, zone, and args
+def _run_action(
+    zone: str, action: str, arg1: str, service: str, progress: Optional[Progress] = None
+) -> Optional[List[Dict[str, Any]]]:
+    """Run an action through the resident executor, falling back to the script.
 
     Returns:
-        Dictionary with ok status
+        Per-speaker results when the executor ran a speaker action, else None
+
+    Raises:
+        RuntimeError: If the action fails
+        ValueError: If zone validation fails
+    """
+    zone = _validate_zone(zone)
+    socket_path = current_app.config.get("EXECUTOR_SOCKET") if has_app_context() else None
+    report = progress or (lambda line: None)
+    if socket_path:
+        report(f"Sending {action} to the executor")
+        request = {"zone": zone, "action": action, "arg1": arg1 or "", "service": service}
+        try:
+            reply = send_request(socket_path, request)
+        except (ConnectionError, FileNotFoundError) as e:
+            logger.info(f"[control_service] Executor unavailable ({e}); running script")
+            report("Executor unavailable; running aircron_run.sh")
+        except (OSError, ValueError) as e:
+            # The executor took the request; re-running it via the script could double-play
+            raise RuntimeError(f"Executor error: {e}")
+        else:
+            for speaker in reply.get("speakers") or []:
+                report(f"{speaker['speaker']}: {'ok' if speaker['ok'] else speaker.get('error')}")
+            if not reply.get("ok"):
+                raise RuntimeError(reply.get("error") or "Control command failed")
+            return reply.get("speakers")
+    else:
+        report(f"Running aircron_run.sh {action}")
+    _run_script(zone, action, arg1, service, progress)
+    return None
+
+
+def _parse_control_request(data: Dict[str, Any]) -> Tuple[str, str, str, str]:
+    """Validate a control request and return (zone, action, arg1, service).
 
     Raises:
         ValueError: If validation fails
-        RuntimeError: If script execution fails
     """
     action = data.get("action")
     service = data.get("service", "spotify")
@@ -114,8 +160,76 @@ def run_control_action(data: Dict[str, Any]) -> Dict[str, Any]:
             raise ValueError("Volume must be between 0 and 100")
         arg1 = str(volume_val)
 
+    # Connect drops and re-adds the speakers; "reconnect" does both in one run
     if action == "connect":
-        _run_script(zone, "disconnect", "", service)
+        action = "reconnect"
+    return zone, action, arg1, service
+
+
+def _execute(
+    zone: str, action: str, arg1: str, service: str, progress: Optional[Progress] = None
+) -> Dict[str, Any]:
+    speakers = _run_action(zone, action, arg1, service, progress)
+    result: Dict[str, Any] = {"ok": True}
+    if speakers is not None:
+        # Partial failures don't fail the action but stay visible per speaker
+        result["speakers"] = speakers
+    return result
+
+
+def run_control_action(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a control action with validation and wait for it.
+
+    Args:
+        data: Dictionary containing action, service, zone, and args
 
-    _run_script(zone, action, arg1, service)
-    return {"ok": True}
+    Returns:
+        Dictionary with ok status
+
+    Raises:
+        ValueError: If validation fails
+        RuntimeError: If script execution fails
+    """
+    zone, action, arg1, service = _parse_control_request(data)
+    return _execute(zone, action, arg1, service)
+
+
+def start_control_action(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate a control action and run it in the background.
+
+    A request matching a run that is still queued or running returns that run.
+
+    Returns:
+        Dictionary with run_id, status and deduplicated
+
+    Raises:
+        ValueError: If validation fails
+    """
+    zone, action, arg1, service = _parse_control_request(data)
+    app = current_app._get_current_object()  # type: ignore[attr-defined]
+
+    def target(progress: Progress) -> Dict[str, Any]:
+        with app.app_context():
+            return _execute(zone, action, arg1, service, progress)
+
+    run, deduplicated = control_runs.submit((zone, action, service, arg1), target)
+    if deduplicated:
+        logger.info(f"[control_service] {action} for {zone} already in flight as {run.id}")
+    return {"run_id": run.id, "status": run.status, "deduplicated": deduplicated}
+
+
+def get_control_run(run_id: str, wait: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """State of a control run, optionally waiting up to ``wait`` seconds for it to finish."""
+    if wait:
+        return control_runs.wait(run_id, wait)
+    return control_runs.get(run_id)
+
+
+def follow_control_run(
+    run_id: str, stop: Optional[threading.Event] = None, max_age: Optional[float] = None
+) -> Iterator[Tuple[str, Any]]:
+    """Progress events for a control run, ending with its final state.
+
+    The events stop early after ``max_age`` seconds or once ``stop`` is set.
+    """
+    return control_runs.follow(run_id, stop=stop, max_age=max_age)
@@ -1,75 +1,69 @@
-import json
 import logging
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Hashable, List, Optional
 
 from flask import current_app
 
-from .. import cronblock
-from ..cronblock import _normalize_cron_line, get_cron_manager
-from ..jobs_store import Job, JobsStore
+from .. import scheduler as scheduler_module
+from ..changefeed import change_feed
+from ..jobs_store import Job
+from ..registry import get_cron_manager, get_jobs_store
+from . import jobs_service
 
 logger = logging.getLogger(__name__)
 
 
+def _uses_internal_scheduler() -> bool:
+    """True when jobs are fired by the in-process scheduler rather than crontab."""
+    return current_app.config.get("SCHEDULER_BACKEND", "cron") == "internal"
+
+
 def apply_jobs_to_cron() -> Dict[str, Any]:
     cron_manager = get_cron_manager()
-    app_support_dir = current_app.config.get("APP_SUPPORT_DIR")
-    jobs_store = JobsStore(app_support_dir)
-    jobs_file = jobs_store.jobs_file
-    if not jobs_file.exists():
-        jobs_file.touch()
-        jobs_file.write_text(json.dumps({}))
+    jobs_store = get_jobs_store()
     all_jobs = jobs_store.get_all_jobs()
     total_jobs = sum(len(jobs) for jobs in all_jobs.values())
     logger.info(
         f"[cron_service] Apply cron called with {len(all_jobs)} zones and {total_jobs} total jobs"
     )
-    cron_manager.apply_jobs_to_cron()
-    if total_jobs == 0:
+    internal = _uses_internal_scheduler()
+    # With the internal scheduler, applying clears the AirCron block so jobs don't fire twice
+    result = cron_manager.apply_jobs_to_cron(include_jobs=not internal)
+    if internal:
+        logger.info("[cron_service] Internal scheduler in use; AirCron block kept empty")
+    elif not result["changed"]:
+        logger.info("[cron_service] Crontab already up to date")
+    elif total_jobs == 0:
         logger.info("[cron_service] Successfully cleared all jobs from crontab")
     else:
         logger.info("[cron_service] Successfully applied jobs to crontab")
-    return {"ok": True}
+    change_feed.publish("cron", "apply", changed=result["changed"])
+    return {
+        "ok": True,
+        "changed": result["changed"],
+        "diff": result["diff"],
+        "scheduler_backend": "internal" if internal else "cron",
+    }
 
 
 def get_cron_status() -> Dict[str, Any]:
     cron_manager = get_cron_manager()
-    app_support_dir = current_app.config.get("APP_SUPPORT_DIR")
-    jobs_store = JobsStore(app_support_dir)
-    jobs_file = jobs_store.jobs_file
-    if not jobs_file.exists():
-        jobs_file.touch()
-        jobs_file.write_text(json.dumps({}))
-    current_lines = cron_manager._get_current_crontab()
-    has_aircron_section = False
-    current_cron_jobs = []
-    in_aircron_section = False
-    for line in current_lines:
-        line = line.strip()
-        if line == cronblock.AIRCRON_BEGIN:
-            has_aircron_section = True
-            in_aircron_section = True
-        elif line == cronblock.AIRCRON_END:
-            in_aircron_section = False
-        elif in_aircron_section and line and not line.startswith("#"):
-            current_cron_jobs.append(_normalize_cron_line(line))
-    app_support_dir = current_app.config.get("APP_SUPPORT_DIR")
-    jobs_store = JobsStore(app_support_dir)
-    all_jobs = jobs_store.get_all_jobs()
-    total_stored_jobs = sum(len(jobs) for jobs in all_jobs.values())
-    expected_cron_lines = []
-    for zone, jobs in all_jobs.items():
-        for job in jobs:
-            cron_line = cron_manager._job_to_cron_line(job)
-            if cron_line:
-                expected_cron_lines.append(_normalize_cron_line(cron_line))
+    crontab = cron_manager.get_crontab_snapshot()
+    has_aircron_section = crontab.has_section
+    current_cron_jobs = list(crontab.cron_lines)
+    # Cron lines are only recompiled for jobs that changed since the last call
+    compiled = cron_manager.compile_jobs()
+    total_stored_jobs = compiled.total_jobs
+    internal = _uses_internal_scheduler()
+    # The internal scheduler fires jobs itself, so the AirCron block should be empty
+    expected = frozenset() if internal else compiled.expected
+    expected_cron_lines = [] if internal else list(compiled.expected_lines)
     has_jobs_in_cron = len(current_cron_jobs) > 0
-    jobs_match = set(current_cron_jobs) == set(expected_cron_lines)
-    needs_apply = total_stored_jobs > 0 and not jobs_match
+    jobs_match = crontab.cron_line_set == expected
+    needs_apply = not jobs_match if internal else total_stored_jobs > 0 and not jobs_match
     # Robust desync check: jobs.json has jobs, but AirCron block is empty
     cron_desync = False
-    if total_stored_jobs > 0 and not has_jobs_in_cron:
+    if not internal and total_stored_jobs > 0 and not has_jobs_in_cron:
         cron_desync = True
         logger.warning(
             "[cron_service] Detected desync: jobs.json has jobs but AirCron block is empty!"
@@ -85,6 +79,7 @@ def get_cron_status() -> Dict[str, Any]:
         "current_cron_jobs": current_cron_jobs,
         "expected_cron_jobs": expected_cron_lines,
         "cron_desync": cron_desync,
+        "scheduler_backend": "internal" if internal else "cron",
     }
 
 
@@ -122,23 +117,14 @@ def get_cron_preview() -> Dict[str, Any]:
 
     job_details = []
 
-    # Map expected cron lines back to their job objects for rich details
-    app_support_dir = current_app.config.get("APP_SUPPORT_DIR")
+    # Map expected cron lines back to their job objects for rich details; a
+    # consolidated line yields one entry per job it fires
     cron_manager = get_cron_manager()
-    jobs_store = JobsStore(app_support_dir)
-    all_jobs = jobs_store.get_all_jobs()
-
-    expected_line_to_job = {}
-    for _, jobs in all_jobs.items():
-        for job in jobs:
-            cron_line = cron_manager._job_to_cron_line(job)
-            if cron_line:
-                normalized_line = _normalize_cron_line(cron_line)
-                expected_line_to_job[normalized_line] = job
+    compiled = cron_manager.compile_jobs()
 
     for line in lines_to_add:
-        found_job: Optional[Job] = expected_line_to_job.get(line)
-        if found_job is not None:
+        found_jobs: List[Job] = compiled.jobs_for_line(line)
+        for found_job in found_jobs:
             job_details.append(
                 {
                     "zone": found_job.zone,
@@ -147,7 +133,7 @@ def get_cron_preview() -> Dict[str, Any]:
                     "status": "will_add",
                 }
             )
-        else:
+        if not found_jobs:
             job_details.append(
                 {
                     "zone": "Unknown",
@@ -157,14 +143,15 @@ def get_cron_preview() -> Dict[str, Any]:
                 }
             )
 
+    # Installed lines name their jobs in the block's manifest comments
+    manifest = cron_manager.get_crontab_snapshot().manifest
     for line in lines_to_remove:
-        # We can't easily map a removed line back to a job if the job was deleted,
-        # so we just show the line itself.
         job_details.append(
             {
                 "zone": "Unknown",
                 "job": None,
                 "cron_line": line,
+                "job_ids": manifest.get(line, []),
                 "status": "will_remove",
             }
         )
@@ -181,21 +168,20 @@ def get_cron_preview() -> Dict[str, Any]:
     }
 
 
+def get_scheduler_status() -> Dict[str, Any]:
+    """Which scheduler fires jobs and, for the internal one, its heap and counters."""
+    backend = current_app.config.get("SCHEDULER_BACKEND", "cron")
+    running = scheduler_module.scheduler
+    return {
+        "backend": backend,
+        "running": running is not None,
+        **(running.status() if running is not None else {}),
+    }
+
+
 def get_current_cron_jobs() -> Dict[str, Any]:
     cron_manager = get_cron_manager()
-    current_lines = cron_manager._get_current_crontab()
-    aircron_lines = []
-    in_aircron_section = False
-    for line in current_lines:
-        if line.strip() == cronblock.AIRCRON_BEGIN:
-            in_aircron_section = True
-            aircron_lines.append(line)
-        elif line.strip() == cronblock.AIRCRON_END:
-            in_aircron_section = False
-            aircron_lines.append(line)
-            break
-        elif in_aircron_section:
-            aircron_lines.append(line)
+    aircron_lines = list(cron_manager.get_crontab_snapshot().block)
     return {
         "aircron_section": aircron_lines,
         "has_section": len(aircron_lines) > 0,
@@ -203,24 +189,46 @@ def get_current_cron_jobs() -> Dict[str, Any]:
     }
 
 
-def get_all_cron_jobs() -> Dict[str, Any]:
+def get_all_cron_jobs_version() -> Optional[Hashable]:
+    """Token covering everything ``get_all_cron_jobs`` depends on (None if unknown)."""
+    jobs_version = jobs_service.get_jobs_version()
+    if jobs_version is None:
+        return None
+    snapshot = get_cron_manager().get_crontab_snapshot()
+    return (jobs_version, snapshot.digest, _uses_internal_scheduler())
+
+
+def get_job_statuses() -> Dict[str, str]:
+    """Status of every stored job by id.
+
+    "applied" if its cron line is installed, else "pending"; with the internal
+    scheduler every job is "scheduled", since the AirCron block is kept empty.
+    """
     cron_manager = get_cron_manager()
-    app_support_dir = current_app.config.get("APP_SUPPORT_DIR")
-    jobs_store = JobsStore(app_support_dir)
-    all_jobs = jobs_store.get_all_jobs()
-    status_data = get_cron_status()
-    if status_data.get("error"):
-        return status_data
-    current_cron_jobs = set(status_data["current_cron_jobs"])
-    jobs_with_status: Dict[str, List[Dict[str, Any]]] = {}
-    for zone, jobs in all_jobs.items():
-        jobs_with_status[zone] = []
+    compiled = cron_manager.compile_jobs()
+    current_cron_jobs = cron_manager.get_crontab_snapshot().cron_line_set
+    internal = _uses_internal_scheduler()
+    statuses: Dict[str, str] = {}
+    for jobs in compiled.all_jobs.values():
         for job in jobs:
-            cron_line = cron_manager._job_to_cron_line(job)
+            compiled_line = compiled.lines.get(job.id)
             status = "pending"
-            if cron_line and _normalize_cron_line(cron_line) in current_cron_jobs:
+            if internal:
+                status = "scheduled"
+            elif compiled_line and compiled_line.normalized in current_cron_jobs:
                 status = "applied"
-            jobs_with_status[zone].append({**job.to_dict(), "status": status})
+            statuses[job.id] = status
+    return statuses
+
+
+def get_all_cron_jobs() -> Dict[str, Any]:
+    compiled = get_cron_manager().compile_jobs()
+    statuses = get_job_statuses()
+    jobs_with_status: Dict[str, List[Dict[str, Any]]] = {}
+    for zone, jobs in compiled.all_jobs.items():
+        jobs_with_status[zone] = [
+            {**job.to_dict(), "status": statuses.get(job.id, "pending")} for job in jobs
+        ]
     return {
         "zones": jobs_with_status,
         "total_jobs": sum(len(jobs) for jobs in jobs_with_status.values()),
@@ -1,15 +1,14 @@
 import logging
-from typing import Any, Dict, List
+from typing import Any, Dict, Hashable, List, Optional, Tuple
 
-from flask import current_app
-
-from .. import cronblock
-from ..cronblock import get_cron_manager
-from ..jobs_store import Job, JobsStore
+from ..jobs_store import Job, JobOperation
+from ..registry import get_cron_manager, get_jobs_store
 
 logger = logging.getLogger(__name__)
 
 VALID_SERVICES = ["spotify", "applemusic"]
+VALID_ACTIONS = ["play", "pause", "resume", "volume", "connect", "disconnect"]
+BATCH_OPS = ["create", "update", "delete"]
 
 
 def _validate_service(service: str) -> str:
@@ -46,19 +45,22 @@ def _normalize_volume_arg(args: Dict[str, Any]) -> int:
     return vol
 
 
+def get_jobs_version() -> Optional[Hashable]:
+    """Token that changes whenever the stored jobs change (None if unknown)."""
+    jobs_store = get_jobs_store()
+    version = jobs_store.get_version()
+    if version is None:
+        return None
+    return (str(jobs_store.backend.location), version)
+
+
 def get_jobs_for_zone(zone: str) -> List[Dict[str, Any]]:
-    app_support_dir = current_app.config.get("APP_SUPPORT_DIR")
-    jobs_store = JobsStore(app_support_dir)
+    jobs_store = get_jobs_store()
     jobs = jobs_store.get_jobs_for_zone(zone)
     return [job.to_dict() for job in jobs]
 
 
-def create_job(zone: str, data: Dict[str, Any]) -> Dict[str, Any]:
-    required_fields = ["days", "time", "action"]
-    for field in required_fields:
-        if field not in data:
-            raise ValueError(f"Missing required field: {field}")
-    time_str = data["time"]
+def _validate_time(time_str: str) -> None:
     try:
         hour, minute = time_str.split(":")
         hour = int(hour)
@@ -67,18 +69,25 @@ def create_job(zone: str, data: Dict[str, Any]) -> Dict[str, Any]:
             raise ValueError("Invalid time range")
     except (ValueError, IndexError):
         raise ValueError("Invalid time format (use HH:MM)")
-    days = [int(day) for day in data["days"]]
+
+
+def _validate_days(raw_days: Any, range_message: str) -> List[int]:
+    try:
+        days = [int(day) for day in raw_days]
+    except (TypeError, ValueError):
+        raise ValueError(range_message)
     if not isinstance(days, list) or not days:
         raise ValueError("Days must be a non-empty list")
     for day in days:
         if not isinstance(day, int) or day < 1 or day > 7:
-            raise ValueError("Days must be integers 1-7 (1=Monday, 7=Sunday)")
-    action = data["action"]
-    valid_actions = ["play", "pause", "resume", "volume", "connect", "disconnect"]
-    if action not in valid_actions:
-        raise ValueError(f"Invalid action. Must be one of: {valid_actions}")
-    args = data.get("args", {})
-    service = _validate_service(data.get("service", "spotify"))
+            raise ValueError(range_message)
+    return days
+
+
+def _validate_action(action: str, args: Dict[str, Any], service: str) -> None:
+    """Check the action and its service-specific args, normalizing volume in place."""
+    if action not in VALID_ACTIONS:
+        raise ValueError(f"Invalid action. Must be one of: {VALID_ACTIONS}")
 
     if action == "play":
         if service == "spotify":
@@ -95,14 +104,34 @@ def create_job(zone: str, data: Dict[str, Any]) -> Dict[str, Any]:
     if action == "volume":
         _normalize_volume_arg(args)
 
-    cron_manager = get_cron_manager()
-    if not cron_manager.validate_cron_syntax(time_str, days):
+
+def _validate_cron_syntax(job: Job, checked: Optional[Dict[Tuple, bool]] = None) -> None:
+    """Run the croniter check, at most once per distinct (time, days) when ``checked`` is given."""
+    key = (job.time, tuple(job.days))
+    valid = checked.get(key) if checked is not None else None
+    if valid is None:
+        valid = get_cron_manager().validate_cron_syntax(job.time, job.days)
+        if checked is not None:
+            checked[key] = valid
+    if not valid:
         raise ValueError("Invalid cron syntax")
 
-    app_support_dir = current_app.config.get("APP_SUPPORT_DIR")
-    jobs_store = JobsStore(app_support_dir)
-    job_id = jobs_store.create_job_id()
-    job = Job(
+
+def _build_new_job(job_id: str, zone: str, data: Dict[str, Any]) -> Job:
+    required_fields = ["days", "time", "action"]
+    for field in required_fields:
+        if field not in data:
+            raise ValueError(f"Missing required field: {field}")
+    time_str = data["time"]
+    _validate_time(time_str)
+    days = _validate_days(data["days"], "Days must be integers 1-7 (1=Monday, 7=Sunday)")
+    action = data["action"]
+    if action not in VALID_ACTIONS:
+        raise ValueError(f"Invalid action. Must be one of: {VALID_ACTIONS}")
+    args = data.get("args", {})
+    service = _validate_service(data.get("service", "spotify"))
+    _validate_action(action, args, service)
+    return Job(
         job_id=job_id,
         zone=zone,
         days=days,
@@ -112,68 +141,24 @@ def create_job(zone: str, data: Dict[str, Any]) -> Dict[str, Any]:
         label=data.get("label", ""),
         service=service,
     )
-    jobs_store.add_job(job)
-    logger.info(f"[jobs_service] Created job {job_id} for zone {zone}")
-    return job.to_dict()
 
 
-def update_job(zone: str, job_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
-    app_support_dir = current_app.config.get("APP_SUPPORT_DIR")
-    jobs_store = JobsStore(app_support_dir)
-    existing_jobs = jobs_store.get_jobs_for_zone(zone)
-    existing_job = None
-    for job in existing_jobs:
-        if job.id == job_id:
-            existing_job = job
-            break
-    if not existing_job:
-        raise ValueError("Job not found")
+def _build_updated_job(existing_job: Job, zone: str, data: Dict[str, Any]) -> Job:
     if "time" in data:
-        time_str = data["time"]
-        try:
-            hour, minute = time_str.split(":")
-            hour = int(hour)
-            minute = int(minute)
-            if not (0 <= hour <= 23) or not (0 <= minute <= 59):
-                raise ValueError("Invalid time range")
-        except (ValueError, IndexError):
-            raise ValueError("Invalid time format (use HH:MM)")
+        _validate_time(data["time"])
     if "days" in data:
-        days = [int(day) for day in data["days"]]
-        if not isinstance(days, list) or not days:
-            raise ValueError("Days must be a non-empty list")
-        for day in days:
-            if not isinstance(day, int) or day < 1 or day > 7:
-                raise ValueError("Days must be integers 1-7")
+        days = _validate_days(data["days"], "Days must be integers 1-7")
     else:
         days = existing_job.days
     action = data.get("action", existing_job.action)
-    args = data.get("args", existing_job.args)
+    # Copy so normalization below never mutates the store's cached Job
+    args = dict(data.get("args", existing_job.args))
     label = data.get("label", getattr(existing_job, "label", ""))
     time_val = data.get("time", existing_job.time)
     service = _validate_service(data.get("service", getattr(existing_job, "service", "spotify")))
-
-    valid_actions = ["play", "pause", "resume", "volume", "connect", "disconnect"]
-    if action not in valid_actions:
-        raise ValueError(f"Invalid action. Must be one of: {valid_actions}")
-
-    if action == "play":
-        if service == "spotify":
-            if "uri" not in args or not args["uri"]:
-                raise ValueError("Play action for Spotify requires 'uri' in args")
-        elif service == "applemusic":
-            if "playlist" not in args or not args["playlist"]:
-                raise ValueError("Play action for Apple Music requires 'playlist' in args")
-    elif action == "volume" and "volume" not in args:
-        raise ValueError("Volume action requires 'volume' in args")
-    elif action in ["connect", "disconnect"]:
-        if not service or service.strip() == "":
-            raise ValueError(f"{action.title()} action requires a valid 'service' to be specified")
-    if action == "volume":
-        _normalize_volume_arg(args)
-
-    updated_job = Job(
-        job_id=job_id,
+    _validate_action(action, args, service)
+    return Job(
+        job_id=existing_job.id,
         zone=data.get("zone", zone),
         days=days,
         time=time_val,
@@ -183,32 +168,142 @@ def update_job(zone: str, job_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
         service=service,
     )
 
-    cron_manager = get_cron_manager()
-    if not cron_manager.validate_cron_syntax(updated_job.time, updated_job.days):
-        raise ValueError("Invalid cron syntax")
 
-    # If zone changed, remove from old zone and add to new zone
-    new_zone = data.get("zone", zone)
+def create_job(zone: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    jobs_store = get_jobs_store()
+    job = _build_new_job(jobs_store.create_job_id(), zone, data)
+    _validate_cron_syntax(job)
+    jobs_store.add_job(job)
+    logger.info(f"[jobs_service] Created job {job.id} for zone {zone}")
+    return job.to_dict()
+
+
+def update_job(zone: str, job_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    jobs_store = get_jobs_store()
+    existing_job = jobs_store.get_job(zone, job_id)
+    if not existing_job:
+        raise ValueError("Job not found")
+    updated_job = _build_updated_job(existing_job, zone, data)
+    _validate_cron_syntax(updated_job)
+
+    # A zone change moves the job atomically, as batch updates do
+    new_zone = updated_job.zone
+    jobs_store.update_job(updated_job, zone)
     if new_zone != zone:
-        jobs_store.delete_job(zone, job_id)
-        jobs_store.add_job(updated_job)
         logger.info(f"[jobs_service] Moved job {job_id} from zone {zone} to {new_zone}")
     else:
-        jobs_store.update_job(updated_job)
         logger.info(f"[jobs_service] Updated job {job_id} in zone {zone}")
     return updated_job.to_dict()
 
 
 def delete_job(zone: str, job_id: str) -> None:
-    app_support_dir = current_app.config.get("APP_SUPPORT_DIR")
-    jobs_store = JobsStore(app_support_dir)
+    jobs_store = get_jobs_store()
     jobs_store.delete_job(zone, job_id)
     logger.info(f"[jobs_service] Deleted job {job_id} from zone {zone}")
 
 
+def apply_batch(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply many creates, updates and deletes, across zones, in one commit.
+
+    ``data["operations"]`` is a list of items shaped like:
+
+    - ``{"op": "create", "zone": ..., "job": {...}}``
+    - ``{"op": "update", "zone": ..., "id": ..., "job": {...}}`` (partial; may set "zone")
+    - ``{"op": "delete", "zone": ..., "id": ...}``
+
+    Every item is validated first (the cron syntax check runs once per distinct
+    time/days pair), then all valid items go to the store as one batch. With
+    ``atomic`` (the default) nothing is saved unless every item succeeds.
+    Returns ``{"committed", "atomic", "applied", "results"}`` where each result has
+    a ``status`` of "applied", "failed" (with an ``error``) or "rolled_back".
+    """
+    operations = data.get("operations")
+    if not isinstance(operations, list) or not operations:
+        raise ValueError("Operations must be a non-empty list")
+    atomic = bool(data.get("atomic", True))
+
+    jobs_store = get_jobs_store()
+    cron_checked: Dict[Tuple, bool] = {}
+    new_ids = set()
+    results: List[Dict[str, Any]] = []
+    store_operations: List[JobOperation] = []
+    store_indexes: List[int] = []
+
+    for index, item in enumerate(operations):
+        result: Dict[str, Any] = {"index": index, "op": None}
+        results.append(result)
+        try:
+            if not isinstance(item, dict):
+                raise ValueError("Operation must be an object")
+            op = item.get("op")
+            result["op"] = op
+            if op not in BATCH_OPS:
+                raise ValueError(f"Invalid op. Must be one of: {BATCH_OPS}")
+            zone = item.get("zone")
+            if not zone:
+                raise ValueError("Missing required field: zone")
+
+            if op == "delete":
+                operation = JobOperation.delete(zone, _require_id(item))
+            elif op == "create":
+                job_id = jobs_store.create_job_id()
+                while job_id in new_ids:
+                    job_id = jobs_store.create_job_id()
+                new_ids.add(job_id)
+                job = _build_new_job(job_id, zone, item.get("job") or {})
+                _validate_cron_syntax(job, cron_checked)
+                operation = JobOperation.add(job)
+            else:
+                job_id = _require_id(item)
+                existing_job = jobs_store.get_job(zone, job_id)
+                if not existing_job:
+                    raise ValueError("Job not found")
+                job = _build_updated_job(existing_job, zone, item.get("job") or {})
+                _validate_cron_syntax(job, cron_checked)
+                operation = JobOperation.update(zone, job)
+        except (TypeError, ValueError) as e:
+            result.update(status="failed", error=str(e))
+            continue
+        result["id"] = operation.job_id
+        if operation.job is not None:
+            result["job"] = operation.job.to_dict()
+        store_operations.append(operation)
+        store_indexes.append(index)
+
+    invalid = any(result.get("status") == "failed" for result in results)
+    if atomic and invalid:
+        errors: List[Optional[str]] = [None] * len(store_operations)
+        committed = False
+    else:
+        errors = jobs_store.apply_batch(store_operations, atomic=atomic) if store_operations else []
+        committed = not (atomic and any(errors))
+
+    for index, error in zip(store_indexes, errors):
+        if error is not None:
+            results[index].update(status="failed", error=error)
+        else:
+            results[index]["status"] = "applied" if committed else "rolled_back"
+    for result in results:
+        if result.get("status") != "applied":
+            result.pop("job", None)
+
+    applied = sum(1 for result in results if result["status"] == "applied")
+    logger.info(
+        f"[jobs_service] Batch of {len(operations)} operations: {applied} applied, "
+        f"committed={committed}"
+    )
+    return {"committed": committed, "atomic": atomic, "applied": applied, "results": results}
+
+
+def _require_id(item: Dict[str, Any]) -> str:
+    job_id = item.get("id")
+    if not job_id:
+        raise ValueError("Missing required field: id")
+    return job_id
+
+
 def get_all_jobs_flat() -> List[Dict[str, Any]]:
-    app_support_dir = current_app.config.get("APP_SUPPORT_DIR")
-    jobs_store = JobsStore(app_support_dir)
+    jobs_store = get_jobs_store()
     all_jobs = jobs_store.get_all_jobs()
     jobs_flat = []
     for zone, jobs in all_jobs.items():
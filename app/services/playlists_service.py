@@ -1,13 +1,16 @@
 import json
 import logging
+import os
 import re
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, cast
+from typing import Any, Dict, Hashable, List, cast
 from uuid import uuid4
 
 from flask import current_app
 
+from ..changefeed import change_feed
+
 logger = logging.getLogger(__name__)
 
 
@@ -16,6 +19,16 @@ def _get_playlists_file() -> Path:
     return Path(app_support_dir) / "playlists.json"
 
 
+def get_playlists_version() -> Hashable:
+    """Token that changes whenever playlists.json does."""
+    playlists_file = _get_playlists_file()
+    try:
+        st = os.stat(playlists_file)
+    except FileNotFoundError:
+        return (str(playlists_file), None)
+    return (str(playlists_file), st.st_ino, st.st_mtime_ns, st.st_size)
+
+
 def list_playlists() -> List[Dict[str, Any]]:
     playlists_file = _get_playlists_file()
     if not playlists_file.exists():
@@ -107,6 +120,7 @@ def create_playlist(data: Dict[str, Any]) -> Dict[str, Any]:
     with playlists_file.open("w") as f:
         json.dump(playlists_data, f, indent=2)
     logger.info(f"Created playlist: {new_playlist['name']} ({service})")
+    change_feed.publish("playlist", "put", id=new_playlist["id"], playlist=new_playlist)
     return new_playlist
 
 
@@ -153,6 +167,7 @@ def update_playlist(playlist_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
     with playlists_file.open("w") as f:
         json.dump(playlists_data, f, indent=2)
     logger.info(f"Updated playlist: {playlist_to_update['name']} ({service})")
+    change_feed.publish("playlist", "put", id=playlist_id, playlist=playlist_to_update)
     return cast(Dict[str, Any], playlist_to_update)
 
 
@@ -169,4 +184,5 @@ def delete_playlist(playlist_id: str) -> Dict[str, Any]:
     with playlists_file.open("w") as f:
         json.dump(playlists_data, f, indent=2)
     logger.info(f"Deleted playlist: {playlist_id}")
+    change_feed.publish("playlist", "delete", id=playlist_id)
     return {"ok": True}
@@ -0,0 +1,31 @@
+import logging
+from typing import Any, Dict, Hashable, List, Optional
+
+from ..runlog import RECENT_RUNS, run_stats
+
+logger = logging.getLogger(__name__)
+
+
+def get_runs_version() -> Optional[Hashable]:
+    """Stat key of the run log, for conditional GETs."""
+    return run_stats.version()
+
+
+def get_run_stats() -> Dict[str, Any]:
+    """Latency histograms and failure rates per action, speaker and step."""
+    return run_stats.snapshot()
+
+
+def get_recent_runs(limit: int = 50, job_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """The most recent run records, newest first, optionally for one job.
+
+    Raises:
+        ValueError: If limit is not between 1 and RECENT_RUNS
+    """
+    if not 1 <= limit <= RECENT_RUNS:
+        raise ValueError(f"limit must be between 1 and {RECENT_RUNS}")
+    runs = run_stats.recent(RECENT_RUNS)
+    if job_id:
+        # A cron line shared by several jobs logs all their ids, comma-separated
+        runs = [run for run in runs if job_id in str(run.get("job_id") or "").split(",")]
+    return runs[:limit]
@@ -11,7 +11,11 @@ def list_speakers() -> List[str]:
     return speaker_discovery.get_available_speakers()
 
 
+def get_speaker_cache_status() -> Dict[str, Any]:
+    return speaker_discovery.get_cache_status()
+
+
 def refresh_speakers() -> Dict[str, Any]:
     logger.info("[speakers_service] Refreshing speakers")
     speakers = speaker_discovery.refresh_speakers()
-    return {"speakers": speakers, "refreshed": True}
+    return {"speakers": speakers, "refreshed": True, **speaker_discovery.get_cache_status()}
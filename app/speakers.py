@@ -2,19 +2,157 @@
 
 import logging
 import subprocess
-from typing import List
+import threading
+import time
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from . import metrics, profiling
 
 logger = logging.getLogger(__name__)
 
 
 class SpeakerDiscovery:
-    """Handles discovery of connected Airfoil speakers."""
+    """Handles discovery of connected Airfoil speakers.
+
+    The speaker list is kept in a cache that a background worker refreshes every
+    ``refresh_interval`` seconds. Reads never run AppleScript: they return the
+    cached list immediately and, if it is older than ``ttl`` seconds, ask the
+    worker to refresh it (stale-while-revalidate). Failed refreshes keep the last
+    good list and record ``last_error``. Whether Airfoil is running is cached and
+    re-checked by the same worker, so status reads don't run AppleScript either.
+    """
+
+    DEFAULT_TTL = 60.0
+    DEFAULT_REFRESH_INTERVAL = 30.0
+    # Age after which a status read asks the worker to re-check Airfoil
+    AIRFOIL_STATUS_TTL = 5.0
 
-    def __init__(self) -> None:
+    def __init__(
+        self, ttl: float = DEFAULT_TTL, refresh_interval: float = DEFAULT_REFRESH_INTERVAL
+    ) -> None:
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
         self.last_speakers: List[str] = []
+        self.last_updated: Optional[float] = None  # time.time() of the last good refresh
+        self.last_error: Optional[str] = None
+        self.last_error_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._refresh_done = threading.Condition(self._lock)
+        self._refreshing = False
+        self._wake = threading.Event()
+        self._speakers_wanted = False
+        self._worker: Optional[threading.Thread] = None
+        self._airfoil_status: Optional[Tuple[float, bool]] = None  # (monotonic, running)
+        self._checking_airfoil = False
+
+    def configure(self, config: Mapping[str, Any]) -> None:
+        """Apply SPEAKER_CACHE_TTL / SPEAKER_REFRESH_INTERVAL from app config."""
+        self.ttl = float(config.get("SPEAKER_CACHE_TTL", self.ttl))
+        self.refresh_interval = float(config.get("SPEAKER_REFRESH_INTERVAL", self.refresh_interval))
+
+    def start(self) -> None:
+        """Start the background refresh worker (no-op if running or the interval is 0)."""
+        with self._lock:
+            if self.refresh_interval <= 0 or (self._worker and self._worker.is_alive()):
+                return
+            self._worker = threading.Thread(target=self._run, name="speaker-discovery", daemon=True)
+            self._worker.start()
+        logger.info(f"Speaker discovery worker started (every {self.refresh_interval:g}s)")
+
+    def _run(self) -> None:
+        next_refresh = 0.0
+        while True:
+            # Woken only for the Airfoil status, the speaker list keeps its schedule
+            if self._speakers_wanted or time.monotonic() >= next_refresh:
+                self._speakers_wanted = False
+                self._refresh()
+                next_refresh = time.monotonic() + self.refresh_interval
+            self._check_airfoil()
+            self._wake.wait(max(0.0, next_refresh - time.monotonic()))
+            self._wake.clear()
+
+    def cache_age(self) -> Optional[float]:
+        """Seconds since the last successful refresh, or None if there hasn't been one."""
+        if self.last_updated is None:
+            return None
+        return max(0.0, time.time() - self.last_updated)
+
+    def is_stale(self) -> bool:
+        age = self.cache_age()
+        return age is None or age > self.ttl
+
+    def request_refresh(self) -> None:
+        """Refresh in the background without waiting for the result."""
+        if self._worker and self._worker.is_alive():
+            self._speakers_wanted = True
+            self._wake.set()
+            return
+        with self._lock:
+            if self._refreshing:
+                return
+        threading.Thread(target=self._refresh, name="speaker-refresh", daemon=True).start()
+
+    def request_airfoil_check(self) -> None:
+        """Re-check whether Airfoil is running in the background."""
+        if self._worker and self._worker.is_alive():
+            self._wake.set()
+            return
+        with self._lock:
+            if self._checking_airfoil:
+                return
+        threading.Thread(target=self._check_airfoil, name="airfoil-check", daemon=True).start()
 
+    @profiling.traced("speakers:list")
     def get_available_speakers(self) -> List[str]:
-        """Get list of all available speakers from Airfoil via AppleScript."""
+        """Get the cached list of available speakers, never blocking on AppleScript."""
+        speakers = list(self.last_speakers) or ["All Speakers"]
+        stale = self.is_stale()
+        metrics.cache_lookup("speakers", not stale)
+        if stale:
+            self.request_refresh()
+        return speakers
+
+    def get_cache_status(self) -> Dict[str, Any]:
+        """Describe the speaker cache for API responses."""
+        age = self.cache_age()
+        return {
+            "age_seconds": round(age, 1) if age is not None else None,
+            "stale": self.is_stale(),
+            "refreshing": self._refreshing,
+            "last_error": self.last_error,
+            "last_error_at": self.last_error_at,
+        }
+
+    def _refresh(self) -> List[str]:
+        """Run discovery now, or wait for the refresh already in flight."""
+        with self._lock:
+            if self._refreshing:
+                while self._refreshing:
+                    self._refresh_done.wait()
+                return list(self.last_speakers) or ["All Speakers"]
+            self._refreshing = True
+        try:
+            speakers = self._discover_speakers()
+            self.last_speakers = speakers
+            self.last_updated = time.time()
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            self.last_error_at = time.time()
+            if self.last_speakers:
+                logger.info("Using cached speaker list due to discovery error")
+        finally:
+            with self._lock:
+                self._refreshing = False
+                self._refresh_done.notify_all()
+        return list(self.last_speakers) or ["All Speakers"]
+
+    def _discover_speakers(self) -> List[str]:
+        """Get list of all available speakers from Airfoil via AppleScript.
+
+        Raises:
+            RuntimeError: If AppleScript fails or times out
+        """
         applescript = """
         tell application "Airfoil"
             try
@@ -31,41 +169,34 @@ class SpeakerDiscovery:
         """
 
         try:
-            result = subprocess.run(
-                ["osascript", "-e", applescript], capture_output=True, text=True, timeout=10
+            result = metrics.run_subprocess(
+                ["osascript", "-e", applescript],
+                "osascript speakers",
+                capture_output=True,
+                text=True,
+                timeout=10,
             )
-
-            if result.returncode == 0:
-                # Parse newline-delimited output (preserves commas in names)
-                output = result.stdout.strip()
-                if output:
-                    speakers = [s.strip() for s in output.splitlines() if s.strip()]
-                    if speakers:
-                        # Always include "All Speakers" as first option
-                        all_speakers = ["All Speakers"] + speakers
-                        self.last_speakers = all_speakers
-                        logger.info(f"Found {len(speakers)} available speakers")
-                        return all_speakers
-
-                # No speakers found
-                self.last_speakers = ["All Speakers"]
-                logger.warning("No available speakers found")
-                return ["All Speakers"]
-
-            else:
-                logger.error(f"AppleScript error: {result.stderr}")
-                # Return cached speakers if available
-                if self.last_speakers:
-                    logger.info("Using cached speaker list due to AppleScript error")
-                    return self.last_speakers
-                return ["All Speakers"]
-
         except subprocess.TimeoutExpired:
             logger.error("AppleScript timeout")
-            return self.last_speakers or ["All Speakers"]
+            raise RuntimeError("AppleScript timeout")
         except Exception as e:
             logger.error(f"Error getting speakers: {e}")
-            return self.last_speakers or ["All Speakers"]
+            raise RuntimeError(f"Error getting speakers: {e}")
+
+        if result.returncode != 0:
+            logger.error(f"AppleScript error: {result.stderr}")
+            raise RuntimeError(f"AppleScript error: {result.stderr.strip()}")
+
+        # Parse newline-delimited output (preserves commas in names)
+        output = result.stdout.strip()
+        speakers = [s.strip() for s in output.splitlines() if s.strip()]
+        if not speakers:
+            logger.warning("No available speakers found")
+            return ["All Speakers"]
+
+        # Always include "All Speakers" as first option
+        logger.info(f"Found {len(speakers)} available speakers")
+        return ["All Speakers"] + speakers
 
     def is_airfoil_running(self) -> bool:
         """Check if Airfoil application is running."""
@@ -76,22 +207,55 @@ class SpeakerDiscovery:
         """
 
         try:
-            result = subprocess.run(
-                ["osascript", "-e", applescript], capture_output=True, text=True, timeout=5
+            result = metrics.run_subprocess(
+                ["osascript", "-e", applescript],
+                "osascript airfoil_status",
+                capture_output=True,
+                text=True,
+                timeout=5,
             )
             return result.returncode == 0 and "true" in result.stdout.lower()
         except Exception as e:
             logger.error(f"Error checking Airfoil status: {e}")
             return False
 
+    def _check_airfoil(self) -> bool:
+        """Check whether Airfoil is running now and cache the answer."""
+        with self._lock:
+            if self._checking_airfoil:
+                cached = self._airfoil_status
+                return cached[1] if cached else False
+            self._checking_airfoil = True
+        try:
+            running = self.is_airfoil_running()
+            self._airfoil_status = (time.monotonic(), running)
+        finally:
+            with self._lock:
+                self._checking_airfoil = False
+        return running
+
+    @profiling.traced("speakers:airfoil_status")
+    def get_airfoil_running(self, max_age: float = AIRFOIL_STATUS_TTL) -> bool:
+        """Whether Airfoil is running, from the cache; never runs AppleScript.
+
+        An answer missing or older than ``max_age`` seconds asks for a background
+        re-check and the last known answer (False if none) is returned meanwhile.
+        """
+        cached = self._airfoil_status
+        fresh = cached is not None and time.monotonic() - cached[0] < max_age
+        metrics.cache_lookup("airfoil_status", fresh)
+        if not fresh:
+            self.request_airfoil_check()
+        return cached[1] if cached is not None else False
+
     def refresh_speakers(self) -> List[str]:
-        """Force refresh of speaker list."""
+        """Force an immediate refresh of the speaker list and wait for the result."""
         logger.info("Refreshing speaker list")
-        if not self.is_airfoil_running():
+        if not self._check_airfoil():
             logger.warning("Airfoil is not running")
             # Still try to get speakers in case it starts
 
-        return self.get_available_speakers()
+        return self._refresh()
 
     def get_connected_speakers(self) -> List[str]:
         """Get list of currently connected speakers from Airfoil via AppleScript."""
@@ -111,8 +275,12 @@ class SpeakerDiscovery:
         """
 
         try:
-            result = subprocess.run(
-                ["osascript", "-e", applescript], capture_output=True, text=True, timeout=10
+            result = metrics.run_subprocess(
+                ["osascript", "-e", applescript],
+                "osascript connected_speakers",
+                capture_output=True,
+                text=True,
+                timeout=10,
             )
 
             if result.returncode == 0:
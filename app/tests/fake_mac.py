@@ -0,0 +1,489 @@
+"""A simulated Mac for tests and load tests: osascript, crontab, spotify, pgrep and open.
+
+``FakeMac(root).install()`` writes the tools to ``root/bin`` and ``env()`` puts
+them first on PATH. The tools share one simulated machine kept in
+``root/state.json``:
+
+- Airfoil's speakers (connected, volume 0-1) and audio source,
+- Music's AirPlay devices (selected, volume 0-100), volume, player state and playlist,
+- Spotify's player state, URI and volume,
+- which apps are running (``pgrep``/``open``) and the user's crontab.
+
+The fake osascript understands the AppleScript AirCron sends (``app/applescript.py``,
+``app/speakers.py`` and ``aircron_run.sh``), not AppleScript in general; anything
+else fails, so a new script shows up as a test failure rather than a silent no-op.
+
+Faults are set per tool: a latency with jitter, a failure rate and a number of
+upcoming calls that fail. A speaker can be made unreachable, failing anything
+done to it. Every invocation is appended to ``root/calls.jsonl`` with its
+arguments, start and end times, exit code and what it did.
+
+The tools run this file directly (``python fake_mac.py TOOL ARGS...``), so it
+only uses the standard library.
+"""
+
+import fcntl
+import json
+import os
+import random
+import re
+import shlex
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+TOOLS = ("osascript", "crontab", "spotify", "pgrep", "open")
+ROOT_ENV = "FAKE_MAC_DIR"
+DEFAULT_SPEAKERS = ("Kitchen", "Patio", "Office")
+APPS = ("Airfoil", "Music", "Spotify")
+
+State = Dict[str, Any]
+# stdout, stderr, exit code, what the call did
+Outcome = Tuple[str, str, int, Dict[str, Any]]
+
+_STRING = re.compile(r'"((?:[^"\\]|\\.)*)"')
+
+
+class ScriptError(Exception):
+    """An AppleScript execution error, reported on stderr with exit code 1."""
+
+
+def default_state(speakers: Sequence[str] = DEFAULT_SPEAKERS) -> State:
+    return {
+        "apps": {app: True for app in APPS},
+        "airfoil": {
+            "source": None,
+            "speakers": {
+                name: {"connected": False, "volume": 0.5, "reachable": True} for name in speakers
+            },
+        },
+        "music": {
+            "state": "stopped",
+            "playlist": None,
+            "volume": 50,
+            "devices": {
+                name: {"selected": False, "volume": 50, "reachable": True} for name in speakers
+            },
+        },
+        "spotify": {"state": "stopped", "uri": None, "volume": 50},
+        "crontab": None,
+        "faults": {},
+    }
+
+
+class FakeMac:
+    """The simulated machine's files, and helpers to set it up and inspect it."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = Path(root)
+        self.bin_dir = self.root / "bin"
+        self.state_path = self.root / "state.json"
+        self.calls_path = self.root / "calls.jsonl"
+        self._lock_path = self.root / "state.lock"
+
+    def install(
+        self, speakers: Sequence[str] = DEFAULT_SPEAKERS, latency: float = 0.0
+    ) -> "FakeMac":
+        """Write the tools and a fresh state; ``latency`` applies to osascript and spotify."""
+        self.bin_dir.mkdir(parents=True, exist_ok=True)
+        for tool in TOOLS:
+            path = self.bin_dir / tool
+            path.write_text(
+                "#!/bin/sh\n"
+                f'exec {shlex.quote(sys.executable)} -S {shlex.quote(__file__)} {tool} "$@"\n'
+            )
+            path.chmod(0o755)
+        self._save(default_state(speakers))
+        self.calls_path.unlink(missing_ok=True)
+        for tool in ("osascript", "spotify"):
+            self.set_latency(tool, latency)
+        return self
+
+    def env(self) -> Dict[str, str]:
+        """Environment running AirCron against the simulated machine."""
+        return {
+            "PATH": f"{self.bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+            ROOT_ENV: str(self.root),
+            "AIRCRON_OSASCRIPT": str(self.bin_dir / "osascript"),
+        }
+
+    # ── State ────────────────────────────────────────────────────────────
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with open(self._lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _load(self) -> State:
+        return json.loads(self.state_path.read_text())
+
+    def _save(self, state: State) -> None:
+        tmp = self.state_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(state, indent=1))
+        os.replace(tmp, self.state_path)
+
+    def state(self) -> State:
+        with self._locked():
+            return self._load()
+
+    @contextmanager
+    def edit(self) -> Iterator[State]:
+        """Change the state in a ``with`` block; it is saved when the block exits."""
+        with self._locked():
+            state = self._load()
+            yield state
+            self._save(state)
+
+    @property
+    def crontab(self) -> Optional[str]:
+        return self.state()["crontab"]
+
+    def set_reachable(self, speaker: str, reachable: bool) -> None:
+        with self.edit() as state:
+            for device in (state["airfoil"]["speakers"], state["music"]["devices"]):
+                if speaker in device:
+                    device[speaker]["reachable"] = reachable
+
+    # ── Faults ───────────────────────────────────────────────────────────
+
+    def _fault(self, state: State, tool: str) -> Dict[str, Any]:
+        fault = state["faults"].setdefault(tool, {})
+        fault.setdefault("latency", 0.0)
+        fault.setdefault("jitter", 0.0)
+        fault.setdefault("fail_rate", 0.0)
+        fault.setdefault("fail_next", 0)
+        fault.setdefault("message", f"{tool}: injected failure")
+        fault.setdefault("exit_code", 1)
+        return fault
+
+    def set_latency(self, tool: str, seconds: float, jitter: float = 0.0) -> None:
+        """Make each call take ``seconds`` plus up to ``jitter`` more."""
+        with self.edit() as state:
+            self._fault(state, tool).update(latency=seconds, jitter=jitter)
+
+    def fail(
+        self, tool: str, times: int = 1, message: Optional[str] = None, exit_code: int = 1
+    ) -> None:
+        """Make the next ``times`` calls fail without doing anything."""
+        with self.edit() as state:
+            fault = self._fault(state, tool)
+            fault.update(fail_next=times, exit_code=exit_code)
+            if message:
+                fault["message"] = message
+
+    def set_fail_rate(self, tool: str, rate: float, message: Optional[str] = None) -> None:
+        """Make each call fail with probability ``rate``."""
+        with self.edit() as state:
+            fault = self._fault(state, tool)
+            fault["fail_rate"] = rate
+            if message:
+                fault["message"] = message
+
+    def _take_fault(self, tool: str) -> Tuple[float, Optional[Dict[str, Any]]]:
+        """The delay for this call, and the fault to report if it fails."""
+        with self.edit() as state:
+            fault = self._fault(state, tool)
+            delay = fault["latency"] + random.uniform(0, fault["jitter"])
+            if fault["fail_next"] > 0:
+                fault["fail_next"] -= 1
+                return delay, dict(fault)
+            if fault["fail_rate"] and random.random() < fault["fail_rate"]:
+                return delay, dict(fault)
+            return delay, None
+
+    # ── Calls ────────────────────────────────────────────────────────────
+
+    def calls(self, tool: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Recorded invocations in the order they finished, optionally for one tool."""
+        if not self.calls_path.exists():
+            return []
+        records = [json.loads(line) for line in self.calls_path.read_text().splitlines()]
+        return [r for r in records if tool is None or r["tool"] == tool]
+
+    def call_count(self, tool: Optional[str] = None) -> int:
+        return len(self.calls(tool))
+
+    def clear_calls(self) -> None:
+        self.calls_path.unlink(missing_ok=True)
+
+    def _record(self, record: Dict[str, Any]) -> None:
+        # One write per line on an O_APPEND file, so concurrent tools don't interleave
+        fd = os.open(self.calls_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, (json.dumps(record) + "\n").encode())
+        finally:
+            os.close(fd)
+
+    def run_tool(self, tool: str, args: List[str], stdin: str) -> Outcome:
+        """Run one invocation of ``tool`` against the state."""
+        start = time.time()
+        delay, fault = self._take_fault(tool)
+        if delay:
+            time.sleep(delay)
+        if fault:
+            outcome: Outcome = ("", fault["message"] + "\n", fault["exit_code"], {"op": "fault"})
+        else:
+            with self.edit() as state:
+                outcome = HANDLERS[tool](state, args, stdin)
+        end = time.time()
+        self._record(
+            {
+                "tool": tool,
+                "args": args,
+                "pid": os.getpid(),
+                "start": start,
+                "end": end,
+                "duration_ms": round((end - start) * 1000, 3),
+                "exit_code": outcome[2],
+                **outcome[3],
+            }
+        )
+        return outcome
+
+
+# ── crontab, spotify, pgrep, open ────────────────────────────────────────
+
+
+def _crontab(state: State, args: List[str], stdin: str) -> Outcome:
+    if args == ["-l"]:
+        if state["crontab"] is None:
+            return "", "crontab: no crontab for user\n", 1, {"op": "list"}
+        return state["crontab"], "", 0, {"op": "list"}
+    if args == ["-r"]:
+        state["crontab"] = None
+        return "", "", 0, {"op": "remove"}
+    if len(args) > 1 or (args and args[0].startswith("-") and args[0] != "-"):
+        return "", f"crontab: unsupported arguments {args}\n", 1, {"op": "error"}
+    if args and args[0] != "-":
+        try:
+            stdin = Path(args[0]).read_text()
+        except OSError as e:
+            return "", f"crontab: {e}\n", 1, {"op": "error"}
+    state["crontab"] = stdin
+    return "", "", 0, {"op": "install", "lines": len(stdin.splitlines())}
+
+
+def _spotify(state: State, args: List[str], stdin: str) -> Outcome:
+    spotify = state["spotify"]
+    verb = args[0] if args else ""
+    if verb == "play" and args[1:2] == ["uri"] and len(args) > 2:
+        spotify.update(state="playing", uri=args[2])
+    elif verb == "play":
+        spotify["state"] = "playing"
+    elif verb == "pause":
+        spotify["state"] = "paused"
+    elif verb == "vol" and len(args) > 1 and args[1].isdigit():
+        spotify["volume"] = max(0, min(100, int(args[1])))
+    elif verb == "status":
+        return f"Spotify is currently {spotify['state']}.\n", "", 0, {"op": "status"}
+    else:
+        return "", f"spotify: unsupported command {args}\n", 1, {"op": "error"}
+    return "", "", 0, {"op": verb}
+
+
+def _pgrep(state: State, args: List[str], stdin: str) -> Outcome:
+    name = args[-1] if args else ""
+    running = state["apps"].get(name, False)
+    return "", "", 0 if running else 1, {"op": "check", "app": name}
+
+
+def _open(state: State, args: List[str], stdin: str) -> Outcome:
+    if "-a" not in args or args.index("-a") + 1 >= len(args):
+        return "", f"open: unsupported arguments {args}\n", 1, {"op": "error"}
+    app = args[args.index("-a") + 1]
+    state["apps"][app] = True
+    return "", "", 0, {"op": "launch", "app": app}
+
+
+# ── osascript ────────────────────────────────────────────────────────────
+
+
+def _unquote(value: str) -> str:
+    return re.sub(r"\\(.)", r"\1", value)
+
+
+def _list_literal(script: str) -> Optional[List[str]]:
+    """Names in the script's first AppleScript list of strings, if any."""
+    match = re.search(r'\{\s*("(?:[^"\\]|\\.)*"(?:\s*,\s*"(?:[^"\\]|\\.)*")*)\s*\}', script)
+    if not match:
+        return None
+    return [_unquote(name) for name in _STRING.findall(match.group(1))]
+
+
+def _results_text(results: List[Tuple[str, Optional[str]]]) -> str:
+    lines = [
+        f"{name}\tok" if error is None else f"{name}\terror\t{error}" for name, error in results
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def _report(script: str, results: List[Tuple[str, Optional[str]]], op: Dict[str, Any]) -> Outcome:
+    """Per-speaker result lines for compiled programs; otherwise fail on any error."""
+    op["speakers"] = [name for name, _ in results]
+    if "set results to {}" in script:
+        return _results_text(results), "", 0, op
+    errors = [error for _, error in results if error is not None]
+    if errors:
+        return "", f"execution error: {'; '.join(errors)} (-2700)\n", 1, op
+    return "", "", 0, op
+
+
+def _airfoil(state: State, script: str) -> Outcome:
+    airfoil = state["airfoil"]
+    speakers: Dict[str, Dict[str, Any]] = airfoil["speakers"]
+    if "current audio source" in script and "Spotify.app" in script:
+        airfoil["source"] = "Spotify"
+    if "name of every speaker" in script:
+        return "\n".join(speakers) + "\n", "", 0, {"op": "airfoil list"}
+    if "name of speakers whose connected is true" in script:
+        connected = [name for name, s in speakers.items() if s["connected"]]
+        return "\n".join(connected) + "\n", "", 0, {"op": "airfoil connected"}
+
+    steps: List[Tuple[str, Optional[float]]] = []
+    for match in re.finditer(r"disconnect from|connect to|set \(volume of s\) to ([\d.]+)", script):
+        if match.group(0).startswith("set"):
+            steps.append(("volume", float(match.group(1))))
+        else:
+            steps.append(("disconnect" if match.group(0) == "disconnect from" else "connect", None))
+    if not steps:
+        if airfoil["source"] and "current audio source" in script:
+            return "", "", 0, {"op": "airfoil source"}
+        raise ScriptError("fake osascript: unsupported Airfoil script")
+
+    names = _list_literal(script)
+    missing_error = "Airfoil speaker not found"
+    if names is None:
+        whose = re.search(r'every speaker whose name is "((?:[^"\\]|\\.)*)"', script)
+        if whose:
+            # Airfoil treats an empty "every speaker whose ..." as nothing to do
+            names = [n for n in [_unquote(whose.group(1))] if n in speakers]
+        elif "whose connected is true" in script:
+            names = [name for name, s in speakers.items() if s["connected"]]
+        else:
+            names = list(speakers)
+    elif "set failures to {}" in script:
+        missing_error = "Airfoil speaker not found: {name}"
+
+    results: List[Tuple[str, Optional[str]]] = []
+    for name in names:
+        speaker = speakers.get(name)
+        if speaker is None:
+            results.append((name, missing_error.format(name=name)))
+        elif not speaker["reachable"]:
+            results.append((name, f"Airfoil could not reach {name}"))
+        else:
+            for step, value in steps:
+                if step == "volume":
+                    speaker["volume"] = value
+                else:
+                    speaker["connected"] = step == "connect"
+            results.append((name, None))
+    op = "+".join(step for step, _ in steps)
+    return _report(script, results, {"op": f"airfoil {op}"})
+
+
+def _music(state: State, script: str) -> Outcome:
+    music = state["music"]
+    devices: Dict[str, Dict[str, Any]] = music["devices"]
+    playlist = re.search(r'play playlist "((?:[^"\\]|\\.)*)"', script)
+    if playlist:
+        music.update(state="playing", playlist=_unquote(playlist.group(1)))
+        return "", "", 0, {"op": "music play playlist"}
+    if re.search(r'application "Music" to pause\s*$', script):
+        music["state"] = "paused"
+        return "", "", 0, {"op": "music pause"}
+    if re.search(r'application "Music" to play\s*$', script):
+        music["state"] = "playing"
+        return "", "", 0, {"op": "music play"}
+    volume = re.search(r'application "Music" to set sound volume to (\d+)', script)
+    if volume:
+        music["volume"] = int(volume.group(1))
+        return "", "", 0, {"op": "music volume"}
+
+    selected = re.search(r"set selected of d to (true|false)", script)
+    device_volume = re.search(r"set sound volume of d to (\d+)", script)
+    if not selected and not device_volume:
+        raise ScriptError("fake osascript: unsupported Music script")
+    steps: List[Tuple[str, Any]] = [
+        ("selected", m.group(1) == "true")
+        for m in re.finditer(r"set selected of d to (true|false)", script)
+    ]
+    if device_volume:
+        steps.append(("volume", int(device_volume.group(1))))
+
+    names = _list_literal(script)
+    if names is None:
+        single = re.search(r'name of d is "((?:[^"\\]|\\.)*)"', script)
+        names = [_unquote(single.group(1))] if single else list(devices)
+        # Scripts without a target list quietly skip devices that don't exist
+        names = [name for name in names if name in devices]
+    elif "All Speakers" in names:
+        names = list(devices)
+
+    results: List[Tuple[str, Optional[str]]] = []
+    for name in names:
+        device = devices.get(name)
+        if device is None:
+            results.append((name, "Apple Music AirPlay device not found"))
+        elif not device["reachable"]:
+            results.append((name, f"AirPlay device {name} is unavailable"))
+        else:
+            for step, value in steps:
+                device[step] = value
+            results.append((name, None))
+    if "set missing to {}" in script:
+        missing = [name for name, error in results if error is not None]
+        if missing:
+            message = f"Apple Music AirPlay device not found: {', '.join(missing)}"
+            return "", f"execution error: {message} (-2700)\n", 1, {"op": "music device"}
+    return _report(script, results, {"op": "music " + "+".join(s for s, _ in steps)})
+
+
+def _osascript(state: State, args: List[str], stdin: str) -> Outcome:
+    script = "\n".join(
+        args[i + 1] for i, arg in enumerate(args) if arg == "-e" and i + 1 < len(args)
+    )
+    script = script or stdin
+    try:
+        if "name of processes" in script:
+            app = re.search(r'contains "([^"]+)"', script)
+            running = bool(app) and state["apps"].get(app.group(1), False)
+            return ("true" if running else "false") + "\n", "", 0, {"op": "process check"}
+        if 'application "Airfoil"' in script:
+            return _airfoil(state, script)
+        if 'application "Music"' in script:
+            return _music(state, script)
+        raise ScriptError("fake osascript: unsupported script")
+    except ScriptError as e:
+        return "", f"{e}\n", 1, {"op": "error"}
+
+
+HANDLERS = {
+    "osascript": _osascript,
+    "crontab": _crontab,
+    "spotify": _spotify,
+    "pgrep": _pgrep,
+    "open": _open,
+}
+
+
+def main(argv: List[str]) -> int:
+    tool, args = argv[1], argv[2:]
+    reads_stdin = (tool == "osascript" and "-e" not in args) or (
+        tool == "crontab" and args in ([], ["-"])
+    )
+    stdin = sys.stdin.read() if reads_stdin else ""
+    out, err, code, _ = FakeMac(Path(os.environ[ROOT_ENV])).run_tool(tool, args, stdin)
+    sys.stdout.write(out)
+    sys.stderr.write(err)
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -1,3 +1,5 @@
+import re
+import subprocess
 from pathlib import Path
 
 
@@ -16,3 +18,21 @@ def test_airfoil_speaker_volume_uses_parenthesized_assignment() -> None:
 
     assert "set (volume of s) to ${f}" in text
     assert "set volume of s to ${f}" not in text
+
+
+def test_only_custom_zones_are_split_on_commas() -> None:
+    script = Path(__file__).resolve().parents[2] / "aircron_run.sh"
+    text = script.read_text()
+    helpers = "\n".join(
+        re.search(rf"^{name}\(\) {{\n.*?^}}\n", text, re.M | re.S).group(0)  # type: ignore
+        for name in ("essc", "normalize_speaker_name", "csv_to_as_list", "zone_to_as_list")
+    )
+
+    def as_list(zone: str) -> str:
+        cmd = f'{helpers}\nzone_to_as_list "$1"'
+        return subprocess.run(
+            ["bash", "-c", cmd, "bash", zone], capture_output=True, text=True, check=True
+        ).stdout
+
+    assert as_list("Den, Upstairs") == '{"Den, Upstairs"}'
+    assert as_list("Custom:Den, Kitchen") == '{"Den", "Kitchen"}'
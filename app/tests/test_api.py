@@ -5,6 +5,7 @@ from typing import Any
 import pytest
 
 from app import create_app
+from app.registry import get_registry
 
 
 @pytest.fixture
@@ -145,6 +146,30 @@ def test_cron_endpoints(client: Any) -> None:
     assert resp.status_code == 200
 
 
+def test_cron_views_share_one_crontab_read(client: Any, monkeypatch: Any) -> None:
+    from app import cronblock
+
+    reads = []
+
+    def read_crontab(self: Any) -> list:
+        reads.append(1)
+        return []
+
+    monkeypatch.setattr(cronblock.CronManager, "_get_current_crontab", read_crontab)
+    get_registry(client.application).cron_manager.invalidate_crontab_snapshot()
+
+    for url in ("/api/cron/status", "/api/cron/preview", "/api/cron/all", "/api/cron/current", "/"):
+        assert client.get(url).status_code == 200
+    assert len(reads) == 1
+
+    # Apply reads fresh, and its write invalidates the snapshot for the next view
+    resp = client.post("/api/cron/apply")
+    assert resp.status_code == 200
+    assert len(reads) == 2
+    assert client.get("/api/cron/status").status_code == 200
+    assert len(reads) == 3
+
+
 def test_playlists_crud(client: Any) -> None:
     # Create Spotify playlist
     pl = {
@@ -277,6 +302,68 @@ def test_jobs_edge_cases(client: Any) -> None:
     assert resp.status_code == 404
 
 
+def test_jobs_batch(client: Any) -> None:
+    creates = [
+        {
+            "op": "create",
+            "zone": zone,
+            "job": {"days": [1, 2], "time": f"0{hour}:00", "action": "pause"},
+        }
+        for zone in ("BatchA", "BatchB")
+        for hour in range(6, 9)
+    ]
+    resp = client.post("/api/jobs/batch", json={"operations": creates})
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data["committed"] and data["applied"] == 6
+    ids = [item["id"] for item in data["results"]]
+    assert len(set(ids)) == 6
+
+    # Atomic batch with one bad item: nothing is applied
+    batch = {
+        "operations": [
+            {"op": "delete", "zone": "BatchA", "id": ids[0]},
+            {"op": "create", "zone": "BatchA", "job": {"days": [1], "time": "25:00"}},
+        ]
+    }
+    resp = client.post("/api/jobs/batch", json=batch)
+    assert resp.status_code == 400
+    statuses = [item["status"] for item in resp.get_json()["results"]]
+    assert statuses == ["rolled_back", "failed"]
+    assert len(client.get("/api/jobs/BatchA").get_json()) == 3
+
+    # Non-numeric days are a validation error, not a conflict
+    batch["operations"][1]["job"] = {"days": ["mon"], "time": "05:00", "action": "pause"}
+    resp = client.post("/api/jobs/batch", json=batch)
+    assert resp.status_code == 400
+    assert "Days must be integers" in resp.get_json()["results"][1]["error"]
+
+    # Conflicts reject an atomic batch with 409
+    batch = {
+        "operations": [
+            {"op": "update", "zone": "BatchA", "id": ids[1], "job": {"time": "06:00"}},
+        ]
+    }
+    resp = client.post("/api/jobs/batch", json=batch)
+    assert resp.status_code == 409
+
+    # Per-item mode applies what it can, including moves between zones
+    batch["atomic"] = False
+    batch["operations"] += [
+        {"op": "delete", "zone": "BatchA", "id": ids[0]},
+        {"op": "update", "zone": "BatchB", "id": ids[3], "job": {"zone": "BatchA"}},
+    ]
+    resp = client.post("/api/jobs/batch", json=batch)
+    assert resp.status_code == 200
+    statuses = [item["status"] for item in resp.get_json()["results"]]
+    assert statuses == ["failed", "applied", "applied"]
+    zone_a = client.get("/api/jobs/BatchA").get_json()
+    assert sorted(job["id"] for job in zone_a) == sorted([ids[1], ids[2], ids[3]])
+
+    resp = client.post("/api/jobs/batch", json={"operations": []})
+    assert resp.status_code == 400
+
+
 def test_playlists_edge_cases(client: Any) -> None:
     # Missing name
     pl = {"uri": "spotify:playlist:abc"}
@@ -0,0 +1,103 @@
+"""Tests for batched zone AppleScript, counted against the simulated Mac's osascript."""
+
+import os
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from ..applescript import compile_zone_action, parse_results
+from ..executor import ActionExecutor
+from ..runqueue import QueuedAction
+from .fake_mac import FakeMac
+
+SCRIPT = Path(__file__).resolve().parents[2] / "aircron_run.sh"
+ZONE = "Custom:Kitchen,Patio,Office"
+
+
+class TestCompileZoneAction(unittest.TestCase):
+    def test_one_program_covers_every_speaker(self) -> None:
+        script = compile_zone_action("reconnect", 'Custom:Kitchen,Bob\'s "Den"')
+        self.assertIn('{"Kitchen", "Bob\'s \\"Den\\""}', script)
+        self.assertLess(script.index("disconnect from s"), script.index("connect to s\n"))
+        self.assertIn("set current audio source", script)
+
+        script = compile_zone_action("volume", ZONE, "applemusic", 40)
+        self.assertIn("set sound volume of d to 40", script)
+        self.assertIn("Apple Music AirPlay device not found", script)
+
+        with self.assertRaises(ValueError):
+            compile_zone_action("volume", ZONE)
+
+    def test_parse_results(self) -> None:
+        results = parse_results("Kitchen\tok\nPatio\terror\tAirfoil speaker not found\n")
+        self.assertEqual(
+            results,
+            [
+                {"speaker": "Kitchen", "ok": True},
+                {"speaker": "Patio", "ok": False, "error": "Airfoil speaker not found"},
+            ],
+        )
+
+
+class TestOsascriptInvocations(unittest.TestCase):
+    """Multi-speaker zone actions cost one osascript launch, not one per speaker."""
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        root = Path(self.temp_dir.name)
+        self.mac = FakeMac(root).install(["Kitchen", "Patio", "Office"])
+        self.env = {
+            **self.mac.env(),
+            "HOME": str(root),
+            "AIRCRON_NO_EXECUTOR": "1",
+        }
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def _osascript_calls(self) -> int:
+        calls = self.mac.call_count("osascript")
+        self.mac.clear_calls()
+        return calls
+
+    def test_executor_runs_one_osascript_per_zone_action(self) -> None:
+        self.mac.set_reachable("Office", False)
+        with patch.dict(os.environ, self.env):
+            executor = ActionExecutor()
+            for action in ("connect", "disconnect", "reconnect"):
+                reply = executor.run(QueuedAction(ZONE, action))
+                self.assertTrue(reply["ok"])
+                self.assertEqual(self._osascript_calls(), 1, action)
+            self.assertEqual(
+                reply["speakers"][2],
+                {"speaker": "Office", "ok": False, "error": "Airfoil could not reach Office"},
+            )
+
+            # A speaker that can't take the volume fails the action, with every result kept
+            reply = executor.run(QueuedAction(ZONE, "volume", "40"))
+            self.assertFalse(reply["ok"])
+            self.assertIn("Office: Airfoil could not reach Office", reply["error"])
+            self.assertEqual(len(reply["speakers"]), 3)
+            self.assertEqual(self._osascript_calls(), 1)
+
+    def test_script_fallback_batches_custom_zones(self) -> None:
+        def run(action: str, arg1: str = "", service: str = "spotify") -> int:
+            subprocess.run(
+                ["bash", str(SCRIPT), ZONE, action, arg1, "", service],
+                env={**os.environ, **self.env},
+                check=True,
+                timeout=30,
+            )
+            return self._osascript_calls()
+
+        # Airfoil source + one program for all three speakers (was 1 + 3)
+        self.assertEqual(run("connect"), 2)
+        self.assertEqual(run("disconnect"), 1)
+        self.assertEqual(run("volume", "40"), 1)
+        self.assertEqual(run("volume", "40", "applemusic"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
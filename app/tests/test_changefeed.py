@@ -0,0 +1,136 @@
+import json
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from app import create_app
+from app.changefeed import ChangeFeed, change_feed
+from app.services import changes_service
+
+JOB = {
+    "zone": "Kitchen",
+    "days": [1],
+    "time": "07:30",
+    "action": "play",
+    "args": {"uri": "spotify:playlist:1"},
+    "service": "spotify",
+}
+
+
+@pytest.fixture
+def app() -> Any:
+    temp_dir = tempfile.TemporaryDirectory()
+    app = create_app({"TESTING": True, "APP_SUPPORT_DIR": Path(temp_dir.name)})
+    yield app
+    temp_dir.cleanup()
+
+
+def test_feed_returns_events_after_a_revision_and_resets_stale_cursors() -> None:
+    feed = ChangeFeed(max_events=3)
+    start = feed.revision
+    for i in range(2):
+        feed.publish("playlist", "delete", id=str(i))
+    changes = feed.since(start)
+    assert [event["id"] for event in changes["events"]] == ["0", "1"]
+    assert not changes["reset"] and changes["rev"] == start + 2
+
+    for i in range(2, 5):
+        feed.publish("playlist", "delete", id=str(i))
+    assert feed.since(start)["reset"]  # older events were dropped
+    assert feed.since(feed.revision - 3)["events"][0]["id"] == "2"
+    assert feed.since(feed.revision + 5)["reset"]  # revision from a restarted server
+    assert feed.since(feed.revision, feed="other")["reset"]
+
+    waiter = threading.Timer(0.1, lambda: feed.publish("cron", "apply", changed=True))
+    waiter.start()
+    began = time.monotonic()
+    result = feed.wait(feed.revision, timeout=5)
+    assert result["events"][0]["type"] == "cron" and time.monotonic() - began < 5
+
+
+def test_api_reports_job_and_playlist_edits(app: Any) -> None:
+    client = app.test_client()
+    cursor = client.get("/api/changes").get_json()
+    assert cursor["events"] == [] and cursor["feed"] == change_feed.feed_id
+
+    job = client.post("/api/jobs/Kitchen", json=JOB).get_json()
+    client.delete(f"/api/jobs/Kitchen/{job['id']}")
+    client.post(
+        "/api/playlists", json={"name": "Jazz", "uri": "spotify:playlist:9", "service": "spotify"}
+    )
+
+    changes = client.get(f"/api/changes?since={cursor['feed']}:{cursor['rev']}").get_json()
+    summary = [(e["type"], e["op"], e.get("id")) for e in changes["events"]]
+    assert summary == [
+        ("job", "put", job["id"]),
+        ("job", "delete", job["id"]),
+        ("playlist", "put", changes["events"][2]["playlist"]["id"]),
+    ]
+    assert changes["events"][0]["job"]["zone"] == "Kitchen"
+    assert changes["events"][2]["playlist"]["name"] == "Jazz"
+    assert client.get("/api/changes?since=abc").status_code == 400
+
+
+def test_moves_publish_a_delete_and_a_put(app: Any) -> None:
+    client = app.test_client()
+    job = client.post("/api/jobs/Kitchen", json=JOB).get_json()
+    other = client.post("/api/jobs/Kitchen", json={**JOB, "time": "08:30"}).get_json()
+    cursor = client.get("/api/changes").get_json()
+
+    batch = {
+        "operations": [
+            {"op": "update", "zone": "Kitchen", "id": job["id"], "job": {"zone": "Office"}}
+        ]
+    }
+    assert client.post("/api/jobs/batch", json=batch).status_code == 200
+    client.put(f"/api/jobs/Kitchen/{other['id']}", json={"zone": "Lobby"})
+
+    changes = client.get(f"/api/changes?since={cursor['rev']}").get_json()
+    summary = [(e["op"], e["zone"], e["id"]) for e in changes["events"]]
+    assert summary == [
+        ("delete", "Kitchen", job["id"]),
+        ("put", "Office", job["id"]),
+        ("delete", "Kitchen", other["id"]),
+        ("put", "Lobby", other["id"]),
+    ]
+
+
+def test_external_job_edits_publish_a_reset(app: Any) -> None:
+    client = app.test_client()
+    client.post("/api/jobs/Kitchen", json=JOB)
+    cursor = client.get("/api/changes").get_json()
+
+    jobs_file = Path(app.config["APP_SUPPORT_DIR"]) / "jobs.json"
+    time.sleep(0.01)  # let the file's mtime move
+    jobs_file.write_text(json.dumps({}))
+
+    changes = client.get(f"/api/changes?since={cursor['rev']}").get_json()
+    assert [(e["type"], e["op"]) for e in changes["events"]] == [("jobs", "reset")]
+
+
+def test_stream_starts_with_hello_then_follows(app: Any) -> None:
+    with app.app_context():
+        stream = changes_service.stream_changes(None, None)
+        event, hello = next(stream)
+        assert event == "hello" and hello["rev"] == change_feed.revision
+        change_feed.publish("cron", "apply", changed=False)
+        event, payload = next(stream)
+        assert event == "change" and payload["type"] == "cron"
+
+
+def test_streams_end_at_max_age_or_when_stopped(app: Any) -> None:
+    with app.app_context():
+        start = time.monotonic()
+        events = [event for event, _ in changes_service.stream_changes(None, None, max_age=0.2)]
+        assert events == ["hello"] and time.monotonic() - start < 2
+
+        stop = threading.Event()
+        stream = changes_service.stream_changes(change_feed.revision, None, stop=stop)
+        threading.Timer(0.1, stop.set).start()
+        start = time.monotonic()
+        assert list(stream) == []
+        assert time.monotonic() - start < changes_service.STREAM_POLL + 1
@@ -1,8 +1,14 @@
+import tempfile
+import threading
+import time
+from pathlib import Path
 from types import SimpleNamespace
 from typing import Any, List
 
 import pytest
 
+from app import create_app, metrics
+from app.control_runs import ControlRuns
 from app.services import control_service
 
 
@@ -15,7 +21,7 @@ def test_run_control_action_preserves_raw_argument_values(monkeypatch: Any) -> N
         calls.append(cmd)
         return SimpleNamespace(returncode=0, stdout="", stderr="")
 
-    monkeypatch.setattr(control_service.subprocess, "run", fake_run)
+    monkeypatch.setattr(metrics.subprocess, "run", fake_run)
 
     result = control_service.run_control_action(
         {
@@ -49,7 +55,7 @@ def test_run_control_action_surfaces_script_failures(monkeypatch: Any) -> None:
             stderr="",
         )
 
-    monkeypatch.setattr(control_service.subprocess, "run", fake_run)
+    monkeypatch.setattr(metrics.subprocess, "run", fake_run)
 
     with pytest.raises(RuntimeError, match="Apple Music AirPlay device not found"):
         control_service.run_control_action(
@@ -60,3 +66,107 @@ def test_run_control_action_surfaces_script_failures(monkeypatch: Any) -> None:
                 "args": {"volume": 50},
             }
         )
+
+
+def test_connect_runs_a_single_reconnect(monkeypatch: Any) -> None:
+    calls: List[List[str]] = []
+
+    monkeypatch.setattr(control_service, "_get_script_path", lambda: "/tmp/aircron_run.sh")
+
+    def fake_run(cmd: List[str], **_: Any) -> Any:
+        calls.append(cmd)
+        return SimpleNamespace(returncode=0, stdout="", stderr="")
+
+    monkeypatch.setattr(metrics.subprocess, "run", fake_run)
+
+    control_service.run_control_action({"action": "connect", "zone": "Custom:Kitchen,Patio"})
+
+    assert calls == [
+        ["/tmp/aircron_run.sh", "Custom:Kitchen,Patio", "reconnect", "", "", "spotify"]
+    ]
+
+
+def test_control_runs_deduplicate_in_flight_actions() -> None:
+    runs = ControlRuns(workers=2)
+    release = threading.Event()
+
+    def slow(progress: Any) -> Any:
+        progress("working")
+        release.wait(5)
+        return {"ok": True}
+
+    key = ("Kitchen", "play", "spotify", "spotify:playlist:1")
+    first, first_dup = runs.submit(key, slow)
+    second, second_dup = runs.submit(key, slow)
+    other, _ = runs.submit(("Patio",) + key[1:], slow)
+    assert (first_dup, second_dup) == (False, True)
+    assert second is first and other is not first
+
+    release.set()
+    final = runs.wait(first.id, timeout=5)
+    assert final is not None
+    assert final["status"] == "succeeded" and final["output"] == ["working"]
+    # Once finished, the same action starts a new run
+    third, third_dup = runs.submit(key, slow)
+    assert not third_dup and third is not first
+    runs.wait(third.id, timeout=5)
+    runs.shutdown()
+
+
+def test_following_a_run_ends_when_stopped_or_too_old() -> None:
+    runs = ControlRuns(workers=1)
+    release = threading.Event()
+    run, _ = runs.submit(("Kitchen", "pause", "spotify", ""), lambda _: release.wait(5) and {})
+    stop = threading.Event()
+    stop.set()
+    assert list(runs.follow(run.id, stop=stop)) == []
+
+    start = time.monotonic()
+    events = [event for event, _ in runs.follow(run.id, max_age=0.2)]
+    assert events and set(events) <= {"status"} and time.monotonic() - start < 2
+    release.set()
+    runs.shutdown()
+
+
+@pytest.fixture
+def client(monkeypatch: Any) -> Any:
+    temp_dir = tempfile.TemporaryDirectory()
+    app = create_app({"TESTING": True, "APP_SUPPORT_DIR": Path(temp_dir.name)})
+    app.config["EXECUTOR_SOCKET"] = None  # go straight to the (mocked) script
+    monkeypatch.setattr(control_service, "_get_script_path", lambda: "/tmp/aircron_run.sh")
+    with app.test_client() as client:
+        yield client
+    temp_dir.cleanup()
+
+
+def test_control_endpoint_returns_a_run_handle(client: Any, monkeypatch: Any) -> None:
+    def fake_run(cmd: List[str], **_: Any) -> Any:
+        if cmd[2] == "pause":
+            return SimpleNamespace(returncode=1, stdout="", stderr="Spotify not running")
+        return SimpleNamespace(returncode=0, stdout="Kitchen connected\n", stderr="")
+
+    monkeypatch.setattr(metrics.subprocess, "run", fake_run)
+
+    resp = client.post("/api/control", json={"action": "connect", "zone": "Kitchen"})
+    assert resp.status_code == 202
+    run = resp.get_json()
+    assert run["status_url"] == f"/api/control/{run['run_id']}"
+
+    final = client.get(f"/api/control/{run['run_id']}?wait=5").get_json()
+    assert final["status"] == "succeeded"
+    assert final["action"] == "reconnect"
+    assert "Kitchen connected" in final["output"]
+
+    stream = client.get(run["events_url"])
+    assert stream.mimetype == "text/event-stream"
+    assert "event: done" in stream.get_data(as_text=True)
+
+    run = client.post("/api/control", json={"action": "pause", "zone": "Kitchen"}).get_json()
+    final = client.get(f"/api/control/{run['run_id']}?wait=5").get_json()
+    assert final["status"] == "failed" and final["error"] == "Spotify not running"
+
+    # Validation errors are still reported synchronously
+    assert client.post("/api/control", json={"action": "explode"}).status_code == 400
+    assert client.get("/api/control/missing").status_code == 404
+    resp = client.post("/api/control", json={"action": "pause", "zone": "Kitchen", "wait": True})
+    assert resp.status_code == 500
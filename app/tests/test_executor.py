@@ -0,0 +1,102 @@
+"""Tests for the resident action executor and its socket protocol."""
+
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+from typing import List, Optional
+from unittest.mock import patch
+
+from .. import create_app
+from ..executor import ActionExecutor, send_request, start_executor
+from ..services import control_service
+
+
+class _RecordingExecutor(ActionExecutor):
+    """Executor whose tools always succeed and are recorded instead of run."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._spotify_cmd = "/usr/local/bin/spotify"
+        self.calls: List[List[str]] = []
+
+    @property
+    def spotify_cmd(self) -> Optional[str]:
+        return self._spotify_cmd
+
+    def _run(self, cmd, input=None, timeout=30):
+        self.calls.append(cmd + ([input] if input else []))
+        return subprocess.CompletedProcess(cmd, 0, "", "")
+
+
+class TestActionExecutor(unittest.TestCase):
+    def setUp(self) -> None:
+        # Short path: Unix socket paths are limited to ~104 bytes on macOS
+        self.temp_dir = tempfile.TemporaryDirectory(dir="/tmp")
+        self.socket_path = Path(self.temp_dir.name) / "executor.sock"
+        self.executor = _RecordingExecutor()
+        self.server = start_executor(self.socket_path, self.executor)
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        self.temp_dir.cleanup()
+
+    def test_ping_and_play(self) -> None:
+        reply = send_request(self.socket_path, {"op": "ping"})
+        self.assertTrue(reply["ok"])
+
+        request = {"zone": "Kitchen", "action": "play", "arg1": "spotify:playlist:1"}
+        self.assertTrue(send_request(self.socket_path, request)["ok"])
+        self.assertIn(
+            ["/usr/local/bin/spotify", "play", "uri", "spotify:playlist:1"], self.executor.calls
+        )
+        self.assertTrue(any("Kitchen" in " ".join(call) for call in self.executor.calls))
+
+        # App readiness is warm: a second action doesn't probe the apps again
+        pgrep_calls = sum(1 for call in self.executor.calls if call[0] == "pgrep")
+        self.assertTrue(
+            send_request(self.socket_path, {"zone": "Kitchen", "action": "pause"})["ok"]
+        )
+        self.assertEqual(sum(1 for call in self.executor.calls if call[0] == "pgrep"), pgrep_calls)
+
+    def test_rejects_bad_requests(self) -> None:
+        reply = send_request(self.socket_path, {"zone": "Kitchen", "action": "explode"})
+        self.assertFalse(reply["ok"])
+        self.assertIn("unknown action", reply["error"])
+
+        self.executor._spotify_cmd = None
+        reply = send_request(
+            self.socket_path, {"zone": "All Speakers", "action": "volume", "arg1": "40"}
+        )
+        self.assertFalse(reply["ok"])
+        self.assertIn("spotify-cli missing", reply["error"])
+
+    def test_stale_socket_is_replaced(self) -> None:
+        self.server.shutdown()
+        self.server.socket.close()  # leave the socket file behind, like a crash
+        self.assertTrue(self.socket_path.exists())
+        self.server = start_executor(self.socket_path, self.executor)
+        self.assertTrue(send_request(self.socket_path, {"op": "ping"})["ok"])
+
+    def test_control_service_prefers_executor(self) -> None:
+        app = create_app(
+            {
+                "TESTING": True,
+                "APP_SUPPORT_DIR": self.temp_dir.name,
+                "EXECUTOR_SOCKET": self.socket_path,
+                "SPEAKER_REFRESH_INTERVAL": 0,
+            }
+        )
+        with app.app_context(), patch.object(control_service, "_run_script") as run_script:
+            control_service.run_control_action({"action": "pause", "zone": "Kitchen"})
+            run_script.assert_not_called()
+
+            # Executor down: the script runs instead
+            app.config["EXECUTOR_SOCKET"] = Path(self.temp_dir.name) / "missing.sock"
+            control_service.run_control_action({"action": "pause", "zone": "Kitchen"})
+            run_script.assert_called_once_with("Kitchen", "pause", "", "spotify", None)
+
+
+if __name__ == "__main__":
+    unittest.main()
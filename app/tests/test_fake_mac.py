@@ -0,0 +1,117 @@
+import os
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Any, Dict
+from unittest.mock import patch
+
+import pytest
+
+from app.cronblock import CronManager
+from app.executor import ActionExecutor
+from app.runqueue import QueuedAction
+from app.speakers import SpeakerDiscovery
+
+from .fake_mac import FakeMac
+
+SCRIPT = Path(__file__).resolve().parents[2] / "aircron_run.sh"
+
+
+@pytest.fixture
+def mac() -> Any:
+    temp_dir = tempfile.TemporaryDirectory()
+    yield FakeMac(Path(temp_dir.name)).install(["Kitchen", "Patio", "Office"])
+    temp_dir.cleanup()
+
+
+def _run_script(mac: FakeMac, *args: str) -> int:
+    env: Dict[str, str] = {
+        **os.environ,
+        **mac.env(),
+        "HOME": str(mac.root),
+        "AIRCRON_NO_EXECUTOR": "1",
+        "AIRCRON_RUN_LOG": str(mac.root / "runs.jsonl"),
+    }
+    return subprocess.run(["bash", str(SCRIPT), *args], env=env, timeout=60).returncode
+
+
+def test_script_actions_change_the_simulated_state(mac: FakeMac) -> None:
+    with mac.edit() as state:
+        state["apps"]["Spotify"] = False
+
+    assert _run_script(mac, "Custom:Kitchen,Patio", "play", "spotify:playlist:7") == 0
+    state = mac.state()
+    speakers = state["airfoil"]["speakers"]
+    assert speakers["Kitchen"]["connected"] and speakers["Patio"]["connected"]
+    assert not speakers["Office"]["connected"]
+    assert state["airfoil"]["source"] == "Spotify"
+    assert state["spotify"] == {"state": "playing", "uri": "spotify:playlist:7", "volume": 50}
+    # Spotify wasn't running, so the script launched it
+    assert state["apps"]["Spotify"]
+    assert [c["app"] for c in mac.calls("open")] == ["Spotify"]
+
+    assert _run_script(mac, "Patio", "volume", "30") == 0
+    assert mac.state()["airfoil"]["speakers"]["Patio"]["volume"] == 0.3
+    assert _run_script(mac, "All Speakers", "disconnect") == 0
+    assert not any(s["connected"] for s in mac.state()["airfoil"]["speakers"].values())
+
+    # A missing speaker fails the script's batched Airfoil call, not the others
+    _run_script(mac, "Custom:Kitchen,Garage", "connect")
+    assert mac.state()["airfoil"]["speakers"]["Kitchen"]["connected"]
+    assert mac.calls("osascript")[-1]["exit_code"] == 1
+
+
+def test_executor_reports_unreachable_speakers(mac: FakeMac) -> None:
+    mac.set_reachable("Patio", False)
+    with patch.dict(os.environ, mac.env()):
+        executor = ActionExecutor()
+        reply = executor.run(QueuedAction("Custom:Kitchen,Patio,Garage", "connect", ""))
+
+    results = {r["speaker"]: r for r in reply["speakers"]}
+    assert results["Kitchen"]["ok"]
+    assert "could not reach" in results["Patio"]["error"]
+    assert results["Garage"]["error"] == "Airfoil speaker not found"
+    speakers = mac.state()["airfoil"]["speakers"]
+    assert speakers["Kitchen"]["connected"] and not speakers["Patio"]["connected"]
+    # The whole zone is one osascript call
+    assert mac.call_count("osascript") == 1
+    assert mac.calls("osascript")[0]["speakers"] == ["Kitchen", "Patio", "Garage"]
+
+
+def test_faults_and_latency_are_injected_and_recorded(mac: FakeMac) -> None:
+    mac.fail("spotify", times=1, message="spotify: not logged in")
+    mac.set_latency("osascript", 0.2)
+
+    _run_script(mac, "Kitchen", "pause")
+    assert mac.state()["spotify"]["state"] == "stopped"
+    _run_script(mac, "Kitchen", "pause")
+    assert mac.state()["spotify"]["state"] == "paused"
+    assert [(c["op"], c["exit_code"]) for c in mac.calls("spotify")] == [
+        ("fault", 1),
+        ("pause", 0),
+    ]
+
+    discovery = SpeakerDiscovery()
+    with patch.dict(os.environ, mac.env()):
+        assert discovery._discover_speakers() == ["All Speakers", "Kitchen", "Patio", "Office"]
+    call = mac.calls("osascript")[-1]
+    assert call["op"] == "airfoil list"
+    assert call["duration_ms"] >= 200 and call["end"] - call["start"] >= 0.2
+
+
+def test_crontab_round_trip(mac: FakeMac) -> None:
+    support = mac.root / "support"
+    support.mkdir()
+    (support / "jobs.json").write_text(
+        '{"Kitchen": [{"id": "j1", "zone": "Kitchen", "days": [1], "time": "07:30",'
+        ' "action": "pause", "args": {}, "service": "spotify"}]}'
+    )
+    with patch.dict(os.environ, {**mac.env(), "HOME": str(mac.root)}):
+        manager = CronManager(support)
+        assert manager.get_crontab_snapshot().lines == []
+        assert manager.apply_jobs_to_cron()["changed"]
+        manager.invalidate_crontab_snapshot()
+        assert len(manager.get_crontab_snapshot().cron_lines) == 1
+
+    assert "AIRCRON_JOB_ID=j1" in (mac.crontab or "")
+    assert [c["op"] for c in mac.calls("crontab")][-2:] == ["install", "list"]
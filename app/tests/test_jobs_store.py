@@ -1,14 +1,21 @@
 """Tests for jobs store functionality."""
 
+import json
+import sqlite3
 import tempfile
+import threading
 import unittest
 from pathlib import Path
+from typing import Any, List, Optional
+from unittest.mock import patch
 
 from flask import Flask
 
 from app import cronblock
 
-from ..jobs_store import Job, JobsStore
+from .. import jobs_store
+from ..jobs_backends import JsonJobsBackend, SqliteJobsBackend
+from ..jobs_store import Job, JobOperation, JobsStore
 
 
 class TestJobsStore(unittest.TestCase):
@@ -135,6 +142,151 @@ class TestJobsStore(unittest.TestCase):
             with self.assertRaises(ValueError):
                 store.add_job(job2)
 
+    def test_reads_are_cached_until_file_changes(self) -> None:
+        """Test that unchanged files are served from the snapshot cache."""
+        with self.app.app_context():
+            store = JobsStore()
+            store.add_job(Job("c1", "Kitchen", [1], "08:00", "pause", {}))
+
+            first = store.get_jobs_for_zone("Kitchen")
+            second = JobsStore().get_jobs_for_zone("Kitchen")
+            self.assertIs(first[0], second[0])
+
+            # An external edit changes the file key and forces a re-parse
+            store.backend.compact()
+            data = json.loads(store.jobs_file.read_text())
+            data["Kitchen"][0]["label"] = "Edited elsewhere"
+            data["Kitchen"][0]["padding"] = "x" * 64
+            store.jobs_file.write_text(json.dumps(data))
+            reloaded = store.get_jobs_for_zone("Kitchen")
+            self.assertIsNot(reloaded[0], first[0])
+            self.assertEqual(reloaded[0].label, "Edited elsewhere")
+
+    def test_save_updates_cache_in_place(self) -> None:
+        """Test that writes through the store are visible without a re-parse."""
+        with self.app.app_context():
+            store = JobsStore()
+            store.add_job(Job("c1", "Kitchen", [1], "08:00", "pause", {}))
+            with patch.object(JsonJobsBackend, "load") as load:
+                store.add_job(Job("c2", "Kitchen", [2], "08:00", "pause", {}))
+                jobs = store.get_jobs_for_zone("Kitchen")
+            load.assert_not_called()
+            self.assertEqual([j.id for j in jobs], ["c1", "c2"])
+
+    def test_indexes_follow_mutations(self) -> None:
+        """Test id lookups and slot conflicts after update and delete."""
+        with self.app.app_context():
+            store = JobsStore()
+            for i, job_time in enumerate(["08:00", "09:00", "10:00"]):
+                store.add_job(Job(f"i{i}", "Kitchen", [1, 2], job_time, "pause", {}))
+
+            # Deleting the first job shifts the others; lookups must still resolve
+            store.delete_job("Kitchen", "i0")
+            job = store.get_job("Kitchen", "i2")
+            assert job is not None
+            self.assertEqual(job.time, "10:00")
+            self.assertIsNone(store.get_job("Kitchen", "i0"))
+            self.assertIsNone(store.get_job("Living Room", "i2"))
+
+            # Moving i1 to 11:00 frees its old slot and claims the new one
+            store.update_job(Job("i1", "Kitchen", [1], "11:00", "pause", {}))
+            store.add_job(Job("i3", "Kitchen", [1, 2], "09:00", "pause", {}))
+            with self.assertRaises(ValueError):
+                store.add_job(Job("i4", "Kitchen", [1], "11:00", "pause", {}))
+            with self.assertRaises(ValueError):
+                store.update_job(Job("i2", "Kitchen", [2], "09:00", "pause", {}))
+
+            # A job may keep its own slot when updated
+            store.update_job(Job("i2", "Kitchen", [1, 2], "10:00", "resume", {}))
+            store.backend.compact()
+            on_disk = json.loads(store.jobs_file.read_text())
+            self.assertEqual([j["id"] for j in on_disk["Kitchen"]], ["i1", "i2", "i3"])
+            self.assertEqual(on_disk["Kitchen"][1]["action"], "resume")
+
+    def test_apply_batch_atomic_and_per_item(self) -> None:
+        """Test that a batch commits once, or not at all when atomic and any item fails."""
+        with self.app.app_context():
+            store = JobsStore()
+            store.add_job(Job("b0", "Kitchen", [1], "08:00", "pause", {}))
+
+            # The second create takes the first one's slot, so the atomic batch is rejected
+            operations = [
+                JobOperation.add(Job("b1", "Kitchen", [2], "08:00", "pause", {})),
+                JobOperation.add(Job("b2", "Kitchen", [2, 3], "08:00", "pause", {})),
+                JobOperation.delete("Kitchen", "b0"),
+            ]
+            with patch.object(store.backend, "apply", wraps=store.backend.apply) as apply:
+                errors = store.apply_batch(operations)
+                apply.assert_not_called()
+            self.assertIsNone(errors[0])
+            self.assertIn("Conflict", errors[1] or "")
+            self.assertEqual([j.id for j in store.get_jobs_for_zone("Kitchen")], ["b0"])
+
+            # Per-item: the conflicting create is skipped, the rest land in one commit
+            with patch.object(store.backend, "apply", wraps=store.backend.apply) as apply:
+                errors = store.apply_batch(operations, atomic=False)
+                self.assertEqual(apply.call_count, 1)
+            self.assertEqual([e is None for e in errors], [True, False, True])
+
+            # Updates may move a job between zones
+            moved = Job("b1", "Office", [2], "08:00", "pause", {})
+            self.assertEqual(store.apply_batch([JobOperation.update("Kitchen", moved)]), [None])
+            store.backend.compact()
+            on_disk = json.loads(store.jobs_file.read_text())
+            self.assertEqual(list(on_disk), ["Office"])
+            self.assertEqual(store.get_job("Office", "b1").days, [2])  # type: ignore[union-attr]
+
+    def test_readers_never_see_a_rejected_batch(self) -> None:
+        """Test that a reader running mid-batch sees only committed jobs."""
+        with self.app.app_context():
+            store = JobsStore()
+            store.add_job(Job("base1", "Kitchen", [1], "08:00", "pause", {}))
+            version = store.get_version()
+            seen: list = []
+            apply_operation = jobs_store._apply_operation
+
+            def read_between_operations(snapshot: Any, operation: JobOperation) -> Any:
+                # Read from another thread after the first operation has been applied
+                if operation.job_id == "clash":
+                    reader = threading.Thread(
+                        target=lambda: seen.append(store.get_all_jobs_versioned())
+                    )
+                    reader.start()
+                    reader.join()
+                return apply_operation(snapshot, operation)
+
+            operations = [
+                JobOperation.add(Job("ghost", "Kitchen", [2], "08:00", "pause", {})),
+                JobOperation.add(Job("clash", "Kitchen", [2], "08:00", "pause", {})),
+            ]
+            with patch.object(jobs_store, "_apply_operation", read_between_operations):
+                errors = store.apply_batch(operations)
+            self.assertIsNotNone(errors[1])
+
+            seen_version, seen_jobs = seen[0]
+            self.assertEqual(seen_version, version)
+            self.assertEqual([j.id for j in seen_jobs["Kitchen"]], ["base1"])
+            self.assertEqual([j.id for j in store.get_jobs_for_zone("Kitchen")], ["base1"])
+            self.assertEqual(store.get_version(), version)
+
+    def test_update_job_moves_zones_in_one_commit(self) -> None:
+        """Test that a single-job update to another zone is one atomic move."""
+        with self.app.app_context():
+            store = JobsStore()
+            store.add_job(Job("u1", "Kitchen", [1], "08:00", "pause", {}))
+            store.add_job(Job("u2", "Office", [1], "08:00", "pause", {}))
+
+            with patch.object(store.backend, "apply", wraps=store.backend.apply) as apply:
+                store.update_job(Job("u1", "Lobby", [1], "09:00", "resume", {}), "Kitchen")
+                self.assertEqual(apply.call_count, 1)
+            self.assertIsNone(store.get_job("Kitchen", "u1"))
+            self.assertEqual(store.get_job("Lobby", "u1").action, "resume")  # type: ignore
+
+            # A conflicting move leaves the job where it was
+            with self.assertRaises(ValueError):
+                store.update_job(Job("u1", "Office", [1], "08:00", "pause", {}), "Lobby")
+            self.assertIsNotNone(store.get_job("Lobby", "u1"))
+
     def test_invalid_service(self) -> None:
         """Test that invalid service values are handled."""
         # Should default to spotify if missing
@@ -156,6 +308,132 @@ class TestJobsStore(unittest.TestCase):
         self.assertEqual(job2.service, "notarealservice")  # Model doesn't validate, but API should
 
 
+class TestJsonJournal(unittest.TestCase):
+    """Test cases for the jobs.json journal and compaction."""
+
+    def setUp(self) -> None:
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.backend = JsonJobsBackend(self.temp_dir)
+        self.store = JobsStore(self.temp_dir, backend=self.backend)
+
+    def test_mutations_append_instead_of_rewriting(self) -> None:
+        """Test that edits only touch the journal and replay on load."""
+        before = self.backend.jobs_file.stat().st_mtime_ns
+        self.store.add_job(Job("j1", "Kitchen", [1], "08:00", "pause", {}))
+        self.store.add_job(Job("j2", "Patio", [1], "08:00", "pause", {}))
+        self.store.update_job(Job("j1", "Kitchen", [1], "08:00", "resume", {}))
+        self.store.delete_job("Patio", "j2")
+
+        self.assertEqual(self.backend.jobs_file.stat().st_mtime_ns, before)
+        self.assertEqual(len(self.backend.journal_file.read_text().splitlines()), 4)
+        replayed = JsonJobsBackend(self.temp_dir).load()
+        self.assertEqual(list(replayed), ["Kitchen"])
+        self.assertEqual(replayed["Kitchen"][0]["action"], "resume")
+
+    def test_threshold_triggers_compaction(self) -> None:
+        """Test that the journal is folded into jobs.json once it grows."""
+        self.backend.compact_threshold = 3
+        for i in range(3):
+            self.store.add_job(Job(f"j{i}", "Kitchen", [1], f"0{i}:00", "pause", {}))
+
+        self.assertEqual(self.backend.journal_file.read_text(), "")
+        on_disk = json.loads(self.backend.jobs_file.read_text())
+        self.assertEqual([j["id"] for j in on_disk["Kitchen"]], ["j0", "j1", "j2"])
+        self.assertTrue(self.backend.jobs_file.with_suffix(".json.bak").exists())
+
+    def test_large_batch_writes_jobs_file_directly(self) -> None:
+        """Test that a batch over the threshold skips the journal."""
+        self.backend.compact_threshold = 3
+        self.store.add_job(Job("j0", "Kitchen", [1], "00:00", "pause", {}))
+        operations = [
+            JobOperation.add(Job(f"j{i}", "Kitchen", [1], f"0{i}:00", "pause", {}))
+            for i in range(1, 5)
+        ]
+        self.assertEqual(self.store.apply_batch(operations), [None] * 4)
+
+        self.assertEqual(self.backend.journal_file.read_text(), "")
+        on_disk = json.loads(self.backend.jobs_file.read_text())
+        self.assertEqual([j["id"] for j in on_disk["Kitchen"]], ["j0", "j1", "j2", "j3", "j4"])
+
+    def test_torn_record_is_skipped(self) -> None:
+        """Test that a partially written last record doesn't break loading."""
+        self.store.add_job(Job("j1", "Kitchen", [1], "08:00", "pause", {}))
+        with self.backend.journal_file.open("a") as f:
+            f.write('{"op": "put", "zone": "Kitch')
+        self.store.add_job(Job("j2", "Kitchen", [2], "08:00", "pause", {}))
+
+        replayed = JsonJobsBackend(self.temp_dir).load()
+        self.assertEqual([j["id"] for j in replayed["Kitchen"]], ["j1", "j2"])
+
+
+class TestSqliteJobsBackend(unittest.TestCase):
+    """Test cases for the SQLite jobs backend."""
+
+    def setUp(self) -> None:
+        self.app = Flask(__name__)
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.app.config["APP_SUPPORT_DIR"] = self.temp_dir
+        self.app.config["JOBS_BACKEND"] = "sqlite"
+
+    def test_crud_round_trip(self) -> None:
+        """Test that row-level changes persist and keep per-zone order."""
+        with self.app.app_context():
+            store = JobsStore()
+            self.assertIsInstance(store.backend, SqliteJobsBackend)
+            store.add_job(Job("s1", "Kitchen", [1], "08:00", "pause", {}))
+            store.add_job(Job("s2", "Kitchen", [1], "09:00", "volume", {"volume": 40}))
+            store.add_job(Job("s3", "Patio", [2], "08:00", "resume", {}, service="applemusic"))
+            store.update_job(Job("s1", "Kitchen", [1, 2], "08:00", "pause", {}, label="x"))
+            store.delete_job("Patio", "s3")
+
+            # A fresh backend instance reads straight from the database
+            raw = SqliteJobsBackend(self.temp_dir).load()
+            self.assertEqual(list(raw), ["Kitchen"])
+            self.assertEqual([j["id"] for j in raw["Kitchen"]], ["s1", "s2"])
+            self.assertEqual(raw["Kitchen"][0]["days"], [1, 2])
+            self.assertEqual(raw["Kitchen"][0]["label"], "x")
+            self.assertEqual(raw["Kitchen"][1]["args"], {"volume": 40})
+            self.assertFalse((self.temp_dir / "jobs.json").exists())
+
+            mode = sqlite3.connect(self.temp_dir / "jobs.db").execute("PRAGMA journal_mode")
+            self.assertEqual(mode.fetchone()[0], "wal")
+
+    def test_imports_existing_json_once(self) -> None:
+        """Test the one-shot import, falling back to jobs.json.bak."""
+        legacy = {
+            "Kitchen": [
+                {
+                    "id": "old1",
+                    "zone": "Kitchen",
+                    "days": [1],
+                    "time": "07:00",
+                    "action": "pause",
+                    "args": {},
+                    "label": "",
+                }
+            ]
+        }
+        (self.temp_dir / "jobs.json").write_text("{corrupt")
+        (self.temp_dir / "jobs.json.bak").write_text(json.dumps(legacy))
+        with self.app.app_context():
+            store = JobsStore()
+            jobs = store.get_jobs_for_zone("Kitchen")
+            self.assertEqual([j.id for j in jobs], ["old1"])
+            self.assertEqual(jobs[0].service, "spotify")
+
+            # Later edits to jobs.json are not re-imported
+            (self.temp_dir / "jobs.json").write_text("{}")
+            reopened = SqliteJobsBackend(self.temp_dir)
+            self.assertEqual(list(reopened.load()), ["Kitchen"])
+
+    def test_unknown_backend_rejected(self) -> None:
+        """Test that an unknown JOBS_BACKEND is an error."""
+        self.app.config["JOBS_BACKEND"] = "carrier-pigeon"
+        with self.app.app_context():
+            with self.assertRaises(ValueError):
+                JobsStore()
+
+
 class TestCronLineGeneration(unittest.TestCase):
     def setUp(self) -> None:
         self.cron_manager = cronblock.CronManager()
@@ -198,6 +476,201 @@ class TestCronLineGeneration(unittest.TestCase):
         self.assertIn("Chill Mix", line)
         self.assertIn("applemusic", line)
 
+    def test_single_job_lines_wait_for_a_compile_in_progress(self) -> None:
+        job = Job("k1", "Kitchen", [1], "07:00", "pause", {})
+        lines: List[Optional[str]] = []
+        with self.cron_manager._compile_lock:
+            worker = threading.Thread(
+                target=lambda: lines.append(self.cron_manager._job_to_cron_line(job))
+            )
+            worker.start()
+            worker.join(0.2)
+            self.assertTrue(worker.is_alive())
+            self.assertEqual(self.cron_manager._line_cache, {})
+        worker.join(5)
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(len(self.cron_manager._line_cache), 1)
+
+
+class TestIncrementalCronApply(unittest.TestCase):
+    """Test that apply only touches the crontab when the AirCron block changes."""
+
+    def setUp(self) -> None:
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.cron_manager = cronblock.CronManager(self.temp_dir)
+        self.crontab = ["MAILTO=me@example.com", "0 1 * * * /usr/bin/true"]
+        self.writes: list = []
+        self.backups: list = []
+
+        def write(lines: list) -> None:
+            self.writes.append(lines)
+            self.crontab = list(lines)
+
+        patches = [
+            patch.object(self.cron_manager, "_get_current_crontab", lambda: list(self.crontab)),
+            patch.object(self.cron_manager, "_write_crontab", write),
+            patch.object(self.cron_manager, "_backup_crontab", self.backups.append),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_reapply_is_skipped_and_diff_reported(self) -> None:
+        store = JobsStore(self.temp_dir)
+        store.add_job(Job("c1", "Kitchen", [1], "08:00", "pause", {}))
+        store.add_job(Job("c2", "Kitchen", [2], "09:00", "pause", {}))
+
+        result = self.cron_manager.apply_jobs_to_cron()
+        self.assertTrue(result["changed"])
+        self.assertEqual(sorted(e["job_id"] for e in result["diff"]["added"]), ["c1", "c2"])
+        self.assertEqual(len(self.writes), 1)
+        self.assertEqual(len(self.backups), 1)
+        self.assertEqual(self.crontab[:2], ["MAILTO=me@example.com", "0 1 * * * /usr/bin/true"])
+
+        # Nothing changed: no backup, no install
+        result = self.cron_manager.apply_jobs_to_cron()
+        self.assertFalse(result["changed"])
+        self.assertEqual(len(result["diff"]["unchanged"]), 2)
+        self.assertEqual((len(self.writes), len(self.backups)), (1, 1))
+
+        store.delete_job("Kitchen", "c1")
+        store.add_job(Job("c3", "Kitchen", [3], "10:00", "pause", {}))
+        result = self.cron_manager.apply_jobs_to_cron()
+        diff = result["diff"]
+        self.assertTrue(result["changed"])
+        self.assertEqual([e["job_id"] for e in diff["added"]], ["c3"])
+        self.assertEqual([e["job_id"] for e in diff["unchanged"]], ["c2"])
+        self.assertEqual(len(diff["removed"]), 1)
+        self.assertIn("8 * * 1 ", diff["removed"][0]["cron_line"])
+        self.assertEqual((len(self.writes), len(self.backups)), (2, 2))
+
+    def test_compiled_lines_are_reused_until_jobs_change(self) -> None:
+        store = JobsStore(self.temp_dir)
+        for i in range(5):
+            store.add_job(Job(f"m{i}", "Kitchen", [1], f"0{i}:00", "pause", {}))
+
+        with patch.object(
+            self.cron_manager, "_compile_job", wraps=self.cron_manager._compile_job
+        ) as compile_line:
+            compiled = self.cron_manager.compile_jobs()
+            self.assertEqual(compile_line.call_count, 5)
+            self.assertIs(self.cron_manager.compile_jobs(), compiled)
+
+            # Only the edited job is recompiled; its old line no longer maps to it
+            old_line = compiled.lines["m2"].normalized
+            store.update_job(Job("m2", "Kitchen", [1], "02:00", "resume", {}))
+            recompiled = self.cron_manager.compile_jobs()
+            self.assertEqual(compile_line.call_count, 6)
+            self.assertIsNone(recompiled.job_for_line(old_line))
+            new_line = recompiled.lines["m2"].normalized
+            self.assertEqual(recompiled.job_for_line(new_line).action, "resume")  # type: ignore
+            # The four pause jobs still share one line
+            self.assertEqual(len(recompiled.expected), 2)
+
+
+class TestCronConsolidation(unittest.TestCase):
+    """Jobs with identical commands share one cron line."""
+
+    def setUp(self) -> None:
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.cron_manager = cronblock.CronManager(self.temp_dir)
+        self.crontab: list = []
+        patches = [
+            patch.object(self.cron_manager, "_get_current_crontab", lambda: list(self.crontab)),
+            patch.object(self.cron_manager, "_write_crontab", self._write),
+            patch.object(self.cron_manager, "_backup_crontab", lambda lines: None),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def _write(self, lines: list) -> None:
+        self.crontab = list(lines)
+
+    def test_cron_field(self) -> None:
+        field = cronblock._cron_field
+        self.assertEqual(field(range(60), 0, 59), "*")
+        self.assertEqual(field([0, 15, 30, 45], 0, 59), "*/15")
+        self.assertEqual(field([5, 20, 35, 50], 0, 59), "5-50/15")
+        self.assertEqual(field([1, 2, 3, 4, 5], 0, 6), "1-5")
+        self.assertEqual(field([0, 6], 0, 6), "0,6")
+        self.assertEqual(field([7, 8, 9, 12, 18], 0, 23), "7-9,12,18")
+
+    def test_identical_commands_share_a_line(self) -> None:
+        store = JobsStore(self.temp_dir)
+        weekdays = [1, 2, 3, 4, 5]
+        for i, hour in enumerate(["08", "09", "10", "12"]):
+            store.add_job(Job(f"p{i}", "Kitchen", weekdays, f"{hour}:00", "pause", {}))
+        store.add_job(Job("w1", "Kitchen", [6, 7], "08:30", "pause", {}))
+        store.add_job(Job("w2", "Kitchen", [6, 7], "09:30", "pause", {}))
+        store.add_job(Job("v1", "Kitchen", weekdays, "11:00", "volume", {"volume": 40}))
+
+        compiled = self.cron_manager.compile_jobs()
+        lines = [line.line.split(" AIRCRON_JOB_ID=") for line in compiled.zone_lines["Kitchen"]]
+        self.assertEqual(
+            [(schedule, env.split(" ")[0]) for schedule, env in lines],
+            [
+                ("0 8-10,12 * * 1-5", "p0,p1,p2,p3"),
+                ("30 8,9 * * 0,6", "w1,w2"),
+                ("0 11 * * 1-5", "v1"),
+            ],
+        )
+        self.assertIs(compiled.lines["p2"], compiled.lines["p0"])
+        first = compiled.lines["p0"].normalized
+        self.assertEqual(
+            [job.id for job in compiled.jobs_for_line(first)], ["p0", "p1", "p2", "p3"]
+        )
+
+        # Every job still fires at exactly its own times
+        week = [
+            (day % 7, hour, minute)
+            for day in range(7)
+            for hour in range(24)
+            for minute in range(60)
+        ]
+        fired = {
+            (day, hour, minute)
+            for line in compiled.zone_lines["Kitchen"]
+            for day, hour, minute in week
+            if _matches(line.line, day, hour, minute)
+        }
+        expected = {
+            ((day % 7), int(job.time[:2]), int(job.time[3:]))
+            for job in compiled.jobs.values()
+            for day in job.days
+        }
+        self.assertEqual(fired, expected)
+
+    def test_manifest_maps_installed_lines_to_jobs(self) -> None:
+        store = JobsStore(self.temp_dir)
+        store.add_job(Job("a", "Kitchen", [1], "08:00", "pause", {}))
+        store.add_job(Job("b", "Kitchen", [1], "09:00", "pause", {}))
+        self.cron_manager.apply_jobs_to_cron()
+        block = self.cron_manager.get_crontab_snapshot(refresh=True)
+        self.assertIn("# aircron-jobs: a,b", block.block)
+        self.assertEqual(list(block.manifest.values()), [["a", "b"]])
+
+        store.delete_job("Kitchen", "a")
+        diff = self.cron_manager.apply_jobs_to_cron()["diff"]
+        self.assertEqual([e["job_id"] for e in diff["added"]], ["b"])
+        self.assertEqual([e["job_ids"] for e in diff["removed"]], [["a", "b"]])
+
+
+def _matches(line: str, day: int, hour: int, minute: int) -> bool:
+    minutes, hours, _, _, days = line.split(" ")[:5]
+    fields = [(minutes, minute, 0, 59), (hours, hour, 0, 23), (days, day, 0, 6)]
+    return all(value in _expand(field, low, high) for field, value, low, high in fields)
+
+
+def _expand(field: str, low: int, high: int) -> set:
+    values: set = set()
+    for part in field.split(","):
+        part, _, step = part.partition("/")
+        start, _, end = part.partition("-")
+        first, last = (low, high) if start == "*" else (int(start), int(end or start))
+        values.update(range(first, last + 1, int(step or 1)))
+    return values
+
 
 if __name__ == "__main__":
     unittest.main()
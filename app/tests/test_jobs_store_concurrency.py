@@ -0,0 +1,48 @@
+"""Multi-process stress test for JobsStore file locking."""
+
+import multiprocessing
+import tempfile
+from pathlib import Path
+from typing import Any, List
+
+from app.jobs_backends import JsonJobsBackend
+from app.jobs_store import Job, JobsStore
+
+WRITERS = 32
+JOBS_PER_WRITER = 8
+
+
+def _writer(app_support_dir: str, writer: int, results: Any) -> None:
+    """Add this writer's jobs and report how long each add waited for the lock."""
+    backend = JsonJobsBackend(Path(app_support_dir))
+    # Compact often so journal appends race with whole-file rewrites
+    backend.compact_threshold = 16
+    store = JobsStore(Path(app_support_dir), backend=backend)
+    waits: List[float] = []
+    for i in range(JOBS_PER_WRITER):
+        store.add_job(Job(f"w{writer}-{i}", f"Zone {writer}", [1], f"{i:02d}:00", "pause", {}))
+        waits.append(backend.lock.last_wait)
+    results.put(waits)
+
+
+def test_concurrent_writers_lose_no_jobs() -> None:
+    ctx = multiprocessing.get_context("fork")
+    results = ctx.Queue()
+    with tempfile.TemporaryDirectory() as tmp:
+        JsonJobsBackend(Path(tmp))  # create jobs.json before the writers start
+        procs = [ctx.Process(target=_writer, args=(tmp, w, results)) for w in range(WRITERS)]
+        for proc in procs:
+            proc.start()
+        waits = [wait for _ in procs for wait in results.get(timeout=60)]
+        for proc in procs:
+            proc.join(timeout=60)
+            assert proc.exitcode == 0
+
+        jobs = JsonJobsBackend(Path(tmp)).load()
+        stored = {job["id"] for job_list in jobs.values() for job in job_list}
+        expected = {f"w{w}-{i}" for w in range(WRITERS) for i in range(JOBS_PER_WRITER)}
+        assert stored == expected
+
+    waits.sort()
+    p99 = waits[int(len(waits) * 0.99) - 1]
+    assert p99 < 5.0
@@ -0,0 +1,90 @@
+import tempfile
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from app import create_app, metrics
+from app.metrics import Counter, Histogram, Registry
+
+JOB = {
+    "zone": "Kitchen",
+    "days": [1],
+    "time": "07:30",
+    "action": "pause",
+    "args": {},
+    "service": "spotify",
+}
+
+
+@pytest.fixture
+def client() -> Any:
+    temp_dir = tempfile.TemporaryDirectory()
+    app = create_app({"TESTING": True, "APP_SUPPORT_DIR": Path(temp_dir.name)})
+    metrics.REGISTRY.clear()
+    with app.test_client() as client:
+        yield client
+    temp_dir.cleanup()
+
+
+def test_registry_renders_prometheus_text() -> None:
+    registry = Registry()
+    requests = registry.register(Counter("demo_total", "Demo count.", ["kind"]))
+    latency = registry.register(Histogram("demo_seconds", "Demo time.", [], buckets=(0.1, 1)))
+    requests.inc(kind='say "hi"')
+    requests.inc(2, kind='say "hi"')
+    latency.observe(0.1)
+    latency.observe(5)
+
+    text = registry.render()
+    assert "# TYPE demo_total counter" in text
+    assert 'demo_total{kind="say \\"hi\\""} 3' in text
+    assert 'demo_seconds_bucket{le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{le="1"} 1' in text
+    assert 'demo_seconds_bucket{le="+Inf"} 2' in text
+    assert "demo_seconds_count 2" in text and "demo_seconds_sum 5.1" in text
+    with pytest.raises(ValueError):
+        requests.inc(other="x")
+    with pytest.raises(ValueError):
+        registry.register(Counter("demo_total", "Again."))
+
+
+def test_run_subprocess_counts_runs_and_failures() -> None:
+    metrics.REGISTRY.clear()
+    metrics.run_subprocess(["true"])
+    metrics.run_subprocess(["false"], "probe")
+    with pytest.raises(OSError):
+        metrics.run_subprocess(["/nonexistent/tool"], "probe")
+
+    assert metrics.SUBPROCESS_SECONDS.count(command="true") == 1
+    assert metrics.SUBPROCESS_FAILURES.value(command="true") == 0
+    assert metrics.SUBPROCESS_SECONDS.count(command="probe") == 2
+    assert metrics.SUBPROCESS_FAILURES.value(command="probe") == 2
+
+
+def test_metrics_endpoint_reports_routes_store_and_caches(client: Any) -> None:
+    client.post("/api/jobs/Kitchen", json=JOB)
+    client.get("/api/jobs/Kitchen")
+    client.get("/api/jobs/Kitchen")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    text = response.get_data(as_text=True)
+    assert (
+        'aircron_http_request_duration_seconds_count{method="GET",route="/api/jobs/<zone>",'
+        'status="200"} 2' in text
+    )
+    assert 'aircron_store_operation_duration_seconds_count{backend="json",op="apply"} 1' in text
+    assert 'aircron_lock_wait_seconds_count{lock="jobs_store"} 1' in text
+    assert 'aircron_cache_requests_total{cache="response",result="hit"} 1' in text
+    assert metrics.CACHE_REQUESTS.value(cache="jobs_snapshot", result="hit") >= 1
+    assert metrics.STORE_FILE_BYTES.value(file="jobs.journal") > 0
+
+
+def test_metrics_can_be_disabled() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        app = create_app(
+            {"TESTING": True, "APP_SUPPORT_DIR": Path(temp_dir), "METRICS_ENABLED": False}
+        )
+        assert app.test_client().get("/metrics").status_code == 404
@@ -0,0 +1,162 @@
+import os
+import pstats
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+from unittest.mock import patch
+
+import pytest
+
+from app import create_app
+from app.profiling import profiler
+from app.speakers import speaker_discovery
+
+from .fake_mac import FakeMac
+
+JOB = {
+    "zone": "Kitchen",
+    "days": [1],
+    "time": "07:30",
+    "action": "pause",
+    "args": {},
+    "service": "spotify",
+}
+
+
+def _names(span: Dict[str, Any]) -> Iterator[str]:
+    yield span["name"]
+    for child in span["children"]:
+        yield from _names(child)
+
+
+def _find(span: Dict[str, Any], name: str) -> Dict[str, Any]:
+    if span["name"] == name:
+        return span
+    for child in span["children"]:
+        try:
+            return _find(child, name)
+        except KeyError:
+            pass
+    raise KeyError(name)
+
+
+@pytest.fixture
+def make_client(monkeypatch: Any, tmp_path: Path) -> Any:
+    root = tmp_path
+    mac = FakeMac(root).install()
+    monkeypatch.setattr(speaker_discovery, "is_airfoil_running", lambda: False)
+    profiler.clear()
+
+    def make(**config: Any) -> Any:
+        app = create_app(
+            {
+                "TESTING": True,
+                "APP_SUPPORT_DIR": root / "support",
+                "PROFILING_ENABLED": True,
+                "PROFILING_SLOW_MS": 0,
+                "SPEAKER_REFRESH_INTERVAL": 0,
+                **config,
+            }
+        )
+        return app.test_client()
+
+    with patch.dict(os.environ, mac.env()):
+        yield make
+
+
+def test_requests_record_span_trees(make_client: Any) -> None:
+    client = make_client()
+    client.post("/api/jobs/Kitchen", json=JOB)
+    page = client.get("/?zone=Kitchen")
+    assert page.status_code == 200
+    assert "subprocess;dur=" in page.headers["Server-Timing"]
+
+    listed: List[Dict[str, Any]] = client.get("/debug/requests").get_json()["requests"]
+    assert [r["path"] for r in listed[:2]] == ["/", "/api/jobs/Kitchen"]
+    summary = listed[0]
+    assert summary["route"] == "/" and summary["status"] == 200
+    assert summary["subprocesses"] == 1 and summary["subprocess_ms"] > 0
+    assert summary["counters"]["cache:crontab_snapshot:miss"] == 1
+
+    trace = client.get(f"/debug/requests/{summary['id']}").get_json()
+    names = list(_names(trace["spans"]))
+    assert "speakers:list" in names and "store:snapshot" in names
+    assert "template:index.html" in names
+    crontab = _find(trace["spans"], "cron:read_crontab")
+    assert crontab["children"][0]["name"] == "subprocess:crontab -l"
+    # No crontab installed yet: crontab -l exits 1
+    assert crontab["children"][0]["attrs"] == {"argv": "crontab -l", "returncode": 1}
+
+    # Service calls are spans with the store work beneath them
+    added = client.get(f"/debug/requests/{listed[1]['id']}").get_json()["spans"]
+    service = _find(added, "service:jobs_service.create_job")
+    assert "store:apply" in list(_names(service))
+    assert client.get("/debug/requests/999999").status_code == 404
+
+
+def test_only_slow_requests_are_kept(make_client: Any) -> None:
+    client = make_client(PROFILING_SLOW_MS=60_000, PROFILING_KEEP=2)
+    client.get("/api/jobs/all")
+    assert client.get("/debug/requests").get_json()["requests"] == []
+
+    profiler.slow_ms = 0
+    for _ in range(3):
+        client.get("/api/jobs/all")
+    assert len(client.get("/debug/requests").get_json()["requests"]) == 2
+
+
+def test_cprofile_capture(make_client: Any, tmp_path: Path) -> None:
+    client = make_client()
+    response = client.get("/api/cron/all?_profile=pstats")
+    assert response.status_code == 200
+    assert "api_cron_all.pstats" in response.headers["Content-Disposition"]
+    (tmp_path / "out.pstats").write_bytes(response.data)
+    stats = pstats.Stats(str(tmp_path / "out.pstats"))
+    assert any(name == "get_all_cron_jobs" for _, _, name in stats.stats)  # type: ignore
+
+    collapsed = client.get("/api/cron/all?_profile=collapsed").get_data(as_text=True)
+    stack, micros = collapsed.splitlines()[0].rsplit(" ", 1)
+    assert int(micros) > 0 and stack
+    assert "(get_all_cron_jobs)" in collapsed
+
+    assert client.get("/api/cron/all?_profile=svg").status_code == 400
+
+
+def test_one_capture_at_a_time(make_client: Any, monkeypatch: Any) -> None:
+    from app.services import cron_service
+
+    client = make_client()
+    entered, release = threading.Event(), threading.Event()
+    get_all = cron_service.get_all_cron_jobs
+
+    def slow_get_all() -> Any:
+        entered.set()
+        release.wait(10)
+        return get_all()
+
+    monkeypatch.setattr(cron_service, "get_all_cron_jobs", slow_get_all)
+    first: List[Any] = []
+    worker = threading.Thread(
+        target=lambda: first.append(
+            client.application.test_client().get("/api/cron/all?_profile=pstats")
+        )
+    )
+    worker.start()
+    try:
+        assert entered.wait(10)
+        assert client.get("/api/jobs/all?_profile=collapsed").status_code == 409
+        assert client.get("/api/jobs/all").status_code == 200
+    finally:
+        release.set()
+        worker.join(10)
+    assert first[0].status_code == 200
+    assert "api_cron_all.pstats" in first[0].headers["Content-Disposition"]
+    # The lock is released once the capture finishes
+    assert client.get("/api/jobs/all?_profile=collapsed").status_code == 200
+
+
+def test_profiling_is_off_by_default(make_client: Any) -> None:
+    client = make_client(PROFILING_ENABLED=False)
+    assert "Server-Timing" not in client.get("/api/jobs/all").headers
+    assert client.get("/debug/requests").status_code == 404
+    assert client.get("/api/jobs/all?_profile=pstats").is_json
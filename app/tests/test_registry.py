@@ -0,0 +1,46 @@
+from pathlib import Path
+from typing import Any
+from unittest.mock import patch
+
+from app import create_app, cronblock
+from app.jobs_store import JobsStore
+from app.registry import get_registry
+
+JOB = {
+    "zone": "Kitchen",
+    "days": [1],
+    "time": "07:30",
+    "action": "pause",
+    "args": {},
+    "service": "spotify",
+}
+
+
+def _app(root: Path) -> Any:
+    return create_app({"TESTING": True, "APP_SUPPORT_DIR": root, "SPEAKER_REFRESH_INTERVAL": 0})
+
+
+def test_each_app_has_its_own_store_and_cron_manager(tmp_path: Path) -> None:
+    first = get_registry(_app(tmp_path / "one"))
+    second = get_registry(_app(tmp_path / "two"))
+    assert first.cron_manager is not second.cron_manager
+    assert first.cron_manager.jobs_store is first.jobs_store
+    assert second.jobs_store.backend.location == tmp_path / "two" / "jobs.json"
+
+
+def test_requests_reuse_the_registry(tmp_path: Path, monkeypatch: Any) -> None:
+    monkeypatch.setattr(cronblock.CronManager, "_get_current_crontab", lambda self: [])
+    app = _app(tmp_path)
+    client = app.test_client()
+    manager = get_registry(app).cron_manager
+
+    with (
+        patch.object(JobsStore, "__init__", side_effect=AssertionError("JobsStore built")),
+        patch.object(cronblock.CronManager, "__init__", side_effect=AssertionError),
+        patch.object(Path, "is_file", side_effect=AssertionError("script path probed")),
+    ):
+        assert client.post("/api/jobs/Kitchen", json=JOB).status_code == 201
+        for url in ("/", "/api/jobs/all", "/api/cron/status", "/api/status"):
+            assert client.get(url).status_code == 200
+        with app.app_context():
+            assert cronblock.get_cron_manager() is manager
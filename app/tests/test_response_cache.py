@@ -0,0 +1,72 @@
+import tempfile
+from pathlib import Path
+from typing import Any, List
+
+import pytest
+
+from app import create_app
+from app.services import jobs_service
+from app.speakers import speaker_discovery
+
+JOB = {
+    "zone": "Kitchen",
+    "days": [1],
+    "time": "07:30",
+    "action": "pause",
+    "args": {},
+    "service": "spotify",
+}
+
+
+@pytest.fixture
+def client(monkeypatch: Any) -> Any:
+    temp_dir = tempfile.TemporaryDirectory()
+    app = create_app({"TESTING": True, "APP_SUPPORT_DIR": Path(temp_dir.name)})
+    from app import cronblock
+
+    monkeypatch.setattr(cronblock.CronManager, "_get_current_crontab", lambda self: [])
+    monkeypatch.setattr(speaker_discovery, "is_airfoil_running", lambda: False)
+    with app.test_client() as client:
+        yield client
+    temp_dir.cleanup()
+
+
+def test_unchanged_jobs_answer_304_without_rebuilding(client: Any, monkeypatch: Any) -> None:
+    builds: List[int] = []
+    build_flat = jobs_service.get_all_jobs_flat
+
+    def counting_build() -> Any:
+        builds.append(1)
+        return build_flat()
+
+    monkeypatch.setattr(jobs_service, "get_all_jobs_flat", counting_build)
+
+    first = client.get("/api/jobs/all")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and first.headers["Cache-Control"] == "no-cache"
+
+    again = client.get("/api/jobs/all", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.data == b""
+    # A client without the ETag gets the cached bytes
+    assert client.get("/api/jobs/all").data == first.data
+    assert len(builds) == 1
+
+    client.post("/api/jobs/Kitchen", json=JOB)
+    changed = client.get("/api/jobs/all", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+    assert changed.get_json()["jobs"][0]["zone"] == "Kitchen"
+    assert len(builds) == 2
+
+
+@pytest.mark.parametrize(
+    "path", ["/api/jobs/Kitchen", "/api/playlists", "/api/cron/all", "/api/status"]
+)
+def test_read_endpoints_are_conditional(client: Any, path: str) -> None:
+    etag = client.get(path).headers["ETag"]
+    assert client.get(path, headers={"If-None-Match": etag}).status_code == 304
+
+    client.post("/api/jobs/Kitchen", json=JOB)
+    client.post(
+        "/api/playlists", json={"name": "Jazz", "uri": "spotify:playlist:9", "service": "spotify"}
+    )
+    assert client.get(path, headers={"If-None-Match": etag}).status_code == 200
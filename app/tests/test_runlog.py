@@ -0,0 +1,145 @@
+import os
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+
+from app import create_app
+from app.executor import ActionExecutor
+from app.runlog import RunLog, RunStats
+from app.runqueue import QueuedAction
+
+from .fake_mac import FakeMac
+
+SCRIPT = Path(__file__).resolve().parents[2] / "aircron_run.sh"
+
+
+@pytest.fixture
+def root() -> Any:
+    temp_dir = tempfile.TemporaryDirectory()
+    root = Path(temp_dir.name)
+    FakeMac(root).install(["Kitchen", "Patio"])
+    yield root
+    temp_dir.cleanup()
+
+
+def _env(root: Path) -> dict:
+    return {
+        **os.environ,
+        **FakeMac(root).env(),
+        "HOME": str(root),
+        "AIRCRON_NO_EXECUTOR": "1",
+        "AIRCRON_RUN_LOG": str(root / "runs.jsonl"),
+    }
+
+
+def test_script_writes_step_and_run_records(root: Path) -> None:
+    env = _env(root)
+    args = ["Custom:Kitchen,Patio", "play", "spotify:playlist:1", "", "spotify"]
+    subprocess.run(
+        ["bash", str(SCRIPT), *args],
+        env={**env, "AIRCRON_JOB_ID": "job1"},
+        check=True,
+        timeout=30,
+    )
+    subprocess.run(
+        ["bash", str(SCRIPT), "Kitchen", "explode", "", "", "spotify"], env=env, timeout=30
+    )
+
+    records, _ = RunLog(root / "runs.jsonl").read()
+    steps = [r["step"] for r in records if r["type"] == "step"]
+    assert "osascript" in steps and "spotify:play" in steps
+    play, bad = [r for r in records if r["type"] == "run"]
+    assert play["job_id"] == "job1" and play["zone"] == args[0] and play["action"] == "play"
+    assert play["exit_code"] == 0 and play["failed_steps"] == 0
+    assert play["end_ms"] >= play["start_ms"] and 0 <= play["drift_ms"] < 60000
+    # Manual runs have no job and no drift
+    assert bad["exit_code"] == 1 and bad["job_id"] == "" and bad["drift_ms"] is None
+
+
+def test_executor_logs_runs_with_speaker_results(root: Path) -> None:
+    FakeMac(root).set_reachable("Patio", False)
+    run_log = RunLog(root / "runs.jsonl")
+    with patch.dict(os.environ, _env(root)):
+        executor = ActionExecutor(run_log)
+        item = QueuedAction("Custom:Kitchen,Patio", "volume", "40", job_id="job2", scheduled_at=0)
+        assert not executor.run(item)["ok"]
+
+    records, _ = run_log.read()
+    assert [r["step"] for r in records if r["type"] == "step"][-1] == "osascript"
+    run = records[-1]
+    assert run["type"] == "run" and run["run_id"] == item.id and run["job_id"] == "job2"
+    assert run["exit_code"] == 1 and "Patio: Airfoil could not reach Patio" in run["error"]
+    assert run["drift_ms"] > 0
+
+    stats = RunStats(run_log)
+    by_speaker = stats.snapshot()["by_speaker"]
+    assert by_speaker["Kitchen"]["failures"] == 0
+    assert by_speaker["Patio"]["failure_rate"] == 1.0
+    assert by_speaker["Patio"]["last_error"] == "Airfoil could not reach Patio"
+
+
+def test_stats_aggregate_incrementally(root: Path) -> None:
+    run_log = RunLog(root / "runs.jsonl")
+    stats = RunStats(run_log)
+    for duration, code in ((40, 0), (300, 0), (7000, 1)):
+        run_log.append(
+            {
+                "type": "run",
+                "zone": "Kitchen",
+                "action": "connect",
+                "start_ms": 1,
+                "duration_ms": duration,
+                "exit_code": code,
+                "drift_ms": 800,
+            }
+        )
+    snapshot = stats.snapshot()
+    connect = snapshot["by_action"]["connect"]
+    assert connect["runs"] == 3 and connect["failures"] == 1
+    assert connect["latency_ms"]["buckets"]["50"] == 1
+    assert connect["latency_ms"]["buckets"]["500"] == 1
+    assert connect["latency_ms"]["buckets"]["10000"] == 1
+    assert connect["latency_ms"]["p50"] == 300
+    assert snapshot["drift_ms"]["buckets"]["1000"] == 3
+
+    # A partly written line waits for the rest
+    with open(run_log.path, "a") as f:
+        f.write('{"type": "run", "action": "play", "zone": "Patio", "duration_ms": 5')
+    assert stats.snapshot()["runs"] == 3
+    with open(run_log.path, "a") as f:
+        f.write('0, "exit_code": 0}\n')
+    assert stats.snapshot()["by_action"]["play"]["latency_ms"]["max"] == 50
+
+    # A rotated log starts over
+    run_log.path.unlink()
+    run_log.append({"type": "run", "action": "pause", "zone": "Kitchen", "duration_ms": 10})
+    assert list(stats.snapshot()["by_action"]) == ["pause"]
+
+
+def test_api_serves_stats_and_recent_runs(root: Path) -> None:
+    app = create_app(
+        {"TESTING": True, "APP_SUPPORT_DIR": root / "support", "RUN_LOG": root / "runs.jsonl"}
+    )
+    RunLog(root / "runs.jsonl").append(
+        {
+            "type": "run",
+            "job_id": "j1",
+            "zone": "Custom:Kitchen,Patio",
+            "action": "play",
+            "duration_ms": 1200,
+            "exit_code": 0,
+        }
+    )
+    client = app.test_client()
+    stats = client.get("/api/runs/stats")
+    assert stats.get_json()["by_speaker"]["Patio"]["runs"] == 1
+    headers = {"If-None-Match": stats.headers["ETag"]}
+    assert client.get("/api/runs/stats", headers=headers).status_code == 304
+
+    assert client.get("/api/runs/recent?job_id=j1").get_json()["runs"][0]["action"] == "play"
+    assert client.get("/api/runs/recent?job_id=other").get_json()["runs"] == []
+    assert client.get("/api/runs/recent?limit=0").status_code == 400
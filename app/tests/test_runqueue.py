@@ -0,0 +1,160 @@
+"""Tests for the durable run queue and same-minute fire handling."""
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+from unittest.mock import patch
+
+from ..executor import ActionExecutor, send_request, start_executor
+from ..runqueue import QueuedAction, RunQueue
+from .fake_mac import FakeMac
+
+
+class TestRunQueue(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.spool_dir = Path(self.temp_dir.name) / "queue"
+        self.ran: List[Tuple[str, str]] = []
+        self.release = threading.Event()
+
+    def tearDown(self) -> None:
+        self.release.set()
+        self.temp_dir.cleanup()
+
+    def _run(self, item: QueuedAction) -> Dict[str, Any]:
+        self.ran.append((item.zone, item.action))
+        self.release.wait(5)
+        return {"ok": True}
+
+    def test_queued_actions_for_a_zone_are_coalesced(self) -> None:
+        queue = RunQueue(self._run, self.spool_dir, workers=2)
+        queue.start()
+        try:
+            running = queue.submit("Kitchen", "volume", "40")
+            time.sleep(0.1)  # let it start so the next ones queue behind it
+            pause = queue.submit("Kitchen", "pause")
+            play = queue.submit("Kitchen", "play", "spotify:playlist:1")
+
+            result = queue.wait(pause, timeout=5)
+            self.assertTrue(result["coalesced"])
+            self.assertEqual(result["superseded_by"], play.id)
+
+            self.release.set()
+            self.assertTrue(queue.wait(play, timeout=5)["ok"])
+            self.assertTrue(queue.wait(running, timeout=5)["ok"])
+        finally:
+            queue.stop()
+        self.assertEqual(self.ran, [("Kitchen", "volume"), ("Kitchen", "play")])
+        self.assertEqual(list(self.spool_dir.glob("*.json")), [])
+
+    def test_independent_speakers_run_in_parallel(self) -> None:
+        queue = RunQueue(self._run, workers=4)
+        queue.start()
+        try:
+            kitchen = queue.submit("Kitchen", "connect")
+            office = queue.submit("Office", "connect")
+            everywhere = queue.submit("All Speakers", "volume", "30")
+            time.sleep(0.2)
+            # Kitchen and Office run together; All Speakers waits for both
+            self.assertEqual(queue.snapshot()["running"], 2)
+            self.assertEqual(queue.snapshot()["pending"], 1)
+            self.release.set()
+            for item in (kitchen, office, everywhere):
+                self.assertTrue(queue.wait(item, timeout=5)["ok"])
+        finally:
+            queue.stop()
+        self.assertEqual(self.ran[-1], ("All Speakers", "volume"))
+
+    def test_spooled_actions_survive_a_restart(self) -> None:
+        # Never started: the action is only on disk
+        RunQueue(self._run, self.spool_dir).submit("Office", "pause")
+        self.assertEqual(len(list(self.spool_dir.glob("*.json"))), 1)
+
+        self.release.set()
+        queue = RunQueue(self._run, self.spool_dir)
+        queue.start()
+        try:
+            deadline = time.monotonic() + 5
+            while queue.snapshot()["completed"] < 1 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            queue.stop()
+        self.assertEqual(self.ran, [("Office", "pause")])
+        self.assertEqual(list(self.spool_dir.glob("*.json")), [])
+
+
+class TestSameMinuteFires(unittest.TestCase):
+    """Fire 50 same-minute jobs at the executor backed by the simulated Mac."""
+
+    latency = 0.05
+    zones = [f"Speaker {n}" for n in range(10)]
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory(dir="/tmp")
+        root = Path(self.temp_dir.name)
+        self.mac = FakeMac(root).install(self.zones, latency=self.latency)
+        self.env = patch.dict(os.environ, self.mac.env())
+        self.env.start()
+        self.executor = ActionExecutor()
+        self.executor._spotify_cmd = str(self.mac.bin_dir / "spotify")
+        self.socket_path = root / "executor.sock"
+        self.server = start_executor(self.socket_path, self.executor, workers=8)
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        self.env.stop()
+        self.temp_dir.cleanup()
+
+    def test_fifty_fires_none_dropped(self) -> None:
+        fires = [
+            (zone, action, arg1)
+            for zone in self.zones
+            for action, arg1 in [
+                ("connect", ""),
+                ("volume", "30"),
+                ("pause", ""),
+                ("play", "spotify:playlist:1"),
+                ("volume", "45"),
+            ]
+        ]
+        self.assertEqual(len(fires), 50)
+
+        start = time.monotonic()
+        for zone, action, arg1 in fires:
+            request = {"zone": zone, "action": action, "arg1": arg1, "wait": False}
+            self.assertTrue(send_request(self.socket_path, request)["ok"])
+
+        deadline = start + 30
+        while time.monotonic() < deadline:
+            queue = send_request(self.socket_path, {"op": "ping"})["queue"]
+            if queue["pending"] == 0 and queue["running"] == 0:
+                break
+            time.sleep(0.02)
+
+        # Every fire either ran or was superseded by a later fire for its zone
+        self.assertEqual(queue["submitted"], 50)
+        self.assertEqual(queue["failed"], 0)
+        self.assertEqual(queue["completed"] + queue["coalesced"], 50)
+        self.assertEqual(list((self.socket_path.parent / "queue").glob("*.json")), [])
+        calls = self.mac.calls()
+        plays = [call for call in calls if call["args"][:2] == ["play", "uri"]]
+        self.assertEqual(len(plays), len(self.zones))
+
+        # Zones ran in parallel: some tool calls overlapped
+        edges = sorted(
+            [(call["start"], 1) for call in calls] + [(call["end"], -1) for call in calls]
+        )
+        running = peak = 0
+        for _, delta in edges:
+            running += delta
+            peak = max(peak, running)
+        self.assertGreater(peak, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
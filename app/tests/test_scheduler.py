@@ -0,0 +1,139 @@
+"""Tests for the in-process scheduler backend."""
+
+import json
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+from pathlib import Path
+from typing import Any, List
+from unittest.mock import patch
+
+from flask import template_rendered
+
+from .. import create_app
+from ..cronblock import CronManager
+from ..jobs_store import Job, JobsStore
+from ..scheduler import JobScheduler
+
+# Monday 08:59 local time
+T0 = datetime(2026, 1, 5, 8, 59).timestamp()
+WEEK = 7 * 24 * 3600
+
+
+class TestJobScheduler(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.app_support_dir = Path(self.temp_dir.name)
+        self.store = JobsStore(self.app_support_dir)
+        self.store.add_job(Job("j1", "Kitchen", [1], "09:00", "play", {"uri": "spotify:x"}))
+        self.store.add_job(Job("j2", "Office", [1, 2], "09:00", "volume", {"volume": 30}))
+        self.fired: List[str] = []
+        self.now = T0
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def _scheduler(self, **kwargs) -> JobScheduler:
+        return JobScheduler(
+            self.store,
+            lambda job, fire: self.fired.append(job.id),
+            clock=lambda: self.now,
+            **kwargs,
+        )
+
+    def test_fires_due_jobs_and_reschedules(self) -> None:
+        scheduler = self._scheduler()
+        scheduler.sync()
+        self.assertEqual(scheduler.next_fire_time(), T0 + 60)
+
+        self.assertEqual(scheduler.run_pending(T0 + 30), 0)
+        self.assertEqual(scheduler.run_pending(T0 + 61), 2)
+        self.assertEqual(sorted(self.fired), ["j1", "j2"])
+        # j2 also runs on Tuesday; j1 not until next Monday
+        self.assertEqual(scheduler.next_fire_time(), T0 + 60 + 24 * 3600)
+        self.assertEqual(scheduler.run_pending(T0 + 120), 0)
+
+    def test_store_changes_are_picked_up_incrementally(self) -> None:
+        scheduler = self._scheduler()
+        scheduler.sync()
+        self.assertFalse(scheduler.sync())
+
+        self.store.update_job(Job("j1", "Kitchen", [1], "09:30", "play", {"uri": "spotify:x"}))
+        self.store.delete_job("Office", "j2")
+        self.assertTrue(scheduler.sync())
+        self.assertEqual(scheduler.status()["jobs"], 1)
+
+        self.assertEqual(scheduler.run_pending(T0 + 61), 0)
+        self.assertEqual(scheduler.run_pending(T0 + 31 * 60 + 1), 1)
+        self.assertEqual(self.fired, ["j1"])
+
+    def test_missed_fires_are_caught_up_within_the_window(self) -> None:
+        # Asleep across 09:00 for two minutes: the fires still run, once each
+        scheduler = self._scheduler(catch_up=300)
+        scheduler.sync()
+        self.assertEqual(scheduler.run_pending(T0 + 180), 2)
+
+        # Asleep for an hour: too late, skipped and rescheduled
+        self.fired.clear()
+        scheduler = self._scheduler(catch_up=300)
+        scheduler.sync()
+        self.assertEqual(scheduler.run_pending(T0 + 3600), 0)
+        self.assertEqual(scheduler.status()["missed"], 2)
+        self.assertEqual(self.fired, [])
+        self.assertGreater(scheduler.next_fire_time(), T0 + 3600)
+
+    def test_restart_catches_up_from_saved_state(self) -> None:
+        state_file = self.app_support_dir / "scheduler.json"
+        state_file.write_text(json.dumps({"last_checked": T0}))
+        self.now = T0 + 120  # the server was down over 09:00
+        dispatched = threading.Event()
+
+        def dispatch(job: Job, fire: float) -> None:
+            self.fired.append(job.id)
+            if len(self.fired) == 2:
+                dispatched.set()
+
+        scheduler = JobScheduler(
+            self.store, dispatch, state_file=state_file, clock=lambda: self.now
+        )
+        scheduler.start()
+        try:
+            self.assertTrue(dispatched.wait(5))
+        finally:
+            scheduler.stop()
+        self.assertEqual(sorted(self.fired), ["j1", "j2"])
+        self.assertEqual(json.loads(state_file.read_text())["last_checked"], T0 + 120)
+
+    def test_views_show_jobs_as_scheduled(self) -> None:
+        app = create_app(
+            {
+                "TESTING": True,
+                "APP_SUPPORT_DIR": self.app_support_dir,
+                "SCHEDULER_BACKEND": "internal",
+                "SPEAKER_REFRESH_INTERVAL": 0,
+            }
+        )
+        client = app.test_client()
+        rendered: List[Any] = []
+
+        def record(sender: Any, template: Any, context: Any, **_: Any) -> None:
+            rendered.append(context)
+
+        template_rendered.connect(record, app)
+        with patch.object(CronManager, "_get_current_crontab", return_value=[]):
+            zones = client.get("/api/cron/all").get_json()["zones"]
+            page = client.get("/zone/Kitchen").get_data(as_text=True)
+            client.get("/?zone=Office")
+        self.assertEqual(zones["Kitchen"][0]["status"], "scheduled")
+        self.assertIn("Scheduled", page)
+        self.assertNotIn("Pending Apply", page)
+        self.assertEqual([job["status"] for job in rendered[-1]["current_jobs"]], ["scheduled"])
+
+    def test_unknown_backend_is_rejected(self) -> None:
+        with self.assertRaises(ValueError):
+            create_app({"APP_SUPPORT_DIR": self.temp_dir.name, "SCHEDULER_BACKEND": "at"})
+
+
+if __name__ == "__main__":
+    unittest.main()
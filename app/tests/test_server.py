@@ -0,0 +1,128 @@
+import http.client
+import socket
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+import pytest
+from flask import Flask, request
+
+from app import create_app
+from app.server import PooledWSGIServer, benchmark, make_server
+
+
+@pytest.fixture
+def flask_app() -> Any:
+    temp_dir = tempfile.TemporaryDirectory()
+    app = create_app(
+        {
+            "TESTING": True,
+            "APP_SUPPORT_DIR": Path(temp_dir.name),
+            "SPEAKER_REFRESH_INTERVAL": 0,
+        }
+    )
+    yield app
+    temp_dir.cleanup()
+
+
+def _serve(server: PooledWSGIServer) -> threading.Thread:
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_pooled_server_serves_the_app(flask_app: Flask) -> None:
+    server = make_server(flask_app, "127.0.0.1", 0, flask_app.config)
+    assert server.threads == flask_app.config["SERVER_THREADS"]
+    _serve(server)
+    conn = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+    conn.request("GET", "/api/scheduler")
+    assert conn.getresponse().status == 200
+    conn.close()
+
+    results = benchmark("127.0.0.1", server.port, ["/api/jobs/all"], requests=20, concurrency=4)
+    assert results[0]["requests"] == 20 and results[0]["errors"] == 0
+    assert server.drain(timeout=5)
+
+
+def test_connection_limit_and_graceful_drain() -> None:
+    release = threading.Event()
+    app = Flask(__name__)
+
+    @app.route("/slow")
+    def slow() -> str:
+        release.wait(5)
+        return "done"
+
+    server = PooledWSGIServer("127.0.0.1", 0, app, threads=1, max_connections=1)
+    _serve(server)
+
+    in_flight = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+    in_flight.request("GET", "/slow")
+    deadline = time.monotonic() + 5
+    while server.snapshot()["active"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    # Over the limit: refused straight away instead of queueing behind /slow
+    extra = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+    extra.request("GET", "/slow")
+    assert extra.getresponse().status == 503
+
+    # Draining waits for the in-flight request to finish
+    drained = []
+    drainer = threading.Thread(target=lambda: drained.append(server.drain(timeout=5)))
+    drainer.start()
+    time.sleep(0.1)
+    release.set()
+    resp = in_flight.getresponse()
+    assert resp.status == 200 and resp.read() == b"done"
+    drainer.join(5)
+    assert drained == [True]
+
+
+def _wait_for_pool_threads(timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not any(t.name.startswith("aircron-http") for t in threading.enumerate()):
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_drain_ends_event_streams(flask_app: Flask) -> None:
+    server = make_server(flask_app, "127.0.0.1", 0, flask_app.config)
+    _serve(server)
+    conn = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+    conn.request("GET", "/api/changes", headers={"Accept": "text/event-stream"})
+    resp = conn.getresponse()
+    assert resp.readline().startswith(b"id: ")
+
+    start = time.monotonic()
+    assert server.drain(timeout=5)
+    assert time.monotonic() - start < 3
+    resp.read()  # the stream ended instead of waiting for the next heartbeat
+    conn.close()
+    assert _wait_for_pool_threads(5)
+
+
+def test_drain_closes_connections_left_after_the_timeout() -> None:
+    app = Flask(__name__)
+
+    @app.route("/upload", methods=["POST"])
+    def upload() -> str:
+        return str(len(request.get_data()))
+
+    server = PooledWSGIServer("127.0.0.1", 0, app, threads=1, request_timeout=60)
+    _serve(server)
+    # Headers promise a body that never comes, so the handler blocks reading it
+    client = socket.create_connection(("127.0.0.1", server.port))
+    client.sendall(b"POST /upload HTTP/1.1\r\nHost: x\r\nContent-Length: 100\r\n\r\npartial")
+    deadline = time.monotonic() + 5
+    while server.snapshot()["active"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert not server.drain(timeout=0.2)
+    assert _wait_for_pool_threads(5)
+    client.close()
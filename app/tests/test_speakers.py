@@ -0,0 +1,113 @@
+"""Tests for the cached, background-refreshed speaker discovery."""
+
+import threading
+import time
+import unittest
+from typing import Callable, List
+from unittest.mock import patch
+
+from ..speakers import SpeakerDiscovery
+
+
+def _wait_until(predicate: Callable[[], bool], timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class TestSpeakerDiscoveryCache(unittest.TestCase):
+    def setUp(self) -> None:
+        # No background worker: refreshes requested by reads run on one-off threads
+        self.discovery = SpeakerDiscovery(ttl=60, refresh_interval=0)
+
+    def test_reads_never_wait_for_applescript(self) -> None:
+        release = threading.Event()
+        started = threading.Event()
+
+        def slow_discover() -> List[str]:
+            started.set()
+            release.wait(5)
+            return ["All Speakers", "Kitchen"]
+
+        with patch.object(self.discovery, "_discover_speakers", slow_discover):
+            # Empty cache: the read returns the fallback right away and starts a refresh
+            self.assertEqual(self.discovery.get_available_speakers(), ["All Speakers"])
+            self.assertTrue(started.wait(5))
+            self.assertTrue(self.discovery.get_cache_status()["refreshing"])
+            self.assertEqual(self.discovery.get_available_speakers(), ["All Speakers"])
+
+            release.set()
+            # refresh_speakers waits for the in-flight refresh instead of starting another
+            self.assertEqual(self.discovery.refresh_speakers(), ["All Speakers", "Kitchen"])
+
+        status = self.discovery.get_cache_status()
+        self.assertFalse(status["stale"])
+        self.assertIsNone(status["last_error"])
+        self.assertEqual(self.discovery.get_available_speakers(), ["All Speakers", "Kitchen"])
+
+    def test_failed_refresh_keeps_last_list(self) -> None:
+        with patch.object(
+            self.discovery, "_discover_speakers", return_value=["All Speakers", "Office"]
+        ):
+            self.discovery.refresh_speakers()
+
+        with patch.object(
+            self.discovery, "_discover_speakers", side_effect=RuntimeError("AppleScript timeout")
+        ):
+            self.assertEqual(self.discovery.refresh_speakers(), ["All Speakers", "Office"])
+
+        status = self.discovery.get_cache_status()
+        self.assertEqual(status["last_error"], "AppleScript timeout")
+        self.assertIsNotNone(status["age_seconds"])
+
+    def test_stale_cache_triggers_background_refresh(self) -> None:
+        self.discovery.ttl = 0
+        refreshed = threading.Event()
+
+        def discover() -> List[str]:
+            refreshed.set()
+            return ["All Speakers", "Patio"]
+
+        self.discovery.last_speakers = ["All Speakers", "Old"]
+        self.discovery.last_updated = 0.0
+        with patch.object(self.discovery, "_discover_speakers", discover):
+            self.assertEqual(self.discovery.get_available_speakers(), ["All Speakers", "Old"])
+            self.assertTrue(refreshed.wait(5))
+
+    def test_airfoil_status_reads_never_wait_for_applescript(self) -> None:
+        release = threading.Event()
+
+        def slow_check() -> bool:
+            release.wait(5)
+            return True
+
+        with patch.object(self.discovery, "is_airfoil_running", slow_check):
+            # Unknown status: reported as not running while the check runs in the background
+            self.assertFalse(self.discovery.get_airfoil_running())
+            self.assertFalse(self.discovery.get_airfoil_running())
+            release.set()
+            self.assertTrue(_wait_until(lambda: self.discovery._airfoil_status is not None))
+            self.assertTrue(self.discovery.get_airfoil_running())
+
+    def test_worker_keeps_the_airfoil_status_fresh(self) -> None:
+        discovery = SpeakerDiscovery(ttl=60, refresh_interval=60)
+        checks: List[float] = []
+
+        def check() -> bool:
+            checks.append(time.monotonic())
+            return True
+
+        with patch.object(discovery, "_discover_speakers", return_value=["All Speakers"]):
+            with patch.object(discovery, "is_airfoil_running", check):
+                discovery.start()
+                self.assertTrue(_wait_until(lambda: discovery._airfoil_status is not None))
+                # A stale status wakes the worker to re-check; the read still returns at once
+                self.assertTrue(discovery.get_airfoil_running(max_age=0))
+                self.assertTrue(_wait_until(lambda: len(checks) >= 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
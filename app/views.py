@@ -7,8 +7,8 @@ from typing import Any
 
 from flask import Blueprint, render_template, request
 
-from .cronblock import _normalize_cron_line
-from .jobs_store import JobsStore
+from .registry import get_jobs_store
+from .services import cron_service
 from .speakers import speaker_discovery
 
 logger = logging.getLogger(__name__)
@@ -26,11 +26,7 @@ def index() -> Any:
         # Get speakers and jobs for initial load
         speakers = speaker_discovery.get_available_speakers()
 
-        # Use Flask app context for JobsStore
-        from flask import current_app
-
-        app_support_dir = current_app.config.get("APP_SUPPORT_DIR")
-        jobs_store = JobsStore(app_support_dir)
+        jobs_store = get_jobs_store()
         all_jobs = jobs_store.get_all_jobs()
 
         # Use requested zone or default to "All Speakers"
@@ -38,43 +34,10 @@ def index() -> Any:
         current_jobs_objs = all_jobs.get(current_zone, [])
         current_jobs = [job.to_dict() for job in current_jobs_objs]
 
-        # Get cron status to determine which jobs are applied
-        from . import cronblock
-
-        if cronblock.cron_manager is None:
-            cronblock.cron_manager = cronblock.CronManager(app_support_dir)
-
-        # Get current cron jobs
-        current_lines = cronblock.cron_manager._get_current_crontab()
-        current_cron_jobs = set()
-        in_aircron_section = False
-
-        for line in current_lines:
-            line = line.strip()
-            if line == cronblock.AIRCRON_BEGIN:
-                in_aircron_section = True
-            elif line == cronblock.AIRCRON_END:
-                in_aircron_section = False
-            elif in_aircron_section and line and not line.startswith("#"):
-                # Normalize the cron line for comparison
-                current_cron_jobs.add(_normalize_cron_line(line))
-
-        # Add status to each job in current zone
+        # Add status to each job in current zone (same rules as /api/cron/all)
+        statuses = cron_service.get_job_statuses()
         for job in current_jobs:
-            job_obj = None
-            for j in current_jobs_objs:
-                if j.id == job["id"]:
-                    job_obj = j
-                    break
-
-            if job_obj:
-                cron_line = cronblock.cron_manager._job_to_cron_line(job_obj)
-                if cron_line and _normalize_cron_line(cron_line) in current_cron_jobs:
-                    job["status"] = "applied"
-                else:
-                    job["status"] = "pending"
-            else:
-                job["status"] = "unknown"
+            job["status"] = statuses.get(job["id"], "pending")
 
         # Always aggregate zones for sidebar from all jobs
         all_jobs_full = jobs_store.get_all_jobs()
@@ -124,50 +87,14 @@ def index() -> Any:
 def zone_view(zone_name: str) -> Any:
     """Get jobs for a specific zone (HTMX partial)."""
     try:
-        from flask import current_app
-
-        app_support_dir = current_app.config.get("APP_SUPPORT_DIR")
-        jobs_store = JobsStore(app_support_dir)
+        jobs_store = get_jobs_store()
         jobs_objs = jobs_store.get_jobs_for_zone(zone_name)
         jobs = [job.to_dict() for job in jobs_objs]
 
-        # Get cron status to determine which jobs are applied
-        from . import cronblock
-
-        if cronblock.cron_manager is None:
-            cronblock.cron_manager = cronblock.CronManager(app_support_dir)
-
-        # Get current cron jobs
-        current_lines = cronblock.cron_manager._get_current_crontab()
-        current_cron_jobs = set()
-        in_aircron_section = False
-
-        for line in current_lines:
-            line = line.strip()
-            if line == cronblock.AIRCRON_BEGIN:
-                in_aircron_section = True
-            elif line == cronblock.AIRCRON_END:
-                in_aircron_section = False
-            elif in_aircron_section and line and not line.startswith("#"):
-                # Normalize the cron line for comparison
-                current_cron_jobs.add(_normalize_cron_line(line))
-
-        # Add status to each job
+        # Add status to each job (same rules as /api/cron/all)
+        statuses = cron_service.get_job_statuses()
         for job in jobs:
-            job_obj = None
-            for j in jobs_objs:
-                if j.id == job["id"]:
-                    job_obj = j
-                    break
-
-            if job_obj:
-                cron_line = cronblock.cron_manager._job_to_cron_line(job_obj)
-                if cron_line and _normalize_cron_line(cron_line) in current_cron_jobs:
-                    job["status"] = "applied"
-                else:
-                    job["status"] = "pending"
-            else:
-                job["status"] = "unknown"
+            job["status"] = statuses.get(job["id"], "pending")
 
         # Always aggregate zones for sidebar from all jobs
         all_jobs_full = jobs_store.get_all_jobs()
@@ -230,16 +157,8 @@ def add_job_modal(zone_name: str) -> Any:
 def edit_job_modal(zone_name: str, job_id: str) -> Any:
     """Show edit job modal (HTMX partial)."""
     try:
-        from flask import current_app
-
-        app_support_dir = current_app.config.get("APP_SUPPORT_DIR")
-        jobs_store = JobsStore(app_support_dir)
-        jobs = jobs_store.get_jobs_for_zone(zone_name)
-        job = None
-        for j in jobs:
-            if j.id == job_id:
-                job = j
-                break
+        jobs_store = get_jobs_store()
+        job = jobs_store.get_job(zone_name, job_id)
         if not job:
             return "<div class='text-red-500'>Job not found</div>", 404
         # Get all available speakers for multi-select
@@ -0,0 +1,127 @@
+"""Benchmark end-to-end fire latency and subprocess fan-out on a simulated Mac.
+
+Run with ``python -m benchmarks.bench_fire``. Each action in a mixed schedule
+(connect, play, volume, pause, disconnect over single and ``Custom:`` zones) is
+fired through ``aircron_run.sh`` as cron would run it (``script``) and through
+the resident executor (``executor``), against the osascript, spotify, pgrep and
+open stand-ins from ``app/tests/fake_mac.py``. ``--latency`` sets how long each
+osascript and spotify call takes, to model a slow Airfoil.
+
+For each path and action it reports the fire's wall time and how many tool
+processes it started. ``--concurrency`` fires that many actions at once, as
+when several jobs share a minute.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+from unittest.mock import patch
+
+from app.executor import ActionExecutor
+from app.runqueue import QueuedAction
+from app.tests.fake_mac import FakeMac
+
+SCRIPT = Path(__file__).resolve().parents[1] / "aircron_run.sh"
+SPEAKERS = [f"Speaker {i}" for i in range(12)]
+FIRES: List[Tuple[str, str, str]] = [
+    ("Speaker 0", "connect", ""),
+    ("Custom:Speaker 1,Speaker 2,Speaker 3", "connect", ""),
+    ("Speaker 4", "play", "spotify:playlist:1"),
+    ("Custom:Speaker 5,Speaker 6", "play", "spotify:playlist:2"),
+    ("Custom:Speaker 7,Speaker 8,Speaker 9,Speaker 10", "volume", "40"),
+    ("Speaker 11", "pause", ""),
+    ("Custom:Speaker 1,Speaker 2,Speaker 3", "disconnect", ""),
+]
+
+
+def _fire_script(mac: FakeMac, zone: str, action: str, arg: str) -> None:
+    env = {
+        **os.environ,
+        **mac.env(),
+        "HOME": str(mac.root),
+        "AIRCRON_NO_EXECUTOR": "1",
+        "AIRCRON_RUN_LOG": str(mac.root / "runs.jsonl"),
+        "AIRCRON_JOB_ID": "bench",
+    }
+    subprocess.run(["bash", str(SCRIPT), zone, action, arg, "", "spotify"], env=env, timeout=120)
+
+
+def _measure(path: str, rounds: int, concurrency: int, latency: float) -> List[Dict[str, Any]]:
+    """Wall time and tool calls per fire, for each action."""
+    with tempfile.TemporaryDirectory() as tmp:
+        mac = FakeMac(Path(tmp)).install(SPEAKERS, latency=latency)
+        with patch.dict(os.environ, mac.env()):
+            executor = ActionExecutor()
+
+            def fire(spec: Tuple[str, str, str]) -> float:
+                start = time.perf_counter()
+                if path == "script":
+                    _fire_script(mac, *spec)
+                else:
+                    executor.run(QueuedAction(*spec, job_id="bench", scheduled_at=time.time()))
+                return time.perf_counter() - start
+
+            rows = []
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                for zone, action, arg in FIRES:
+                    mac.clear_calls()
+                    batch = [(zone, action, arg)] * (rounds * concurrency)
+                    timings = list(pool.map(fire, batch))
+                    calls = mac.calls()
+                    by_tool: Dict[str, int] = {}
+                    for call in calls:
+                        by_tool[call["tool"]] = by_tool.get(call["tool"], 0) + 1
+                    rows.append(
+                        {
+                            "path": path,
+                            "action": action,
+                            "zone": zone,
+                            "fires": len(timings),
+                            "median_ms": round(statistics.median(timings) * 1e3, 1),
+                            "max_ms": round(max(timings) * 1e3, 1),
+                            "tools_per_fire": round(len(calls) / len(timings), 2),
+                            "by_tool": by_tool,
+                        }
+                    )
+            return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--rounds", type=int, default=3, help="fires per action and worker")
+    parser.add_argument("--concurrency", type=int, default=1, help="simultaneous fires")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per tool call")
+    parser.add_argument("--path", choices=["script", "executor", "both"], default="both")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    paths = ["script", "executor"] if args.path == "both" else [args.path]
+    rows = [
+        row for path in paths for row in _measure(path, args.rounds, args.concurrency, args.latency)
+    ]
+
+    print(
+        f"{'path':<9} {'action':<11} {'speakers':>8} {'median ms':>10} {'max ms':>9} {'tools':>6}"
+    )
+    for row in rows:
+        speakers = len(row["zone"].split(","))
+        print(
+            f"{row['path']:<9} {row['action']:<11} {speakers:>8} {row['median_ms']:>10.1f} "
+            f"{row['max_ms']:>9.1f} {row['tools_per_fire']:>6.1f}"
+        )
+    if args.output:
+        meta = {"rounds": args.rounds, "concurrency": args.concurrency, "latency": args.latency}
+        Path(args.output).write_text(json.dumps({"meta": meta, "results": rows}, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
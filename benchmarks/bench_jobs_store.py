@@ -0,0 +1,131 @@
+"""Benchmark JobsStore add/update/delete latency as the store grows.
+
+Run with ``python -m benchmarks.bench_jobs_store``. By default persistence is
+stubbed out so the numbers isolate the in-memory index work (lookup by id and
+slot conflict checks); pass ``--persist`` to include the backend write, and
+``--backend sqlite`` to measure the row-level SQLite backend instead of jobs.json.
+
+It finishes with the time to import each store size as a single persisted
+``JobsStore.apply_batch`` call into an empty store.
+"""
+
+import argparse
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+from unittest.mock import patch
+
+from app.jobs_backends import BACKENDS, DEFAULT_BACKEND, get_backend
+from app.jobs_store import Job, JobOperation, JobsStore
+
+SIZES = [100, 1_000, 10_000, 50_000]
+ZONE_SIZE = 50
+
+
+def _write_jobs(app_support_dir: Path, count: int) -> None:
+    """Write a jobs.json with `count` non-conflicting jobs spread over many zones."""
+    jobs: Dict[str, List[Dict[str, object]]] = {}
+    for i in range(count):
+        zone = f"Zone {i // ZONE_SIZE}"
+        slot = i % ZONE_SIZE
+        job = Job(
+            job_id=f"j{i}",
+            zone=zone,
+            days=[1, 2, 3, 4, 5],
+            time=f"{slot // 60:02d}:{slot % 60:02d}",
+            action="pause",
+            args={},
+            service="spotify",
+        )
+        jobs.setdefault(zone, []).append(job.to_dict())
+    (app_support_dir / "jobs.json").write_text(json.dumps(jobs))
+
+
+def _time_ops(backend_name: str, count: int, ops: int) -> Dict[str, List[float]]:
+    """Return per-operation latencies in seconds for add, update and delete."""
+    with tempfile.TemporaryDirectory() as tmp:
+        _write_jobs(Path(tmp), count)
+        # A new backend imports the jobs.json written above
+        store = JobsStore(Path(tmp), backend=get_backend(backend_name, Path(tmp)))
+        store.get_all_jobs()  # warm the snapshot cache
+
+        new_jobs = [
+            Job(f"n{i}", "Bench Zone", [6, 7], f"{i // 60 % 24:02d}:{i % 60:02d}", "pause", {})
+            for i in range(ops)
+        ]
+        timings: Dict[str, List[float]] = {"add": [], "update": [], "delete": []}
+        for job in new_jobs:
+            start = time.perf_counter()
+            store.add_job(job)
+            timings["add"].append(time.perf_counter() - start)
+        for job in new_jobs:
+            updated = Job(job.id, job.zone, job.days, job.time, "resume", {}, label="updated")
+            start = time.perf_counter()
+            store.update_job(updated)
+            timings["update"].append(time.perf_counter() - start)
+        for job in new_jobs:
+            start = time.perf_counter()
+            store.delete_job(job.zone, job.id)
+            timings["delete"].append(time.perf_counter() - start)
+        return timings
+
+
+def _time_batch_import(backend_name: str, count: int) -> float:
+    """Return the seconds taken to import `count` jobs as one batch, including the write."""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = JobsStore(Path(tmp), backend=get_backend(backend_name, Path(tmp)))
+        operations = [
+            JobOperation.add(
+                Job(
+                    f"j{i}",
+                    f"Zone {i // ZONE_SIZE}",
+                    [1, 2, 3, 4, 5],
+                    f"{i % ZONE_SIZE // 60:02d}:{i % ZONE_SIZE % 60:02d}",
+                    "pause",
+                    {},
+                )
+            )
+            for i in range(count)
+        ]
+        start = time.perf_counter()
+        errors = store.apply_batch(operations)
+        elapsed = time.perf_counter() - start
+        assert not any(errors), "benchmark jobs must not conflict"
+        return elapsed
+
+
+def _p99(values: List[float]) -> float:
+    return sorted(values)[max(0, int(len(values) * 0.99) - 1)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--persist", action="store_true", help="include backend writes")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=DEFAULT_BACKEND)
+    parser.add_argument("--ops", type=int, default=200, help="operations per size and kind")
+    args = parser.parse_args()
+
+    print(f"{'jobs':>8} {'op':>7} {'mean us':>10} {'p99 us':>10}")
+    for count in SIZES:
+        if args.persist:
+            timings = _time_ops(args.backend, count, args.ops)
+        else:
+            # Skip the write but report the unchanged version so the cache stays valid
+            skip_write = lambda self, changes, current: self.version()  # noqa: E731
+            with patch.object(BACKENDS[args.backend], "apply", skip_write):
+                timings = _time_ops(args.backend, count, args.ops)
+        for op, values in timings.items():
+            mean_us = statistics.mean(values) * 1e6
+            p99_us = _p99(values) * 1e6
+            print(f"{count:>8} {op:>7} {mean_us:>10.1f} {p99_us:>10.1f}")
+
+    print(f"\n{'jobs':>8} {'batch import ms':>16}")
+    for count in SIZES:
+        print(f"{count:>8} {_time_batch_import(args.backend, count) * 1e3:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Benchmark the in-process scheduler's heap as the schedule grows.
+
+Run with ``python -m benchmarks.bench_scheduler``. For each size it reports the
+time to build the heap from the store, the per-fire scheduling overhead (pop,
+dispatch to a no-op and reschedule, measured over a busy simulated day) and the
+time to pick up a single edited job.
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from app.jobs_store import Job, JobsStore
+from app.scheduler import JobScheduler
+
+SIZES = [100, 1_000, 10_000, 100_000]
+ZONE_SIZE = 50
+ACTIONS = ["play", "pause", "resume", "volume", "connect", "disconnect"]
+
+
+def _write_jobs(app_support_dir: Path, count: int) -> None:
+    """Write `count` jobs over many zones (every 10th a Custom: zone), spread over the day."""
+    jobs: Dict[str, List[Dict[str, object]]] = {}
+    for i in range(count):
+        group = i // ZONE_SIZE
+        zone = f"Custom:Zone {group},Zone {group + 1}" if group % 10 == 0 else f"Zone {group}"
+        slot = (i * 7) % 1440
+        action = ACTIONS[i % len(ACTIONS)]
+        args = {"uri": f"spotify:playlist:{i}"} if action == "play" else {}
+        if action == "volume":
+            args = {"volume": i % 100}
+        job = Job(
+            f"j{i}",
+            zone,
+            [1 + i % 7, 1 + (i + 3) % 7],
+            f"{slot // 60:02d}:{slot % 60:02d}",
+            action,
+            args,
+        )
+        jobs.setdefault(zone, []).append(job.to_dict())
+    (app_support_dir / "jobs.json").write_text(json.dumps(jobs))
+
+
+def _measure(count: int, fires: int) -> Tuple[float, float, int, float]:
+    """Return (build s, per-fire us, fires measured, single-edit sync ms)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        _write_jobs(Path(tmp), count)
+        store = JobsStore(Path(tmp))
+        store.get_all_jobs()  # warm the snapshot cache; parsing jobs.json isn't measured
+
+        start_at = datetime(2026, 1, 5, 0, 0).timestamp()  # a Monday
+        scheduler = JobScheduler(store, lambda job, fire: None, clock=lambda: start_at)
+        start = time.perf_counter()
+        scheduler.sync()
+        build = time.perf_counter() - start
+
+        # Step through the day minute by minute until enough fires were measured
+        fired = 0
+        elapsed = 0.0
+        now = start_at
+        while fired < fires and now < start_at + 7 * 86400:
+            now += 60
+            start = time.perf_counter()
+            fired += scheduler.run_pending(now)
+            elapsed += time.perf_counter() - start
+        per_fire_us = elapsed / max(fired, 1) * 1e6
+
+        job = store.get_job("Zone 1", "j50")
+        assert job is not None
+        edited = Job(job.id, job.zone, job.days, "23:59", job.action, job.args)
+        store.update_job(edited)
+        start = time.perf_counter()
+        scheduler.sync()
+        edit_ms = (time.perf_counter() - start) * 1e3
+        return build, per_fire_us, fired, edit_ms
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--fires", type=int, default=5_000, help="fires to time per size")
+    args = parser.parse_args()
+
+    print(f"{'jobs':>8} {'build ms':>10} {'us/fire':>9} {'fires':>7} {'edit sync ms':>13}")
+    for count in SIZES:
+        build, per_fire_us, fired, edit_ms = _measure(count, args.fires)
+        print(f"{count:>8} {build * 1e3:>10.1f} {per_fire_us:>9.1f} {fired:>7} {edit_ms:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+"""Benchmark the jobs store, cron compiler and API over synthetic schedules.
+
+Run with ``python -m benchmarks.bench_suite``. For each schedule size (100 to
+100,000 jobs over up to 400 zones, every 10th a ``Custom:`` multi-speaker zone)
+it times:
+
+- ``store.load``: reading jobs.json into a cold snapshot cache, and
+  ``store.add`` / ``store.update`` / ``store.delete``: single persisted edits.
+- ``cron.generate_lines``: the AirCron block from a new ``CronManager`` (every
+  line compiled) and ``cron.generate_lines.warm`` from the memoized one, plus
+  ``cron.compile.after_edit``: recompiling after one job changed.
+- ``cron.status`` / ``cron.preview``: with the crontab snapshot re-read each
+  time from a crontab holding the applied block.
+- ``GET /api/jobs/all``, ``GET /api/cron/all`` and ``GET /``: through the Flask
+  test client with the response cache cleared, so the handler does its work.
+
+``crontab`` and ``osascript`` are the simulated Mac's (``app/tests/fake_mac.py``),
+so the suite runs anywhere and never touches the real crontab.
+
+``--output results.json`` saves the timings; ``--compare baseline.json`` reports
+each median against a saved run and exits 1 if any is more than ``--threshold``
+times slower. ``--compare`` with ``--input`` compares two saved runs without
+measuring. The scaling exponent between sizes (1 = linear) points out paths that
+grow faster than the schedule.
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from unittest.mock import patch
+
+from app import create_app, cronblock
+from app.jobs_store import Job, JobsStore, RawJobs
+from app.jobs_store import _snapshot_cache as jobs_snapshot_cache
+from app.response_cache import response_cache
+from app.services import cron_service
+from app.speakers import speaker_discovery
+from app.tests.fake_mac import FakeMac
+
+SIZES = [100, 1_000, 10_000, 100_000]
+ZONES = 400
+CUSTOM_EVERY = 10
+ACTIONS = ["play", "pause", "resume", "volume", "connect", "disconnect"]
+ROUTES = ["/api/jobs/all", "/api/cron/all", "/"]
+# Medians this many times the baseline's are reported as regressions
+DEFAULT_THRESHOLD = 1.25
+# Scaling exponents above this are flagged as superlinear
+SUPERLINEAR = 1.3
+
+Result = Dict[str, Any]
+
+
+def _zone_name(index: int) -> str:
+    if index % CUSTOM_EVERY == 0:
+        return "Custom:" + ",".join(f"Speaker {index + k}" for k in range(3))
+    return f"Speaker {index}"
+
+
+def make_jobs(count: int, zones: int = ZONES) -> RawJobs:
+    """`count` non-conflicting jobs spread round-robin over up to `zones` zones."""
+    zone_count = max(1, min(zones, count))
+    jobs: RawJobs = {}
+    for i in range(count):
+        zone = _zone_name(i % zone_count)
+        # Each zone's jobs get distinct minutes of the day, so no slot is taken twice
+        slot = (i // zone_count * 7) % 1440
+        action = ACTIONS[i % len(ACTIONS)]
+        args: Dict[str, Any] = {}
+        if action == "play":
+            args = {"uri": f"spotify:playlist:{i}"}
+        elif action == "volume":
+            args = {"volume": i % 100}
+        job = Job(
+            f"j{i}",
+            zone,
+            [1 + i % 7, 1 + (i + 3) % 7],
+            f"{slot // 60:02d}:{slot % 60:02d}",
+            action,
+            args,
+        )
+        jobs.setdefault(zone, []).append(job.to_dict())
+    return jobs
+
+
+def _speakers(count: int) -> List[str]:
+    return [f"Speaker {i}" for i in range(min(ZONES, count) + 2)]
+
+
+def _time(
+    fn: Callable[[], Any], repeat: int, setup: Optional[Callable[[], Any]] = None
+) -> List[float]:
+    """Seconds per call of `fn`, running the untimed `setup` before each."""
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _time_each(fn: Callable[[Job], Any], jobs: List[Job]) -> List[float]:
+    """Seconds per call of `fn` for each job."""
+    timings = []
+    for job in jobs:
+        start = time.perf_counter()
+        fn(job)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _summarize(name: str, size: int, timings: List[float]) -> Result:
+    ordered = sorted(timings)
+    return {
+        "name": name,
+        "size": size,
+        "runs": len(ordered),
+        "min_ms": round(ordered[0] * 1e3, 4),
+        "median_ms": round(statistics.median(ordered) * 1e3, 4),
+        "mean_ms": round(statistics.mean(ordered) * 1e3, 4),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1e3, 4),
+    }
+
+
+def _time_store(root: Path, repeat: int, ops: int) -> Dict[str, List[float]]:
+    timings = {
+        "store.load": _time(
+            lambda: JobsStore(root).get_all_jobs(), repeat, jobs_snapshot_cache.clear
+        )
+    }
+    store = JobsStore(root)
+    new_jobs = [
+        Job(f"n{i}", "Bench Zone", [6, 7], f"{i // 60 % 24:02d}:{i % 60:02d}", "pause", {})
+        for i in range(ops)
+    ]
+    timings["store.add"] = _time_each(store.add_job, new_jobs)
+    timings["store.update"] = _time_each(
+        store.update_job,
+        [Job(job.id, job.zone, job.days, job.time, "resume", {}) for job in new_jobs],
+    )
+    timings["store.delete"] = _time_each(lambda job: store.delete_job(job.zone, job.id), new_jobs)
+    return timings
+
+
+def _time_cron(root: Path, repeat: int) -> Dict[str, List[float]]:
+    timings = {
+        "cron.generate_lines": _time(
+            lambda: cronblock.CronManager(root)._generate_cron_lines(), repeat
+        )
+    }
+    manager = cronblock.CronManager(root)
+    manager._generate_cron_lines()
+    timings["cron.generate_lines.warm"] = _time(manager._generate_cron_lines, repeat)
+
+    store = JobsStore(root)
+    job = store.get_job(_zone_name(0), "j0")
+    assert job is not None
+    edits = iter(range(1, repeat + 1))
+
+    def edit_one_job() -> None:
+        minute = 1439 - next(edits)
+        store.update_job(
+            Job(
+                job.id,
+                job.zone,
+                job.days,
+                f"{minute // 60:02d}:{minute % 60:02d}",
+                job.action,
+                job.args,
+            )
+        )
+
+    timings["cron.compile.after_edit"] = _time(manager.compile_jobs, repeat, edit_one_job)
+    return timings
+
+
+def _measure(root: Path, count: int, repeat: int, ops: int) -> List[Result]:
+    support = root / "support"
+    support.mkdir()
+    (support / "jobs.json").write_text(json.dumps(make_jobs(count)))
+    jobs_snapshot_cache.clear()
+
+    timings = _time_store(support, repeat, ops)
+    timings.update(_time_cron(support, repeat))
+
+    # The app gets its own CronManager; the crontab holds the applied block
+    app = create_app(
+        {
+            "TESTING": True,
+            "APP_SUPPORT_DIR": support,
+            "RUN_LOG": root / "runs.jsonl",
+            "SPEAKER_REFRESH_INTERVAL": 0,
+            "SPEAKER_CACHE_TTL": 3600.0,
+            "CRONTAB_SNAPSHOT_TTL": 3600.0,
+        }
+    )
+    speaker_discovery._refresh()
+    with app.app_context():
+        manager = cronblock.get_cron_manager()
+        manager.apply_jobs_to_cron()
+        timings["cron.status"] = _time(
+            cron_service.get_cron_status, repeat, manager.invalidate_crontab_snapshot
+        )
+        timings["cron.preview"] = _time(
+            cron_service.get_cron_preview, repeat, manager.invalidate_crontab_snapshot
+        )
+
+    client = app.test_client()
+    for route in ROUTES:
+
+        def get(route: str = route) -> None:
+            response = client.get(route)
+            assert response.status_code == 200, f"{route} returned {response.status_code}"
+
+        get()  # first request pays for template compilation
+        timings[f"GET {route}"] = _time(get, repeat, response_cache.clear)
+
+    return [_summarize(name, count, values) for name, values in timings.items()]
+
+
+def run_suite(sizes: List[int], repeat: int, ops: int) -> Dict[str, Any]:
+    """Measure every size and return the JSON-ready results."""
+    results: List[Result] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        mac = FakeMac(Path(tmp)).install(_speakers(max(sizes)))
+        # Crontab backups are written to the home directory
+        with patch.dict(os.environ, {**mac.env(), "HOME": tmp}):
+            for count in sizes:
+                with mac.edit() as state:
+                    state["crontab"] = None
+                with tempfile.TemporaryDirectory(dir=tmp) as root:
+                    print(f"measuring {count} jobs...", file=sys.stderr)
+                    results.extend(_measure(Path(root), count, repeat, ops))
+    return {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": sizes,
+            "repeat": repeat,
+            "ops": ops,
+        },
+        "results": results,
+        "scaling": scaling(results),
+    }
+
+
+def scaling(results: List[Result]) -> List[Result]:
+    """Growth exponent of each benchmark's median between consecutive sizes."""
+    by_name: Dict[str, List[Tuple[int, float]]] = {}
+    for result in results:
+        by_name.setdefault(result["name"], []).append((result["size"], result["median_ms"]))
+    rows = []
+    for name, points in by_name.items():
+        points.sort()
+        for (n1, t1), (n2, t2) in zip(points, points[1:]):
+            if t1 <= 0 or t2 <= 0:
+                continue
+            exponent = math.log(t2 / t1) / math.log(n2 / n1)
+            rows.append({"name": name, "from": n1, "to": n2, "exponent": round(exponent, 2)})
+    return rows
+
+
+def compare(current: List[Result], baseline: List[Result], threshold: float) -> List[Result]:
+    """Median ratio (current / baseline) for each benchmark present in both runs."""
+    previous = {(r["name"], r["size"]): r for r in baseline}
+    rows = []
+    for result in current:
+        base = previous.get((result["name"], result["size"]))
+        if base is None or base["median_ms"] <= 0:
+            continue
+        ratio = result["median_ms"] / base["median_ms"]
+        status = "ok"
+        if ratio > threshold:
+            status = "regression"
+        elif ratio < 1 / threshold:
+            status = "improvement"
+        rows.append(
+            {
+                "name": result["name"],
+                "size": result["size"],
+                "baseline_ms": base["median_ms"],
+                "median_ms": result["median_ms"],
+                "ratio": round(ratio, 3),
+                "status": status,
+            }
+        )
+    return rows
+
+
+def _print_results(report: Dict[str, Any]) -> None:
+    print(f"{'benchmark':<28} {'jobs':>7} {'median ms':>11} {'p95 ms':>11} {'min ms':>11}")
+    for r in report["results"]:
+        print(
+            f"{r['name']:<28} {r['size']:>7} {r['median_ms']:>11.3f} "
+            f"{r['p95_ms']:>11.3f} {r['min_ms']:>11.3f}"
+        )
+    flagged = [row for row in report.get("scaling", []) if row["exponent"] > SUPERLINEAR]
+    if flagged:
+        print(f"\nGrowing faster than the schedule (exponent > {SUPERLINEAR}):")
+        for row in flagged:
+            print(f"  {row['name']:<28} {row['from']:>7} -> {row['to']:<7} n^{row['exponent']}")
+
+
+def _print_comparison(rows: List[Result]) -> None:
+    print(f"\n{'benchmark':<28} {'jobs':>7} {'baseline ms':>12} {'median ms':>11} {'ratio':>7}")
+    for row in rows:
+        marker = "" if row["status"] == "ok" else f"  {row['status']}"
+        print(
+            f"{row['name']:<28} {row['size']:>7} {row['baseline_ms']:>12.3f} "
+            f"{row['median_ms']:>11.3f} {row['ratio']:>7.2f}{marker}"
+        )
+
+
+def _load(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--sizes",
+        type=lambda value: [int(n) for n in value.split(",")],
+        default=SIZES,
+        help="comma-separated job counts (default: %(default)s)",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="timed calls per benchmark")
+    parser.add_argument("--ops", type=int, default=20, help="store edits per size and kind")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument("--input", help="compare these saved results instead of measuring")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    if args.input:
+        report = _load(args.input)
+    else:
+        # Keep the per-request info logging out of the terminal and the timings' noise
+        logging.disable(logging.INFO)
+        report = run_suite(args.sizes, args.repeat, args.ops)
+    _print_results(report)
+
+    if args.compare:
+        rows = compare(report["results"], _load(args.compare)["results"], args.threshold)
+        report["comparison"] = rows
+        _print_comparison(rows)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+    if any(row["status"] == "regression" for row in report.get("comparison", [])):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,23 @@
 #!/usr/bin/env python3
 """AirCron UI - Flask server entry point (no tray)."""
 
+import argparse
 import logging
 import shutil
+import signal
+import tempfile
 import threading
 import webbrowser
 from pathlib import Path
+from typing import Any, Dict, List, Optional
 
 from app import create_app
+from app import scheduler as scheduler_module
+from app.executor import ActionExecutor, start_executor
+from app.runlog import RunLog
+from app.runqueue import RunQueue
+from app.scheduler import start_scheduler
+from app.server import SERVER_MODES, benchmark, make_server
 
 
 def setup_logging() -> None:
@@ -72,8 +82,88 @@ def check_dependencies() -> None:
         raise RuntimeError("cron not found in PATH")
 
 
-def main() -> None:
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="AirCron UI server")
+    parser.add_argument("--port", type=int, default=3009)
+    parser.add_argument("--server", choices=SERVER_MODES, help="HTTP server (SERVER_MODE)")
+    parser.add_argument("--threads", type=int, help="handler threads (SERVER_THREADS)")
+    parser.add_argument(
+        "--max-connections", type=int, help="open connections before 503s (SERVER_MAX_CONNECTIONS)"
+    )
+    parser.add_argument(
+        "--request-timeout", type=float, help="socket read/write timeout (SERVER_REQUEST_TIMEOUT)"
+    )
+    parser.add_argument(
+        "--bench",
+        action="store_true",
+        help="serve a scratch app on a free port and report req/s and p50/p99 for read endpoints",
+    )
+    parser.add_argument("--bench-requests", type=int, default=500)
+    parser.add_argument("--bench-concurrency", type=int, default=8)
+    parser.add_argument("--no-browser", action="store_true", help="don't open the UI on launch")
+    return parser.parse_args(argv)
+
+
+def server_config(args: argparse.Namespace) -> Dict[str, Any]:
+    """App config overrides from the command line."""
+    config: Dict[str, Any] = {}
+    for option, key in [
+        ("server", "SERVER_MODE"),
+        ("threads", "SERVER_THREADS"),
+        ("max_connections", "SERVER_MAX_CONNECTIONS"),
+        ("request_timeout", "SERVER_REQUEST_TIMEOUT"),
+    ]:
+        if getattr(args, option) is not None:
+            config[key] = getattr(args, option)
+    return config
+
+
+def run_bench(args: argparse.Namespace) -> None:
+    """Benchmark the read endpoints against a throwaway app support dir."""
+    with tempfile.TemporaryDirectory(prefix="aircron-bench-") as temp_dir:
+        flask_app = create_app(
+            {
+                **server_config(args),
+                "APP_SUPPORT_DIR": temp_dir,
+                "SPEAKER_REFRESH_INTERVAL": 0,
+                "EXECUTOR_AUTOSTART": False,
+            }
+        )
+        mode = flask_app.config["SERVER_MODE"]
+        if mode == "production":
+            server: Any = make_server(flask_app, "127.0.0.1", 0, flask_app.config)
+        else:
+            from werkzeug.serving import make_server as make_dev_server
+
+            server = make_dev_server("127.0.0.1", 0, flask_app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        print(f"{mode} server, {args.bench_requests} requests x {args.bench_concurrency} clients")
+        print(f"{'endpoint':<20} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        results = benchmark(
+            "127.0.0.1",
+            server.port,
+            requests=args.bench_requests,
+            concurrency=args.bench_concurrency,
+        )
+        for row in results:
+            print(
+                f"{row['endpoint']:<20} {row['rps']:>9.0f} {row['p50_ms']:>8.2f} "
+                f"{row['p99_ms']:>8.2f} {row['errors']:>7}"
+            )
+        if mode == "production":
+            server.drain(timeout=1)
+        else:
+            server.shutdown()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
     """Main entry point (no tray)."""
+    args = parse_args(argv)
+    if args.bench:
+        run_bench(args)
+        return
+
     setup_logging()
 
     try:
@@ -82,21 +172,66 @@ def main() -> None:
         logging.error(f"Dependency check failed: {e}")
         return
 
-    flask_app = create_app()
-    port = 3009
+    flask_app = create_app(server_config(args))
+    port = args.port
+
+    # Executor runs go to the same run log as aircron_run.sh's
+    run_log = RunLog(flask_app.config["RUN_LOG"])
+
+    # Keep a resident executor so cron fires skip the script's cold start
+    executor_server = None
+    if flask_app.config["EXECUTOR_AUTOSTART"]:
+        try:
+            executor_server = start_executor(
+                flask_app.config["EXECUTOR_SOCKET"], ActionExecutor(run_log)
+            )
+        except OSError as e:
+            logging.warning(f"Action executor not started: {e}")
+
+    if flask_app.config["SCHEDULER_BACKEND"] == "internal":
+        if executor_server is not None:
+            queue = executor_server.queue
+        else:
+            queue = RunQueue(
+                ActionExecutor(run_log).run,
+                flask_app.config["APP_SUPPORT_DIR"] / "scheduler-queue",
+            )
+            queue.start()
+        start_scheduler(flask_app.config, queue)
+        logging.info("Internal scheduler started")
 
-    def run_flask():
-        flask_app.run(host="127.0.0.1", port=port, debug=False)
+    if flask_app.config["SERVER_MODE"] == "production":
+        http_server = make_server(flask_app, "127.0.0.1", port, flask_app.config)
+        run_flask = http_server.serve_forever
+    else:
+        http_server = None
+
+        def run_flask():
+            flask_app.run(host="127.0.0.1", port=port, debug=False)
 
     flask_thread = threading.Thread(target=run_flask, daemon=True)
     flask_thread.start()
-    logging.info(f"Flask server started on port {port}")
+    logging.info(f"Flask server ({flask_app.config['SERVER_MODE']}) started on port {port}")
 
     # Open browser on first launch
-    webbrowser.open(f"http://127.0.0.1:{port}")
-
-    # Wait for Flask thread to finish (block main thread)
-    flask_thread.join()
+    if not args.no_browser:
+        webbrowser.open(f"http://127.0.0.1:{port}")
+
+    # Block the main thread until SIGINT/SIGTERM, then drain in-flight requests
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+    while flask_thread.is_alive() and not stop.wait(1):
+        pass
+
+    logging.info("Shutting down")
+    if http_server is not None:
+        http_server.drain(flask_app.config["SERVER_DRAIN_TIMEOUT"])
+    if scheduler_module.scheduler is not None:
+        scheduler_module.scheduler.stop()
+    if executor_server is not None:
+        executor_server.shutdown()
+        executor_server.server_close()
 
 
 if __name__ == "__main__":
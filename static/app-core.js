@@ -60,7 +60,10 @@ window.AirCron.applyCron = function () {
       return resp.json();
     })
     .then((data) => {
-      window.AirCron.showStatus("✓ Applied to cron", "success");
+      window.AirCron.showStatus(
+        data.changed === false ? "✓ Cron already up to date" : "✓ Applied to cron",
+        "success"
+      );
       return data;
     })
     .catch((err) => {
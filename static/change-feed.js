@@ -0,0 +1,74 @@
+// Change Feed Module
+// Follows /api/changes and patches UI state instead of re-fetching job lists
+
+window.AirCron = window.AirCron || {};
+
+(function () {
+  const state = window.AirCron.state;
+
+  function jobKey(job) {
+    return `${job.zone}\u0000${job.id}`;
+  }
+
+  function applyJobEvent(event) {
+    const jobs = state.jobs || [];
+    if (event.op === "put") {
+      // An update that moved zones arrives as a delete plus a put
+      const index = jobs.findIndex((job) => jobKey(job) === jobKey(event.job));
+      if (index >= 0) jobs[index] = event.job;
+      else jobs.push(event.job);
+    } else if (event.op === "delete") {
+      state.jobs = jobs.filter((job) => !(job.zone === event.zone && job.id === event.id));
+      return;
+    }
+    state.jobs = jobs;
+  }
+
+  let rerenderQueued = false;
+  function rerender() {
+    // Coalesce a burst of events (e.g. a batch edit) into one render
+    if (rerenderQueued) return;
+    rerenderQueued = true;
+    requestAnimationFrame(() => {
+      rerenderQueued = false;
+      if (window.AirCron.renderFilters) window.AirCron.renderFilters();
+      if (window.AirCron.renderSchedule) window.AirCron.renderSchedule();
+    });
+  }
+
+  function handleChange(event) {
+    if (event.type === "job") {
+      applyJobEvent(event);
+      rerender();
+    } else if (event.type === "jobs" && event.op === "reset") {
+      if (window.AirCron.refreshJobs) window.AirCron.refreshJobs();
+    }
+    document.dispatchEvent(new CustomEvent("aircron:change", { detail: event }));
+  }
+
+  function connect() {
+    if (!window.EventSource) return;
+    const source = new EventSource("/api/changes");
+
+    source.addEventListener("hello", () => {
+      window.AirCron.changeFeedConnected = true;
+    });
+    source.addEventListener("change", (msg) => handleChange(JSON.parse(msg.data)));
+    source.addEventListener("reset", () => {
+      // Missed events (server restart or too far behind): reload once
+      if (window.AirCron.refreshJobs) window.AirCron.refreshJobs();
+      document.dispatchEvent(
+        new CustomEvent("aircron:change", { detail: { type: "all", op: "reset" } })
+      );
+    });
+    source.onerror = () => {
+      // EventSource reconnects by itself, resuming from the last event id
+      window.AirCron.changeFeedConnected = false;
+    };
+    source.onopen = () => {
+      window.AirCron.changeFeedConnected = true;
+    };
+  }
+
+  document.addEventListener("DOMContentLoaded", connect);
+})();
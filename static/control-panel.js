@@ -155,6 +155,49 @@ function loadControlPlaylists() {
     });
 }
 
+// Resolve with the finished run, or reject with its error; the drawer stays usable meanwhile
+function waitForControlRun(run) {
+  return new Promise((resolve, reject) => {
+    const settle = (final) => {
+      if (final.status === "succeeded") resolve(final);
+      else reject(new Error(final.error || "Control action failed"));
+    };
+    const poll = () =>
+      fetch(`/api/control/${run.run_id}?wait=25`)
+        .then((resp) => resp.json())
+        .then((final) =>
+          final.status === "succeeded" || final.status === "failed"
+            ? settle(final)
+            : poll()
+        )
+        .catch(reject);
+
+    if (!window.EventSource) {
+      poll();
+      return;
+    }
+    const source = new EventSource(run.events_url);
+    source.addEventListener("done", (event) => {
+      source.close();
+      settle(JSON.parse(event.data));
+    });
+    source.onerror = () => {
+      // Stream dropped (e.g. proxy timeout); fall back to long-polling
+      source.close();
+      poll();
+    };
+  });
+}
+
+function describeControlRun(run) {
+  const speakers = (run.result && run.result.speakers) || [];
+  const failed = speakers.filter((s) => !s.ok);
+  if (failed.length) {
+    return `Done; failed on ${failed.map((s) => s.speaker).join(", ")}`;
+  }
+  return "Action complete";
+}
+
 function sendControlAction(action, args = {}, options = {}) {
   const service =
     document.getElementById("control-service")?.value || "spotify";
@@ -170,16 +213,30 @@ function sendControlAction(action, args = {}, options = {}) {
     headers: { "Content-Type": "application/json" },
     body: JSON.stringify({ action, service, zone, args }),
   })
-    .then((resp) => {
-      if (!resp.ok) {
-        return resp.json().then((data) => {
+    .then((resp) =>
+      resp.json().then((data) => {
+        if (!resp.ok) {
           throw new Error(data.error || "Control action failed");
-        });
+        }
+        return data;
+      })
+    )
+    .then((run) => {
+      if (window.AirCron.showNotification) {
+        window.AirCron.showNotification(
+          run.deduplicated ? "Action already running" : "Action sent",
+          "info"
+        );
       }
+      return waitForControlRun(run);
     })
-    .then(() => {
+    .then((run) => {
       if (window.AirCron.showNotification) {
-        window.AirCron.showNotification("Action sent", "success");
+        const failed = ((run.result && run.result.speakers) || []).some((s) => !s.ok);
+        window.AirCron.showNotification(
+          describeControlRun(run),
+          failed ? "warning" : "success"
+        );
       }
     })
     .catch((err) => {
@@ -189,6 +246,13 @@ function sendControlAction(action, args = {}, options = {}) {
     });
 }
 
+// Keep the playlist picker current when playlists change in any browser
+document.addEventListener("aircron:change", function (e) {
+  if (e.detail.type === "playlist" || e.detail.type === "all") {
+    loadControlPlaylists();
+  }
+});
+
 document.addEventListener("DOMContentLoaded", function () {
   const closeBtn = document.getElementById("control-panel-close");
   const overlay = document.getElementById("control-panel-overlay");
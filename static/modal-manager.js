@@ -501,15 +501,10 @@ window.AirCron.initCronReviewModal = function () {
           ) {
             window.AirCron.refreshZone(window.currentZone);
           }
-          // Always refresh allJobs after apply to avoid stale state
-          fetch("/api/jobs/all")
-            .then((r) => r.json())
-            .then((data) => {
-              window.allJobs = data.jobs || [];
-              if (window.AirCron.renderHourlyTable) {
-                window.AirCron.renderHourlyTable();
-              }
-            });
+          // The change feed keeps the schedule current; re-fetch only without it
+          if (!window.AirCron.changeFeedConnected && window.AirCron.refreshJobs) {
+            window.AirCron.refreshJobs();
+          }
         } else {
           throw new Error(data.error || "Failed to apply changes");
         }
@@ -259,8 +259,11 @@ function renderHourlyTable() {
           throw new Error(data.error || "Delete failed");
         }
 
-        // Refresh jobs if the function exists
-        if (typeof window.AirCron.refreshJobs === "function") {
+        // The change feed removes the job; re-fetch only without it
+        if (
+          !window.AirCron.changeFeedConnected &&
+          typeof window.AirCron.refreshJobs === "function"
+        ) {
           await window.AirCron.refreshJobs();
         }
 
@@ -308,6 +311,7 @@ window.AirCron.refreshJobs = function () {
 };
 
 window.AirCron.renderFilters = renderFilters;
+window.AirCron.renderSchedule = renderSchedule;
 
 window.AirCron.openAddSchedule = function ({ day, time } = {}) {
   const params = new URLSearchParams();